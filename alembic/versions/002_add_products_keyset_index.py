@@ -0,0 +1,24 @@
+"""Add composite index for keyset pagination of products
+
+Revision ID: 002_add_products_keyset_index
+Revises: 001_add_lead_nurturing_state
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '002_add_products_keyset_index'
+down_revision = '001_add_lead_nurturing_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination orders by (created_at, id)
+    op.create_index('ix_products_created_at_id', 'products', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_products_created_at_id', table_name='products')
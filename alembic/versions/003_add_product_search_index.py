@@ -0,0 +1,47 @@
+"""Add full-text search index for products
+
+Revision ID: 003_add_product_search_index
+Revises: 002_add_products_keyset_index
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+
+from src.models.database import PRODUCT_SEARCH_DDL_SQLITE, PRODUCT_SEARCH_DDL_POSTGRESQL
+
+
+# revision identifiers, used by Alembic.
+revision = '003_add_product_search_index'
+down_revision = '002_add_products_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # FTS5 table + triggers, then backfill existing products
+        for statement in PRODUCT_SEARCH_DDL_SQLITE:
+            op.execute(statement)
+        op.execute(
+            "INSERT INTO products_fts (product_id, category, name, description, sku) "
+            "SELECT id, category, name, description, sku FROM products"
+        )
+    elif dialect == 'postgresql':
+        # Generated tsvector column is computed for existing rows on creation
+        for statement in PRODUCT_SEARCH_DDL_POSTGRESQL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS products_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS products_fts_insert")
+        op.execute("DROP TABLE IF EXISTS products_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search_vector")
+        op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_vector")
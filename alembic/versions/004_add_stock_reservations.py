@@ -0,0 +1,51 @@
+"""Add stock reservations for shop orders
+
+Revision ID: 004_add_stock_reservations
+Revises: 003_add_product_search_index
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_stock_reservations'
+down_revision = '003_add_product_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('order_id', sa.String(), sa.ForeignKey('orders.id'), nullable=False),
+        sa.Column('product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('RESERVED', 'COMMITTED', 'RELEASED', name='stockreservationstatusdb'),
+            nullable=False
+        ),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservations_id', 'stock_reservations', ['id'])
+    op.create_index('ix_stock_reservations_order_id', 'stock_reservations', ['order_id'])
+    op.create_index('ix_stock_reservations_product_id', 'stock_reservations', ['product_id'])
+    # The expiry sweep only looks at open reservations past their deadline
+    op.create_index(
+        'ix_stock_reservations_status_expires_at', 'stock_reservations', ['status', 'expires_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservations_status_expires_at', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_product_id', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_order_id', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_id', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
+    sa.Enum(name='stockreservationstatusdb').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,24 @@
+"""Add version column to cart items for optimistic concurrency
+
+Revision ID: 005_add_cart_item_version
+Revises: 004_add_stock_reservations
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_add_cart_item_version'
+down_revision = '004_add_stock_reservations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('cart_items', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('cart_items', 'version')
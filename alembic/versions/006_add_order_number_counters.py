@@ -0,0 +1,29 @@
+"""Add counter table for block-allocated order numbers
+
+Revision ID: 006_add_order_number_counters
+Revises: 005_add_cart_item_version
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_order_number_counters'
+down_revision = '005_add_cart_item_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_number_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('next_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('order_number_counters')
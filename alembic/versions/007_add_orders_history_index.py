@@ -0,0 +1,24 @@
+"""Add composite index for keyset pagination of the order history
+
+Revision ID: 007_add_orders_history_index
+Revises: 006_add_order_number_counters
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '007_add_orders_history_index'
+down_revision = '006_add_order_number_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Order history filters by user_id and orders by (created_at, id) descending
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
@@ -0,0 +1,85 @@
+"""Add local class schedule replica
+
+Revision ID: 009_add_schedule_replica
+Revises: 008_add_refresh_tokens
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_schedule_replica'
+down_revision = '008_add_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'classes',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('class_type', sa.String(), nullable=True),
+        sa.Column('trainer_name', sa.String(), nullable=True),
+        sa.Column('level', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('price', sa.String(), nullable=True),
+        sa.Column('location', sa.String(), nullable=True),
+        sa.Column('class_date', sa.Date(), nullable=False),
+        sa.Column('day_of_week', sa.String(), nullable=False),
+        sa.Column('start_time', sa.String(), nullable=True),
+        sa.Column('end_time', sa.String(), nullable=True),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # /api/schedule/classes filters a date range, optionally by day, type or trainer
+    op.create_index('ix_classes_date_start', 'classes', ['class_date', 'start_time'])
+    op.create_index('ix_classes_day_date', 'classes', ['day_of_week', 'class_date'])
+    op.create_index('ix_classes_type_date', 'classes', ['class_type', 'class_date'])
+    op.create_index('ix_classes_trainer_date', 'classes', ['trainer_name', 'class_date'])
+
+    for table in ('class_types', 'trainers'):
+        op.create_table(
+            table,
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('data', sa.JSON(), nullable=False),
+            sa.Column('synced_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    op.create_table(
+        'class_bookings',
+        sa.Column('booking_id', sa.String(), nullable=False),
+        sa.Column('class_id', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('booking_id')
+    )
+    op.create_index('ix_class_bookings_class_id', 'class_bookings', ['class_id'])
+
+    op.create_table(
+        'schedule_sync_state',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('window_start', sa.Date(), nullable=False),
+        sa.Column('window_end', sa.Date(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('schedule_sync_state')
+    op.drop_index('ix_class_bookings_class_id', table_name='class_bookings')
+    op.drop_table('class_bookings')
+    op.drop_table('trainers')
+    op.drop_table('class_types')
+    op.drop_index('ix_classes_trainer_date', table_name='classes')
+    op.drop_index('ix_classes_type_date', table_name='classes')
+    op.drop_index('ix_classes_day_date', table_name='classes')
+    op.drop_index('ix_classes_date_start', table_name='classes')
+    op.drop_table('classes')
@@ -0,0 +1,56 @@
+"""Add class reservations (optimistic bookings)
+
+Revision ID: 010_add_class_reservations
+Revises: 009_add_schedule_replica
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_class_reservations'
+down_revision = '009_add_schedule_replica'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'class_reservations',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('kind', sa.Enum('BOOKING', 'WAITLIST', name='classreservationkinddb'), nullable=False),
+        sa.Column('class_id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('user_email', sa.String(), nullable=False),
+        sa.Column('user_name', sa.String(), nullable=False),
+        sa.Column('holds_spot', sa.Boolean(), nullable=False),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'CONFIRMED', 'REJECTED', 'FAILED', name='classreservationstatusdb'),
+            nullable=False
+        ),
+        sa.Column('wodify_booking_id', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_class_reservations_class_id', 'class_reservations', ['class_id'])
+    op.create_index('ix_class_reservations_user_id', 'class_reservations', ['user_id'])
+    # The confirmation queue picks pending reservations that are due
+    op.create_index(
+        'ix_class_reservations_status_next_attempt_at', 'class_reservations', ['status', 'next_attempt_at']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_class_reservations_status_next_attempt_at', table_name='class_reservations')
+    op.drop_index('ix_class_reservations_user_id', table_name='class_reservations')
+    op.drop_index('ix_class_reservations_class_id', table_name='class_reservations')
+    op.drop_table('class_reservations')
+    sa.Enum(name='classreservationstatusdb').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='classreservationkinddb').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,32 @@
+"""Add date indexes for streaming exports
+
+Revision ID: 011_add_export_indexes
+Revises: 010_add_class_reservations
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_export_indexes'
+down_revision = '010_add_class_reservations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Exports stream rows ordered (and filtered) by their date
+    op.create_index('ix_members_created_at', 'members', ['created_at'])
+    op.create_index('ix_leads_created_at', 'leads', ['created_at'])
+    op.create_index('ix_webhook_logs_received_at', 'webhook_logs', ['received_at'])
+    op.create_index('ix_email_logs_created_at', 'email_logs', ['created_at'])
+    op.create_index('ix_email_logs_email_type_created_at', 'email_logs', ['email_type', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_email_logs_email_type_created_at', table_name='email_logs')
+    op.drop_index('ix_email_logs_created_at', table_name='email_logs')
+    op.drop_index('ix_webhook_logs_received_at', table_name='webhook_logs')
+    op.drop_index('ix_leads_created_at', table_name='leads')
+    op.drop_index('ix_members_created_at', table_name='members')
@@ -0,0 +1,38 @@
+"""Drop the expiry of stock reservations
+
+Orders are binding as soon as they are placed, so reservations are never
+released and don't need a status or deadline.
+
+Revision ID: 012_drop_stock_reservation_expiry
+Revises: 011_add_export_indexes
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012_drop_stock_reservation_expiry'
+down_revision = '011_add_export_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_stock_reservations_status_expires_at', table_name='stock_reservations')
+    with op.batch_alter_table('stock_reservations') as batch_op:
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('status')
+    sa.Enum(name='stockreservationstatusdb').drop(op.get_bind(), checkfirst=True)
+
+
+def downgrade():
+    status = sa.Enum('RESERVED', 'COMMITTED', 'RELEASED', name='stockreservationstatusdb')
+    status.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table('stock_reservations') as batch_op:
+        batch_op.add_column(sa.Column('status', status, nullable=False, server_default='COMMITTED'))
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    op.create_index(
+        'ix_stock_reservations_status_expires_at', 'stock_reservations', ['status', 'expires_at']
+    )
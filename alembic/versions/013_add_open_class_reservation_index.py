@@ -0,0 +1,46 @@
+"""Allow one open class reservation per user, class and kind
+
+Revision ID: 013_add_open_class_reservation_index
+Revises: 012_drop_stock_reservation_expiry
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013_add_open_class_reservation_index'
+down_revision = '012_drop_stock_reservation_expiry'
+branch_labels = None
+depends_on = None
+
+OPEN_CONDITION = "status IN ('PENDING', 'CONFIRMED')"
+
+
+def upgrade():
+    # Concurrent requests could create duplicates before; keep the oldest open one
+    op.execute(f"""
+        UPDATE class_reservations SET status = 'FAILED', last_error = 'Doppelte Anfrage'
+        WHERE {OPEN_CONDITION} AND EXISTS (
+            SELECT 1 FROM class_reservations AS older
+            WHERE older.kind = class_reservations.kind
+              AND older.class_id = class_reservations.class_id
+              AND older.user_id = class_reservations.user_id
+              AND older.status IN ('PENDING', 'CONFIRMED')
+              AND (older.created_at < class_reservations.created_at
+                   OR (older.created_at = class_reservations.created_at AND older.id < class_reservations.id))
+        )
+    """)
+    op.create_index(
+        'uq_class_reservations_open_request',
+        'class_reservations',
+        ['kind', 'class_id', 'user_id'],
+        unique=True,
+        sqlite_where=sa.text(OPEN_CONDITION),
+        postgresql_where=sa.text(OPEN_CONDITION)
+    )
+
+
+def downgrade():
+    op.drop_index('uq_class_reservations_open_request', table_name='class_reservations')
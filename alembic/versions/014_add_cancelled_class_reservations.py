@@ -0,0 +1,27 @@
+"""Add the cancelled status of class reservations
+
+Revision ID: 014_add_cancelled_class_reservations
+Revises: 013_add_open_class_reservation_index
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '014_add_cancelled_class_reservations'
+down_revision = '013_add_open_class_reservation_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite stores the enum as VARCHAR, only Postgres has a type to extend
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE classreservationstatusdb ADD VALUE IF NOT EXISTS 'CANCELLED'")
+
+
+def downgrade():
+    # Postgres can't drop enum values; cancelled reservations count as failed
+    op.execute("UPDATE class_reservations SET status = 'FAILED' WHERE status = 'CANCELLED'")
@@ -29,6 +29,10 @@ class Settings(BaseSettings):
     redis_db: int = Field(default=0, env="REDIS_DB")
     redis_password: Optional[str] = Field(default=None, env="REDIS_PASSWORD")
     
+    # Rate Limiting ("sliding-window-counter", "moving-window" or "fixed-window")
+    rate_limit_strategy: str = Field(default="sliding-window-counter", env="RATE_LIMIT_STRATEGY")
+    rate_limit_storage_uri: Optional[str] = Field(default=None, env="RATE_LIMIT_STORAGE_URI")  # Overrides the Redis settings
+    
     # WODIFY Configuration
     wodify_webhook_secret: str = Field(env="WODIFY_WEBHOOK_SECRET")
     wodify_api_key: Optional[str] = Field(default=None, env="WODIFY_API_KEY")
@@ -48,6 +52,28 @@ class Settings(BaseSettings):
         default=None,
         env="WODIFY_SALES_PORTAL_API_KEY"
     )
+    wodify_retry_attempts: int = Field(default=3, env="WODIFY_RETRY_ATTEMPTS")  # Incl. the first attempt
+    wodify_retry_backoff_seconds: float = Field(default=0.5, env="WODIFY_RETRY_BACKOFF_SECONDS")  # Doubles per retry
+    wodify_retry_max_wait_seconds: float = Field(default=5.0, env="WODIFY_RETRY_MAX_WAIT_SECONDS")  # Longer Retry-After fails
+    wodify_breaker_failure_threshold: int = Field(default=5, env="WODIFY_BREAKER_FAILURE_THRESHOLD")  # Consecutive failures
+    wodify_breaker_recovery_seconds: float = Field(default=30.0, env="WODIFY_BREAKER_RECOVERY_SECONDS")  # Open before probing
+    wodify_concurrency_initial: int = Field(default=10, env="WODIFY_CONCURRENCY_INITIAL")
+    wodify_concurrency_min: int = Field(default=1, env="WODIFY_CONCURRENCY_MIN")
+    wodify_concurrency_max: int = Field(default=50, env="WODIFY_CONCURRENCY_MAX")
+    wodify_concurrency_queue_timeout_seconds: float = Field(default=5.0, env="WODIFY_CONCURRENCY_QUEUE_TIMEOUT_SECONDS")
+    wodify_hedging: bool = Field(default=False, env="WODIFY_HEDGING")  # Second request for slow schedule reads
+    wodify_hedge_min_samples: int = Field(default=20, env="WODIFY_HEDGE_MIN_SAMPLES")  # Latencies needed for the p95
+    wodify_batch_lookups: bool = Field(default=False, env="WODIFY_BATCH_LOOKUPS")  # API accepts ?ids=a,b,c lists
+    wodify_batch_max_size: int = Field(default=50, env="WODIFY_BATCH_MAX_SIZE")  # IDs per batched lookup
+    wodify_lookup_concurrency: int = Field(default=5, env="WODIFY_LOOKUP_CONCURRENCY")  # Single lookups in flight per batch
+    schedule_deadline_seconds: float = Field(default=5.0, env="SCHEDULE_DEADLINE_SECONDS")  # /api/schedule reads
+    schedule_replica_enabled: bool = Field(default=True, env="SCHEDULE_REPLICA_ENABLED")  # Local copy of the schedule
+    schedule_replica_refresh_minutes: int = Field(default=15, env="SCHEDULE_REPLICA_REFRESH_MINUTES")
+    schedule_replica_days_ahead: int = Field(default=28, env="SCHEDULE_REPLICA_DAYS_AHEAD")
+    optimistic_booking_enabled: bool = Field(default=True, env="OPTIMISTIC_BOOKING_ENABLED")  # Confirm bookings with Wodify in the background
+    booking_confirm_max_attempts: int = Field(default=5, env="BOOKING_CONFIRM_MAX_ATTEMPTS")
+    booking_confirm_backoff_seconds: float = Field(default=30.0, env="BOOKING_CONFIRM_BACKOFF_SECONDS")  # Doubles per attempt
+    booking_confirm_interval_seconds: int = Field(default=30, env="BOOKING_CONFIRM_INTERVAL_SECONDS")  # Queue sweep
     
     # SendGrid Email Configuration
     sendgrid_api_key: str = Field(env="SENDGRID_API_KEY")
@@ -82,6 +108,11 @@ class Settings(BaseSettings):
     jwt_algorithm: str = Field(default="HS256", env="JWT_ALGORITHM")
     jwt_access_token_expire_minutes: int = Field(default=30, env="JWT_ACCESS_TOKEN_EXPIRE_MINUTES")
     jwt_refresh_token_expire_days: int = Field(default=7, env="JWT_REFRESH_TOKEN_EXPIRE_DAYS")
+    jwt_embed_principal_claims: bool = Field(default=True, env="JWT_EMBED_PRINCIPAL_CLAIMS")
+    auth_principal_cache_ttl_seconds: int = Field(default=60, env="AUTH_PRINCIPAL_CACHE_TTL_SECONDS")
+    auth_principal_local_ttl_seconds: int = Field(default=5, env="AUTH_PRINCIPAL_LOCAL_TTL_SECONDS")  # Without Redis
+    bcrypt_rounds: int = Field(default=12, env="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=4, env="PASSWORD_HASH_WORKERS")
 
     # AI/LLM Configuration
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
@@ -90,17 +121,43 @@ class Settings(BaseSettings):
     llm_model: str = Field(default="gpt-4o-mini", env="LLM_MODEL")  # e.g., "gpt-4o-mini", "gpt-4", "claude-3-haiku"
     llm_temperature: float = Field(default=0.7, env="LLM_TEMPERATURE")
     llm_max_tokens: int = Field(default=500, env="LLM_MAX_TOKENS")
+    llm_timeout_seconds: float = Field(default=30.0, env="LLM_TIMEOUT_SECONDS")  # Whole request incl. queueing
+    llm_max_concurrency: int = Field(default=8, env="LLM_MAX_CONCURRENCY")  # In-flight requests per provider
+    llm_max_connections: int = Field(default=20, env="LLM_MAX_CONNECTIONS")  # Pooled connections per provider
+    openai_base_url: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")
+    anthropic_base_url: Optional[str] = Field(default=None, env="ANTHROPIC_BASE_URL")
+    llm_cache_ttl_seconds: int = Field(default=3600, env="LLM_CACHE_TTL_SECONDS")
+    llm_cache_max_entries: int = Field(default=1000, env="LLM_CACHE_MAX_ENTRIES")  # 0 disables the response cache
+    llm_cache_semantic: bool = Field(default=False, env="LLM_CACHE_SEMANTIC")  # Match rephrased prompts (needs numpy)
+    llm_cache_semantic_threshold: float = Field(default=0.9, env="LLM_CACHE_SEMANTIC_THRESHOLD")  # Cosine similarity
+    llm_context_max_tokens: int = Field(default=300, env="LLM_CONTEXT_MAX_TOKENS")  # Caller-supplied extra context
+    llm_history_max_tokens: int = Field(default=1500, env="LLM_HISTORY_MAX_TOKENS")  # Older messages are summarized
+    llm_input_cost_per_million: float = Field(default=0.15, env="LLM_INPUT_COST_PER_MILLION")  # USD, gpt-4o-mini
+    llm_cached_input_cost_per_million: float = Field(default=0.075, env="LLM_CACHED_INPUT_COST_PER_MILLION")
+    llm_output_cost_per_million: float = Field(default=0.60, env="LLM_OUTPUT_COST_PER_MILLION")
+    training_plan_cache_ttl_seconds: int = Field(default=604800, env="TRAINING_PLAN_CACHE_TTL_SECONDS")  # Skeletons
+    training_plan_cache_max_entries: int = Field(default=500, env="TRAINING_PLAN_CACHE_MAX_ENTRIES")
+    training_plan_skeleton_max_tokens: int = Field(default=2000, env="TRAINING_PLAN_SKELETON_MAX_TOKENS")
+    training_plan_personalization_max_tokens: int = Field(default=300, env="TRAINING_PLAN_PERSONALIZATION_MAX_TOKENS")
+    training_plan_job_ttl_seconds: int = Field(default=3600, env="TRAINING_PLAN_JOB_TTL_SECONDS")  # Finished job results
+    training_plan_max_jobs_per_user: int = Field(default=2, env="TRAINING_PLAN_MAX_JOBS_PER_USER")  # Running jobs
+    training_plan_job_stale_seconds: int = Field(default=60, env="TRAINING_PLAN_JOB_STALE_SECONDS")  # No heartbeat
     
     # Feature Flags
     enable_welcome_email: bool = Field(default=True, env="ENABLE_WELCOME_EMAIL")
     enable_team_notification: bool = Field(default=True, env="ENABLE_TEAM_NOTIFICATION")
     enable_lead_nurturing: bool = Field(default=True, env="ENABLE_LEAD_NURTURING")
     enable_slack_notifications: bool = Field(default=False, env="ENABLE_SLACK_NOTIFICATIONS")
+    scheduler_run_jobs: bool = Field(default=True, env="SCHEDULER_RUN_JOBS")  # False: only write jobs to the job store (CLI scripts)
     
     # Email Timing
     welcome_email_delay_minutes: int = Field(default=5, env="WELCOME_EMAIL_DELAY_MINUTES")
     lead_nurturing_delay_hours: int = Field(default=24, env="LEAD_NURTURING_DELAY_HOURS")
     lead_followup_delay_days: int = Field(default=7, env="LEAD_FOLLOWUP_DELAY_DAYS")
+    nurturing_spread_minutes: int = Field(default=60, env="NURTURING_SPREAD_MINUTES")  # Bulk-scheduled sequences are spread over this window
+    
+    # Shop
+    cart_cache_ttl_seconds: int = Field(default=900, env="CART_CACHE_TTL_SECONDS")
     
     class Config:
         env_file = ".env"
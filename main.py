@@ -7,8 +7,7 @@ It handles WODIFY webhooks and triggers automated workflows.
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from loguru import logger
 import sys
@@ -52,6 +51,7 @@ from src.api.shop import router as shop_router
 from src.api.leads import router as leads_router
 from src.api.membership import router as membership_router
 from src.api.sync import router as sync_router
+from src.utils.rate_limit import limiter
 
 
 # Configure logging
@@ -69,10 +69,6 @@ logger.add(
 )
 
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
-
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
@@ -81,7 +77,7 @@ app = FastAPI(
     debug=settings.debug
 )
 
-# Add rate limiter to app state
+# Add rate limiter to app state (shared with the routers, see src/utils/rate_limit.py)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -132,7 +128,13 @@ async def startup_event():
 async def shutdown_event():
     """Run on application shutdown"""
     from src.services.scheduler_service import scheduler_service
+    from src.utils.auth import shutdown_password_executor
+    from src.services.llm_service import llm_service
+    from src.services.training_plan_service import training_plan_service
+    await training_plan_service.aclose()
+    await llm_service.aclose()
     scheduler_service.shutdown()
+    shutdown_password_executor()
     logger.info(f"Shutting down {settings.app_name}")
 
 
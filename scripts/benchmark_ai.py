@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+AI Benchmark Script - G3 CrossFit WODIFY Automation
+
+Misst die AI-Endpunkte gegen einen lokalen Stub-Provider (OpenAI-kompatibel),
+der Antworten mit einstellbarer Latenz Token für Token erzeugt. Es werden
+weder API-Keys noch ein laufendes Backend benötigt.
+
+Verwendung:
+    python scripts/benchmark_ai.py
+    python scripts/benchmark_ai.py --only streaming --first-token-ms 500 --tokens 400
+    python scripts/benchmark_ai.py --only cache --semantic-threshold 0.85
+    python scripts/benchmark_ai.py --only intents --show-misses
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+os.environ.setdefault("WODIFY_WEBHOOK_SECRET", "benchmark")
+os.environ.setdefault("DEBUG", "False")
+
+
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def print_header(text: str):
+    """Print formatted header"""
+    print(f"\n{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{text}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}\n")
+
+
+def serve(app) -> tuple:
+    """Run an ASGI app with uvicorn in a background thread, returns (server, base_url)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def make_provider_stub(first_token_ms: float, tokens: int, token_ms: float):
+    """OpenAI-compatible chat completions stub: first token after first_token_ms, then one every token_ms"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    words = [f" wort{i}" for i in range(tokens)]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": body["model"]}
+
+        if not body.get("stream"):
+            await asyncio.sleep((first_token_ms + tokens * token_ms) / 1000)
+            return {
+                **chunk, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(words)}}],
+            }
+
+        async def events():
+            await asyncio.sleep(first_token_ms / 1000)
+            for word in words:
+                delta = {**chunk, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+                await asyncio.sleep(token_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def bench_streaming(args) -> List:
+    """Time to first byte and total time: buffered /generate-response vs. SSE stream"""
+    import httpx
+    from fastapi import FastAPI
+    from loguru import logger
+    from config.settings import settings
+    import src.api.ai as ai_api
+    from src.services.llm_service import LLMService
+
+    logger.disable("src")
+    provider, provider_url = serve(make_provider_stub(args.first_token_ms, args.tokens, args.token_ms))
+    settings.llm_provider = "openai"
+    settings.openai_api_key = "sk-benchmark"
+    settings.openai_base_url = f"{provider_url}/v1"
+    ai_api.llm_service = LLMService()
+
+    app = FastAPI()
+    app.include_router(ai_api.router)
+    server, base_url = serve(app)
+
+    def measure(path: str):
+        ttfb, total = [], []
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                with client.stream("POST", path, json={"prompt": "Was kostet die Mitgliedschaft?"}) as response:
+                    chunks = response.iter_raw()
+                    next(chunks)
+                    ttfb.append((time.perf_counter() - start) * 1000)
+                    for _ in chunks:
+                        pass
+                total.append((time.perf_counter() - start) * 1000)
+        return statistics.mean(ttfb), statistics.mean(total)
+
+    generation_ms = args.first_token_ms + args.tokens * args.token_ms
+    print_header(
+        f"Streaming ({args.requests} Requests je Lauf, erstes Token nach {args.first_token_ms:.0f} ms, "
+        f"{args.tokens} Tokens, ~{generation_ms:.0f} ms Generierung)"
+    )
+    print(f"{'Endpoint':<48} {'TTFB (ms)':>10} {'Gesamt (ms)':>12}")
+    print("-" * 72)
+    try:
+        for name, path in (
+            ("Gepuffert: /generate-response", "/api/ai/generate-response"),
+            ("SSE: /generate-response/stream", "/api/ai/generate-response/stream"),
+        ):
+            ttfb, total = measure(path)
+            print(f"{name:<48} {ttfb:>10.1f} {total:>12.1f}")
+    finally:
+        server.should_exit = True
+        provider.should_exit = True
+
+
+# Typical phone assistant questions: a few topics, asked in many variants
+CACHE_WORKLOAD = [
+    "Wann habt ihr geöffnet?", "wann habt ihr geöffnet", "Wann habt ihr denn geöffnet?",
+    "Wie sind eure Öffnungszeiten?", "Wie sind denn eure Öffnungszeiten", "wie sind eure öffnungszeiten?",
+    "Was kostet die Mitgliedschaft?", "Was kostet die Mitgliedschaft", "Was kostet die Mitgliedschaft denn?",
+    "Kann ich ein Probetraining buchen?", "Kann ich ein Probetraining buchen", "kann ich ein probetraining buchen?!",
+    "Kann ich bei euch ein Probetraining buchen?", "Wo seid ihr?", "wo seid ihr", "Wo seid ihr genau?",
+    "Gibt es Parkplätze?", "gibt es parkplätze", "Gibt es bei euch Parkplätze?", "Welche Kurse gibt es?",
+]
+
+
+def bench_cache(args) -> List:
+    """Hit rate and latency of the LLM response cache for a repetitive question mix"""
+    from loguru import logger
+    from config.settings import settings
+    from src.services.llm_cache_service import LLMResponseCache
+    from src.services.llm_service import LLMService
+
+    logger.disable("src")
+    provider, provider_url = serve(make_provider_stub(args.first_token_ms, 20, 0))
+    settings.llm_provider = "openai"
+    settings.openai_api_key = "sk-benchmark"
+    settings.openai_base_url = f"{provider_url}/v1"
+
+    print_header(
+        f"LLM-Cache ({len(CACHE_WORKLOAD) * args.cache_rounds} Anfragen, {len(CACHE_WORKLOAD)} Varianten, "
+        f"Provider-Latenz {args.first_token_ms:.0f} ms)"
+    )
+    print(f"{'Cache':<36} {'Hit-Rate':>9} {'Exakt':>7} {'Semant.':>8} {'Treffer (µs)':>13} {'Provider (ms)':>14}")
+    print("-" * 92)
+    loop = asyncio.new_event_loop()
+    try:
+        for name, max_entries, semantic in (
+            ("ohne Cache", 0, False),
+            ("exakt", 1000, False),
+            (f"exakt + semantisch (>= {args.semantic_threshold})", 1000, True),
+        ):
+            service = LLMService()
+            service.cache = LLMResponseCache(
+                max_entries=max_entries, semantic=semantic, semantic_threshold=args.semantic_threshold
+            )
+            hits, misses = [], []
+
+            async def run():
+                for _ in range(args.cache_rounds):
+                    for prompt in CACHE_WORKLOAD:
+                        before = service.cache.report()["misses"]
+                        start = time.perf_counter()
+                        await service.generate_response(prompt, context="G3 CrossFit Assistent")
+                        elapsed = time.perf_counter() - start
+                        (misses if service.cache.report()["misses"] > before else hits).append(elapsed)
+                await service.aclose()
+
+            loop.run_until_complete(run())
+            report = service.cache.report()
+            hit_us = statistics.mean(hits) * 1e6 if hits else 0.0
+            miss_ms = statistics.mean(misses) * 1000 if misses else 0.0
+            print(f"{name:<36} {report['hit_rate']:>8.0%} {report['exact_hits']:>7} {report['semantic_hits']:>8} "
+                  f"{hit_us:>13.0f} {miss_ms:>14.0f}")
+    finally:
+        loop.close()
+        provider.should_exit = True
+
+
+CALLER_UTTERANCES = Path(__file__).resolve().parent / "data" / "caller_utterances.tsv"
+
+
+def legacy_intent(prompt: str):
+    """Former LLMService._generate_fallback substring chain, returning the intent instead of the answer"""
+    prompt_lower = prompt.lower()
+    if "probetraining" in prompt_lower or "trial" in prompt_lower:
+        return "trial_class"
+    if "preis" in prompt_lower or "kostet" in prompt_lower or "mitgliedschaft" in prompt_lower:
+        return "pricing"
+    if "standort" in prompt_lower or "wo" in prompt_lower or "adresse" in prompt_lower:
+        return "location"
+    if "öffnungszeiten" in prompt_lower or "wann" in prompt_lower or "stunden" in prompt_lower:
+        return "opening_hours"
+    if "kurse" in prompt_lower or "klassen" in prompt_lower or "training" in prompt_lower:
+        return "classes"
+    if "anruf beginnt" in prompt_lower:
+        return "greeting_call_start"
+    if "hallo" in prompt_lower:
+        return "greeting"
+    return None
+
+
+def bench_intents(args) -> List:
+    """Accuracy and throughput of the fallback intent classification on labeled caller utterances"""
+    from src.services.intent_service import intent_matcher
+
+    corpus = []
+    for line in CALLER_UTTERANCES.read_text(encoding="utf-8").splitlines():
+        if line and not line.startswith("#"):
+            intent, utterance = line.split("\t", 1)
+            corpus.append((None if intent == "none" else intent, utterance))
+
+    print_header(f"Intent-Erkennung ({len(corpus)} Äußerungen, {args.intent_rounds} Durchläufe für den Durchsatz)")
+    print(f"{'Verfahren':<48} {'Genauigkeit':>12} {'Äußerungen/s':>14}")
+    print("-" * 76)
+    for name, classify in (
+        ("Legacy: Substring-Kette", legacy_intent),
+        ("Regex-Trie mit Wortgrenzen und Gewichtung", intent_matcher.classify),
+    ):
+        misses = [(expected, classify(text), text) for expected, text in corpus if classify(text) != expected]
+        start = time.perf_counter()
+        for _ in range(args.intent_rounds):
+            for _, text in corpus:
+                classify(text)
+        throughput = args.intent_rounds * len(corpus) / (time.perf_counter() - start)
+        accuracy = 1 - len(misses) / len(corpus)
+        print(f"{name:<48} {accuracy:>11.1%} {throughput:>14,.0f}")
+        if args.show_misses:
+            for expected, actual, text in misses:
+                print(f"    erwartet {expected or 'none'}, erkannt {actual or 'none'}: {text}")
+
+
+BENCHMARKS = {
+    "streaming": bench_streaming,
+    "cache": bench_cache,
+    "intents": bench_intents,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI-Benchmarks")
+    parser.add_argument("--requests", type=int, default=5, help="Requests je Lauf")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Latenz des Stub-Providers bis zum ersten Token")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens pro Antwort des Stub-Providers")
+    parser.add_argument("--token-ms", type=float, default=10, help="Abstand zwischen zwei Tokens")
+    parser.add_argument("--cache-rounds", type=int, default=3, help="Durchläufe der Fragen-Mischung im Cache-Benchmark")
+    parser.add_argument("--semantic-threshold", type=float, default=0.9, help="Ähnlichkeitsschwelle des semantischen Caches")
+    parser.add_argument("--intent-rounds", type=int, default=200, help="Durchläufe des Korpus im Intent-Benchmark")
+    parser.add_argument("--show-misses", action="store_true", help="Falsch erkannte Äußerungen ausgeben")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS.keys()), action="append", help="Nur ausgewählte Benchmarks")
+    args = parser.parse_args()
+
+    print_header("AI-Benchmarks - G3 CrossFit WODIFY Automation")
+    for name in args.only or BENCHMARKS.keys():
+        BENCHMARKS[name](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Export Benchmark Script - G3 CrossFit WODIFY Automation
+
+Misst Durchsatz (Zeilen/s) und Peak-RSS der Admin-Exporte gegen
+synthetische E-Mail-Logs (Standard: 500.000 Zeilen) in einer temporären
+SQLite-Datenbank. Das Backend muss dafür nicht laufen.
+
+Jede Messung läuft in einem eigenen Prozess, da der Peak-RSS eines
+Prozesses nur wachsen kann.
+
+Verwendung:
+    python scripts/benchmark_export.py
+    python scripts/benchmark_export.py --rows 100000 --only ndjson --only legacy
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_DB_DIR = tempfile.mkdtemp(prefix="g3_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/bench.db")
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+os.environ.setdefault("WODIFY_WEBHOOK_SECRET", "benchmark")
+os.environ.setdefault("DEBUG", "False")
+
+EMAIL_TYPES = ["welcome", "nurturing_day_1", "nurturing_day_3", "nurturing_day_7", "followup"]
+
+
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def print_header(text: str):
+    """Print formatted header"""
+    print(f"\n{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{text}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}\n")
+
+
+def peak_rss_mib() -> float:
+    """Peak RSS of this process (ru_maxrss is KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows: int):
+    """Create tables and seed synthetic email logs"""
+    from src.database import engine, init_db
+    from src.models.database import EmailLog
+
+    init_db()
+    start = time.perf_counter()
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, 10_000):
+            conn.execute(EmailLog.__table__.insert(), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "email_type": EMAIL_TYPES[i % len(EMAIL_TYPES)],
+                    "recipient_email": f"lead{i}@example.com",
+                    "recipient_name": f"Lead {i}",
+                    "sendgrid_message_id": f"sg-{i}",
+                    "sent": True,
+                    "sent_at": base + timedelta(seconds=i * 30),
+                    "related_lead_id": f"lead_{i % 5000}",
+                    "created_at": base + timedelta(seconds=i * 30),
+                }
+                for i in range(offset, min(offset + 10_000, rows))
+            ])
+    print(f"{Colors.GREEN}✅ {rows} E-Mail-Logs angelegt ({time.perf_counter() - start:.1f}s){Colors.RESET}")
+
+
+def run_mode(mode: str):
+    """Export all email logs once and print 'rows seconds peak_rss_mib'"""
+    import json
+
+    from src.database import SessionLocal
+    from src.models.database import EmailLog
+    from src.services.export_service import EXPORTS, _value, export_service
+
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    size = 0
+    if mode == "legacy":
+        # Behaviour without streaming: load every row, then serialize
+        db = SessionLocal()
+        try:
+            columns = EXPORTS["email_logs"].columns
+            logs = db.query(EmailLog).order_by(EmailLog.created_at).all()
+            body = "".join(
+                json.dumps({c: _value(getattr(log, c)) for c in columns}, ensure_ascii=False) + "\n"
+                for log in logs
+            )
+            size = body.count("\n")
+        finally:
+            db.close()
+    else:
+        for chunk in export_service.stream("email_logs", mode):
+            size += chunk.count("\n")
+        if mode == "csv":
+            size -= 1  # header row
+    elapsed = time.perf_counter() - start
+    print(f"{size} {elapsed} {peak_rss_mib() - baseline}")
+
+
+MODES = {
+    "ndjson": "Streaming NDJSON (yield_per)",
+    "csv": "Streaming CSV (yield_per)",
+    "legacy": "Legacy .all() + NDJSON",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export-Benchmarks")
+    parser.add_argument("--rows", type=int, default=500_000, help="Anzahl synthetischer E-Mail-Logs")
+    parser.add_argument("--only", choices=list(MODES), action="append", help="Nur ausgewählte Exporte")
+    parser.add_argument("--run", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run)
+        return 0
+
+    print_header("Export-Benchmarks - G3 CrossFit WODIFY Automation")
+    print(f"Datenbank: {os.environ['DATABASE_URL']}")
+    seed(args.rows)
+
+    print(f"\n{'Export':<40} {'Zeilen':>10} {'Zeilen/s':>12} {'Peak-RSS +MiB':>16}")
+    print("-" * 82)
+    for mode in args.only or MODES.keys():
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", mode],
+            capture_output=True, text=True, check=True, env=os.environ.copy()
+        ).stdout.split()
+        rows, seconds, rss = int(output[-3]), float(output[-2]), float(output[-1])
+        print(f"{MODES[mode]:<40} {rows:>10} {rows / seconds:>12.0f} {rss:>16.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
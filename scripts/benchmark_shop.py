@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Shop Benchmark Script - G3 CrossFit WODIFY Automation
+
+Misst Latenz und Speicherverbrauch der Shop-Abfragen gegen einen
+synthetischen Katalog (Standard: 100.000 Produkte) in einer temporären
+SQLite-Datenbank. Das Backend muss dafür nicht laufen.
+
+Verwendung:
+    python scripts/benchmark_shop.py
+    python scripts/benchmark_shop.py --catalog-size 10000 --only listing
+    python scripts/benchmark_shop.py --catalog-size 10000 --only loading --review-count 20000
+    python scripts/benchmark_shop.py --catalog-size 1000 --only auth
+    python scripts/benchmark_shop.py --catalog-size 1000 --only ratelimit --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_DB_DIR = tempfile.mkdtemp(prefix="g3_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/bench.db")
+os.environ.setdefault("SENDGRID_API_KEY", "benchmark")
+os.environ.setdefault("WODIFY_WEBHOOK_SECRET", "benchmark")
+os.environ.setdefault("DEBUG", "False")
+
+
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def print_header(text: str):
+    """Print formatted header"""
+    print(f"\n{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{text}{Colors.RESET}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{'='*70}{Colors.RESET}\n")
+
+
+def measure(func: Callable, iterations: int = 5) -> Dict[str, float]:
+    """
+    Run func several times and report latency and peak memory
+
+    Returns:
+        Dict with avg_ms, p95_ms and peak_kb (peak Python heap of one run)
+    """
+    timings = []
+    peak = 0
+    for _ in range(iterations):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    timings.sort()
+    return {
+        "avg_ms": statistics.mean(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "peak_kb": peak / 1024,
+    }
+
+
+def print_result(name: str, result: Dict[str, float]):
+    """Print one benchmark row"""
+    print(f"{name:<48} {result['avg_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['peak_kb']:>12.0f}")
+
+
+def print_table_header():
+    print(f"{'Benchmark':<48} {'Avg (ms)':>10} {'P95 (ms)':>10} {'Peak (KiB)':>12}")
+    print("-" * 84)
+
+
+def seed(catalog_size: int):
+    """Create tables and seed the synthetic catalog"""
+    from src.database import SessionLocal, init_db
+    from scripts.seed_products import seed_catalog
+
+    init_db()
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        seed_catalog(db, catalog_size)
+        print(f"{Colors.GREEN}✅ {catalog_size} Produkte angelegt "
+              f"({time.perf_counter() - start:.1f}s){Colors.RESET}")
+    finally:
+        db.close()
+
+
+def bench_listing(args) -> List:
+    """Product listing: legacy full load vs. keyset pages with projection"""
+    from src.database import SessionLocal
+    from src.models.database import Product
+    from src.api.shop import ProductResponse, fetch_product_page, parse_product_fields
+
+    print_header(f"Produktliste ({args.catalog_size} Produkte, Seitengröße {args.page_size})")
+    print_table_header()
+    db = SessionLocal()
+    try:
+        def legacy_full_load():
+            # Behaviour before pagination: load everything, build a model per row
+            for product in db.query(Product).all():
+                ProductResponse(
+                    id=product.id, name=product.name, description=product.description,
+                    price=product.price, category=product.category.value,
+                    images=product.images or [], sizes=product.sizes or [],
+                    inStock=product.in_stock, stock_quantity=product.stock_quantity,
+                    featured=product.featured, sku=product.sku
+                )
+            db.expunge_all()
+
+        def first_page():
+            fetch_product_page(db, limit=args.page_size)
+
+        sparse = parse_product_fields("id,name,price,inStock")
+
+        def first_page_sparse():
+            fetch_product_page(db, limit=args.page_size, fields=sparse)
+
+        # Cursor roughly in the middle of the catalog
+        middle_cursor = None
+        pages_to_middle = max(1, (args.catalog_size // 2) // args.page_size)
+        page = fetch_product_page(db, limit=args.page_size, fields=["id"])
+        for _ in range(pages_to_middle - 1):
+            if not page["next_cursor"]:
+                break
+            page = fetch_product_page(db, limit=args.page_size, cursor=page["next_cursor"], fields=["id"])
+        middle_cursor = page["next_cursor"]
+
+        def middle_page():
+            fetch_product_page(db, limit=args.page_size, cursor=middle_cursor)
+
+        print_result("Legacy: query.all() + ProductResponse", measure(legacy_full_load, iterations=2))
+        print_result("Keyset: erste Seite, alle Felder", measure(first_page, iterations=args.iterations))
+        print_result("Keyset: erste Seite, fields=id,name,price,inStock", measure(first_page_sparse, iterations=args.iterations))
+        print_result("Keyset: Seite in der Katalogmitte", measure(middle_page, iterations=args.iterations))
+    finally:
+        db.close()
+
+
+def bench_search(args) -> List:
+    """Full-text search latency at 1k and the configured catalog size"""
+    from sqlalchemy import text
+    from src.database import SessionLocal
+    from src.services.product_search_service import product_search_service
+
+    queries = ["hoodie", "g3 cross", "wasser", "G3-TS", "leggings kompression", "protein"]
+    db = SessionLocal()
+    try:
+        sizes = sorted({1_000, args.catalog_size})
+        for size in sizes:
+            # Restrict the index to the first `size` products for the smaller catalog
+            if size < args.catalog_size:
+                product_search_service.clear_index(db)
+                db.execute(text(
+                    "INSERT INTO products_fts (product_id, category, name, description, sku) "
+                    "SELECT id, category, name, description, sku FROM products ORDER BY created_at LIMIT :n"
+                ), {"n": size})
+                db.commit()
+            else:
+                product_search_service.rebuild_index(db)
+
+            print_header(f"Volltextsuche ({size} Produkte im Index)")
+            print_table_header()
+            for q in queries:
+                print_result(
+                    f"q={q!r}",
+                    measure(lambda: product_search_service.search(db, q, limit=20), iterations=args.iterations)
+                )
+            print_result(
+                "q='g3' category=clothing",
+                measure(lambda: product_search_service.search(db, "g3", category="clothing"), iterations=args.iterations)
+            )
+    finally:
+        db.close()
+
+
+def seed_loading_data(db, review_count: int, cart_size: int):
+    """Users with one review each on a single product, plus one large cart"""
+    import uuid
+    from src.models.database import User, Product, CartItem, ProductReview
+
+    product_ids = [row[0] for row in db.query(Product.id).order_by(Product.id).limit(cart_size).all()]
+    db.execute(User.__table__.insert(), [
+        {
+            "id": f"bench_user_{i}", "email": f"bench{i}@example.com", "username": f"bench{i}",
+            "hashed_password": "$2b$12$" + "x" * 53, "first_name": f"Athlet{i}", "last_name": "G3",
+        }
+        for i in range(review_count)
+    ])
+    db.execute(ProductReview.__table__.insert(), [
+        {
+            "id": str(uuid.uuid4()), "product_id": product_ids[0], "user_id": f"bench_user_{i}",
+            "rating": 1 + i % 5, "title": "Bewertung", "comment": "Sehr gutes Produkt " * 5,
+            "verified_purchase": False, "helpful_count": 0,
+        }
+        for i in range(review_count)
+    ])
+    db.execute(CartItem.__table__.insert(), [
+        {
+            "id": str(uuid.uuid4()), "user_id": "bench_user_0", "product_id": product_id,
+            "quantity": 1, "price_at_added": 19.99,
+        }
+        for product_id in product_ids
+    ])
+    db.commit()
+    return product_ids[0]
+
+
+def bench_loading(args) -> List:
+    """get_cart / get_product_reviews: legacy joined loads vs. explicit load options"""
+    import asyncio
+    from sqlalchemy.orm import joinedload
+    from src.database import SessionLocal
+    from src.models.database import User, CartItem, ProductReview
+    from src.api.shop import CartItemResponse, CartResponse, ReviewResponse, get_cart, get_product_reviews
+
+    db = SessionLocal()
+    try:
+        product_id = seed_loading_data(db, args.review_count, args.cart_size)
+        user = db.query(User).filter(User.id == "bench_user_0").one()
+        db.expunge(user)
+
+        def legacy_cart():
+            # Former lazy="joined" defaults: every row joins products and users
+            items = db.query(CartItem).options(
+                joinedload(CartItem.product), joinedload(CartItem.user)
+            ).filter(CartItem.user_id == user.id).all()
+            responses = [
+                CartItemResponse(
+                    id=item.id, product_id=item.product_id, product_name=item.product.name,
+                    product_image=item.product.images[0] if item.product.images else None,
+                    price=item.price_at_added, quantity=item.quantity, size=item.size,
+                    subtotal=item.price_at_added * item.quantity
+                )
+                for item in items
+            ]
+            subtotal = sum(r.subtotal for r in responses)
+            CartResponse(items=responses, subtotal=subtotal, shipping_cost=0.0, total=subtotal)
+            db.expunge_all()
+
+        def legacy_reviews():
+            reviews = db.query(ProductReview).options(
+                joinedload(ProductReview.product), joinedload(ProductReview.user)
+            ).filter(ProductReview.product_id == product_id).order_by(ProductReview.created_at.desc()).all()
+            for review in reviews:
+                ReviewResponse(
+                    id=review.id, product_id=review.product_id, user_id=review.user_id,
+                    user_name=review.user.first_name or review.user.email, rating=review.rating,
+                    title=review.title, comment=review.comment, verified_purchase=review.verified_purchase,
+                    helpful_count=review.helpful_count, created_at=review.created_at.isoformat()
+                )
+            db.expunge_all()
+
+        # One loop for all calls; asyncio.run() per call would dominate small carts
+        loop = asyncio.new_event_loop()
+
+        def current_cart():
+            loop.run_until_complete(get_cart(current_user=user, db=db))
+            db.expunge_all()
+
+        def current_reviews():
+            loop.run_until_complete(get_product_reviews(product_id, db=db))
+            db.expunge_all()
+
+        print_header(f"Lade-Strategien (Warenkorb: {args.cart_size} Items, {args.review_count} Bewertungen)")
+        print_table_header()
+        print_result("Legacy: get_cart mit joined Product + User", measure(legacy_cart, iterations=args.iterations))
+        print_result("get_cart: joinedload(product).load_only", measure(current_cart, iterations=args.iterations))
+        print_result("Legacy: get_product_reviews mit joined User", measure(legacy_reviews, iterations=args.iterations))
+        print_result("get_product_reviews: Namensspalten per JOIN", measure(current_reviews, iterations=args.iterations))
+        loop.close()
+    finally:
+        db.close()
+
+
+def bench_checkout(args) -> List:
+    """Checkout throughput with 20-line carts (sequential and from parallel threads)"""
+    import asyncio
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import update
+    from src.database import SessionLocal
+    from src.models.database import User, Product, CartItem
+    from src.api.shop import CreateOrderRequest, create_order
+
+    lines = 20
+    request = CreateOrderRequest(
+        shipping_name="Max Mustermann", shipping_email="max@example.com", shipping_phone=None,
+        shipping_address_line1="Hauptstraße 1", shipping_city="Berlin", shipping_postal_code="10115"
+    )
+
+    db = SessionLocal()
+    try:
+        product_ids = [row[0] for row in db.query(Product.id).order_by(Product.id).limit(lines).all()]
+        db.execute(update(Product).where(Product.id.in_(product_ids)).values(stock_quantity=10_000_000, in_stock=True))
+        users = [f"checkout_user_{i}" for i in range(2 * args.checkouts)]
+        db.execute(User.__table__.insert(), [
+            {"id": user_id, "email": f"{user_id}@example.com", "hashed_password": "x"} for user_id in users
+        ])
+        db.execute(CartItem.__table__.insert(), [
+            {
+                "id": str(uuid.uuid4()), "user_id": user_id, "product_id": product_id,
+                "quantity": 1 + i % 3, "price_at_added": 19.99, "version": 1,
+            }
+            for user_id in users
+            for i, product_id in enumerate(product_ids)
+        ])
+        db.commit()
+        user_objects = {user.id: user for user in db.query(User).filter(User.id.in_(users)).all()}
+        db.expunge_all()
+    finally:
+        db.close()
+
+    def checkout(user_ids: List[str]):
+        loop = asyncio.new_event_loop()
+        session = SessionLocal()
+        try:
+            for user_id in user_ids:
+                response = loop.run_until_complete(
+                    create_order(request, current_user=user_objects[user_id], db=session)
+                )
+                assert response.status_code == 201
+        finally:
+            session.close()
+            loop.close()
+
+    print_header(f"Checkout ({lines} Positionen pro Warenkorb, {args.checkouts} Bestellungen je Lauf)")
+    print(f"{'Lauf':<48} {'Gesamt (s)':>10} {'ms/Best.':>10} {'Best./s':>12}")
+    print("-" * 84)
+
+    sequential, parallel = users[:args.checkouts], users[args.checkouts:]
+    start = time.perf_counter()
+    checkout(sequential)
+    elapsed = time.perf_counter() - start
+    print(f"{'Sequenziell':<48} {elapsed:>10.2f} {elapsed * 1000 / len(sequential):>10.2f} {len(sequential) / elapsed:>12.0f}")
+
+    threads = 8
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(checkout, [parallel[i::threads] for i in range(threads)]))
+    elapsed = time.perf_counter() - start
+    print(f"{f'Parallel ({threads} Threads)':<48} {elapsed:>10.2f} {elapsed * 1000 / len(parallel):>10.2f} {len(parallel) / elapsed:>12.0f}")
+
+
+def bench_auth(args) -> List:
+    """get_current_user throughput: user query per request vs. principal cache vs. embedded claims"""
+    import asyncio
+    from fastapi.security import HTTPAuthorizationCredentials
+    from src.database import SessionLocal
+    from src.models.database import User
+    from src.api.auth import get_current_user
+    from src.services.database_service import database_service
+    from src.services.principal_cache_service import principal_cache_service
+    from src.utils.auth import create_access_token, principal_claims, verify_token
+
+    db = SessionLocal()
+    try:
+        db.merge(User(id="auth_bench_user", email="auth@example.com", hashed_password="x", is_active=True))
+        db.commit()
+        user = db.query(User).filter(User.id == "auth_bench_user").one()
+        plain_token = create_access_token({"sub": user.id, "email": user.email})
+        claims_token = create_access_token(principal_claims(user))
+    finally:
+        db.close()
+
+    def legacy_request(token: str):
+        # Former get_current_user: decode, then load the full user row
+        payload = verify_token(token, token_type="access")
+        session = database_service.get_session()
+        try:
+            session.query(User).filter(User.id == payload["sub"]).first()
+        finally:
+            session.close()
+
+    loop = asyncio.new_event_loop()
+
+    def run(name: str, request: Callable[[], object]):
+        principal_cache_service.clear()
+        start = time.perf_counter()
+        for _ in range(args.auth_requests):
+            request()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<48} {elapsed:>10.2f} {elapsed * 1e6 / args.auth_requests:>10.0f} "
+              f"{args.auth_requests / elapsed:>12.0f}")
+
+    print_header(f"Authentifizierung ({args.auth_requests} Requests je Lauf)")
+    print(f"{'Lauf':<48} {'Gesamt (s)':>10} {'µs/Req.':>10} {'Req./s':>12}")
+    print("-" * 84)
+    run("Legacy: User-Abfrage pro Request", lambda: legacy_request(plain_token))
+    run("Token ohne Claims + Principal-Cache", lambda: loop.run_until_complete(
+        get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=plain_token))
+    ))
+    run("Token mit eingebetteten Claims", lambda: loop.run_until_complete(
+        get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=claims_token))
+    ))
+    loop.close()
+
+
+def bench_ratelimit(args) -> List:
+    """Rate limiter overhead per request for each strategy (in-memory and optionally Redis)"""
+    import asyncio
+    import httpx
+    from fastapi import FastAPI, Request
+    from config.settings import settings
+    from src.utils.rate_limit import create_limiter
+
+    def make_app(limiter) -> FastAPI:
+        app = FastAPI()
+        app.state.limiter = limiter
+
+        @app.get("/plain")
+        async def plain(request: Request):
+            return {"status": "ok"}
+
+        @app.get("/limited")
+        @limiter.limit("1000000/minute")
+        async def limited(request: Request):
+            return {"status": "ok"}
+
+        return app
+
+    storages = [("memory", "memory://")]
+    if args.redis_url:
+        storages.append(("redis", args.redis_url))
+    strategies = ["fixed-window", "sliding-window-counter", "moving-window"]
+
+    loop = asyncio.new_event_loop()
+
+    def per_request_us(client: httpx.AsyncClient, path: str) -> float:
+        async def run():
+            for _ in range(args.ratelimit_requests):
+                await client.get(path)
+        start = time.perf_counter()
+        loop.run_until_complete(run())
+        return (time.perf_counter() - start) * 1e6 / args.ratelimit_requests
+
+    print_header(f"Rate-Limiter ({args.ratelimit_requests} Requests je Lauf)")
+    print(f"{'Storage / Strategie':<48} {'ohne (µs)':>10} {'mit (µs)':>10} {'Overhead':>12}")
+    print("-" * 84)
+    previous_strategy = settings.rate_limit_strategy
+    try:
+        for storage_name, storage_uri in storages:
+            for strategy in strategies:
+                settings.rate_limit_strategy = strategy
+                limiter = create_limiter(storage_uri)
+                limiter.reset()
+                client = httpx.AsyncClient(app=make_app(limiter), base_url="http://bench")
+                per_request_us(client, "/limited")  # warm up
+                plain = per_request_us(client, "/plain")
+                limited = per_request_us(client, "/limited")
+                loop.run_until_complete(client.aclose())
+                limiter.reset()
+                print(f"{f'{storage_name} / {strategy}':<48} {plain:>10.0f} {limited:>10.0f} {limited - plain:>10.0f}µs")
+    finally:
+        settings.rate_limit_strategy = previous_strategy
+        loop.close()
+
+
+BENCHMARKS = {
+    "listing": bench_listing,
+    "search": bench_search,
+    "loading": bench_loading,
+    "checkout": bench_checkout,
+    "auth": bench_auth,
+    "ratelimit": bench_ratelimit,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shop-Benchmarks")
+    parser.add_argument("--catalog-size", type=int, default=100_000, help="Anzahl synthetischer Produkte")
+    parser.add_argument("--page-size", type=int, default=50, help="Seitengröße für paginierte Abfragen")
+    parser.add_argument("--iterations", type=int, default=20, help="Wiederholungen pro Messung")
+    parser.add_argument("--review-count", type=int, default=20_000, help="Bewertungen für den Lade-Benchmark")
+    parser.add_argument("--cart-size", type=int, default=500, help="Warenkorb-Items für den Lade-Benchmark")
+    parser.add_argument("--checkouts", type=int, default=500, help="Bestellungen je Checkout-Lauf")
+    parser.add_argument("--auth-requests", type=int, default=5000, help="Requests je Authentifizierungs-Lauf")
+    parser.add_argument("--ratelimit-requests", type=int, default=3000, help="Requests je Rate-Limiter-Lauf")
+    parser.add_argument("--redis-url", help="Redis für den Rate-Limiter-Benchmark (z.B. redis://localhost:6379/15)")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS.keys()), action="append", help="Nur ausgewählte Benchmarks")
+    args = parser.parse_args()
+
+    print_header("Shop-Benchmarks - G3 CrossFit WODIFY Automation")
+    print(f"Datenbank: {os.environ['DATABASE_URL']}")
+    seed(args.catalog_size)
+
+    for name in args.only or BENCHMARKS.keys():
+        BENCHMARKS[name](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
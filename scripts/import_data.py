@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Import-Script für Mitglieder und Leads - G3 CrossFit WODIFY Automation
+
+Importiert eine CSV- (mit Kopfzeile) oder NDJSON-Datei in die Tabellen
+members bzw. leads, z.B. bei der Übernahme eines weiteren Standorts.
+Die Spalten heißen wie in der Datenbank (client_id, first_name, ...).
+Ungültige und doppelte Zeilen werden übersprungen und in einem
+Ablehnungsbericht (CSV) mit Zeilennummer und Grund aufgeführt.
+
+Für neu angelegte Datensätze werden wie bei den Webhooks E-Mails geplant
+(Willkommens-E-Mail bzw. Lead-Antwort und Nurturing-Sequenz); verschickt
+werden sie vom laufenden Backend; das Skript selbst führt keine Jobs aus.
+Mit --skip-automation wird nichts geplant.
+
+Verwendung:
+    python scripts/import_data.py members standort2_mitglieder.csv --skip-automation
+    python scripts/import_data.py leads leads.ndjson --report leads_abgelehnt.csv
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config.settings import settings
+from src.database import init_db
+from src.services.import_service import IMPORTS, import_service, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-Import von Mitgliedern und Leads")
+    parser.add_argument("entity", choices=sorted(IMPORTS), help="Zieltabelle")
+    parser.add_argument("file", type=Path, help="CSV- oder NDJSON-Datei")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Dateiformat (Standard: nach Dateiendung)")
+    parser.add_argument("--skip-automation", action="store_true", help="Keine E-Mails für neue Datensätze planen")
+    parser.add_argument("--report", type=Path, help="Ablehnungsbericht (Standard: <datei>.abgelehnt.csv)")
+    args = parser.parse_args()
+
+    import_format = args.format or ("ndjson" if args.file.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+    init_db()
+    # Only write the email jobs; the backend's scheduler sends them
+    settings.scheduler_run_jobs = False
+
+    print(f"📥 Importiere {args.entity} aus {args.file} ({import_format})...")
+    with args.file.open(encoding="utf-8-sig", newline="") as stream:
+        result = import_service.import_file(args.entity, stream, import_format, args.skip_automation)
+
+    print(f"✅ {result.rows} Zeilen in {result.seconds:.1f}s: {result.created} angelegt, "
+          f"{result.updated} aktualisiert, {len(result.rejections)} abgelehnt")
+    if result.converted_leads:
+        print(f"   {result.converted_leads} Leads als konvertiert markiert")
+    if result.rejections:
+        report = args.report or args.file.with_name(f"{args.file.stem}.abgelehnt.csv")
+        with report.open("w", encoding="utf-8", newline="") as out:
+            write_report(result, out)
+        print(f"⚠️  Ablehnungsbericht: {report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,18 @@ Produkt-Seeding-Script für G3 CrossFit Shop
 Erstellt echte CrossFit-Produkte mit realistischen Daten
 """
 
+import argparse
 import sys
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from sqlalchemy.orm import Session
-from src.database import get_db
+from src.database import SessionLocal, init_db
 from src.models.database import Product, ProductCategoryDB
+from src.services.product_search_service import product_search_service
 import uuid
 
 # Echte CrossFit-Produkte mit realistischen Daten
@@ -383,8 +386,61 @@ PRODUCTS = [
 ]
 
 
-def seed_products():
-    """Seed products into database"""
+def build_catalog(size: int, start: datetime = None) -> list:
+    """
+    Build a synthetic catalog of `size` products based on PRODUCTS
+
+    Each entry is a variant of a real product with a unique SKU and a
+    distinct created_at, so keyset pagination sees realistic ordering.
+    """
+    start = start or datetime.utcnow() - timedelta(seconds=size)
+    catalog = []
+    for i in range(size):
+        base = PRODUCTS[i % len(PRODUCTS)]
+        variant = i // len(PRODUCTS)
+        catalog.append({
+            **base,
+            "id": str(uuid.uuid4()),
+            "name": f"{base['name']} #{variant}" if variant else base["name"],
+            "sku": f"{base['sku']}-{i:06d}",
+            "featured": base["featured"] and i % 50 == 0,
+            "created_at": start + timedelta(seconds=i),
+            "updated_at": start + timedelta(seconds=i),
+        })
+    return catalog
+
+
+def seed_catalog(db: Session, size: int, chunk_size: int = 5000) -> int:
+    """
+    Bulk insert a synthetic catalog (e.g. 100k products for benchmarks)
+
+    Args:
+        db: Database session
+        size: Number of products to create
+        chunk_size: Rows per INSERT batch
+
+    Returns:
+        Number of created products
+    """
+    catalog = build_catalog(size)
+    for offset in range(0, len(catalog), chunk_size):
+        db.execute(Product.__table__.insert(), catalog[offset:offset + chunk_size])
+    db.commit()
+    
+    # Search index rows are written by triggers; merge the segments after the bulk load
+    product_search_service.optimize_index(db)
+    return len(catalog)
+
+
+def seed_products(count: int = None, force: bool = False):
+    """
+    Seed products into database
+    
+    Args:
+        count: Create a synthetic catalog of this size instead of the real products
+        force: Replace existing products without asking
+    """
+    init_db()
     db: Session = SessionLocal()
     
     try:
@@ -392,27 +448,33 @@ def seed_products():
         existing_count = db.query(Product).count()
         if existing_count > 0:
             print(f"⚠️  Es existieren bereits {existing_count} Produkte in der Datenbank.")
-            response = input("Möchtest du die bestehenden Produkte löschen und neu anlegen? (j/n): ")
-            if response.lower() != 'j':
-                print("❌ Abgebrochen.")
-                return
+            if not force:
+                response = input("Möchtest du die bestehenden Produkte löschen und neu anlegen? (j/n): ")
+                if response.lower() != 'j':
+                    print("❌ Abgebrochen.")
+                    return
             
-            # Delete existing products
+            # Delete existing products (empty the search index first so the delete trigger stays cheap)
+            product_search_service.clear_index(db)
             db.query(Product).delete()
             db.commit()
             print("✅ Bestehende Produkte gelöscht.")
         
         # Create products
         created_count = 0
-        for product_data in PRODUCTS:
-            product = Product(
-                id=str(uuid.uuid4()),
-                **product_data
-            )
-            db.add(product)
-            created_count += 1
-        
-        db.commit()
+        if count:
+            created_count = seed_catalog(db, count)
+        else:
+            for product_data in PRODUCTS:
+                product = Product(
+                    id=str(uuid.uuid4()),
+                    **product_data
+                )
+                db.add(product)
+                created_count += 1
+            
+            db.commit()
+            product_search_service.optimize_index(db)
         print(f"✅ {created_count} Produkte erfolgreich erstellt!")
         
         # Show summary
@@ -430,7 +492,12 @@ def seed_products():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Produkt-Seeding für den G3 CrossFit Shop")
+    parser.add_argument("--count", type=int, default=None, help="Synthetischen Katalog mit N Produkten anlegen (z.B. 100000)")
+    parser.add_argument("--force", action="store_true", help="Bestehende Produkte ohne Rückfrage ersetzen")
+    args = parser.parse_args()
+    
     print("🌱 Starte Produkt-Seeding...")
-    seed_products()
+    seed_products(count=args.count, force=args.force)
     print("✨ Fertig!")
 
@@ -4,24 +4,34 @@ G3 CrossFit WODIFY Automation - Admin Dashboard API
 This module provides admin endpoints for monitoring and testing.
 """
 
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import HTMLResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from loguru import logger
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal, Optional
+import io
+import tempfile
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy import func
 
 from config.settings import settings
-from src.models.database import Member, Lead, EmailLog, WebhookLog
+from src.api.auth import get_current_admin
+from src.models.auth import AuthenticatedUser, UserResponse, UserUpdate
+from src.models.database import Member, Lead, EmailLog, WebhookLog, User
+from src.services.export_service import EXPORTS, FORMATS, export_service
+from src.services.import_service import IMPORT_SPOOL_BYTES, IMPORTS, import_service
 from src.services.database_service import database_service
 from src.services.wodify_api_service import wodify_api_service
 from src.services.sync_service import sync_service
 from src.services.scheduler_service import scheduler_service
+from src.services.llm_service import llm_service
+from src.services.llm_usage_service import llm_usage_service
+from src.services.principal_cache_service import principal_cache_service
+from src.services.refresh_token_service import refresh_token_service
+from src.utils.rate_limit import limiter
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -501,7 +511,8 @@ async def get_wodify_status(request: Request):
     Get detailed WODIFY API status and configuration
     
     Returns:
-        WODIFY API health status, configuration, and sync status
+        WODIFY API health status, circuit breakers and concurrency limit of
+        this worker, configuration, and sync status
     """
     try:
         # Get WODIFY API health
@@ -522,6 +533,7 @@ async def get_wodify_status(request: Request):
         
         return {
             "wodify_api_health": wodify_health,
+            **wodify_api_service.resilience_status(),
             "sync_status": sync_status,
             "configuration": config,
             "timestamp": datetime.now().isoformat()
@@ -532,6 +544,169 @@ async def get_wodify_status(request: Request):
         raise HTTPException(status_code=500, detail=f"Failed to get WODIFY status: {str(e)}")
 
 
+@router.get("/export/{entity}")
+@limiter.limit("10/minute")
+async def export_data(
+    request: Request,
+    entity: str,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson or csv"),
+    start_date: Optional[date] = Query(None, description="First day (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last day (YYYY-MM-DD)"),
+    type: Optional[str] = Query(None, description="Membership status, lead status, email type or event type"),
+    current_user: AuthenticatedUser = Depends(get_current_admin)
+):
+    """
+    Stream all rows of members, leads, email_logs or webhook_logs
+    
+    Rows are ordered by creation (webhook logs: receipt) and streamed as
+    they are read, so exports of any size use constant memory.
+    
+    Returns:
+        NDJSON (one object per line) or CSV with a header row
+    """
+    if entity not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {entity}")
+    logger.info(f"Export of {entity} ({format}) started by {current_user.email}")
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return StreamingResponse(
+        export_service.stream(entity, format, start_date, end_date, type),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity}-{stamp}.{format}"'}
+    )
+
+
+@router.post("/import/{entity}")
+@limiter.limit("5/minute")
+async def import_data(
+    request: Request,
+    entity: str,
+    format: Literal["csv", "ndjson"] = Query("csv", description="csv or ndjson"),
+    skip_automation: bool = Query(False, description="Don't schedule any emails for new records"),
+    current_user: AuthenticatedUser = Depends(get_current_admin)
+):
+    """
+    Bulk import members or leads from the request body (CSV with header row or NDJSON)
+    
+    The upload is spooled (to disk above IMPORT_SPOOL_BYTES) and imported
+    in batches; invalid and duplicate rows are skipped and reported.
+    
+    Returns:
+        Counts of created/updated/rejected rows and the rejection report
+    """
+    if entity not in IMPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown import: {entity}")
+    logger.info(f"Import of {entity} ({format}) started by {current_user.email}")
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        stream = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+        try:
+            result = await run_in_threadpool(import_service.import_file, entity, stream, format, skip_automation)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+        finally:
+            stream.detach()
+    return result.to_dict()
+
+
+@router.patch("/users/{user_id}", response_model=UserResponse)
+@limiter.limit("30/minute")
+async def update_user(
+    request: Request,
+    user_id: str,
+    user_data: UserUpdate,
+    current_user: AuthenticatedUser = Depends(get_current_admin)
+):
+    """
+    Update a user (admins only), e.g. deactivate the account or change the admin flag
+    
+    Current tokens of the user are checked against the database again;
+    deactivating also revokes all refresh tokens.
+    """
+    session = database_service.get_session()
+    
+    try:
+        user = session.query(User).filter(User.id == user_id).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # null doesn't clear a field (is_active/is_admin aren't nullable)
+        changes = user_data.dict(exclude_none=True)
+        for field, value in changes.items():
+            setattr(user, field, value)
+        session.commit()
+        
+        if user_data.is_active is False:
+            refresh_token_service.revoke_user(session, user.id)
+        await principal_cache_service.invalidate_user(user.id)
+        logger.info(f"User {user.email} updated by {current_user.email}: {changes}")
+        
+        return UserResponse(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            is_admin=user.is_admin,
+            wodify_client_id=user.wodify_client_id,
+            created_at=user.created_at.isoformat() if user.created_at else ""
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error updating user {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update user: {str(e)}")
+    finally:
+        session.close()
+
+
+@router.get("/llm-cache")
+@limiter.limit("60/minute")
+async def get_llm_cache_report(
+    request: Request,
+    current_user: AuthenticatedUser = Depends(get_current_admin)
+):
+    """
+    Get the LLM response cache report of this worker (admins only, the
+    top entries contain prompt text)
+    
+    Returns:
+        Hit rate, exact/semantic hits, misses, evictions and the most used entries
+    """
+    try:
+        return {
+            **llm_service.cache.report(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error getting LLM cache report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get LLM cache report: {str(e)}")
+
+
+@router.get("/llm-usage")
+@limiter.limit("60/minute")
+async def get_llm_usage_report(request: Request):
+    """
+    Get the LLM token usage and cost of this worker
+    
+    Returns:
+        Tokens in/out (cached input tokens separately) and cost per provider/model,
+        and the average cost per AI request
+    """
+    try:
+        return {
+            **llm_usage_service.report(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error getting LLM usage report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get LLM usage report: {str(e)}")
+
+
 @router.post("/test-webhook/membership")
 @limiter.limit("10/minute")
 async def send_test_membership_webhook(request: Request):
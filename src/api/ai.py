@@ -4,32 +4,35 @@ G3 CrossFit WODIFY Automation - AI/LLM Integration
 This module provides AI-powered features like training plan generation.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from contextlib import aclosing
+
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
 from loguru import logger
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Literal, Optional, List, Dict
 
 from src.api.auth import get_current_user
-from src.models.database import User
-from src.services.llm_service import llm_service
+from src.models.auth import AuthenticatedUser
+from src.models.training_plan import TrainingPlanJobResponse, TrainingPlanRequest, TrainingPlanResponse
+from src.services.llm_service import llm_service, ClientDisconnectedError
+from src.services.llm_usage_service import llm_usage_service, LLMUsage
+from src.services.prompt_service import prompt_service, AssembledPrompt
+from src.services.training_plan_service import training_plan_service, TooManyJobsError
+from src.utils.streaming import EventStreamResponse, sse_event
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
 
-class TrainingPlanRequest(BaseModel):
-    prompt: str
-    experience_level: Optional[str] = "Fortgeschritten"
-    goals: Optional[str] = "Allgemeine Fitness"
-
-
-class TrainingPlanResponse(BaseModel):
-    plan: str
-    success: bool = True
+class ChatMessage(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
 
 
 class AIResponseRequest(BaseModel):
     prompt: str
     context: Optional[str] = ""
+    conversation_history: List[ChatMessage] = Field(default_factory=list)
 
 
 class AIResponseResponse(BaseModel):
@@ -37,132 +40,63 @@ class AIResponseResponse(BaseModel):
     success: bool = True
 
 
+def assemble_prompt(request: AIResponseRequest) -> AssembledPrompt:
+    """Assistant prompt with the static G3 CrossFit prefix; context and history within their token budgets"""
+    assembled = prompt_service.assemble(
+        prompt=request.prompt,
+        context=request.context,
+        history=[message.dict() for message in request.conversation_history]
+    )
+    if assembled.dropped_messages:
+        logger.info(f"Summarized {assembled.dropped_messages} older messages of the conversation history")
+    return assembled
+
+
+def log_usage(usage: LLMUsage, assembled: AssembledPrompt):
+    """Per-request token and cost metric"""
+    if not usage.calls:
+        return
+    logger.info(
+        f"LLM usage: {usage.input_tokens} tokens in ({usage.cached_input_tokens} cached, "
+        f"{assembled.input_tokens} counted locally), {usage.output_tokens} tokens out, "
+        f"${usage.cost:.6f}{' (estimated)' if usage.estimated else ''}"
+    )
+
+
+async def stream_events(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """SSE events for a stream of text deltas, closed by a "done" event"""
+    try:
+        async for delta in deltas:
+            yield sse_event({"delta": delta})
+    except Exception as e:
+        logger.error(f"Error streaming AI response: {str(e)}")
+        yield sse_event({"detail": "Fehler beim Generieren der Antwort"}, event="error")
+        return
+    finally:
+        await deltas.aclose()
+    yield sse_event({"success": True}, event="done")
+
+
 @router.post("/generate-training-plan")
 async def generate_training_plan(
     request: TrainingPlanRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """
     Generate a personalized training plan using AI/LLM
     
-    This endpoint generates a training plan based on user input.
-    Currently returns a mock response, but can be integrated with:
-    - OpenAI API
-    - Anthropic Claude
-    - Local LLM (Ollama, etc.)
+    The plan skeleton for (experience level, goals, days, equipment) is
+    cached; only a short personalization is generated per request. Use
+    POST /api/ai/training-plan-jobs to generate in the background.
+    Without a configured LLM provider an example plan is returned.
     """
     try:
         logger.info(f"Generating training plan for user {current_user.email}")
         
-        # TODO: Integrate with actual LLM service
-        # For now, return a structured mock response
-        
-        mock_plan = f"""# Dein personalisierter CrossFit Trainingsplan
-
-## Woche: {request.experience_level} Level
-
-### Tag 1: Kraft & Technik
-
-#### Warm-up (10 Minuten)
-- 5 Minuten leichtes Laufen oder Rudern
-- Dynamisches Dehnen: Armkreise, Beinschwünge, Rumpfrotationen
-- 2 Runden: 10 Air Squats, 10 Push-ups, 10 Sit-ups
-
-#### Skill/Strength Part (20 Minuten)
-**Back Squat**
-- 5x5 @ 75% 1RM
-- Fokus auf Tiefe und Kontrolle
-- 2-3 Minuten Pause zwischen den Sätzen
-
-#### Metcon (20 Minuten)
-**"Strength Builder"**
-- 5 Runden für Zeit:
-  - 10 Back Squats (60% 1RM)
-  - 15 Kettlebell Swings (24kg)
-  - 20 Double Unders
-  - 400m Lauf
-
-#### Cool-down (5 Minuten)
-- Statisches Dehnen: Quadrizeps, Hamstrings, Waden
-- Foam Rolling: Beine und Rücken
-
----
-
-### Tag 2: Kondition & Ausdauer
-
-#### Warm-up (10 Minuten)
-- 5 Minuten Rudern
-- Beweglichkeitsübungen: Cat-Cow, Hip Circles
-- 2 Runden: 10 Burpees, 10 Mountain Climbers
-
-#### Skill/Strength Part (20 Minuten)
-**Strict Pull-ups**
-- 5x3-5 Wiederholungen
-- Falls nicht möglich: Negatives oder Band-Unterstützung
-- Fokus auf vollständige Bewegungsamplitude
-
-#### Metcon (25 Minuten)
-**"Endurance Challenge"**
-- AMRAP in 20 Minuten:
-  - 400m Lauf
-  - 15 Box Jumps (24")
-  - 10 Pull-ups
-  - 15 Wall Balls (9kg)
-
-#### Cool-down (5 Minuten)
-- Dehnen: Schultern, Rücken, Hüfte
-- Leichtes Gehen
-
----
-
-### Tag 3: Gymnastics & Beweglichkeit
-
-#### Warm-up (10 Minuten)
-- 5 Minuten Seilspringen
-- Gymnastics Warm-up: Handstand Practice, Ring Dips
-- Beweglichkeitsübungen für Schultern und Hüfte
-
-#### Skill/Strength Part (20 Minuten)
-**Handstand Push-ups Progression**
-- 5x3-5 Wiederholungen
-- Oder Pike Push-ups falls noch nicht möglich
-- Fokus auf Stabilität und Kontrolle
-
-#### Metcon (15 Minuten)
-**"Gymnastics Flow"**
-- 3 Runden für Zeit:
-  - 15 Handstand Push-ups (oder Pike Push-ups)
-  - 20 Toes-to-Bar
-  - 25 Sit-ups
-  - 30 Double Unders
-
-#### Cool-down (5 Minuten)
-- Ausgiebiges Dehnen: Schultern, Rücken, Bauch
-- Yoga-Positionen: Downward Dog, Child's Pose
-
----
-
-### Ruhetage
-
-**Tag 4 & Tag 7: Aktive Erholung**
-- Leichtes Cardio: 30 Minuten Spazieren, Radfahren oder Schwimmen
-- Beweglichkeitstraining: 20 Minuten Yoga oder Mobility Work
-- Foam Rolling: Ganzkörper
-
----
-
-## Tipps für dein Training
-
-- **Konsistenz ist wichtiger als Intensität**: Regelmäßiges Training bringt mehr als sporadische Höchstleistungen
-- **Höre auf deinen Körper**: Bei Schmerzen oder extremer Müdigkeit lieber einen Tag Pause machen
-- **Ernährung**: Achte auf ausreichend Protein (ca. 1.6-2g pro kg Körpergewicht) und Hydration
-- **Schlaf**: 7-9 Stunden Schlaf sind essentiell für Regeneration und Performance
-
-Viel Erfolg bei deinem Training! 💪
-"""
+        plan = await training_plan_service.generate(request)
         
         return TrainingPlanResponse(
-            plan=mock_plan,
+            plan=plan,
             success=True
         )
         
@@ -174,9 +108,102 @@ Viel Erfolg bei deinem Training! 💪
         )
 
 
+@router.post("/training-plan-jobs", response_model=TrainingPlanJobResponse, status_code=202)
+async def create_training_plan_job(
+    request: TrainingPlanRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    Generate a training plan in the background
+    
+    Returns the queued job right away; poll GET /api/ai/training-plan-jobs/{job_id}
+    or follow GET /api/ai/training-plan-jobs/{job_id}/events (SSE).
+    """
+    try:
+        job = await training_plan_service.submit(current_user.id, request)
+    except TooManyJobsError:
+        raise HTTPException(
+            status_code=429,
+            detail="Es werden bereits Trainingspläne für dich erstellt. Bitte warte, bis sie fertig sind."
+        )
+    logger.info(f"Queued training plan job {job['job_id']} for user {current_user.email}")
+    return job
+
+
+async def get_own_job(job_id: str, current_user: AuthenticatedUser) -> dict:
+    job = await training_plan_service.get_job(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trainingsplan-Auftrag nicht gefunden")
+    return job
+
+
+@router.get("/training-plan-jobs/{job_id}", response_model=TrainingPlanJobResponse)
+async def get_training_plan_job(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Get the status (and once completed, the plan) of a training plan job"""
+    return await get_own_job(job_id, current_user)
+
+
+@router.get("/training-plan-jobs/{job_id}/events")
+async def training_plan_job_events(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    Follow a training plan job as Server-Sent Events
+    
+    Sends `event: status` whenever the status changes and a final
+    `event: done` with the finished job (plan or error). Ends with
+    `event: error` if the job expired or its worker stopped working on it.
+    """
+    job = await get_own_job(job_id, current_user)
+
+    async def events() -> AsyncIterator[str]:
+        current = job
+        last_status = None
+        while True:
+            if current is None:
+                yield sse_event({"detail": "Trainingsplan-Auftrag nicht gefunden"}, event="error")
+                return
+            payload = jsonable_encoder(TrainingPlanJobResponse(**current))
+            if current["status"] in ("completed", "failed"):
+                yield sse_event(payload, event="done")
+                return
+            if training_plan_service.is_stale(current):
+                yield sse_event({"detail": "Trainingsplan-Auftrag wird nicht mehr bearbeitet"}, event="error")
+                return
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield sse_event(payload, event="status")
+            await training_plan_service.wait_for_update(job_id)
+            current = await training_plan_service.get_job(job_id, current_user.id)
+
+    return EventStreamResponse(events())
+
+
+@router.post("/generate-training-plan/stream")
+async def stream_training_plan(
+    request: TrainingPlanRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    Stream a training plan as Server-Sent Events
+
+    Sends `data: {"delta": "..."}` events and a final `event: done`. The
+    personalization is streamed as it is generated, followed by the
+    (usually cached) plan skeleton. Without a configured LLM provider the
+    example plan is sent as a single delta.
+    """
+    logger.info(f"Streaming training plan for user {current_user.email}")
+    return EventStreamResponse(stream_events(training_plan_service.stream(request)))
+
+
 @router.post("/generate-response")
 async def generate_response(
-    request: AIResponseRequest
+    request: AIResponseRequest,
+    http_request: Request
 ):
     """
     Generate a general AI response for phone assistant or chatbot
@@ -189,39 +216,28 @@ async def generate_response(
     try:
         logger.info(f"Generating AI response for prompt: {request.prompt[:50]}...")
         
-        # Build context with G3 CrossFit information
-        system_context = f"""
-Du bist ein freundlicher und professioneller AI-Assistent für G3 CrossFit in Berlin.
-
-WICHTIGE INFORMATIONEN:
-- Standort: Musterstraße 123, 10115 Berlin
-- Telefon: +49 30 12345678
-- Öffnungszeiten: Mo-Fr 6:00-21:00, Sa 8:00-18:00, So 9:00-16:00
-- Preise: Starter 89€, Unlimited 139€, Premium 189€
-- Kostenloses Probetraining verfügbar
-- Alle Level willkommen
-
-GESPRÄCHSFÜHRUNG:
-- Sei freundlich, professionell und hilfsbereit
-- Antworte kurz und präzise (max. 2-3 Sätze)
-- Biete bei Fragen zu Probetraining die Online-Buchung an
-- Erwähne wichtige Informationen wie kostenloses Probetraining
-- Antworte immer auf Deutsch
-
-{request.context or ""}
-"""
+        assembled = assemble_prompt(request)
         
         # Generate response using LLM service
-        response = await llm_service.generate_response(
-            prompt=request.prompt,
-            context=system_context
-        )
+        # The completion is cancelled if the caller hangs up
+        with llm_usage_service.track() as usage:
+            response = await llm_service.generate_response(
+                prompt=assembled.prompt,
+                context=assembled.context,
+                conversation_history=assembled.history,
+                is_disconnected=http_request.is_disconnected,
+                static_context=assembled.static_context
+            )
+        log_usage(usage, assembled)
         
         return AIResponseResponse(
             response=response,
             success=True
         )
         
+    except ClientDisconnectedError:
+        logger.info("Client disconnected before the AI response was ready")
+        return Response(status_code=499)  # Client Closed Request
     except Exception as e:
         logger.error(f"Error generating AI response: {str(e)}")
         # Fallback to rule-based response on error
@@ -231,3 +247,32 @@ GESPRÄCHSFÜHRUNG:
             success=True
         )
 
+
+@router.post("/generate-response/stream")
+async def stream_response(request: AIResponseRequest):
+    """
+    Stream a general AI response as Server-Sent Events
+
+    Same as /generate-response, but the answer is sent as `data:
+    {"delta": "..."}` events as soon as the provider produces it, followed
+    by `event: done`. If the client disconnects, the provider stream is
+    closed.
+    """
+    logger.info(f"Streaming AI response for prompt: {request.prompt[:50]}...")
+    assembled = assemble_prompt(request)
+
+    async def deltas() -> AsyncIterator[str]:
+        with llm_usage_service.track() as usage:
+            try:
+                async with aclosing(llm_service.stream_response(
+                    prompt=assembled.prompt,
+                    context=assembled.context,
+                    conversation_history=assembled.history,
+                    static_context=assembled.static_context
+                )) as stream:
+                    async for delta in stream:
+                        yield delta
+            finally:
+                log_usage(usage, assembled)
+
+    return EventStreamResponse(stream_events(deltas()))
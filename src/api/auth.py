@@ -6,47 +6,77 @@ Authentication endpoints for user login, registration, and token management.
 
 from fastapi import APIRouter, HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from loguru import logger
 from datetime import datetime
+from typing import Optional
 import uuid
 
 from config.settings import settings
 from src.models.auth import (
+    PasswordChange,
     UserLogin,
     UserRegister,
     TokenResponse,
     TokenRefresh,
-    UserResponse
+    UserResponse,
+    AuthenticatedUser
 )
 from src.models.database import User
 from src.services.database_service import database_service
+from src.services.principal_cache_service import principal_cache_service
+from src.services.refresh_token_service import refresh_token_service, RefreshTokenError
 from src.utils.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
     create_access_token,
-    create_refresh_token,
+    principal_claims,
     verify_token
 )
+from src.utils.rate_limit import limiter
 
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
-limiter = Limiter(key_func=get_remote_address)
 security = HTTPBearer()
 
 
+def load_principal(user_id: str) -> Optional[AuthenticatedUser]:
+    """
+    Load the principal of a user from the database
+    
+    Args:
+        user_id: User ID (token subject)
+        
+    Returns:
+        Principal or None if the user doesn't exist
+    """
+    session = database_service.get_session()
+    try:
+        row = session.query(User.id, User.email, User.is_active, User.is_admin).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        return AuthenticatedUser(
+            id=row.id, email=row.email, is_active=bool(row.is_active), is_admin=bool(row.is_admin)
+        )
+    finally:
+        session.close()
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
+) -> AuthenticatedUser:
     """
     Get current authenticated user from JWT token
     
+    The user is taken from the token claims or the principal cache; the
+    database is only queried for tokens without embedded claims (once per
+    cache TTL) or after the user was invalidated.
+    
     Args:
         credentials: HTTP Bearer token credentials
         
     Returns:
-        User object
+        Principal of the authenticated user
         
     Raises:
         HTTPException: If token is invalid or user not found
@@ -69,23 +99,36 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    session = database_service.get_session()
-    try:
-        user = session.query(User).filter(User.id == user_id).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Inactive user account"
-            )
-        return user
-    finally:
-        session.close()
+    user = await principal_cache_service.resolve(payload, load_principal)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user account"
+        )
+    return user
+
+
+async def get_current_admin(
+    current_user: AuthenticatedUser = Depends(get_current_user)
+) -> AuthenticatedUser:
+    """
+    Get current authenticated user if it is an admin
+    
+    Raises:
+        HTTPException: 403 if the user isn't an admin
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -124,7 +167,7 @@ async def register(request: Request, user_data: UserRegister):
                 )
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         new_user = User(
             id=str(uuid.uuid4()),
             email=user_data.email,
@@ -191,7 +234,7 @@ async def login(request: Request, login_data: UserLogin):
         # Find user by email
         user = session.query(User).filter(User.email == login_data.email).first()
         
-        if not user or not verify_password(login_data.password, user.hashed_password):
+        if not user or not await verify_password_async(login_data.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -204,15 +247,20 @@ async def login(request: Request, login_data: UserLogin):
                 detail="User account is inactive"
             )
         
+        # Upgrade hashes created with a different cost (BCRYPT_ROUNDS changed)
+        if password_needs_rehash(user.hashed_password):
+            user.hashed_password = await get_password_hash_async(login_data.password)
+            logger.info(f"Password hash of {user.email} upgraded to cost {settings.bcrypt_rounds}")
+        
+        # Create tokens (the refresh token starts a new token family)
+        access_token = create_access_token(data=principal_claims(user))
+        refresh_token = refresh_token_service.issue(session, user.id)
+        
         # Update last login
         user.last_login = datetime.utcnow()
         session.commit()
         
-        # Create tokens
-        access_token = create_access_token(data={"sub": user.id, "email": user.email})
-        refresh_token = create_refresh_token(data={"sub": user.id})
-        
-        logger.info(f"User logged in: {user.email}")
+        logger.info(f"User logged in: {login_data.email}")
         
         return TokenResponse(
             access_token=access_token,
@@ -256,20 +304,12 @@ async def refresh_token(request: Request, token_data: TokenRefresh):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_id: str = payload.get("sub")
     session = database_service.get_session()
     
     try:
-        user = session.query(User).filter(User.id == user_id).first()
-        if not user or not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found or inactive"
-            )
-        
-        # Create new tokens
-        access_token = create_access_token(data={"sub": user.id, "email": user.email})
-        refresh_token = create_refresh_token(data={"sub": user.id})
+        # Rotate: the presented token is revoked, a new one of its family issued
+        refresh_token, user = refresh_token_service.rotate(session, token_data.refresh_token)
+        access_token = create_access_token(data=principal_claims(user))
         
         return TokenResponse(
             access_token=access_token,
@@ -277,9 +317,14 @@ async def refresh_token(request: Request, token_data: TokenRefresh):
             token_type="bearer"
         )
         
-    except HTTPException:
-        raise
+    except RefreshTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid refresh token ({e.reason})",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     except Exception as e:
+        session.rollback()
         logger.error(f"Error refreshing token: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -289,8 +334,80 @@ async def refresh_token(request: Request, token_data: TokenRefresh):
         session.close()
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@limiter.limit("10/minute")
+async def logout(request: Request, token_data: TokenRefresh):
+    """
+    Revoke a refresh token and all tokens rotated from the same login
+    
+    Args:
+        token_data: Refresh token
+    """
+    session = database_service.get_session()
+    
+    try:
+        refresh_token_service.revoke(session, token_data.refresh_token)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error revoking refresh token: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to revoke token"
+        )
+    finally:
+        session.close()
+
+
+@router.post("/change-password", status_code=status.HTTP_204_NO_CONTENT)
+@limiter.limit("5/minute")
+async def change_password(
+    request: Request,
+    password_data: PasswordChange,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    Change the password of the current user
+    
+    All refresh tokens of the user are revoked (logout everywhere) and
+    cached principals of the user are invalidated.
+    
+    Args:
+        password_data: Current and new password
+        
+    Raises:
+        HTTPException: 400 if the current password is wrong
+    """
+    session = database_service.get_session()
+    
+    try:
+        user = session.query(User).filter(User.id == current_user.id).first()
+        if not user or not await verify_password_async(password_data.current_password, user.hashed_password):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Current password is incorrect"
+            )
+        
+        user.hashed_password = await get_password_hash_async(password_data.new_password)
+        session.commit()
+        refresh_token_service.revoke_user(session, user.id)
+        await principal_cache_service.invalidate_user(user.id)
+        logger.info(f"Password changed: {user.email}")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error changing password: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to change password"
+        )
+    finally:
+        session.close()
+
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: AuthenticatedUser = Depends(get_current_user)):
     """
     Get current authenticated user information
     
@@ -300,16 +417,25 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     Returns:
         User information
     """
-    return UserResponse(
-        id=current_user.id,
-        email=current_user.email,
-        username=current_user.username,
-        first_name=current_user.first_name,
-        last_name=current_user.last_name,
-        is_active=current_user.is_active,
-        is_verified=current_user.is_verified,
-        is_admin=current_user.is_admin,
-        wodify_client_id=current_user.wodify_client_id,
-        created_at=current_user.created_at.isoformat() if current_user.created_at else ""
-    )
-
+    session = database_service.get_session()
+    try:
+        user = session.query(User).filter(User.id == current_user.id).first()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        return UserResponse(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            is_admin=user.is_admin,
+            wodify_client_id=user.wodify_client_id,
+            created_at=user.created_at.isoformat() if user.created_at else ""
+        )
+    finally:
+        session.close()
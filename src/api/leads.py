@@ -5,8 +5,6 @@ API endpoints for creating and managing leads from the contact form.
 """
 
 from fastapi import APIRouter, HTTPException, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from pydantic import BaseModel, EmailStr, Field, validator
 from loguru import logger
 from datetime import datetime
@@ -18,10 +16,10 @@ from src.services.automation_service import automation_service
 from src.services.scheduler_service import scheduler_service
 from src.models.database import Lead, LeadStatus
 from src.services.database_service import database_service
+from src.utils.rate_limit import limiter
 
 
 router = APIRouter(prefix="/api/leads", tags=["leads"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 class LeadCreateRequest(BaseModel):
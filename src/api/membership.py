@@ -5,8 +5,6 @@ API endpoints for membership management and WODIFY Sales Portal integration.
 """
 
 from fastapi import APIRouter, HTTPException, Query, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from pydantic import BaseModel, EmailStr, Field
 from loguru import logger
 from datetime import datetime
@@ -17,10 +15,10 @@ from src.services.wodify_api_service import wodify_api_service
 from src.services.automation_service import automation_service
 from src.models.database import Member, MembershipStatus
 from src.services.database_service import database_service
+from src.utils.rate_limit import limiter
 
 
 router = APIRouter(prefix="/api/membership", tags=["membership"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 class MembershipPackageResponse(BaseModel):
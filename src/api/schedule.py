@@ -1,51 +1,136 @@
 """
 Schedule API Endpoints - Provides schedule data to Next.js frontend
+
+Schedule reads have a deadline of SCHEDULE_DEADLINE_SECONDS, which a
+client can shorten with the X-Request-Timeout-Ms header (e.g. the
+frontend's own fetch timeout). Wodify calls made for the request stop
+when it runs out, and /classes then answers with the last cached
+schedule ("stale": true).
+
+Classes, class types and trainers are read from the local schedule
+replica (see src/services/schedule_replica_service.py) as long as it
+covers the requested dates; Wodify is only asked for other dates.
+
+Bookings and waitlist requests are answered right away (202) with a
+pending reservation that Wodify confirms in the background (see
+src/services/booking_service.py); its outcome is available from
+GET /reservations/{reservation_id}. Booking endpoints act for the
+authenticated user.
 """
 
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Depends, Request
 from fastapi.responses import JSONResponse
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import date, datetime, timedelta
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 import logging
 
+from config.settings import settings
+from src.api.auth import get_current_user
+from src.database import get_db
+from src.models.auth import AuthenticatedUser
+from src.models.database import (
+    ClassReservation,
+    ClassReservationKindDB,
+    ClassReservationStatusDB,
+    ClassType,
+    Trainer,
+    User,
+)
+from src.services.booking_service import ClassFullError, booking_service, reservation_payload
+from src.services.schedule_replica_service import class_payload, schedule_replica_service
 from src.services.wodify_api_service import wodify_api_service
+from src.utils.resilience import deadline
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/schedule", tags=["schedule"])
 
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+def request_deadline(request: Request) -> float:
+    """Seconds the request may take: the configured deadline, or less if the client asks for it"""
+    seconds = settings.schedule_deadline_seconds
+    try:
+        requested = float(request.headers.get(DEADLINE_HEADER, "")) / 1000
+    except ValueError:
+        return seconds
+    return min(seconds, max(requested, 0.0))
+
+
+def replica_classes(
+    db: Session,
+    start: date,
+    end: date,
+    class_type: Optional[str],
+    day: Optional[str],
+    trainer: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """/classes response from the schedule replica, or None if it doesn't cover the dates"""
+    if not settings.schedule_replica_enabled:
+        return None
+    try:
+        state = schedule_replica_service.covering_state(db, start, end)
+        if state is None:
+            return None
+        classes = [
+            class_payload(row)
+            for row in schedule_replica_service.query(db, start, end, class_type, day, trainer)
+        ]
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to read schedule replica: {str(e)}")
+        return None
+    return {
+        "success": True,
+        "classes": classes,
+        "count": len(classes),
+        "stale": schedule_replica_service.is_stale(state),
+        "fetchedAt": state.refreshed_at.isoformat()
+    }
+
+
+def replica_catalog(db: Session, model) -> List[Dict[str, Any]]:
+    """Class types or trainers from the schedule replica ([] if there are none)"""
+    if not settings.schedule_replica_enabled:
+        return []
+    try:
+        return schedule_replica_service.catalog(db, model)
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to read schedule replica: {str(e)}")
+        return []
+
 
 # Pydantic Models for Request/Response
 class BookingRequest(BaseModel):
     """Request model for booking a class"""
     class_id: str
-    user_id: str
-    user_email: EmailStr
-    user_name: str
 
 
 class WaitlistRequest(BaseModel):
     """Request model for joining waitlist"""
     class_id: str
-    user_id: str
-    user_email: EmailStr
-    user_name: str
 
 
-class CancelBookingRequest(BaseModel):
-    """Request model for cancelling a booking"""
-    booking_id: str
-    user_id: str
+def member_name(db: Session, user: AuthenticatedUser) -> str:
+    """Full name of the user for Wodify (the e-mail address if no name is set)"""
+    row = db.query(User.first_name, User.last_name).filter(User.id == user.id).first()
+    name = " ".join(part for part in (row or ()) if part)
+    return name or user.email
 
 
 # API Endpoints
 @router.get("/classes")
 async def get_classes(
+    request: Request,
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     class_type: Optional[str] = Query(None, description="Filter by class type"),
     day: Optional[str] = Query(None, description="Filter by day (Monday, Tuesday, etc.)"),
+    trainer: Optional[str] = Query(None, description="Filter by trainer name"),
+    db: Session = Depends(get_db)
 ):
     """
     Get class schedule
@@ -55,25 +140,37 @@ async def get_classes(
     - end_date: End date in YYYY-MM-DD format (default: 7 days from start)
     - class_type: Filter by class type (optional)
     - day: Filter by day of week (optional)
+    - trainer: Filter by trainer name (optional)
     
     Returns:
-    - List of classes with availability
+    - List of classes with availability; "stale" is true if the schedule
+      from "fetchedAt" is shown because Wodify didn't answer in time (or the
+      local replica wasn't refreshed for two intervals)
     """
     try:
         # Parse dates
         start = date.fromisoformat(start_date) if start_date else date.today()
         end = date.fromisoformat(end_date) if end_date else start + timedelta(days=7)
         
+        # Local replica
+        replica = replica_classes(db, start, end, class_type, day, trainer)
+        if replica is not None:
+            return JSONResponse(content=replica)
+        
         # Fetch classes from Wodify API
-        classes = await wodify_api_service.get_schedule(
-            start_date=start,
-            end_date=end,
-            class_type=class_type
-        )
+        with deadline(request_deadline(request)):
+            schedule = await wodify_api_service.get_schedule_snapshot(
+                start_date=start,
+                end_date=end,
+                class_type=class_type
+            )
+        classes = schedule["classes"]
         
-        # Filter by day if specified
+        # Filter by day and trainer if specified
         if day and classes:
             classes = [c for c in classes if c.get("day") == day]
+        if trainer and classes:
+            classes = [c for c in classes if (c.get("trainer") or {}).get("name") == trainer]
         
         # Transform data for frontend
         transformed_classes = []
@@ -97,7 +194,9 @@ async def get_classes(
         return JSONResponse(content={
             "success": True,
             "classes": transformed_classes,
-            "count": len(transformed_classes)
+            "count": len(transformed_classes),
+            "stale": schedule["stale"],
+            "fetchedAt": schedule["fetched_at"]
         })
         
     except ValueError as e:
@@ -109,7 +208,7 @@ async def get_classes(
 
 
 @router.get("/classes/{class_id}")
-async def get_class_details(class_id: str):
+async def get_class_details(class_id: str, request: Request):
     """
     Get detailed information about a specific class
     
@@ -120,7 +219,8 @@ async def get_class_details(class_id: str):
     - Detailed class information
     """
     try:
-        class_details = await wodify_api_service.get_class_details(class_id)
+        with deadline(request_deadline(request)):
+            class_details = await wodify_api_service.get_class_details(class_id)
         
         if not class_details:
             raise HTTPException(status_code=404, detail="Class not found")
@@ -137,26 +237,69 @@ async def get_class_details(class_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch class details")
 
 
+def queue_reservation(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    kind: ClassReservationKindDB,
+    class_id: str,
+    user: AuthenticatedUser
+) -> ClassReservation:
+    """Reserve locally and confirm with Wodify after the response"""
+    reservation = booking_service.reserve(
+        db,
+        kind,
+        class_id=class_id,
+        user_id=user.id,
+        user_email=user.email,
+        user_name=member_name(db, user)
+    )
+    if reservation.status == ClassReservationStatusDB.PENDING:
+        background_tasks.add_task(booking_service.confirm_in_background, reservation.id)
+    return reservation
+
+
 @router.post("/book")
-async def book_class(booking: BookingRequest):
+async def book_class(
+    booking: BookingRequest,
+    background_tasks: BackgroundTasks,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    Book a class
+    Book a class for the authenticated user
     
     Request Body:
     - class_id: Wodify class ID
-    - user_id: User ID
-    - user_email: User email
-    - user_name: User full name
     
     Returns:
-    - Booking confirmation
+    - Pending booking (202) that Wodify confirms in the background, or the
+      Wodify booking confirmation if optimistic booking is disabled;
+      409 if the class is fully booked
     """
+    if settings.optimistic_booking_enabled:
+        try:
+            reservation = queue_reservation(
+                db, background_tasks, ClassReservationKindDB.BOOKING, booking.class_id, current_user
+            )
+        except ClassFullError:
+            raise HTTPException(status_code=409, detail="Class is fully booked")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error booking class: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to book class: {str(e)}")
+        
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "Class booking pending confirmation",
+            "booking": reservation_payload(reservation)
+        })
+    
     try:
         result = await wodify_api_service.book_class(
             class_id=booking.class_id,
-            user_id=booking.user_id,
-            user_email=booking.user_email,
-            user_name=booking.user_name
+            user_id=current_user.id,
+            user_email=current_user.email,
+            user_name=member_name(db, current_user)
         )
         
         return JSONResponse(content={
@@ -171,25 +314,44 @@ async def book_class(booking: BookingRequest):
 
 
 @router.post("/waitlist")
-async def join_waitlist(request: WaitlistRequest):
+async def join_waitlist(
+    request: WaitlistRequest,
+    background_tasks: BackgroundTasks,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    Join class waitlist
+    Put the authenticated user on a class waitlist
     
     Request Body:
     - class_id: Wodify class ID
-    - user_id: User ID
-    - user_email: User email
-    - user_name: User full name
     
     Returns:
-    - Waitlist confirmation
+    - Pending waitlist entry (202) that Wodify confirms in the background,
+      or the Wodify confirmation if optimistic booking is disabled
     """
+    if settings.optimistic_booking_enabled:
+        try:
+            reservation = queue_reservation(
+                db, background_tasks, ClassReservationKindDB.WAITLIST, request.class_id, current_user
+            )
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error joining waitlist: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to join waitlist: {str(e)}")
+        
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "Waitlist request pending confirmation",
+            "waitlist": reservation_payload(reservation)
+        })
+    
     try:
         result = await wodify_api_service.join_waitlist(
             class_id=request.class_id,
-            user_id=request.user_id,
-            user_email=request.user_email,
-            user_name=request.user_name
+            user_id=current_user.id,
+            user_email=current_user.email,
+            user_name=member_name(db, current_user)
         )
         
         return JSONResponse(content={
@@ -203,41 +365,73 @@ async def join_waitlist(request: WaitlistRequest):
         raise HTTPException(status_code=500, detail=f"Failed to join waitlist: {str(e)}")
 
 
+@router.get("/reservations/{reservation_id}")
+async def get_reservation(
+    reservation_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the status of a booking or waitlist request of the authenticated user
+    
+    Path Parameters:
+    - reservation_id: ID returned by /book or /waitlist
+    
+    Returns:
+    - Reservation with status pending, confirmed, rejected, failed or cancelled
+    """
+    reservation = db.get(ClassReservation, reservation_id)
+    if reservation is None or reservation.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    return JSONResponse(content={
+        "success": True,
+        "reservation": reservation_payload(reservation)
+    })
+
+
 @router.delete("/bookings/{booking_id}")
-async def cancel_booking(booking_id: str, user_id: str = Query(...)):
+async def cancel_booking(
+    booking_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """
-    Cancel a booking
+    Cancel a booking of the authenticated user (its spot is free right away)
     
     Path Parameters:
     - booking_id: Booking ID
     
-    Query Parameters:
-    - user_id: User ID
-    
     Returns:
     - Cancellation confirmation
     """
     try:
         result = await wodify_api_service.cancel_booking(
             booking_id=booking_id,
-            user_id=user_id
+            user_id=current_user.id
         )
-        
-        return JSONResponse(content={
-            "success": True,
-            "message": "Booking cancelled successfully",
-            "cancellation": result
-        })
-        
     except Exception as e:
         logger.error(f"Error cancelling booking: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to cancel booking: {str(e)}")
+    
+    try:
+        schedule_replica_service.cancel_booking(db, booking_id)
+    except SQLAlchemyError as e:
+        # Wodify cancelled it; the next refresh or webhook corrects the counter
+        db.rollback()
+        logger.error(f"Failed to release replica spot of booking {booking_id}: {str(e)}")
+    
+    return JSONResponse(content={
+        "success": True,
+        "message": "Booking cancelled successfully",
+        "cancellation": result
+    })
 
 
 @router.get("/user/{user_id}/bookings")
-async def get_user_bookings(user_id: str):
+async def get_user_bookings(user_id: str, current_user: AuthenticatedUser = Depends(get_current_user)):
     """
-    Get all bookings for a user
+    Get all bookings for a user (the authenticated user's own, or any for admins)
     
     Path Parameters:
     - user_id: User ID
@@ -245,6 +439,9 @@ async def get_user_bookings(user_id: str):
     Returns:
     - List of user bookings
     """
+    if user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not allowed to view bookings of other users")
+    
     try:
         bookings = await wodify_api_service.get_user_bookings(user_id)
         
@@ -260,7 +457,7 @@ async def get_user_bookings(user_id: str):
 
 
 @router.get("/class-types")
-async def get_class_types():
+async def get_class_types(request: Request, db: Session = Depends(get_db)):
     """
     Get all available class types
     
@@ -268,7 +465,10 @@ async def get_class_types():
     - List of class types
     """
     try:
-        class_types = await wodify_api_service.get_class_types()
+        class_types = replica_catalog(db, ClassType)
+        if not class_types:
+            with deadline(request_deadline(request)):
+                class_types = await wodify_api_service.get_class_types()
         
         return JSONResponse(content={
             "success": True,
@@ -282,7 +482,7 @@ async def get_class_types():
 
 
 @router.get("/trainers")
-async def get_trainers():
+async def get_trainers(request: Request, db: Session = Depends(get_db)):
     """
     Get all trainers/coaches
     
@@ -290,7 +490,10 @@ async def get_trainers():
     - List of trainers
     """
     try:
-        trainers = await wodify_api_service.get_trainers()
+        trainers = replica_catalog(db, Trainer)
+        if not trainers:
+            with deadline(request_deadline(request)):
+                trainers = await wodify_api_service.get_trainers()
         
         return JSONResponse(content={
             "success": True,
@@ -4,11 +4,13 @@ Shop API Endpoints - Product catalog and shopping cart
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import JSONResponse
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Tuple, Union
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, selectinload
+from sqlalchemy import String, and_, cast, func, insert, literal, or_, select, tuple_
 from loguru import logger
+import base64
+import json
 import uuid
 from datetime import datetime
 
@@ -17,8 +19,13 @@ from src.models.database import (
     ProductReview, WishlistItem
 )
 from src.api.auth import get_current_user
+from src.models.auth import AuthenticatedUser
 from src.models.database import User
 from src.database import get_db
+from src.services.product_search_service import product_search_service
+from src.services.stock_service import stock_service, InsufficientStockError
+from src.services.cart_cache_service import cart_cache_service, CartVersionConflictError
+from src.services.order_number_service import order_number_service
 
 router = APIRouter(prefix="/api/shop", tags=["shop"])
 
@@ -46,6 +53,27 @@ class ProductListResponse(BaseModel):
     total: int
 
 
+class ProductPageResponse(BaseModel):
+    products: List[Dict[str, Any]]
+    total: int  # Number of products on this page
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class OrderPageResponse(BaseModel):
+    orders: List[Dict[str, Any]]
+    total: int  # Number of orders on this page
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class ProductSearchResponse(BaseModel):
+    products: List[Dict[str, Any]]
+    total: int  # Total hits (respecting the category filter)
+    facets: Dict[str, int]  # Hits per category (ignoring the category filter)
+    query: str
+
+
 class AddToCartRequest(BaseModel):
     product_id: str
     quantity: int = 1
@@ -61,6 +89,7 @@ class CartItemResponse(BaseModel):
     quantity: int
     size: Optional[str]
     subtotal: float
+    version: int  # Send back when changing the quantity (see update_cart_item)
 
     class Config:
         from_attributes = True
@@ -77,6 +106,12 @@ class CreateOrderRequest(BaseModel):
     shipping_name: str
     shipping_email: EmailStr
     shipping_phone: Optional[str]
+    shipping_address_line1: str
+    shipping_address_line2: Optional[str] = None
+    shipping_city: str
+    shipping_postal_code: str
+    shipping_country: str = "DE"
+    customer_notes: Optional[str] = None
 
 
 class ReviewRequest(BaseModel):
@@ -109,70 +144,374 @@ class OrderResponse(BaseModel):
     subtotal: float
     shipping_cost: float
     total: float
-    created_at: str
+    created_at: Optional[str]
     items: List[dict]
 
     class Config:
         from_attributes = True
 
 
-# Helper function to generate order number
-def generate_order_number() -> str:
-    """Generate a human-readable order number"""
-    timestamp = datetime.now().strftime("%Y%m%d")
-    random_part = str(uuid.uuid4())[:8].upper()
-    return f"G3-{timestamp}-{random_part}"
+def review_display_name(
+    first_name: Optional[str],
+    last_name: Optional[str],
+    username: Optional[str]
+) -> Optional[str]:
+    """Public name shown next to a review ("Max M."), never the email address"""
+    if first_name:
+        return f"{first_name} {last_name[0]}." if last_name else first_name
+    return username
+
+
+# Product listing: sparse fieldsets and keyset pagination
+PRODUCT_FIELD_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "description": Product.description,
+    "price": Product.price,
+    "category": Product.category,
+    "images": Product.images,
+    "sizes": Product.sizes,
+    "inStock": Product.in_stock,
+    "stock_quantity": Product.stock_quantity,
+    "featured": Product.featured,
+    "sku": Product.sku,
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+DEFAULT_ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+
+
+def parse_product_fields(fields: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated sparse fieldset
+
+    Args:
+        fields: Comma-separated field names (None for all fields)
+
+    Returns:
+        Ordered list of requested field names (always including "id")
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not fields:
+        return list(PRODUCT_FIELD_COLUMNS.keys())
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PRODUCT_FIELD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unbekannte Felder: {', '.join(unknown)}")
+
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+
+def encode_cursor(created_at: Union[datetime, str, None], row_id: str) -> str:
+    """
+    Encode the (created_at, id) position of a product or order into an opaque cursor
+
+    created_at is a datetime or the timestamp text as stored (see keyset_timestamp).
+    """
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_position(cursor: str) -> Tuple[Optional[str], str]:
+    """Decode a cursor into its timestamp text and id (raises ValueError if malformed)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if created_at is not None:
+            datetime.fromisoformat(created_at)
+        return created_at, str(row_id)
+    except Exception as e:
+        raise ValueError("Ungültiger Cursor") from e
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """
+    Decode an opaque cursor into its (created_at, id) position
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    created_at, row_id = _cursor_position(cursor)
+    return (datetime.fromisoformat(created_at) if created_at else None), row_id
+
+
+def _stores_text_timestamps(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def keyset_timestamp(db: Session, column):
+    """
+    Timestamp column as it goes into a cursor
+
+    SQLite stores timestamps as text, and in two formats: server defaults
+    (CURRENT_TIMESTAMP) as "YYYY-MM-DD HH:MM:SS", bound Python datetimes as
+    "YYYY-MM-DD HH:MM:SS.ffffff". Rows are ordered by that text, so a cursor
+    bound as a datetime would be compared in the wrong format and rows
+    sharing a second would repeat or be skipped. On SQLite the cursor
+    therefore keeps the stored text and is compared as text.
+    """
+    return cast(column, String) if _stores_text_timestamps(db) else column
+
+
+def keyset_condition(db: Session, created_at_column, id_column, cursor: str, descending: bool = False):
+    """
+    Filter for the rows after a cursor in (created_at, id) order
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    cursor_created_at, cursor_id = _cursor_position(cursor)
+    # NULL sorts below every value on SQLite/MySQL and above on Postgres/Oracle
+    nulls_low = db.get_bind().dialect.name not in ("postgresql", "oracle")
+    nulls_come_last = nulls_low == descending
+
+    if cursor_created_at is None:
+        condition = and_(
+            created_at_column.is_(None),
+            id_column < cursor_id if descending else id_column > cursor_id
+        )
+        return condition if nulls_come_last else or_(condition, created_at_column.isnot(None))
+
+    if _stores_text_timestamps(db):
+        value = literal(cursor_created_at, String)
+    else:
+        value = datetime.fromisoformat(cursor_created_at)
+    # Row-value comparison lets Postgres/SQLite seek directly in the (created_at, id) index
+    position, after = tuple_(created_at_column, id_column), tuple_(value, cursor_id)
+    condition = position < after if descending else position > after
+    return or_(condition, created_at_column.is_(None)) if nulls_come_last else condition
+
+
+def fetch_product_page(
+    db: Session,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    in_stock: Optional[bool] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Fetch one page of products using keyset pagination
+
+    Only the columns needed for the requested fields are selected, and rows
+    are returned as plain dicts instead of ORM objects.
+
+    Args:
+        db: Database session
+        category: Filter by category
+        featured: Filter featured products
+        in_stock: Filter in-stock products
+        limit: Page size
+        cursor: Opaque cursor from a previous page
+        fields: Sparse fieldset (defaults to all fields)
+
+    Returns:
+        Dict with products, total (page size), next_cursor and has_more
+    """
+    fields = fields or list(PRODUCT_FIELD_COLUMNS.keys())
+    columns = [PRODUCT_FIELD_COLUMNS[f].label(f) for f in fields]
+    columns.append(keyset_timestamp(db, Product.created_at).label("_created_at"))
+    if "id" not in fields:
+        columns.append(Product.id.label("id"))
+
+    query = db.query(*columns)
+
+    if category:
+        query = query.filter(Product.category == category)
+    if featured is not None:
+        query = query.filter(Product.featured == featured)
+    if in_stock is not None:
+        query = query.filter(Product.in_stock == in_stock)
+
+    if cursor:
+        # Seeks in ix_products_created_at_id
+        query = query.filter(keyset_condition(db, Product.created_at, Product.id, cursor))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Product.created_at.asc(), Product.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    products = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            value = getattr(row, field)
+            if field == "category" and value is not None:
+                value = value.value
+            elif field in ("images", "sizes"):
+                value = value or []
+            item[field] = value
+        products.append(item)
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last._created_at, last.id)
+
+    return {
+        "products": products,
+        "total": len(products),
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }
+
+
+def serialize_order(order: Order, items: Optional[List[OrderItem]] = None) -> Dict[str, Any]:
+    """Order as returned by the API; items use the denormalized name/SKU stored on the order item"""
+    data = {
+        "id": order.id,
+        "order_number": order.order_number,
+        "status": order.status.value,
+        "subtotal": order.subtotal,
+        "shipping_cost": order.shipping_cost,
+        "total": order.total,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+    }
+    if items is not None:
+        data["items"] = [
+            {
+                "product_id": item.product_id,
+                "product_name": item.product_name,
+                "product_sku": item.product_sku,
+                "quantity": item.quantity,
+                "price": item.price,
+                "size": item.size,
+            }
+            for item in items
+        ]
+    return data
+
+
+def fetch_order_page(
+    db: Session,
+    user_id: str,
+    limit: int = DEFAULT_ORDER_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    summary: bool = False
+) -> Dict[str, Any]:
+    """
+    Fetch one page of a user's order history, newest first (keyset pagination)
+
+    Items of all orders on the page are loaded with a single selectin query.
+    In summary mode no items are loaded; each order carries an item_count
+    computed in the same query instead.
+
+    Args:
+        db: Database session
+        user_id: Order owner
+        limit: Page size
+        cursor: Opaque cursor from a previous page
+        summary: Return compact orders without items
+
+    Returns:
+        Dict with orders, total (page size), next_cursor and has_more
+    """
+    created_at = keyset_timestamp(db, Order.created_at)
+    if summary:
+        item_count = (
+            select(func.count(OrderItem.id))
+            .where(OrderItem.order_id == Order.id)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+        query = db.query(Order, item_count.label("item_count"), created_at.label("_created_at")).options(
+            load_only(Order.id, Order.order_number, Order.status, Order.subtotal,
+                      Order.shipping_cost, Order.total, Order.created_at),
+            raiseload(Order.items)
+        )
+    else:
+        query = db.query(Order, created_at.label("_created_at")).options(selectinload(Order.items))
+
+    query = query.filter(Order.user_id == user_id)
+
+    if cursor:
+        # Seeks in ix_orders_user_id_created_at_id
+        query = query.filter(keyset_condition(db, Order.created_at, Order.id, cursor, descending=True))
+
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    orders = []
+    for row in rows:
+        if summary:
+            orders.append({**serialize_order(row.Order), "item_count": row.item_count})
+        else:
+            orders.append(serialize_order(row.Order, row.Order.items))
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last._created_at, last.Order.id)
+
+    return {
+        "orders": orders,
+        "total": len(orders),
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
 
 
 # Product Endpoints
-@router.get("/products", response_model=ProductListResponse)
+@router.get("/products", response_model=ProductPageResponse)
 async def get_products(
     category: Optional[str] = Query(None, description="Filter by category"),
     featured: Optional[bool] = Query(None, description="Filter featured products"),
     in_stock: Optional[bool] = Query(None, description="Filter in-stock products"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page (next_cursor)"),
+    fields: Optional[str] = Query(None, description="Comma-separated sparse fieldset, e.g. id,name,price"),
     db: Session = Depends(get_db)
 ):
-    """Get all products with optional filters"""
+    """Get products with optional filters, keyset pagination and sparse fieldsets"""
     try:
-        query = db.query(Product)
-        
-        if category:
-            query = query.filter(Product.category == category)
-        
-        if featured is not None:
-            query = query.filter(Product.featured == featured)
-        
-        if in_stock is not None:
-            query = query.filter(Product.in_stock == in_stock)
-        
-        products = query.all()
-        
-        # Convert to response format
-        product_responses = []
-        for product in products:
-            product_responses.append(ProductResponse(
-                id=product.id,
-                name=product.name,
-                description=product.description,
-                price=product.price,
-                category=product.category.value,
-                images=product.images or [],
-                sizes=product.sizes or [],
-                inStock=product.in_stock,
-                stock_quantity=product.stock_quantity,
-                featured=product.featured,
-                sku=product.sku
-            ))
-        
-        return ProductListResponse(
-            products=product_responses,
-            total=len(product_responses)
+        requested_fields = parse_product_fields(fields)
+        return fetch_product_page(
+            db,
+            category=category,
+            featured=featured,
+            in_stock=in_stock,
+            limit=limit,
+            cursor=cursor,
+            fields=requested_fields
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching products: {str(e)}")
         raise HTTPException(status_code=500, detail="Fehler beim Laden der Produkte")
 
 
+@router.get("/products/search", response_model=ProductSearchResponse)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text (prefix matching)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    limit: int = Query(20, ge=1, le=50, description="Page size"),
+    offset: int = Query(0, ge=0, le=1000, description="Offset into ranked results"),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over product name, description and SKU with category facets"""
+    try:
+        return product_search_service.search(db, q, category=category, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        raise HTTPException(status_code=500, detail="Fehler bei der Produktsuche")
+
+
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(product_id: str, db: Session = Depends(get_db)):
     """Get a single product by ID"""
@@ -182,10 +521,6 @@ async def get_product(product_id: str, db: Session = Depends(get_db)):
         if not product:
             raise HTTPException(status_code=404, detail="Produkt nicht gefunden")
         
-        # Get average rating and review count
-        reviews = db.query(ProductReview).filter(ProductReview.product_id == product_id).all()
-        avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0.0
-        
         return ProductResponse(
             id=product.id,
             name=product.name,
@@ -209,30 +544,31 @@ async def get_product(product_id: str, db: Session = Depends(get_db)):
 # Cart Endpoints
 @router.get("/cart", response_model=CartResponse)
 async def get_cart(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's shopping cart"""
     try:
-        cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
+        # Served from the cart cache; the database is only read on a cache miss
+        cart_items = await cart_cache_service.get_cart(db, current_user.id)
         
         items = []
         subtotal = 0.0
         
         for item in cart_items:
-            product = item.product
-            item_subtotal = item.price_at_added * item.quantity
+            item_subtotal = item["price"] * item["quantity"]
             subtotal += item_subtotal
             
             items.append(CartItemResponse(
-                id=item.id,
-                product_id=item.product_id,
-                product_name=product.name,
-                product_image=product.images[0] if product.images else None,
-                price=item.price_at_added,
-                quantity=item.quantity,
-                size=item.size,
-                subtotal=item_subtotal
+                id=item["id"],
+                product_id=item["product_id"],
+                product_name=item["product_name"],
+                product_image=item["product_image"],
+                price=item["price"],
+                quantity=item["quantity"],
+                size=item["size"],
+                subtotal=item_subtotal,
+                version=item["version"]
             ))
         
         # Calculate shipping (free shipping over 50€)
@@ -253,7 +589,7 @@ async def get_cart(
 @router.post("/cart")
 async def add_to_cart(
     request: AddToCartRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add item to shopping cart"""
@@ -291,6 +627,7 @@ async def add_to_cart(
             db.add(cart_item)
         
         db.commit()
+        await cart_cache_service.invalidate(current_user.id)
         
         return JSONResponse(
             status_code=200,
@@ -308,33 +645,37 @@ async def add_to_cart(
 async def update_cart_item(
     item_id: str,
     quantity: int = Query(..., ge=1),
-    current_user: User = Depends(get_current_user),
+    version: Optional[int] = Query(None, ge=1),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Update cart item quantity"""
+    """
+    Update cart item quantity
+    
+    The change is written to the database right away.
+    Pass the item `version` from the last cart response to detect changes
+    made in another tab (409 with the current version).
+    """
     try:
-        cart_item = db.query(CartItem).filter(
-            and_(
-                CartItem.id == item_id,
-                CartItem.user_id == current_user.id
-            )
-        ).first()
+        item = await cart_cache_service.update_quantity(
+            db, current_user.id, item_id, quantity, expected_version=version
+        )
         
-        if not cart_item:
+        if item is None:
             raise HTTPException(status_code=404, detail="Warenkorb-Item nicht gefunden")
         
-        cart_item.quantity = quantity
-        cart_item.updated_at = datetime.now()
-        db.commit()
-        
         return JSONResponse(
             status_code=200,
-            content={"success": True, "message": "Warenkorb aktualisiert"}
+            content={"success": True, "message": "Warenkorb aktualisiert", "version": item["version"]}
+        )
+    except CartVersionConflictError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Warenkorb wurde in einem anderen Fenster geändert (aktuelle Version {e.current_version})"
         )
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
         logger.error(f"Error updating cart item: {str(e)}")
         raise HTTPException(status_code=500, detail="Fehler beim Aktualisieren des Warenkorbs")
 
@@ -342,7 +683,7 @@ async def update_cart_item(
 @router.delete("/cart/{item_id}")
 async def remove_from_cart(
     item_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Remove item from cart"""
@@ -359,6 +700,7 @@ async def remove_from_cart(
         
         db.delete(cart_item)
         db.commit()
+        await cart_cache_service.invalidate(current_user.id)
         
         return JSONResponse(
             status_code=200,
@@ -374,13 +716,14 @@ async def remove_from_cart(
 
 @router.delete("/cart")
 async def clear_cart(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Clear entire cart"""
     try:
         db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
         db.commit()
+        await cart_cache_service.invalidate(current_user.id)
         
         return JSONResponse(
             status_code=200,
@@ -396,13 +739,15 @@ async def clear_cart(
 @router.post("/orders")
 async def create_order(
     request: CreateOrderRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new order from cart"""
     try:
-        # Get cart items
-        cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
+        # Get cart items (the database is authoritative, not the cart cache)
+        cart_items = db.query(CartItem).options(
+            joinedload(CartItem.product).load_only(Product.name, Product.sku)
+        ).filter(CartItem.user_id == current_user.id).all()
         
         if not cart_items:
             raise HTTPException(status_code=400, detail="Warenkorb ist leer")
@@ -412,10 +757,11 @@ async def create_order(
         shipping_cost = 0.0 if subtotal >= 50.0 else 5.99
         total = subtotal + shipping_cost
         
-        # Create order
+        # Create order (number from a block-allocated counter, unique across workers)
         order = Order(
+            id=str(uuid.uuid4()),
             user_id=current_user.id,
-            order_number=generate_order_number(),
+            order_number=order_number_service.next_order_number(db),
             status=OrderStatusDB.PENDING,
             subtotal=subtotal,
             shipping_cost=shipping_cost,
@@ -431,33 +777,54 @@ async def create_order(
             customer_notes=request.customer_notes
         )
         db.add(order)
-        db.flush()  # Get order ID
+        db.flush()
         
-        # Create order items
+        # Reserve stock for all lines at once (conditional decrement, no oversell)
+        quantities: Dict[str, int] = {}
         for cart_item in cart_items:
-            product = cart_item.product
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                product_name=product.name,
-                product_sku=product.sku,
-                quantity=cart_item.quantity,
-                price=cart_item.price_at_added,
-                size=cart_item.size
+            quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
+        try:
+            stock_service.reserve(db, order.id, quantities)
+        except InsufficientStockError as e:
+            names = sorted({item.product.name for item in cart_items if item.product_id in e.product_ids})
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail=f"Nicht genügend Lagerbestand für: {', '.join(names)}"
             )
-            db.add(order_item)
+        
+        # Create all order items with one statement: with RETURNING, SQLAlchemy
+        # batches the rows into a single multi-row INSERT ... VALUES
+        # ("insertmanyvalues") and the compiled statement stays cached
+        item_rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "order_id": order.id,
+                "product_id": cart_item.product_id,
+                "product_name": cart_item.product.name,
+                "product_sku": cart_item.product.sku,
+                "quantity": cart_item.quantity,
+                "price": cart_item.price_at_added,
+                "size": cart_item.size,
+            }
+            for cart_item in cart_items
+        ]
+        db.execute(insert(OrderItem).returning(OrderItem.id), item_rows)
         
         # Clear cart
         db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
         
+        # Read before commit so the expired order isn't reloaded (with its items)
+        order_id, order_number = order.id, order.order_number
         db.commit()
+        await cart_cache_service.invalidate(current_user.id)
         
         return JSONResponse(
             status_code=201,
             content={
                 "success": True,
-                "order_id": order.id,
-                "order_number": order.order_number,
+                "order_id": order_id,
+                "order_number": order_number,
                 "total": total
             }
         )
@@ -469,38 +836,23 @@ async def create_order(
         raise HTTPException(status_code=500, detail="Fehler beim Erstellen der Bestellung")
 
 
-@router.get("/orders", response_model=List[OrderResponse])
+@router.get("/orders", response_model=OrderPageResponse)
 async def get_orders(
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(DEFAULT_ORDER_PAGE_SIZE, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = Query(False, description="Kompakte Liste ohne Positionen (mit item_count)"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's orders"""
+    """
+    Get user's order history, newest first
+    
+    Paginate with `next_cursor`; `summary=true` returns compact orders for list views.
+    """
     try:
-        orders = db.query(Order).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
-        
-        order_responses = []
-        for order in orders:
-            items = []
-            for item in order.items:
-                items.append({
-                    "product_name": item.product_name,
-                    "quantity": item.quantity,
-                    "price": item.price,
-                    "size": item.size
-                })
-            
-            order_responses.append(OrderResponse(
-                id=order.id,
-                order_number=order.order_number,
-                status=order.status.value,
-                subtotal=order.subtotal,
-                shipping_cost=order.shipping_cost,
-                total=order.total,
-                created_at=order.created_at.isoformat(),
-                items=items
-            ))
-        
-        return order_responses
+        return fetch_order_page(db, current_user.id, limit=limit, cursor=cursor, summary=summary)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
         raise HTTPException(status_code=500, detail="Fehler beim Laden der Bestellungen")
@@ -509,7 +861,7 @@ async def get_orders(
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a single order by ID"""
@@ -524,25 +876,7 @@ async def get_order(
         if not order:
             raise HTTPException(status_code=404, detail="Bestellung nicht gefunden")
         
-        items = []
-        for item in order.items:
-            items.append({
-                "product_name": item.product_name,
-                "quantity": item.quantity,
-                "price": item.price,
-                "size": item.size
-            })
-        
-        return OrderResponse(
-            id=order.id,
-            order_number=order.order_number,
-            status=order.status.value,
-            subtotal=order.subtotal,
-            shipping_cost=order.shipping_cost,
-            total=order.total,
-            created_at=order.created_at.isoformat(),
-            items=items
-        )
+        return OrderResponse(**serialize_order(order, order.items))
     except HTTPException:
         raise
     except Exception as e:
@@ -554,7 +888,7 @@ async def get_order(
 @router.post("/reviews")
 async def create_review(
     request: ReviewRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a product review"""
@@ -584,7 +918,7 @@ async def create_review(
             and_(
                 Order.user_id == current_user.id,
                 OrderItem.product_id == request.product_id,
-                Order.status.in_([OrderStatusDB.COMPLETED, OrderStatusDB.DELIVERED])
+                Order.status == OrderStatusDB.DELIVERED
             )
         ).first() is not None
         
@@ -619,18 +953,20 @@ async def get_product_reviews(
 ):
     """Get reviews for a product"""
     try:
-        reviews = db.query(ProductReview).filter(
+        # Join users for the display name columns only (no email, no password hash)
+        rows = db.query(ProductReview, User.first_name, User.last_name, User.username).join(
+            User, User.id == ProductReview.user_id
+        ).filter(
             ProductReview.product_id == product_id
         ).order_by(ProductReview.created_at.desc()).all()
         
         review_responses = []
-        for review in reviews:
-            user = review.user
+        for review, first_name, last_name, username in rows:
             review_responses.append(ReviewResponse(
                 id=review.id,
                 product_id=review.product_id,
                 user_id=review.user_id,
-                user_name=f"{user.name or user.email}",
+                user_name=review_display_name(first_name, last_name, username),
                 rating=review.rating,
                 title=review.title,
                 comment=review.comment,
@@ -648,7 +984,7 @@ async def get_product_reviews(
 @router.post("/reviews/{review_id}/helpful")
 async def mark_review_helpful(
     review_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Mark a review as helpful"""
@@ -676,7 +1012,7 @@ async def mark_review_helpful(
 @router.post("/wishlist/{product_id}")
 async def add_to_wishlist(
     product_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Add product to wishlist"""
@@ -720,7 +1056,7 @@ async def add_to_wishlist(
 @router.delete("/wishlist/{product_id}")
 async def remove_from_wishlist(
     product_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Remove product from wishlist"""
@@ -752,12 +1088,14 @@ async def remove_from_wishlist(
 
 @router.get("/wishlist", response_model=ProductListResponse)
 async def get_wishlist(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get user's wishlist"""
     try:
-        wishlist_items = db.query(WishlistItem).filter(
+        wishlist_items = db.query(WishlistItem).options(
+            joinedload(WishlistItem.product)
+        ).filter(
             WishlistItem.user_id == current_user.id
         ).all()
         
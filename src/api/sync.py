@@ -5,18 +5,16 @@ API endpoints for manual synchronization and sync status monitoring.
 """
 
 from fastapi import APIRouter, HTTPException, Request, Query
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from loguru import logger
 from datetime import datetime
 from typing import Optional
 
 from src.services.sync_service import sync_service
 from src.services.wodify_api_service import wodify_api_service
+from src.utils.rate_limit import limiter
 
 
 router = APIRouter(prefix="/api/sync", tags=["synchronization"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.post("/members")
@@ -3,8 +3,6 @@ G3 CrossFit WODIFY Automation - Webhook Handlers
 """
 
 from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from loguru import logger
 import json
 import hmac
@@ -20,6 +18,8 @@ from src.models.wodify import (
     WodifyClassBooked
 )
 from src.services.automation_service import automation_service
+from src.services.schedule_replica_service import schedule_replica_service
+from src.utils.rate_limit import limiter
 
 # Initialize Sentry if available
 try:
@@ -30,7 +30,6 @@ except ImportError:
 
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 def _track_webhook_status(
@@ -284,6 +283,7 @@ async def handle_booking_created(
     1. Trial confirmation email (if trial class)
     2. Trial reminder email (24h before)
     3. Trial follow-up email (24h after)
+    4. Update of the class's booked spots in the local schedule
     """
     try:
         # Get raw body for signature verification
@@ -311,6 +311,11 @@ async def handle_booking_created(
             automation_service.process_booking_created,
             booking_data
         )
+        if settings.schedule_replica_enabled:
+            background_tasks.add_task(
+                schedule_replica_service.process_booking,
+                booking_data
+            )
         
         # Track webhook processing
         _track_webhook_status("booking-created", booking_data.booking_id, "success")
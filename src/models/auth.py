@@ -24,6 +24,21 @@ class UserRegister(BaseModel):
     phone: Optional[str] = Field(None, description="Phone number")
 
 
+class PasswordChange(BaseModel):
+    """Password change request model"""
+    current_password: str = Field(..., description="Current password")
+    new_password: str = Field(..., min_length=8, description="New password (min 8 characters)")
+
+
+class UserUpdate(BaseModel):
+    """User update request model (admin); only given, non-null fields are changed"""
+    first_name: Optional[str] = Field(None, description="First name")
+    last_name: Optional[str] = Field(None, description="Last name")
+    phone: Optional[str] = Field(None, description="Phone number")
+    is_active: Optional[bool] = Field(None, description="False deactivates the account")
+    is_admin: Optional[bool] = Field(None, description="Admin privileges")
+
+
 class TokenResponse(BaseModel):
     """Token response model"""
     access_token: str = Field(..., description="JWT access token")
@@ -52,3 +67,11 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class AuthenticatedUser(BaseModel):
+    """Principal of an authenticated request (from token claims or the principal cache)"""
+    id: str
+    email: str
+    is_active: bool = True
+    is_admin: bool = False
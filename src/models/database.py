@@ -2,7 +2,7 @@
 G3 CrossFit WODIFY Automation - Database Models
 """
 
-from sqlalchemy import Column, String, Float, Boolean, DateTime, Text, Enum as SQLEnum, Integer, ForeignKey, JSON
+from sqlalchemy import Column, String, Float, Boolean, Date, DateTime, Text, Enum as SQLEnum, Integer, ForeignKey, JSON, Index, DDL, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -75,6 +75,11 @@ class Member(Base):
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    # Exports stream rows ordered (and filtered) by this date
+    __table_args__ = (
+        Index("ix_members_created_at", "created_at"),
+    )
 
 
 class Lead(Base):
@@ -124,6 +129,11 @@ class Lead(Base):
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    # Exports stream rows ordered (and filtered) by this date
+    __table_args__ = (
+        Index("ix_leads_created_at", "created_at"),
+    )
 
 
 class WebhookLog(Base):
@@ -148,6 +158,11 @@ class WebhookLog(Base):
     
     # Timestamps
     received_at = Column(DateTime, server_default=func.now())
+    
+    # Exports stream rows ordered (and filtered) by this date
+    __table_args__ = (
+        Index("ix_webhook_logs_received_at", "received_at"),
+    )
 
 
 class EmailLog(Base):
@@ -176,6 +191,12 @@ class EmailLog(Base):
     
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
+    
+    # Exports stream rows ordered (and filtered) by this date
+    __table_args__ = (
+        Index("ix_email_logs_created_at", "created_at"),
+        Index("ix_email_logs_email_type_created_at", "email_type", "created_at"),
+    )
 
 
 class User(Base):
@@ -209,6 +230,29 @@ class User(Base):
     last_login = Column(DateTime, nullable=True)
 
 
+class RefreshToken(Base):
+    """Issued refresh token (only its SHA-256 hash is stored)"""
+    __tablename__ = "refresh_tokens"
+    
+    # Primary Key
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    # Foreign Keys
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Token Information
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    family_id = Column(String, nullable=False, index=True)  # All rotations of one login
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    # Rotation / Revocation
+    revoked_at = Column(DateTime, nullable=True)
+    replaced_by_id = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, server_default=func.now())
+
+
 class ProductCategoryDB(str, enum.Enum):
     """Product category enum"""
     CLOTHING = "clothing"
@@ -227,6 +271,21 @@ class OrderStatusDB(str, enum.Enum):
     REFUNDED = "refunded"
 
 
+class ClassReservationStatusDB(str, enum.Enum):
+    """Class reservation status enum"""
+    PENDING = "pending"  # Spot is held locally, Wodify hasn't confirmed yet
+    CONFIRMED = "confirmed"  # Wodify accepted the booking
+    REJECTED = "rejected"  # Wodify refused the booking, spot returned
+    FAILED = "failed"  # Wodify couldn't be reached in time, spot returned
+    CANCELLED = "cancelled"  # Confirmed booking was cancelled later
+
+
+class ClassReservationKindDB(str, enum.Enum):
+    """Class reservation kind enum"""
+    BOOKING = "booking"
+    WAITLIST = "waitlist"
+
+
 class Product(Base):
     """Product database model"""
     __tablename__ = "products"
@@ -255,6 +314,65 @@ class Product(Base):
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    # Composite index backing keyset pagination (ORDER BY created_at, id)
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+    )
+
+
+# Full-text search index for products
+# SQLite (local): FTS5 table kept in sync by triggers on products; category is
+# stored unindexed so ranking and facet counts never have to join products.
+# PostgreSQL: generated tsvector column with a GIN index (maintained by Postgres on every write).
+PRODUCT_SEARCH_DDL_SQLITE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_id UNINDEXED, category UNINDEXED, name, description, sku,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (product_id, category, name, description, sku)
+        VALUES (new.id, new.category, new.name, new.description, new.sku);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE product_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF id, category, name, description, sku ON products BEGIN
+        DELETE FROM products_fts WHERE product_id = old.id;
+        INSERT INTO products_fts (product_id, category, name, description, sku)
+        VALUES (new.id, new.category, new.name, new.description, new.sku);
+    END
+    """,
+]
+
+PRODUCT_SEARCH_DDL_POSTGRESQL = [
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(sku, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+for _statement in PRODUCT_SEARCH_DDL_SQLITE:
+    event.listen(Product.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in PRODUCT_SEARCH_DDL_POSTGRESQL:
+    event.listen(Product.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+event.listen(
+    Product.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite")
+)
 
 
 class CartItem(Base):
@@ -273,13 +391,19 @@ class CartItem(Base):
     size = Column(String, nullable=True)
     price_at_added = Column(Float, nullable=False)  # Store price at time of adding
     
+    # Optimistic concurrency: bumped on every write, so requests from other
+    # tabs or workers can't overwrite each other unnoticed
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
-    # Relationships
-    product = relationship("Product", lazy="joined")
-    user = relationship("User", lazy="joined")
+    # Relationships (lazy="raise": queries declare what they load, see src/api/shop.py)
+    product = relationship("Product", lazy="raise")
+    user = relationship("User", lazy="raise")
+    
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Order(Base):
@@ -332,8 +456,13 @@ class Order(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     # Relationships
-    user = relationship("User", lazy="joined")
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    user = relationship("User", lazy="raise")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="selectin")
+    
+    # Composite index backing the order history (WHERE user_id ORDER BY created_at DESC, id DESC)
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
 
 class OrderItem(Base):
@@ -359,7 +488,37 @@ class OrderItem(Base):
     
     # Relationships
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", lazy="joined")
+    product = relationship("Product", lazy="raise")
+
+
+class OrderNumberCounter(Base):
+    """Counter handing out blocks of order numbers (see src/services/order_number_service.py)"""
+    __tablename__ = "order_number_counters"
+    
+    # Primary Key
+    name = Column(String, primary_key=True)
+    
+    # First value of the next unallocated block
+    next_value = Column(Integer, nullable=False, default=1)
+
+
+class StockReservation(Base):
+    """Stock taken by one order line"""
+    __tablename__ = "stock_reservations"
+    
+    # Primary Key
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    
+    # Foreign Keys
+    order_id = Column(String, ForeignKey("orders.id"), nullable=False, index=True)
+    product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
+    
+    # Reservation Details
+    quantity = Column(Integer, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class ProductReview(Base):
@@ -386,9 +545,9 @@ class ProductReview(Base):
     created_at = Column(DateTime, server_default=func.now(), index=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
-    # Relationships
-    product = relationship("Product", lazy="joined")
-    user = relationship("User", lazy="joined")
+    # Relationships (lazy="raise": queries declare what they load, see src/api/shop.py)
+    product = relationship("Product", lazy="raise")
+    user = relationship("User", lazy="raise")
 
 
 class WishlistItem(Base):
@@ -405,11 +564,144 @@ class WishlistItem(Base):
     # Timestamps
     created_at = Column(DateTime, server_default=func.now(), index=True)
     
-    # Relationships
-    product = relationship("Product", lazy="joined")
-    user = relationship("User", lazy="joined")
+    # Relationships (lazy="raise": queries declare what they load, see src/api/shop.py)
+    product = relationship("Product", lazy="raise")
+    user = relationship("User", lazy="raise")
     
     # Unique constraint: one product per user in wishlist
     __table_args__ = (
         {"sqlite_autoincrement": True},
     )
+
+
+class ScheduleClass(Base):
+    """Local copy of a Wodify class (see src/services/schedule_replica_service.py)"""
+    __tablename__ = "classes"
+    
+    # Primary Key (Wodify class ID)
+    id = Column(String, primary_key=True)
+    
+    # Class Details
+    name = Column(String, nullable=False)
+    class_type = Column(String, nullable=True)
+    trainer_name = Column(String, nullable=True)
+    level = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    price = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+    
+    # Time
+    class_date = Column(Date, nullable=False)
+    day_of_week = Column(String, nullable=False)  # "Monday" ... "Sunday"
+    start_time = Column(String, nullable=True)  # As sent by Wodify
+    end_time = Column(String, nullable=True)
+    
+    # Capacity (booked is kept current by booking webhooks between refreshes)
+    capacity = Column(Integer, nullable=False, default=12)
+    booked = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    synced_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Schedule filters: date range, optionally by day of week, type or trainer
+    __table_args__ = (
+        Index("ix_classes_date_start", "class_date", "start_time"),
+        Index("ix_classes_day_date", "day_of_week", "class_date"),
+        Index("ix_classes_type_date", "class_type", "class_date"),
+        Index("ix_classes_trainer_date", "trainer_name", "class_date"),
+    )
+
+
+class ClassType(Base):
+    """Local copy of a Wodify class type"""
+    __tablename__ = "class_types"
+    
+    # Primary Key (Wodify ID)
+    id = Column(String, primary_key=True)
+    
+    name = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)  # Object as sent by Wodify
+    synced_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Trainer(Base):
+    """Local copy of a Wodify trainer/coach"""
+    __tablename__ = "trainers"
+    
+    # Primary Key (Wodify ID)
+    id = Column(String, primary_key=True)
+    
+    name = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)  # Object as sent by Wodify
+    synced_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ClassBooking(Base):
+    """Last known status of a Wodify booking (makes booking webhooks idempotent)"""
+    __tablename__ = "class_bookings"
+    
+    # Primary Key (Wodify booking ID)
+    booking_id = Column(String, primary_key=True)
+    
+    class_id = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False)  # Booked, Waitlist, Cancelled
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ScheduleSyncState(Base):
+    """Date range covered by the last successful schedule refresh"""
+    __tablename__ = "schedule_sync_state"
+    
+    # Primary Key
+    name = Column(String, primary_key=True)
+    
+    window_start = Column(Date, nullable=False)
+    window_end = Column(Date, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+# Reservations that still count as the user's request for a class
+CLASS_RESERVATION_OPEN_CONDITION = "status IN ('PENDING', 'CONFIRMED')"
+
+
+class ClassReservation(Base):
+    """Booking or waitlist request, held locally until Wodify confirms it"""
+    __tablename__ = "class_reservations"
+    
+    # Primary Key (the pending booking ID returned to the client)
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    # Request
+    kind = Column(SQLEnum(ClassReservationKindDB), nullable=False)
+    class_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False, index=True)
+    user_email = Column(String, nullable=False)
+    user_name = Column(String, nullable=False)
+    holds_spot = Column(Boolean, nullable=False, default=False)  # Counted in classes.booked while pending
+    
+    # Confirmation
+    status = Column(
+        SQLEnum(ClassReservationStatusDB),
+        nullable=False,
+        default=ClassReservationStatusDB.PENDING
+    )
+    wodify_booking_id = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    # The confirmation queue picks pending reservations that are due; a user
+    # has at most one open request per class and kind
+    __table_args__ = (
+        Index("ix_class_reservations_status_next_attempt_at", "status", "next_attempt_at"),
+        Index(
+            "uq_class_reservations_open_request", "kind", "class_id", "user_id",
+            unique=True,
+            sqlite_where=text(CLASS_RESERVATION_OPEN_CONDITION),
+            postgresql_where=text(CLASS_RESERVATION_OPEN_CONDITION),
+        ),
+    )
@@ -0,0 +1,35 @@
+"""
+G3 CrossFit WODIFY Automation - Training Plan Models
+
+Pydantic models for AI-generated training plans.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class TrainingPlanRequest(BaseModel):
+    """Training plan request model"""
+    prompt: str = Field(default="", description="Personal wishes, e.g. injuries or focus areas")
+    experience_level: Optional[str] = Field(default="Fortgeschritten", description="Experience level")
+    goals: Optional[str] = Field(default="Allgemeine Fitness", description="Training goals")
+    days: int = Field(default=3, ge=1, le=6, description="Training days per week")
+    equipment: Optional[str] = Field(default="Volle CrossFit-Box", description="Available equipment")
+
+
+class TrainingPlanResponse(BaseModel):
+    """Training plan response model"""
+    plan: str
+    success: bool = True
+
+
+class TrainingPlanJobResponse(BaseModel):
+    """Background training plan job"""
+    job_id: str
+    status: str = Field(..., description="queued, running, completed or failed")
+    plan: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = Field(None, description="Refreshed while the job is running")
@@ -8,6 +8,7 @@ and triggering automated actions.
 from loguru import logger
 from datetime import datetime
 import uuid
+from typing import Any, Dict, List
 
 from config.settings import settings
 from src.models.wodify import (
@@ -18,7 +19,7 @@ from src.models.wodify import (
 )
 from src.services.email_service import email_service
 from src.services.database_service import database_service
-from src.services.scheduler_service import scheduler_service
+from src.services.scheduler_service import parse_nurturing_job_id, scheduler_service
 
 
 class AutomationService:
@@ -209,6 +210,71 @@ class AutomationService:
         except Exception as e:
             logger.error(f"Error processing new booking: {str(e)}")
     
+    def process_imported_members(self, members: List[Dict[str, Any]], converted_lead_ids: List[str]):
+        """
+        Automation for members created by a bulk import (see import_service)
+
+        Workflow:
+        1. Cancel scheduled nurturing jobs of leads converted by the import
+        2. Schedule welcome emails (if enabled)
+
+        No team notification is sent: an import would notify the team once
+        per imported member.
+
+        Args:
+            members: Newly created member rows
+            converted_lead_ids: Leads the import marked as converted
+        """
+        if converted_lead_ids:
+            # One pass over the jobs instead of cancel_nurturing_jobs per lead
+            lead_ids = set(converted_lead_ids)
+            cancelled = 0
+            for job in scheduler_service.get_all_jobs():
+                step = parse_nurturing_job_id(job["job_id"])
+                if step and step[1] in lead_ids:
+                    cancelled += scheduler_service.remove_job(job["job_id"])
+            logger.info(f"Cancelled {cancelled} nurturing jobs of {len(lead_ids)} converted leads")
+
+        if settings.enable_welcome_email:
+            for member in members:
+                scheduler_service.schedule_welcome_email(
+                    client_id=member["client_id"],
+                    first_name=member["first_name"],
+                    last_name=member["last_name"],
+                    email=member["email"],
+                    membership_type=member["membership_type"],
+                    start_date=member["start_date"].strftime("%d.%m.%Y"),
+                    monthly_price=member["monthly_price"],
+                    delay_minutes=settings.welcome_email_delay_minutes,
+                    is_first_membership=member.get("is_first_membership", True),
+                    referral_source=member.get("referral_source")
+                )
+            logger.info(f"Welcome emails scheduled for {len(members)} imported members")
+
+    def process_imported_leads(self, leads: List[Dict[str, Any]]):
+        """
+        Automation for leads created by a bulk import (see import_service)
+
+        Schedules the nurturing sequences of all leads at once (if enabled)
+        and the lead response email of every lead, like process_new_lead.
+
+        Args:
+            leads: Newly created lead rows
+        """
+        if settings.enable_lead_nurturing:
+            scheduler_service.schedule_nurturing_sequences(leads)
+        for lead in leads:
+            scheduler_service.schedule_lead_response_email(
+                lead_id=lead["lead_id"],
+                first_name=lead["first_name"],
+                last_name=lead["last_name"],
+                email=lead["email"],
+                delay_minutes=5,
+                interested_in=lead.get("interested_in"),
+                phone=lead.get("phone")
+            )
+        logger.info(f"Lead automation scheduled for {len(leads)} imported leads")
+
     async def log_webhook(self, webhook_data: WodifyWebhookPayload):
         """
         Log generic webhook to database
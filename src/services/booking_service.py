@@ -0,0 +1,312 @@
+"""
+G3 CrossFit WODIFY Automation - Booking Service
+
+Optimistic class bookings. A booking takes a spot from the locally
+tracked capacity of the class (schedule replica) with a single
+conditional UPDATE, so of many simultaneous requests for the last spot
+exactly one wins. The request is stored in `class_reservations` and
+answered right away with the pending reservation ID.
+
+The reservations table is the queue for the confirmation with Wodify:
+right after the request a background task confirms it, and the scheduler
+picks up everything that is still pending (e.g. after a restart or while
+Wodify was down). A worker claims a reservation with a conditional UPDATE
+of its next_attempt_at, so no two workers send it at the same time.
+
+Every request carries the reservation ID as idempotency key. A timeout or
+5xx doesn't tell whether Wodify booked the class, so before a booking is
+sent again the user's Wodify bookings are checked for it.
+
+If Wodify refuses the booking (4xx) or can't be reached within
+BOOKING_CONFIRM_MAX_ATTEMPTS attempts, the reservation is rejected/failed
+and its spot is given back. Waitlist requests go through the same queue,
+without holding a spot.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from loguru import logger
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from src.database import SessionLocal
+from src.models.database import (
+    ClassBooking,
+    ClassReservation,
+    ClassReservationKindDB,
+    ClassReservationStatusDB,
+    ScheduleClass,
+)
+from src.services.wodify_api_service import RETRYABLE_STATUS_CODES, wodify_api_service
+
+# A claimed reservation is left alone by other workers for this long
+CLAIM_SECONDS = 120
+# Longest wait between two confirmation attempts
+MAX_BACKOFF_SECONDS = 3600
+
+
+class ClassFullError(Exception):
+    """Raised when the class has no free spot left"""
+
+    def __init__(self, class_id: str):
+        self.class_id = class_id
+        super().__init__(f"Kurs {class_id} ist ausgebucht")
+
+
+def _wodify_booking_id(result: Dict[str, Any]) -> Optional[str]:
+    value = result.get("booking_id") or result.get("id") or (result.get("booking") or {}).get("id")
+    return str(value) if value else None
+
+
+def reservation_payload(reservation: ClassReservation) -> Dict[str, Any]:
+    """Reservation in the format of the /api/schedule booking endpoints"""
+    return {
+        "id": reservation.id,
+        "kind": reservation.kind.value,
+        "class_id": reservation.class_id,
+        "status": reservation.status.value,
+        "wodify_booking_id": reservation.wodify_booking_id,
+        "error": reservation.last_error if reservation.status != ClassReservationStatusDB.CONFIRMED else None,
+    }
+
+
+class BookingService:
+    """Service for optimistic bookings and their confirmation with Wodify"""
+
+    def reserve(
+        self,
+        db: Session,
+        kind: ClassReservationKindDB,
+        class_id: str,
+        user_id: str,
+        user_email: str,
+        user_name: str
+    ) -> ClassReservation:
+        """
+        Hold a spot (bookings only) and queue the request for confirmation
+
+        A class the schedule replica doesn't know is queued without holding
+        a spot; Wodify decides. An open request of the same user for the
+        same class is returned instead of a new one; a unique index on open
+        requests makes this hold for concurrent requests as well.
+
+        Raises:
+            ClassFullError: If the class has no free spot left
+        """
+        existing = self._open_request(db, kind, class_id, user_id)
+        if existing:
+            return existing
+
+        holds_spot = False
+        if kind == ClassReservationKindDB.BOOKING:
+            holds_spot = db.execute(
+                update(ScheduleClass)
+                .where(ScheduleClass.id == class_id, ScheduleClass.booked < ScheduleClass.capacity)
+                .values(booked=ScheduleClass.booked + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount == 1
+            if not holds_spot and db.query(ScheduleClass.id).filter(ScheduleClass.id == class_id).first():
+                db.rollback()
+                raise ClassFullError(class_id)
+
+        reservation = ClassReservation(
+            kind=kind,
+            class_id=class_id,
+            user_id=user_id,
+            user_email=user_email,
+            user_name=user_name,
+            holds_spot=holds_spot,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.add(reservation)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request of the same user won; its spot is the one held
+            db.rollback()
+            existing = self._open_request(db, kind, class_id, user_id)
+            if existing is None:
+                raise
+            return existing
+        logger.info(f"Reserved {kind.value} for class {class_id} ({reservation.id}), confirming with Wodify")
+        return reservation
+
+    def _open_request(
+        self,
+        db: Session,
+        kind: ClassReservationKindDB,
+        class_id: str,
+        user_id: str
+    ) -> Optional[ClassReservation]:
+        return db.query(ClassReservation).filter(
+            ClassReservation.kind == kind,
+            ClassReservation.class_id == class_id,
+            ClassReservation.user_id == user_id,
+            ClassReservation.status.in_([ClassReservationStatusDB.PENDING, ClassReservationStatusDB.CONFIRMED])
+        ).first()
+
+    def _claim(self, db: Session, reservation_id: str, now: datetime) -> bool:
+        claimed = db.execute(
+            update(ClassReservation)
+            .where(
+                ClassReservation.id == reservation_id,
+                ClassReservation.status == ClassReservationStatusDB.PENDING,
+                ClassReservation.next_attempt_at <= now
+            )
+            .values(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.commit()
+        return claimed
+
+    def _release_spot(self, db: Session, class_id: str):
+        booked = ScheduleClass.booked - 1
+        db.execute(
+            update(ScheduleClass)
+            .where(ScheduleClass.id == class_id)
+            .values(booked=case((booked < 0, 0), else_=booked))
+            .execution_options(synchronize_session=False)
+        )
+
+    def _record_confirmed(self, db: Session, class_id: str, wodify_booking_id: str):
+        """
+        Add the Wodify booking to class_bookings, so its webhook isn't counted
+        again; if the webhook came first, it already counted the spot we hold
+        """
+        for attempt in range(2):
+            try:
+                entry = db.get(ClassBooking, wodify_booking_id)
+                if entry is None:
+                    db.add(ClassBooking(booking_id=wodify_booking_id, class_id=class_id, status="Booked"))
+                elif entry.status == "Booked":
+                    self._release_spot(db, class_id)
+                db.flush()
+                return
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+
+    def _finish(self, db: Session, reservation: ClassReservation, status: ClassReservationStatusDB, error: str):
+        """End a reservation without booking and give its spot back"""
+        reservation.status = status
+        reservation.last_error = error
+        if reservation.holds_spot:
+            self._release_spot(db, reservation.class_id)
+        db.commit()
+        logger.warning(f"Class reservation {reservation.id} {status.value}: {error}")
+
+    async def confirm(self, db: Session, reservation_id: str) -> Optional[ClassReservation]:
+        """
+        Send one pending, due reservation to Wodify
+
+        Returns:
+            The reservation, or None if it isn't pending and due (or another
+            worker claimed it)
+        """
+        if not self._claim(db, reservation_id, datetime.utcnow()):
+            return None
+        reservation = db.get(ClassReservation, reservation_id)
+
+        result = None
+        if reservation.attempts and reservation.kind == ClassReservationKindDB.BOOKING:
+            # An earlier attempt may have reached Wodify before it failed
+            try:
+                result = await wodify_api_service.find_booking(reservation.user_id, reservation.class_id)
+            except Exception as e:
+                return self._retry_later(db, reservation, e)
+
+        try:
+            if result is not None:
+                logger.info(f"Class reservation {reservation.id} was already booked at Wodify, not resending")
+            elif reservation.kind == ClassReservationKindDB.BOOKING:
+                result = await wodify_api_service.book_class(
+                    class_id=reservation.class_id,
+                    user_id=reservation.user_id,
+                    user_email=reservation.user_email,
+                    user_name=reservation.user_name,
+                    idempotency_key=reservation.id
+                )
+            else:
+                result = await wodify_api_service.join_waitlist(
+                    class_id=reservation.class_id,
+                    user_id=reservation.user_id,
+                    user_email=reservation.user_email,
+                    user_name=reservation.user_name,
+                    idempotency_key=reservation.id
+                )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in RETRYABLE_STATUS_CODES:
+                reservation.attempts += 1
+                self._finish(db, reservation, ClassReservationStatusDB.REJECTED, f"Wodify: HTTP {e.response.status_code}")
+                return reservation
+            return self._retry_later(db, reservation, e)
+        except Exception as e:
+            return self._retry_later(db, reservation, e)
+
+        wodify_booking_id = _wodify_booking_id(result or {})
+        if reservation.holds_spot and wodify_booking_id:
+            self._record_confirmed(db, reservation.class_id, wodify_booking_id)
+        reservation.attempts += 1
+        reservation.status = ClassReservationStatusDB.CONFIRMED
+        reservation.wodify_booking_id = wodify_booking_id
+        reservation.last_error = None
+        db.commit()
+        logger.info(f"Class reservation {reservation.id} confirmed by Wodify ({reservation.wodify_booking_id})")
+        return reservation
+
+    def _retry_later(self, db: Session, reservation: ClassReservation, error: Exception) -> ClassReservation:
+        reservation.attempts += 1
+        if reservation.attempts >= settings.booking_confirm_max_attempts:
+            self._finish(db, reservation, ClassReservationStatusDB.FAILED, f"Wodify nicht erreichbar: {str(error)}")
+            return reservation
+        delay = min(settings.booking_confirm_backoff_seconds * 2 ** (reservation.attempts - 1), MAX_BACKOFF_SECONDS)
+        reservation.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        reservation.last_error = str(error)
+        db.commit()
+        logger.warning(f"Class reservation {reservation.id} not confirmed, retrying in {delay:.0f}s: {str(error)}")
+        return reservation
+
+    async def process_due(self, db: Session, limit: int = 50) -> Dict[str, int]:
+        """
+        Confirm pending reservations that are due
+
+        Returns:
+            Number of reservations per resulting status
+        """
+        ids: List[str] = [
+            row.id for row in db.query(ClassReservation.id)
+            .filter(
+                ClassReservation.status == ClassReservationStatusDB.PENDING,
+                ClassReservation.next_attempt_at <= datetime.utcnow()
+            )
+            .order_by(ClassReservation.next_attempt_at)
+            .limit(limit)
+        ]
+        counts: Dict[str, int] = {}
+        for reservation_id in ids:
+            reservation = await self.confirm(db, reservation_id)
+            if reservation is not None:
+                counts[reservation.status.value] = counts.get(reservation.status.value, 0) + 1
+        if counts:
+            logger.info(f"Processed class reservations: {counts}")
+        return counts
+
+    async def confirm_in_background(self, reservation_id: str):
+        """Background task right after a booking request"""
+        db = SessionLocal()
+        try:
+            await self.confirm(db, reservation_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to confirm class reservation {reservation_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+# Global booking service instance
+booking_service = BookingService()
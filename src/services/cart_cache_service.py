@@ -0,0 +1,209 @@
+"""
+G3 CrossFit WODIFY Automation - Cart Cache Service
+
+Per-user shopping cart cache for reads. Carts are cached in Redis
+(REDIS_HOST), so all workers share one cache; without Redis, or while it
+is unreachable, carts are read from the database directly.
+
+Writes always go to the database first and then drop the cached cart, so
+an acknowledged change is never held only in the cache. Every cart item
+carries a version (CartItem.version): clients send the version they last
+saw, and the quantity is only written if the row still has it, so a stale
+tab on any worker gets a 409 instead of overwriting a newer quantity.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import update
+from sqlalchemy.orm import Session, joinedload
+
+from config.settings import settings
+from src.models.database import CartItem, Product
+
+
+class CartVersionConflictError(Exception):
+    """Raised when a cart item was changed since the client last read it"""
+
+    def __init__(self, current_version: int):
+        self.current_version = current_version
+        super().__init__(f"Warenkorb-Item wurde zwischenzeitlich geändert (Version {current_version})")
+
+
+class InMemoryCartCacheBackend:
+    """Process-local cart cache with per-entry expiry (single process only, e.g. tests)"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Any] = {}
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        cached = self._entries.get(user_id)
+        if cached is None:
+            return None
+        expires_at, entry = cached
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        return entry
+
+    async def set(self, user_id: str, entry: Dict[str, Any]):
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, entry)
+
+    async def delete(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+
+class RedisCartCacheBackend:
+    """Cart cache shared by all workers"""
+
+    def __init__(self, ttl_seconds: int):
+        import redis.asyncio as redis
+
+        self.ttl_seconds = ttl_seconds
+        self._redis = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            password=settings.redis_password
+        )
+
+    def _key(self, user_id: str) -> str:
+        return f"g3:cart:{user_id}"
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._key(user_id))
+        return json.loads(raw) if raw else None
+
+    async def set(self, user_id: str, entry: Dict[str, Any]):
+        await self._redis.set(self._key(user_id), json.dumps(entry), ex=self.ttl_seconds)
+
+    async def delete(self, user_id: str):
+        await self._redis.delete(self._key(user_id))
+
+
+class CartCacheService:
+    """Service for cached cart reads and version-checked quantity writes"""
+
+    def __init__(self, backend=None):
+        if backend is None and settings.redis_host:
+            backend = RedisCartCacheBackend(settings.cart_cache_ttl_seconds)
+        # None: no shared cache, read the database directly
+        self.backend = backend
+
+    def _load(self, db: Session, user_id: str) -> Dict[str, Any]:
+        """Build a cache entry from the database"""
+        cart_items = db.query(CartItem).options(
+            joinedload(CartItem.product).load_only(Product.name, Product.images)
+        ).filter(CartItem.user_id == user_id).order_by(CartItem.created_at, CartItem.id).all()
+
+        items = {}
+        for item in cart_items:
+            images = item.product.images
+            items[item.id] = {
+                "product_id": item.product_id,
+                "product_name": item.product.name,
+                "product_image": images[0] if images else None,
+                "price": item.price_at_added,
+                "quantity": item.quantity,
+                "size": item.size,
+                "version": item.version,
+            }
+        return {"items": items}
+
+    async def _cached(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cached cart, None on a miss or if the cache is unreachable"""
+        try:
+            return await self.backend.get(user_id)
+        except Exception as e:
+            logger.warning(f"Cart cache unavailable, reading cart of user {user_id} from the database: {str(e)}")
+            return None
+
+    async def get_cart(self, db: Session, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the user's cart items (served from the cache after the first read)
+
+        Returns:
+            List of item dicts with id, product data, price, quantity, size and version
+        """
+        entry = await self._cached(user_id) if self.backend is not None else None
+        if entry is None:
+            entry = self._load(db, user_id)
+            if self.backend is not None:
+                try:
+                    await self.backend.set(user_id, entry)
+                except Exception as e:
+                    logger.warning(f"Could not cache cart of user {user_id}: {str(e)}")
+        return [{"id": item_id, **item} for item_id, item in entry["items"].items()]
+
+    async def update_quantity(
+        self,
+        db: Session,
+        user_id: str,
+        item_id: str,
+        quantity: int,
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Write an item's quantity to the database and drop the cached cart
+
+        The write is a single conditional UPDATE, so concurrent changes from
+        other workers can't interleave with it.
+
+        Args:
+            db: Database session
+            user_id: Cart owner
+            item_id: Cart item ID
+            quantity: New quantity
+            expected_version: Item version the client last saw (None = don't check)
+
+        Returns:
+            Dict with the item ID, quantity and new version, or None if the
+            item isn't in the user's cart
+
+        Raises:
+            CartVersionConflictError: If expected_version is outdated
+        """
+        conditions = [CartItem.id == item_id, CartItem.user_id == user_id]
+        if expected_version is not None:
+            conditions.append(CartItem.version == expected_version)
+        version = db.execute(
+            update(CartItem)
+            .where(*conditions)
+            .values(quantity=quantity, version=CartItem.version + 1, updated_at=datetime.now())
+            .returning(CartItem.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+        if version is None:
+            current_version = db.query(CartItem.version).filter(*conditions[:2]).scalar()
+            db.rollback()
+            if current_version is None:
+                return None
+            raise CartVersionConflictError(current_version)
+
+        db.commit()
+        await self.invalidate(user_id)
+        return {"id": item_id, "quantity": quantity, "version": version}
+
+    async def invalidate(self, user_id: str):
+        """
+        Drop the cached cart after a database write
+
+        If the cache is unreachable the entry can't be dropped; it expires
+        after CART_CACHE_TTL_SECONDS, and writes based on it fail the
+        version check meanwhile.
+        """
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(user_id)
+        except Exception as e:
+            logger.warning(f"Could not drop cached cart of user {user_id}: {str(e)}")
+
+
+# Global cart cache service instance
+cart_cache_service = CartCacheService()
@@ -0,0 +1,226 @@
+"""
+G3 CrossFit WODIFY Automation - Export Service
+
+Streaming exports of members, leads, email logs and webhook logs as
+NDJSON or CSV.
+
+Rows are read with a server-side cursor (`yield_per`) and encoded by a
+generator, so an export holds one batch of rows in memory no matter how
+many rows it has. Date range and type filters are part of the SQL query
+(backed by indexes on the date columns). The generator opens its own
+session and closes it when the export ends or the client disconnects.
+
+CSV cells that a spreadsheet would run as a formula (text starting with
+=, +, -, @, tab or carriage return, e.g. a lead's message) are prefixed
+with an apostrophe.
+"""
+
+import csv
+import enum
+import io
+import json
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.models.database import EmailLog, Lead, Member, WebhookLog
+
+# Rows per database fetch and per chunk handed to the response
+EXPORT_BATCH_SIZE = 1000
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """Table, columns and filter columns of one export"""
+    model: Any
+    columns: Tuple[str, ...]
+    date_column: str
+    type_column: str
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "members": ExportSpec(
+        Member,
+        (
+            "client_id", "first_name", "last_name", "email", "phone", "membership_id",
+            "membership_type", "membership_status", "monthly_price", "start_date", "end_date",
+            "is_first_membership", "referral_source", "welcome_email_sent", "welcome_email_sent_at",
+            "created_at", "updated_at",
+        ),
+        "created_at",
+        "membership_status",
+    ),
+    "leads": ExportSpec(
+        Lead,
+        (
+            "lead_id", "first_name", "last_name", "email", "phone", "lead_status", "interested_in",
+            "referral_source", "nurturing_state", "response_email_sent", "converted_to_member",
+            "converted_at", "opted_out", "opted_out_at", "created_at", "updated_at",
+        ),
+        "created_at",
+        "lead_status",
+    ),
+    "email_logs": ExportSpec(
+        EmailLog,
+        (
+            "id", "email_type", "recipient_email", "recipient_name", "sendgrid_message_id", "sent",
+            "sent_at", "error_message", "related_client_id", "related_lead_id", "created_at",
+        ),
+        "created_at",
+        "email_type",
+    ),
+    "webhook_logs": ExportSpec(
+        WebhookLog,
+        ("id", "event_type", "event_id", "tenant", "payload", "processed", "processed_at", "error_message", "received_at"),
+        "received_at",
+        "event_type",
+    ),
+}
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+# Leading characters that make Excel/LibreOffice treat a cell as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Signed numbers and phone numbers ("-1.5", "+49 170 1234-56") are safe to keep as they are
+PLAIN_NUMBER_PATTERN = re.compile(r"[+-]\d[\d\s().,/-]*")
+
+
+def _csv_value(value: Any) -> Any:
+    value = _value(value)
+    if (
+        isinstance(value, str)
+        and value.startswith(CSV_FORMULA_PREFIXES)
+        and not PLAIN_NUMBER_PATTERN.fullmatch(value)
+    ):
+        # Imports strip the apostrophe again (see import_service._parse_csv)
+        return "'" + value
+    return value
+
+
+class ExportService:
+    """Service for streaming table exports"""
+
+    def build_query(
+        self,
+        entity: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        type_filter: Optional[str] = None
+    ):
+        """
+        SELECT of the export columns, filtered and ordered by the date column
+
+        Args:
+            entity: members, leads, email_logs or webhook_logs
+            start: First day (inclusive)
+            end: Last day (inclusive)
+            type_filter: Value of the type column (membership status, lead
+                status, email type or event type)
+
+        Raises:
+            KeyError: If the entity can't be exported
+        """
+        spec = EXPORTS[entity]
+        model = spec.model
+        date_column = getattr(model, spec.date_column)
+        query = select(*(getattr(model, column) for column in spec.columns))
+        if start:
+            query = query.where(date_column >= datetime.combine(start, time.min))
+        if end:
+            query = query.where(date_column < datetime.combine(end + timedelta(days=1), time.min))
+        if type_filter:
+            type_column = getattr(model, spec.type_column)
+            enum_type = getattr(type_column.type, "enum_class", None)
+            if enum_type is not None:
+                # Matched case-insensitively; unknown values match nothing
+                # instead of failing the export
+                wanted = type_filter.lower()
+                matches = [member for member in enum_type if wanted in (member.value.lower(), member.name.lower())]
+                query = query.where(type_column.in_(matches))
+            else:
+                query = query.where(type_column == type_filter)
+        primary_key = model.__table__.primary_key.columns.values()[0]
+        return query.order_by(date_column, primary_key)
+
+    def iter_rows(self, db: Session, query) -> Iterator[List[tuple]]:
+        """Batches of rows from a server-side cursor"""
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield partition
+
+    def _encode_ndjson(self, columns: Tuple[str, ...]) -> Callable[[List[tuple]], str]:
+        def encode(rows: List[tuple]) -> str:
+            return "".join(
+                json.dumps(dict(zip(columns, map(_value, row))), ensure_ascii=False) + "\n"
+                for row in rows
+            )
+        return encode
+
+    def _encode_csv(self, columns: Tuple[str, ...]) -> Callable[[List[tuple]], str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def encode(rows: List[tuple]) -> str:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            return buffer.getvalue()
+        return encode
+
+    def stream(
+        self,
+        entity: str,
+        export_format: str = "ndjson",
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        type_filter: Optional[str] = None,
+        session_factory: Optional[Callable[[], Session]] = None
+    ) -> Iterator[str]:
+        """
+        Generate the export in chunks of EXPORT_BATCH_SIZE rows
+
+        The query is built before the generator is returned, so an unknown
+        entity raises KeyError right away.
+        """
+        query = self.build_query(entity, start, end, type_filter)
+        columns = EXPORTS[entity].columns
+        if export_format == "csv":
+            encode = self._encode_csv(columns)
+        else:
+            encode = self._encode_ndjson(columns)
+
+        def generate() -> Iterator[str]:
+            if export_format == "csv":
+                header = io.StringIO()
+                csv.writer(header).writerow(columns)
+                yield header.getvalue()
+            db = (session_factory or SessionLocal)()
+            try:
+                for rows in self.iter_rows(db, query):
+                    yield encode(rows)
+            finally:
+                db.close()
+
+        return generate()
+
+
+# Global export service instance
+export_service = ExportService()
@@ -0,0 +1,460 @@
+"""
+G3 CrossFit WODIFY Automation - Import Service
+
+Bulk import of members and leads from CSV or NDJSON files, e.g. when the
+members of another location are moved into this installation.
+
+The file is parsed as a stream and handled in batches of
+IMPORT_BATCH_SIZE rows. A batch is validated column by column (one
+compiled e-mail pattern, enum lookup tables) instead of a pydantic model
+per row, deduplicated on client_id/lead_id and e-mail (within the file
+and against the database, with one query per batch) and written with one
+bulk INSERT and one bulk UPDATE in its own transaction. Rows that can't
+be imported end up in the rejection report with their line number and
+reason; the rest of the file is imported anyway.
+
+Email automation (welcome email, lead response and nurturing sequence)
+is only triggered for newly created records and can be skipped.
+"""
+
+import csv
+import enum
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.models.database import Lead, LeadNurturingStateDB, LeadStatusDB, Member, MembershipStatusDB
+from src.services.export_service import CSV_FORMULA_PREFIXES
+
+# Rows per validation batch and per transaction
+IMPORT_BATCH_SIZE = 1000
+
+# Uploads to the import endpoint larger than this are spooled to disk
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+_TRUE = {"1", "true", "yes", "ja", "y", "j", "x"}
+_FALSE = {"0", "false", "no", "nein", "n", ""}
+
+
+def _text(value: Any) -> str:
+    return str(value).strip()
+
+
+def _email(value: Any) -> str:
+    email = str(value).strip().lower()
+    if not EMAIL_PATTERN.fullmatch(email):
+        raise ValueError("keine gültige E-Mail-Adresse")
+    return email
+
+
+def _float(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return float(str(value).strip().replace(",", "."))
+
+
+def _bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError("kein Wahrheitswert")
+
+
+def _datetime(value: Any) -> datetime:
+    text = str(value).strip()
+    if re.fullmatch(r"\d{1,2}\.\d{1,2}\.\d{4}", text):
+        return datetime.strptime(text, "%d.%m.%Y")
+    return datetime.fromisoformat(text.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _enum(enum_type: type) -> Callable[[Any], enum.Enum]:
+    """Converter accepting value or name of the enum, in any case"""
+    lookup = {}
+    for member in enum_type:
+        lookup[member.value.lower()] = member
+        lookup[member.name.lower()] = member
+
+    def convert(value: Any) -> enum.Enum:
+        try:
+            return lookup[str(value).strip().lower()]
+        except KeyError:
+            raise ValueError(f"erlaubt: {', '.join(member.value for member in enum_type)}")
+    return convert
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """Table, key and columns of one import"""
+    model: Any
+    key: str
+    required: Tuple[str, ...]
+    optional: Tuple[str, ...]
+    converters: Dict[str, Callable[[Any], Any]]
+
+
+IMPORTS: Dict[str, ImportSpec] = {
+    "members": ImportSpec(
+        Member,
+        "client_id",
+        (
+            "client_id", "first_name", "last_name", "email", "membership_id", "membership_type",
+            "membership_status", "monthly_price", "start_date",
+        ),
+        ("phone", "end_date", "is_first_membership", "referral_source", "emergency_contact"),
+        {
+            "email": _email,
+            "membership_status": _enum(MembershipStatusDB),
+            "monthly_price": _float,
+            "start_date": _datetime,
+            "end_date": _datetime,
+            "is_first_membership": _bool,
+        },
+    ),
+    "leads": ImportSpec(
+        Lead,
+        "lead_id",
+        ("lead_id", "first_name", "last_name", "email"),
+        ("phone", "lead_status", "interested_in", "message", "referral_source"),
+        {
+            "email": _email,
+            "lead_status": _enum(LeadStatusDB),
+        },
+    ),
+}
+
+
+@dataclass
+class Rejection:
+    """A row that wasn't imported"""
+    line: int
+    key: Optional[str]
+    reason: str
+
+
+@dataclass
+class ImportResult:
+    """Outcome of one import"""
+    entity: str
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    converted_leads: int = 0
+    rejections: List[Rejection] = field(default_factory=list)
+    automation: bool = True
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entity": self.entity,
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "rejected": len(self.rejections),
+            "converted_leads": self.converted_leads,
+            "automation": self.automation,
+            "seconds": round(self.seconds, 3),
+            "rejections": [rejection.__dict__ for rejection in self.rejections],
+        }
+
+
+def write_report(result: ImportResult, report: TextIO):
+    """Write the rejections as CSV (line, key, reason)"""
+    writer = csv.writer(report)
+    writer.writerow(("line", "key", "reason"))
+    writer.writerows((rejection.line, rejection.key, rejection.reason) for rejection in result.rejections)
+
+
+Row = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def _csv_cell(value: Optional[str]) -> Optional[str]:
+    # Undo the apostrophe CSV exports put in front of formula-like values
+    if value and value.startswith("'") and value[1:].startswith(CSV_FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _parse_csv(stream: TextIO) -> Iterator[Row]:
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        row.pop(None, None)
+        yield reader.line_num, {name: _csv_cell(value) for name, value in row.items()}, None
+
+
+def _parse_ndjson(stream: TextIO) -> Iterator[Row]:
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, None, "Ungültiges JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "Kein JSON-Objekt"
+            continue
+        yield line, {str(name).strip().lower(): value for name, value in row.items()}, None
+
+
+class ImportService:
+    """Service for bulk imports of members and leads"""
+
+    def _validate(
+        self,
+        spec: ImportSpec,
+        batch: List[Tuple[int, Dict[str, Any]]],
+        result: ImportResult
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Convert the batch column by column, reject rows with invalid values"""
+        errors: List[Optional[str]] = [None] * len(batch)
+        records: List[Dict[str, Any]] = [{} for _ in batch]
+        for column in spec.required + spec.optional:
+            convert = spec.converters.get(column, _text)
+            required = column in spec.required
+            for i, (_, row) in enumerate(batch):
+                if errors[i] is not None:
+                    continue
+                value = row.get(column)
+                if value is None or (isinstance(value, str) and not value.strip()):
+                    if required:
+                        errors[i] = f"{column} fehlt"
+                    elif column in row and spec.model.__table__.c[column].nullable:
+                        # An empty optional column clears the value
+                        records[i][column] = None
+                    continue
+                try:
+                    records[i][column] = convert(value)
+                except (TypeError, ValueError) as e:
+                    errors[i] = f"{column} ungültig ({value!r}): {str(e)}"
+
+        valid = []
+        for (line, row), record, error in zip(batch, records, errors):
+            if error is None:
+                valid.append((line, record))
+            else:
+                key = row.get(spec.key)
+                result.rejections.append(Rejection(line, str(key) if key is not None else None, error))
+        return valid
+
+    def _deduplicate(
+        self,
+        db: Session,
+        spec: ImportSpec,
+        records: List[Tuple[int, Dict[str, Any]]],
+        seen_keys: Dict[str, int],
+        seen_emails: Dict[str, Tuple[str, int]],
+        result: ImportResult
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Split the batch into new and existing records
+
+        A key or e-mail that appeared earlier in the file, or an e-mail that
+        belongs to another record in the database, is rejected.
+        """
+        model = spec.model
+        key_column = getattr(model, spec.key)
+        keys = [record[spec.key] for _, record in records]
+        emails = [record["email"] for _, record in records]
+        existing: Set[str] = {row[0] for row in db.query(key_column).filter(key_column.in_(keys))}
+        owners: Dict[str, Set[str]] = {}
+        for email, key in db.query(model.email, key_column).filter(model.email.in_(emails)):
+            owners.setdefault(email, set()).add(key)
+
+        inserts, updates = [], []
+        for line, record in records:
+            key, email = record[spec.key], record["email"]
+            if key in seen_keys:
+                reason = f"{spec.key} doppelt in der Datei (Zeile {seen_keys[key]})"
+            elif email in seen_emails:
+                reason = f"E-Mail doppelt in der Datei (Zeile {seen_emails[email][1]}, {spec.key} {seen_emails[email][0]})"
+            elif email in owners and key not in owners[email]:
+                reason = f"E-Mail gehört bereits zu {spec.key} {', '.join(sorted(owners[email]))}"
+            else:
+                reason = None
+            if reason:
+                result.rejections.append(Rejection(line, key, reason))
+                continue
+            seen_keys[key] = line
+            seen_emails[email] = (key, line)
+            (updates if key in existing else inserts).append(record)
+        return inserts, updates
+
+    def _convert_leads(self, db: Session, emails: List[str]) -> List[str]:
+        """Mark leads of imported members as converted (see mark_lead_as_converted)"""
+        lead_ids = [
+            row.lead_id for row in db.query(Lead.lead_id).filter(
+                Lead.email.in_(emails), Lead.converted_to_member.isnot(True)
+            )
+        ]
+        if lead_ids:
+            now = datetime.utcnow()
+            db.query(Lead).filter(Lead.lead_id.in_(lead_ids)).update({
+                Lead.nurturing_state: LeadNurturingStateDB.CONVERTED,
+                Lead.lead_status: LeadStatusDB.CONVERTED,
+                Lead.converted_to_member: True,
+                Lead.converted_at: now,
+                Lead.updated_at: now,
+            }, synchronize_session=False)
+        return lead_ids
+
+    def _write(
+        self,
+        db: Session,
+        spec: ImportSpec,
+        inserts: List[Dict[str, Any]],
+        updates: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Bulk INSERT/UPDATE one batch and commit; returns converted lead IDs"""
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(spec.model, inserts)
+        db.bulk_update_mappings(spec.model, [{**record, "updated_at": now} for record in updates])
+        converted = []
+        if spec.model is Member:
+            converted = self._convert_leads(db, [record["email"] for record in inserts + updates])
+        db.commit()
+        return converted
+
+    def _automation(self):
+        # Imported lazily: the automation service starts the scheduler
+        from src.services.automation_service import automation_service
+        return automation_service
+
+    def _trigger_automation(self, entity: str, created: List[Dict[str, Any]], converted_lead_ids: List[str]):
+        try:
+            if entity == "members":
+                self._automation().process_imported_members(created, converted_lead_ids)
+            else:
+                self._automation().process_imported_leads(created)
+        except Exception as e:
+            logger.error(f"Error triggering automation for imported {entity}: {str(e)}")
+
+    def _process(
+        self,
+        db: Session,
+        spec: ImportSpec,
+        batch: List[Tuple[int, Dict[str, Any]]],
+        seen_keys: Dict[str, int],
+        seen_emails: Dict[str, Tuple[str, int]],
+        result: ImportResult
+    ):
+        records = self._validate(spec, batch, result)
+        if not records:
+            return
+        inserts, updates = self._deduplicate(db, spec, records, seen_keys, seen_emails, result)
+        lines = {id(record): line for line, record in records}
+        try:
+            converted = self._write(db, spec, inserts, updates)
+            written = [(record, True) for record in inserts] + [(record, False) for record in updates]
+        except IntegrityError:
+            # Someone else wrote one of the rows meanwhile: write row by row to
+            # find it and keep the rest
+            db.rollback()
+            converted, written = [], []
+            for record, created in [(record, True) for record in inserts] + [(record, False) for record in updates]:
+                try:
+                    converted += self._write(db, spec, [record] if created else [], [] if created else [record])
+                    written.append((record, created))
+                except IntegrityError as e:
+                    db.rollback()
+                    result.rejections.append(Rejection(
+                        lines[id(record)], record[spec.key], f"Datenbankfehler: {str(e.orig)}"
+                    ))
+
+        created_records = [record for record, created in written if created]
+        result.created += len(created_records)
+        result.updated += len(written) - len(created_records)
+        result.converted_leads += len(converted)
+        if result.automation and (created_records or converted):
+            self._trigger_automation(result.entity, created_records, converted)
+
+    def import_rows(
+        self,
+        entity: str,
+        rows: Iterable[Row],
+        skip_automation: bool = False,
+        session_factory: Optional[Callable[[], Session]] = None
+    ) -> ImportResult:
+        """
+        Import parsed rows in batches of IMPORT_BATCH_SIZE
+
+        Raises:
+            KeyError: If the entity can't be imported
+        """
+        spec = IMPORTS[entity]
+        result = ImportResult(entity=entity, automation=not skip_automation)
+        started = time.perf_counter()
+        seen_keys: Dict[str, int] = {}
+        seen_emails: Dict[str, Tuple[str, int]] = {}
+        db = (session_factory or SessionLocal)()
+        try:
+            batch = []
+            for line, row, error in rows:
+                result.rows += 1
+                if error:
+                    result.rejections.append(Rejection(line, None, error))
+                    continue
+                batch.append((line, row))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._process(db, spec, batch, seen_keys, seen_emails, result)
+                    batch = []
+            if batch:
+                self._process(db, spec, batch, seen_keys, seen_emails, result)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        result.rejections.sort(key=lambda rejection: rejection.line)
+        result.seconds = time.perf_counter() - started
+        logger.info(
+            f"Imported {entity}: {result.rows} rows, {result.created} created, {result.updated} updated, "
+            f"{len(result.rejections)} rejected ({result.seconds:.2f}s)"
+        )
+        return result
+
+    def import_file(
+        self,
+        entity: str,
+        stream: TextIO,
+        import_format: str = "csv",
+        skip_automation: bool = False,
+        session_factory: Optional[Callable[[], Session]] = None
+    ) -> ImportResult:
+        """
+        Import a CSV (with header row) or NDJSON file
+
+        Column names are those of the members/leads tables (case-insensitive);
+        unknown columns are ignored.
+
+        Args:
+            entity: members or leads
+            stream: Text stream of the file
+            import_format: csv or ndjson
+            skip_automation: Don't schedule any emails for new records
+
+        Raises:
+            KeyError: If the entity can't be imported
+        """
+        parse = _parse_ndjson if import_format == "ndjson" else _parse_csv
+        return self.import_rows(entity, parse(stream), skip_automation, session_factory)
+
+
+# Global import service instance
+import_service = ImportService()
@@ -0,0 +1,202 @@
+"""
+G3 CrossFit WODIFY Automation - Intent Service
+
+Rule-based intent classification for the phone assistant and chatbot
+fallback (no LLM provider configured, or the provider failed).
+
+Intents are defined as data in INTENTS: weighted keywords and the answer.
+All keywords are compiled into one regex trie, so an utterance is scanned
+once regardless of the number of keywords. Keywords only match whole
+words ("wo" doesn't match inside "Woche"); a trailing "*" matches any
+word ending ("öffnungszeit*" also matches "Öffnungszeiten"). Each intent
+scores the sum of the weights of its distinct keywords found, and the
+best intent wins if it reaches MIN_INTENT_SCORE.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# Minimum score for an intent to be used instead of the default answer
+MIN_INTENT_SCORE = 1.0
+
+DEFAULT_RESPONSE = (
+    "Vielen Dank für Ihre Anfrage! Gerne helfe ich Ihnen weiter. Möchten Sie mehr über unsere "
+    "Mitgliedschaften, Kurse oder ein kostenloses Probetraining erfahren?"
+)
+
+# In priority order (earlier intents win ties)
+INTENTS: List[Dict[str, Any]] = [
+    {
+        "name": "greeting_call_start",
+        "keywords": {"anruf beginnt": 5},
+        "response": "G3 CrossFit, mein Name ist Alex. Wie kann ich Ihnen helfen?",
+    },
+    {
+        "name": "trial_class",
+        "keywords": {
+            "probetraining*": 3, "probestunde*": 3, "schnuppertraining*": 3, "kostenloses training": 3,
+            "schnupper*": 2, "trial": 2, "ausprobieren": 2, "kostenlos testen": 2, "erstes mal": 1.5,
+            "testen": 1, "vorbeikommen": 1, "reinschnuppern": 2,
+        },
+        "response": (
+            "Gerne können Sie ein kostenloses Probetraining bei uns buchen! Wir bieten flexible Termine von "
+            "Montag bis Sonntag. Möchten Sie direkt einen Termin vereinbaren oder haben Sie Fragen zu "
+            "unseren Kursen?"
+        ),
+    },
+    {
+        "name": "pricing",
+        "keywords": {
+            "preis*": 2, "kostet": 2, "kosten": 2, "beitrag*": 2, "monatsbeitrag*": 2, "tarif*": 2,
+            "gebühr*": 2, "aufnahmegebühr*": 2, "rabatt*": 2, "studentenrabatt*": 2, "teuer": 2,
+            "mitgliedschaft*": 1.5, "wie viel": 1.5, "wieviel": 1.5, "vertrag*": 1.5, "abo": 1.5,
+            "günstig*": 1.5, "kündig*": 1.5, "euro": 1, "bezahlen": 1,
+        },
+        "response": (
+            "Wir haben verschiedene Mitgliedschaftsoptionen: Starter für 89€, Unlimited für 139€ und Premium "
+            "für 189€ pro Monat. Alle Mitgliedschaften beinhalten ein kostenloses Probetraining. Welche "
+            "Option interessiert Sie am meisten?"
+        ),
+    },
+    {
+        "name": "location",
+        "keywords": {
+            "adresse": 3, "anfahrt": 3, "wegbeschreibung": 3, "standort*": 2, "parkpl*": 2, "parken": 2,
+            "wie komme ich": 2, "hinkommen": 2, "hinfinden": 2, "finde ich euch": 2, "wo": 1, "wohin": 1,
+            "u bahn": 1.5, "ubahn": 1.5, "s bahn": 1.5, "bus": 1, "erreichbar": 1, "straße": 1,
+        },
+        "response": (
+            "Wir befinden uns in der Musterstraße 123, 10115 Berlin. Wir haben kostenlose Parkplätze und "
+            "sind sehr gut mit den öffentlichen Verkehrsmitteln erreichbar. Möchten Sie eine "
+            "Wegbeschreibung?"
+        ),
+    },
+    {
+        "name": "opening_hours",
+        "keywords": {
+            "öffnungszeit*": 3, "wie viel uhr": 2.5, "geöffnet": 2, "offen": 1.5, "uhrzeit*": 1.5,
+            "feiertag*": 1.5, "schließ*": 1.5, "wann": 1, "uhr": 1, "wochenende": 1, "samstag*": 1, "sonntag*": 1,
+            "morgens": 1, "abends": 1, "früh": 1, "spät": 1, "heute": 0.5,
+        },
+        "response": (
+            "Unsere Öffnungszeiten sind: Montag bis Freitag von 6:00 bis 21:00 Uhr, Samstag von 8:00 bis "
+            "18:00 Uhr und Sonntag von 9:00 bis 16:00 Uhr. Wann passt es Ihnen am besten für ein "
+            "Probetraining?"
+        ),
+    },
+    {
+        "name": "classes",
+        "keywords": {
+            "kursplan*": 3, "stundenplan*": 3, "trainingsstunde*": 2, "kurs*": 2, "klasse*": 2,
+            "weightlifting": 2, "gewichtheben": 2, "foundations": 2, "gymnastics": 2, "mobility": 2,
+            "yoga": 2, "anfänger*": 1.5, "einsteiger*": 1.5,
+            "wod": 1.5, "kinder*": 1.5, "training": 1, "trainingszeiten": 1, "workout*": 1, "level": 1,
+            "crossfit": 0.5,
+        },
+        "response": (
+            "Wir bieten verschiedene Kurse an: CrossFit Foundations für Anfänger, CrossFit Classes für alle "
+            "Level, Olympic Weightlifting und Strength & Conditioning. Alle Level sind willkommen! Welcher "
+            "Kurs interessiert Sie?"
+        ),
+    },
+    {
+        "name": "greeting",
+        "keywords": {"hallo": 1, "guten tag": 1, "guten morgen": 1, "guten abend": 1, "hi": 1, "moin": 1, "servus": 1},
+        "response": "G3 CrossFit, mein Name ist Alex. Wie kann ich Ihnen helfen?",
+    },
+]
+
+_UMLAUTS = str.maketrans({"ä": "a", "ö": "o", "ü": "u"})
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_utterance(text: Optional[str]) -> str:
+    """Fold case, umlauts, ß and punctuation (applied to keywords and utterances alike)"""
+    text = unicodedata.normalize("NFKC", text or "").casefold().translate(_UMLAUTS)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """
+    Regex alternation of words, factored into a trie
+
+    Shared prefixes are matched once, and longer words are tried before
+    their prefixes.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{group})?"
+        return group
+
+    return render(trie)
+
+
+class IntentMatcher:
+    """Compiled keyword automaton over an intent table"""
+
+    def __init__(self, intents: List[Dict[str, Any]], min_score: float = MIN_INTENT_SCORE):
+        self.intents = intents
+        self.min_score = min_score
+        # keyword -> [(intent index, weight)]
+        self._exact: Dict[str, List[tuple]] = {}
+        self._prefix: Dict[str, List[tuple]] = {}
+        for index, intent in enumerate(intents):
+            for keyword, weight in intent["keywords"].items():
+                table = self._prefix if keyword.endswith("*") else self._exact
+                table.setdefault(normalize_utterance(keyword.rstrip("*")), []).append((index, weight))
+
+        alternatives = []
+        if self._exact:
+            alternatives.append(rf"(?P<exact>{trie_regex(self._exact)})\b")
+        if self._prefix:
+            alternatives.append(rf"(?P<prefix>{trie_regex(self._prefix)})\w*")
+        self._pattern = re.compile(rf"\b(?:{'|'.join(alternatives)})") if alternatives else None
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Score of every intent with at least one matching keyword"""
+        totals: Dict[int, float] = {}
+        if self._pattern is None:
+            return {}
+        seen = set()
+        for match in self._pattern.finditer(normalize_utterance(text)):
+            keyword = match.group("exact") if match.lastgroup == "exact" else match.group("prefix")
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            table = self._exact if match.lastgroup == "exact" else self._prefix
+            for index, weight in table[keyword]:
+                totals[index] = totals.get(index, 0.0) + weight
+        return {self.intents[index]["name"]: score for index, score in sorted(totals.items())}
+
+    def classify(self, text: str) -> Optional[str]:
+        """Name of the best intent, or None if no intent reaches the minimum score"""
+        best_name, best_score = None, self.min_score
+        for name, score in self.scores(text).items():
+            # Intents are in priority order, so ties keep the earlier one
+            if score > best_score or (best_name is None and score >= best_score):
+                best_name, best_score = name, score
+        return best_name
+
+    def respond(self, text: str) -> str:
+        """Answer of the best intent, or the default answer"""
+        name = self.classify(text)
+        if name is None:
+            return DEFAULT_RESPONSE
+        return next(intent["response"] for intent in self.intents if intent["name"] == name)
+
+
+# Global intent matcher instance
+intent_matcher = IntentMatcher(INTENTS)
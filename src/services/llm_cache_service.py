@@ -0,0 +1,256 @@
+"""
+G3 CrossFit WODIFY Automation - LLM Response Cache
+
+Two-tier in-process cache for LLM answers. The phone assistant and the
+chatbot mostly get the same few questions (opening hours, prices, trial
+class), so answers are reused instead of paying for another completion.
+
+1. Exact tier: normalized prompt (case, punctuation and whitespace folded)
+   within the same scope (model + system context).
+2. Semantic tier (optional, needs NumPy): prompts are embedded locally as
+   hashed word and character trigram vectors and compared by cosine
+   similarity against all cached prompts of the scope with one
+   matrix-vector product. It catches rephrasings of the same question; a
+   real embedding model can be plugged in through `embedder`.
+
+Entries expire after LLM_CACHE_TTL_SECONDS and the least recently used
+entry is evicted when LLM_CACHE_MAX_ENTRIES is reached. Each worker has its
+own cache.
+"""
+
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config.settings import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - semantic tier is optional
+    np = None
+
+
+# Dimension of the hashed prompt vectors
+EMBEDDING_DIMENSIONS = 1024
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: Optional[str]) -> str:
+    """Fold case, punctuation and whitespace so trivial variants share a cache key"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+def hashed_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS):
+    """
+    Unit vector of hashed word and character trigram counts of a normalized prompt
+
+    Cheap (a few microseconds) and good enough to match rephrasings of a
+    short question; it knows nothing about synonyms.
+    """
+    words = text.split()
+    padded = f" {text} "
+    features = words + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    buckets = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) % dimensions for feature in features),
+        dtype=np.int64,
+        count=len(features)
+    )
+    vector = np.bincount(buckets, minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class CacheEntry:
+    """One cached answer"""
+
+    __slots__ = ("key", "prompt", "response", "expires_at", "hits", "row")
+
+    def __init__(self, key: Tuple[str, str], prompt: str, response: str, expires_at: float):
+        self.key = key
+        self.prompt = prompt
+        self.response = response
+        self.expires_at = expires_at
+        self.hits = 0
+        # Row of the prompt vector in the semantic index
+        self.row: Optional[int] = None
+
+
+class LLMResponseCache:
+    """Exact and semantic cache for LLM responses"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        semantic: Optional[bool] = None,
+        semantic_threshold: Optional[float] = None,
+        embedder: Optional[Callable[[str], Any]] = None
+    ):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.llm_cache_ttl_seconds
+        self.max_entries = max_entries if max_entries is not None else settings.llm_cache_max_entries
+        self.semantic_threshold = (
+            semantic_threshold if semantic_threshold is not None else settings.llm_cache_semantic_threshold
+        )
+        self.semantic = settings.llm_cache_semantic if semantic is None else semantic
+        if self.semantic and np is None:
+            logger.warning("NumPy not installed, semantic LLM cache disabled")
+            self.semantic = False
+        self.embedder = embedder or hashed_embedding
+
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+        # Semantic index: one row per entry, scope -1 marks a free row
+        self._scope_ids: Dict[str, List[int]] = {}  # scope -> [id, entry count]
+        self._next_scope_id = 0
+        self._vectors = None
+        self._row_scopes = None
+        self._row_expires = None
+        self._row_entries: List[Optional[CacheEntry]] = []
+        self._free_rows: List[int] = []
+
+    @staticmethod
+    def scope(model: str, context: Optional[str]) -> str:
+        """Answers are only shared between requests with the same model and system context"""
+        return f"{model}\x00{normalize_prompt(context)}"
+
+    def get(self, prompt: str, context: Optional[str], model: str) -> Optional[str]:
+        """
+        Look up a cached answer
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        scope = self.scope(model, context)
+        normalized = normalize_prompt(prompt)
+        now = time.monotonic()
+
+        entry = self._entries.get((scope, normalized))
+        if entry is not None and entry.expires_at <= now:
+            self._remove(entry)
+            self._stats["expirations"] += 1
+            entry = None
+        if entry is not None:
+            self._stats["exact_hits"] += 1
+        elif self.semantic:
+            entry = self._nearest(scope, normalized, now)
+            if entry is not None:
+                self._stats["semantic_hits"] += 1
+
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        entry.hits += 1
+        self._entries.move_to_end(entry.key)
+        return entry.response
+
+    def _nearest(self, scope: str, normalized: str, now: float) -> Optional[CacheEntry]:
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None or self._vectors is None:
+            return None
+        scores = self._vectors @ self.embedder(normalized)
+        scores[(self._row_scopes != scope_id[0]) | (self._row_expires <= now)] = -1.0
+        row = int(np.argmax(scores))
+        if scores[row] < self.semantic_threshold:
+            return None
+        return self._row_entries[row]
+
+    def put(self, prompt: str, context: Optional[str], model: str, response: str):
+        """Cache an answer of the provider (never cache fallbacks)"""
+        if self.max_entries <= 0:
+            return
+        scope = self.scope(model, context)
+        normalized = normalize_prompt(prompt)
+        key = (scope, normalized)
+
+        existing = self._entries.get(key)
+        if existing is not None:
+            self._remove(existing)
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries.values())))
+            self._stats["evictions"] += 1
+
+        entry = CacheEntry(key, prompt, response, time.monotonic() + self.ttl_seconds)
+        self._entries[key] = entry
+        if self.semantic:
+            self._index(entry, scope, normalized)
+
+    def _index(self, entry: CacheEntry, scope: str, normalized: str):
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, EMBEDDING_DIMENSIONS), dtype=np.float32)
+            self._row_scopes = np.full(self.max_entries, -1, dtype=np.int64)
+            self._row_expires = np.zeros(self.max_entries, dtype=np.float64)
+            self._row_entries = [None] * self.max_entries
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+
+        scope_id = self._scope_ids.get(scope)
+        if scope_id is None:
+            scope_id = self._scope_ids[scope] = [self._next_scope_id, 0]
+            self._next_scope_id += 1
+        scope_id[1] += 1
+
+        row = self._free_rows.pop()
+        self._vectors[row] = self.embedder(normalized)
+        self._row_scopes[row] = scope_id[0]
+        self._row_expires[row] = entry.expires_at
+        self._row_entries[row] = entry
+        entry.row = row
+
+    def _remove(self, entry: CacheEntry):
+        del self._entries[entry.key]
+        if entry.row is None:
+            return
+        self._row_scopes[entry.row] = -1
+        self._row_entries[entry.row] = None
+        self._free_rows.append(entry.row)
+        entry.row = None
+
+        scope_id = self._scope_ids[entry.key[0]]
+        scope_id[1] -= 1
+        if not scope_id[1]:
+            del self._scope_ids[entry.key[0]]
+
+    def clear(self):
+        """Drop all entries (statistics are kept)"""
+        for entry in list(self._entries.values()):
+            self._remove(entry)
+
+    def report(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Hit rate and the most used entries
+
+        Args:
+            top: Number of entries to list, by hit count
+
+        Returns:
+            Dict with counters, hit_rate and top_entries
+        """
+        hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+        lookups = hits + self._stats["misses"]
+        now = time.monotonic()
+        top_entries = sorted(self._entries.values(), key=lambda entry: entry.hits, reverse=True)[:top]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic": self.semantic,
+            "lookups": lookups,
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "top_entries": [
+                {
+                    "prompt": entry.prompt[:200],
+                    "hits": entry.hits,
+                    "expires_in_seconds": round(max(0.0, entry.expires_at - now)),
+                }
+                for entry in top_entries
+            ],
+        }
@@ -1,11 +1,50 @@
 """
 LLM Service for AI-powered conversations
 Supports OpenAI and Anthropic Claude
+
+Both providers are called through long-lived async clients (created on
+first use) with a pooled HTTP connection per provider, so completions
+never block the event loop and don't pay a TLS handshake per request.
+Requests are limited per provider (LLM_MAX_CONCURRENCY), bounded by
+LLM_TIMEOUT_SECONDS including time spent waiting for a slot, and
+cancelled when the HTTP client that asked for them disconnects.
+
+Answers to prompts without conversation history are cached (exact and
+optionally semantic match, see LLMResponseCache), so repeated questions
+don't cost another completion.
+
+stream_response() yields the completion as text deltas while the provider
+generates it. The stream is pulled chunk by chunk, so a slow reader slows
+down reading from the provider instead of buffering the whole answer.
+
+A static_context (see prompt_service.ASSISTANT_CONTEXT) is sent as the
+first, unchanged part of the system prompt so providers can serve it from
+their prompt cache (automatic for OpenAI, a cache_control breakpoint for
+Anthropic). Tokens in/out of every provider call are recorded with
+llm_usage_service.
 """
 
-from typing import Optional, List, Dict
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, List, Dict
+
+import httpx
 from loguru import logger
 from config.settings import settings
+from src.services.intent_service import intent_matcher
+from src.services.llm_cache_service import LLMResponseCache
+from src.services.llm_usage_service import llm_usage_service
+from src.services.prompt_service import count_message_tokens, count_tokens
+
+
+DEFAULT_SYSTEM_MESSAGE = "Du bist ein freundlicher und hilfsbereiter Assistent für G3 CrossFit in Berlin."
+
+# How often a running completion checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the requesting client disconnected before the completion finished"""
 
 
 class LLMService:
@@ -16,12 +55,184 @@ class LLMService:
         self.model = settings.llm_model
         self.temperature = settings.llm_temperature
         self.max_tokens = settings.llm_max_tokens
+        self._clients: Dict[str, Any] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.cache = LLMResponseCache()
+    
+    def _http_client(self) -> httpx.AsyncClient:
+        """Connection pool for one provider"""
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections
+            )
+        )
+    
+    def _get_openai_client(self):
+        client = self._clients.get("openai")
+        if client is None:
+            import openai
+            
+            client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=settings.llm_timeout_seconds,
+                max_retries=1,
+                http_client=self._http_client()
+            )
+            self._clients["openai"] = client
+        return client
+    
+    def _get_anthropic_client(self):
+        client = self._clients.get("anthropic")
+        if client is None:
+            import anthropic
+            
+            client = anthropic.AsyncAnthropic(
+                api_key=settings.anthropic_api_key,
+                base_url=settings.anthropic_base_url,
+                timeout=settings.llm_timeout_seconds,
+                max_retries=1,
+                http_client=self._http_client()
+            )
+            self._clients["anthropic"] = client
+        return client
+    
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+            self._semaphores[provider] = semaphore
+        return semaphore
+    
+    @staticmethod
+    def _system_text(static_context: Optional[str], context: Optional[str]) -> str:
+        """Whole system prompt, the static part first"""
+        return "\n\n".join(part for part in (static_context, context) if part) or DEFAULT_SYSTEM_MESSAGE
+    
+    @staticmethod
+    def _anthropic_system(static_context: Optional[str], context: Optional[str]) -> Any:
+        """System parameter; the static part ends with a prompt cache breakpoint"""
+        if not static_context:
+            return context or DEFAULT_SYSTEM_MESSAGE
+        blocks = [{"type": "text", "text": static_context, "cache_control": {"type": "ephemeral"}}]
+        if context:
+            blocks.append({"type": "text", "text": context})
+        return blocks
+    
+    @classmethod
+    def _openai_messages(
+        cls,
+        prompt: str,
+        context: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]],
+        static_context: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """System message with context, history, current prompt"""
+        messages = [{"role": "system", "content": cls._system_text(static_context, context)}]
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        return messages
+    
+    @staticmethod
+    def _anthropic_messages(
+        prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> List[Dict[str, str]]:
+        """History and current prompt (the system message is a separate parameter)"""
+        messages = []
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        return messages
+    
+    def _record_usage(
+        self,
+        provider: str,
+        usage: Any,
+        messages: List[Dict[str, str]],
+        system: Optional[str],
+        output: str
+    ):
+        """Record the usage reported by the provider, or count it locally if there is none"""
+        if usage is None:
+            input_tokens = count_message_tokens(messages) + (count_tokens(system) + 4 if system else 0)
+            llm_usage_service.record(provider, self.model, input_tokens, count_tokens(output), estimated=True)
+        elif provider == "openai":
+            details = getattr(usage, "prompt_tokens_details", None)
+            llm_usage_service.record(
+                provider, self.model, usage.prompt_tokens, usage.completion_tokens,
+                cached_input_tokens=getattr(details, "cached_tokens", None) or 0
+            )
+        else:
+            cached = getattr(usage, "cache_read_input_tokens", None) or 0
+            written = getattr(usage, "cache_creation_input_tokens", None) or 0
+            llm_usage_service.record(
+                provider, self.model, usage.input_tokens + cached + written, usage.output_tokens,
+                cached_input_tokens=cached
+            )
+    
+    async def _call(
+        self,
+        provider: str,
+        request: Callable[[], Awaitable[str]],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> str:
+        """
+        Run a provider request within the concurrency limit and timeout
+        
+        Args:
+            provider: Provider name (one semaphore per provider)
+            request: Coroutine factory performing the API call
+            is_disconnected: Returns True once the requesting client is gone
+                (e.g. starlette's Request.is_disconnected)
+            
+        Raises:
+            asyncio.TimeoutError: If the request (incl. queueing) took too long
+            ClientDisconnectedError: If the client disconnected; the API
+                request is cancelled and its connection closed
+        """
+        async def limited() -> str:
+            async with self._semaphore(provider):
+                return await request()
+        
+        task = asyncio.ensure_future(asyncio.wait_for(limited(), timeout=settings.llm_timeout_seconds))
+        if is_disconnected is None:
+            return await task
+        
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    return task.result()
+                if await is_disconnected():
+                    task.cancel()
+                    raise ClientDisconnectedError()
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+    
+    async def aclose(self):
+        """Close the provider connection pools (application shutdown)"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.close()
         
     async def generate_response(
         self, 
         prompt: str, 
         context: Optional[str] = None,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        static_context: Optional[str] = None
     ) -> str:
         """
         Generate a response using the configured LLM provider
@@ -30,139 +241,323 @@ class LLMService:
             prompt: The user's prompt/question
             context: Additional context (e.g., system instructions)
             conversation_history: Previous conversation messages
+            is_disconnected: Disconnect check of the HTTP request; the
+                completion is cancelled once it returns True
+            static_context: Constant system prompt prefix (provider prompt caching)
             
         Returns:
             Generated response string
+            
+        Raises:
+            ClientDisconnectedError: If the client disconnected
+        """
+        cacheable = not conversation_history
+        system = self._system_text(static_context, context)
+        if cacheable:
+            cached = self.cache.get(prompt, system, self.model)
+            if cached is not None:
+                return cached
+        
+        response = await self.complete(
+            prompt, context, conversation_history, is_disconnected=is_disconnected, static_context=static_context
+        )
+        if response is None:
+            return self._generate_fallback(prompt)
+        if cacheable:
+            self.cache.put(prompt, system, self.model, response)
+        return response
+    
+    async def complete(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        max_tokens: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        static_context: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        One completion of the configured provider, without cache and fallback
+        
+        Args:
+            prompt: The user's prompt/question
+            context: Additional context (e.g., system instructions)
+            conversation_history: Previous conversation messages
+            max_tokens: Completion limit (defaults to LLM_MAX_TOKENS)
+            is_disconnected: Disconnect check of the HTTP request
+            static_context: Constant system prompt prefix (provider prompt caching)
+            
+        Returns:
+            Generated text, or None if no provider is available or it failed
+            
+        Raises:
+            ClientDisconnectedError: If the client disconnected
         """
         try:
             if self.provider == "openai":
-                return await self._generate_openai(prompt, context, conversation_history)
+                return await self._generate_openai(
+                    prompt, context, conversation_history, is_disconnected,
+                    max_tokens=max_tokens, static_context=static_context
+                )
             elif self.provider == "anthropic":
-                return await self._generate_anthropic(prompt, context, conversation_history)
-            else:
-                logger.warning(f"Unknown LLM provider: {self.provider}, using fallback")
-                return self._generate_fallback(prompt)
+                return await self._generate_anthropic(
+                    prompt, context, conversation_history, is_disconnected,
+                    max_tokens=max_tokens, static_context=static_context
+                )
+            logger.warning(f"Unknown LLM provider: {self.provider}, using fallback")
+            return None
+        except ClientDisconnectedError:
+            raise
         except Exception as e:
             logger.error(f"Error generating LLM response: {str(e)}")
-            return self._generate_fallback(prompt)
+            return None
     
-    async def _generate_openai(self, prompt: str, context: Optional[str], conversation_history: Optional[List[Dict[str, str]]]) -> str:
-        """Generate response using OpenAI API"""
+    async def _generate_openai(
+        self,
+        prompt: str,
+        context: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        max_tokens: Optional[int] = None,
+        static_context: Optional[str] = None
+    ) -> Optional[str]:
+        """Generate response using OpenAI API (None if the provider can't answer)"""
         try:
-            import openai
-            
             if not settings.openai_api_key:
                 logger.warning("OpenAI API key not configured, using fallback")
-                return self._generate_fallback(prompt)
+                return None
             
-            client = openai.OpenAI(api_key=settings.openai_api_key)
+            client = self._get_openai_client()
             
-            # Build messages
-            messages = []
+            messages = self._openai_messages(prompt, context, conversation_history, static_context)
             
-            # Add system message with context
-            if context:
-                messages.append({
-                    "role": "system",
-                    "content": context
-                })
-            else:
-                messages.append({
-                    "role": "system",
-                    "content": "Du bist ein freundlicher und hilfsbereiter Assistent für G3 CrossFit in Berlin."
-                })
-            
-            # Add conversation history
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add current user prompt
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-            
-            # Make API call
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-            )
+            async def request() -> str:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens or self.max_tokens,
+                )
+                text = response.choices[0].message.content.strip()
+                self._record_usage("openai", getattr(response, "usage", None), messages, None, text)
+                return text
             
-            return response.choices[0].message.content.strip()
+            return await self._call("openai", request, is_disconnected)
             
         except ImportError:
             logger.error("OpenAI library not installed. Install with: pip install openai")
-            return self._generate_fallback(prompt)
+            return None
+        except ClientDisconnectedError:
+            logger.info("Client disconnected, OpenAI request cancelled")
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"OpenAI API timeout after {settings.llm_timeout_seconds}s")
+            return None
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
-            return self._generate_fallback(prompt)
+            return None
     
-    async def _generate_anthropic(self, prompt: str, context: Optional[str], conversation_history: Optional[List[Dict[str, str]]]) -> str:
-        """Generate response using Anthropic Claude API"""
+    async def _generate_anthropic(
+        self,
+        prompt: str,
+        context: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        max_tokens: Optional[int] = None,
+        static_context: Optional[str] = None
+    ) -> Optional[str]:
+        """Generate response using Anthropic Claude API (None if the provider can't answer)"""
         try:
-            import anthropic
-            
             if not settings.anthropic_api_key:
                 logger.warning("Anthropic API key not configured, using fallback")
-                return self._generate_fallback(prompt)
+                return None
             
-            client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
+            client = self._get_anthropic_client()
             
-            # Build system message
-            system_message = context or "Du bist ein freundlicher und hilfsbereiter Assistent für G3 CrossFit in Berlin."
+            messages = self._anthropic_messages(prompt, conversation_history)
             
-            # Build messages list
-            messages = []
-            if conversation_history:
-                messages.extend(conversation_history)
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-            
-            # Make API call
-            response = client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                system=system_message,
-                messages=messages
-            )
+            async def request() -> str:
+                response = await client.messages.create(
+                    model=self.model,
+                    max_tokens=max_tokens or self.max_tokens,
+                    temperature=self.temperature,
+                    system=self._anthropic_system(static_context, context),
+                    messages=messages
+                )
+                text = response.content[0].text.strip()
+                self._record_usage(
+                    "anthropic", getattr(response, "usage", None), messages,
+                    self._system_text(static_context, context), text
+                )
+                return text
             
-            return response.content[0].text.strip()
+            return await self._call("anthropic", request, is_disconnected)
             
         except ImportError:
             logger.error("Anthropic library not installed. Install with: pip install anthropic")
-            return self._generate_fallback(prompt)
+            return None
+        except ClientDisconnectedError:
+            logger.info("Client disconnected, Anthropic request cancelled")
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Anthropic API timeout after {settings.llm_timeout_seconds}s")
+            return None
         except Exception as e:
             logger.error(f"Anthropic API error: {str(e)}")
-            return self._generate_fallback(prompt)
+            return None
     
-    def _generate_fallback(self, prompt: str) -> str:
-        """Fallback rule-based responses when LLM is unavailable"""
-        prompt_lower = prompt.lower()
-        
-        if "probetraining" in prompt_lower or "trial" in prompt_lower:
-            return "Gerne können Sie ein kostenloses Probetraining bei uns buchen! Wir bieten flexible Termine von Montag bis Sonntag. Möchten Sie direkt einen Termin vereinbaren oder haben Sie Fragen zu unseren Kursen?"
+    async def stream_response(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        fallback: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        cache: bool = True,
+        static_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response of the configured LLM provider as text deltas
         
-        if "preis" in prompt_lower or "kostet" in prompt_lower or "mitgliedschaft" in prompt_lower:
-            return "Wir haben verschiedene Mitgliedschaftsoptionen: Starter für 89€, Unlimited für 139€ und Premium für 189€ pro Monat. Alle Mitgliedschaften beinhalten ein kostenloses Probetraining. Welche Option interessiert Sie am meisten?"
+        The provider slot is held until the stream is exhausted or closed.
+        Waiting for a slot and every gap between two chunks is bounded by
+        LLM_TIMEOUT_SECONDS. Closing the generator (e.g. because the HTTP
+        client disconnected) closes the provider stream and its connection.
         
-        if "standort" in prompt_lower or "wo" in prompt_lower or "adresse" in prompt_lower:
-            return "Wir befinden uns in der Musterstraße 123, 10115 Berlin. Wir haben kostenlose Parkplätze und sind sehr gut mit den öffentlichen Verkehrsmitteln erreichbar. Möchten Sie eine Wegbeschreibung?"
+        Args:
+            prompt: The user's prompt/question
+            context: Additional context (e.g., system instructions)
+            conversation_history: Previous conversation messages
+            fallback: Text to send if no provider is available or the
+                provider fails before the first chunk (defaults to the
+                rule-based response)
+            max_tokens: Completion limit (defaults to LLM_MAX_TOKENS)
+            cache: Whether to use the response cache
+            static_context: Constant system prompt prefix (provider prompt caching)
+            
+        Yields:
+            Text deltas; if the provider fails mid-answer the stream ends early
+        """
+        cacheable = cache and not conversation_history
+        system = self._system_text(static_context, context)
+        if cacheable:
+            cached = self.cache.get(prompt, system, self.model)
+            if cached is not None:
+                yield cached
+                return
         
-        if "öffnungszeiten" in prompt_lower or "wann" in prompt_lower or "stunden" in prompt_lower:
-            return "Unsere Öffnungszeiten sind: Montag bis Freitag von 6:00 bis 21:00 Uhr, Samstag von 8:00 bis 18:00 Uhr und Sonntag von 9:00 bis 16:00 Uhr. Wann passt es Ihnen am besten für ein Probetraining?"
+        if fallback is None:
+            fallback = self._generate_fallback(prompt)
         
-        if "kurse" in prompt_lower or "klassen" in prompt_lower or "training" in prompt_lower:
-            return "Wir bieten verschiedene Kurse an: CrossFit Foundations für Anfänger, CrossFit Classes für alle Level, Olympic Weightlifting und Strength & Conditioning. Alle Level sind willkommen! Welcher Kurs interessiert Sie?"
+        if self.provider == "openai" and settings.openai_api_key:
+            deltas = self._stream_openai(prompt, context, conversation_history, max_tokens, static_context)
+        elif self.provider == "anthropic" and settings.anthropic_api_key:
+            deltas = self._stream_anthropic(prompt, context, conversation_history, max_tokens, static_context)
+        else:
+            logger.warning(f"LLM provider {self.provider} not configured, streaming fallback")
+            yield fallback
+            return
         
-        if "anruf beginnt" in prompt_lower or "hallo" in prompt_lower:
-            return "G3 CrossFit, mein Name ist Alex. Wie kann ich Ihnen helfen?"
+        parts: List[str] = []
+        try:
+            async with aclosing(self._limited_stream(self.provider, deltas)) as limited:
+                async for delta in limited:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                logger.error(f"{self.provider} stream timeout after {settings.llm_timeout_seconds}s")
+            else:
+                logger.error(f"{self.provider} stream error: {str(e)}")
+            if not parts:
+                yield fallback
+            return
         
-        return "Vielen Dank für Ihre Anfrage! Gerne helfe ich Ihnen weiter. Möchten Sie mehr über unsere Mitgliedschaften, Kurse oder ein kostenloses Probetraining erfahren?"
+        if cacheable and parts:
+            self.cache.put(prompt, system, self.model, "".join(parts).strip())
+    
+    async def _limited_stream(self, provider: str, deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Pull deltas within the provider's concurrency limit and the per-chunk timeout"""
+        semaphore = self._semaphore(provider)
+        await asyncio.wait_for(semaphore.acquire(), timeout=settings.llm_timeout_seconds)
+        try:
+            while True:
+                try:
+                    delta = await asyncio.wait_for(anext(deltas), timeout=settings.llm_timeout_seconds)
+                except StopAsyncIteration:
+                    return
+                yield delta
+        finally:
+            semaphore.release()
+            await deltas.aclose()
+    
+    async def _stream_openai(
+        self,
+        prompt: str,
+        context: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]],
+        max_tokens: Optional[int] = None,
+        static_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion from the OpenAI API"""
+        client = self._get_openai_client()
+        messages = self._openai_messages(prompt, context, conversation_history, static_context)
+        stream = await client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=max_tokens or self.max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts: List[str] = []
+        usage = None
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+            # A stream closed early has no usage chunk; its tokens are counted locally
+            self._record_usage("openai", usage, messages, None, "".join(parts))
+    
+    async def _stream_anthropic(
+        self,
+        prompt: str,
+        context: Optional[str],
+        conversation_history: Optional[List[Dict[str, str]]],
+        max_tokens: Optional[int] = None,
+        static_context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a message from the Anthropic API"""
+        client = self._get_anthropic_client()
+        messages = self._anthropic_messages(prompt, conversation_history)
+        parts: List[str] = []
+        usage = None
+        try:
+            async with client.messages.stream(
+                model=self.model,
+                max_tokens=max_tokens or self.max_tokens,
+                temperature=self.temperature,
+                system=self._anthropic_system(static_context, context),
+                messages=messages
+            ) as stream:
+                async for text in stream.text_stream:
+                    if text:
+                        parts.append(text)
+                        yield text
+                usage = (await stream.get_final_message()).usage
+        finally:
+            self._record_usage(
+                "anthropic", usage, messages, self._system_text(static_context, context), "".join(parts)
+            )
+    
+    def _generate_fallback(self, prompt: str) -> str:
+        """Fallback rule-based responses when LLM is unavailable"""
+        return intent_matcher.respond(prompt)
 
 
 # Global LLM service instance
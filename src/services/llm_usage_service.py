@@ -0,0 +1,119 @@
+"""
+G3 CrossFit WODIFY Automation - LLM Usage Service
+
+Records input/output tokens and the resulting cost of LLM completions.
+
+LLMService reports every provider call with the usage returned by the
+provider (cached prompt tokens included), or with a local token count if
+the provider didn't return one. Calls are added to the per-worker totals
+and to the usage of the current request, if one is tracked:
+
+    with llm_usage_service.track() as usage:
+        answer = await llm_service.generate_response(...)
+    usage.cost  # USD for this request
+
+Prices per million tokens come from LLM_INPUT_COST_PER_MILLION,
+LLM_CACHED_INPUT_COST_PER_MILLION and LLM_OUTPUT_COST_PER_MILLION.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from config.settings import settings
+
+
+def usage_cost(input_tokens: int, output_tokens: int, cached_input_tokens: int = 0) -> float:
+    """Cost in USD (cached_input_tokens is the part of input_tokens read from the prompt cache)"""
+    uncached = max(input_tokens - cached_input_tokens, 0)
+    return (
+        uncached * settings.llm_input_cost_per_million
+        + cached_input_tokens * settings.llm_cached_input_cost_per_million
+        + output_tokens * settings.llm_output_cost_per_million
+    ) / 1_000_000
+
+
+class LLMUsage:
+    """Token usage of one request (possibly several provider calls)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        # True if any call was counted locally instead of reported by the provider
+        self.estimated = False
+
+    def add(self, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0, estimated: bool = False):
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.cached_input_tokens += cached_input_tokens
+        self.output_tokens += output_tokens
+        self.estimated = self.estimated or estimated
+
+    @property
+    def cost(self) -> float:
+        return usage_cost(self.input_tokens, self.output_tokens, self.cached_input_tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6),
+            "estimated": self.estimated,
+        }
+
+
+_current_usage: ContextVar[Optional[LLMUsage]] = ContextVar("llm_usage", default=None)
+
+
+class LLMUsageService:
+    """Per-worker LLM usage totals"""
+
+    def __init__(self):
+        self.requests = 0
+        self.request_cost = 0.0
+        self.totals: Dict[str, LLMUsage] = {}
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_input_tokens: int = 0,
+        estimated: bool = False
+    ):
+        """Record one provider call"""
+        total = self.totals.setdefault(f"{provider}:{model}", LLMUsage())
+        total.add(input_tokens, output_tokens, cached_input_tokens, estimated)
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.add(input_tokens, output_tokens, cached_input_tokens, estimated)
+
+    @contextmanager
+    def track(self) -> Iterator[LLMUsage]:
+        """Collect the usage of all provider calls made within the block"""
+        usage = LLMUsage()
+        token = _current_usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _current_usage.reset(token)
+            self.requests += 1
+            self.request_cost += usage.cost
+
+    def report(self) -> Dict[str, Any]:
+        """Totals per provider/model and the average cost of a tracked request"""
+        return {
+            "requests": self.requests,
+            "cost_usd": round(sum(total.cost for total in self.totals.values()), 6),
+            "avg_cost_per_request_usd": round(self.request_cost / self.requests, 6) if self.requests else 0.0,
+            "models": {name: total.to_dict() for name, total in sorted(self.totals.items())},
+        }
+
+
+# Global LLM usage service instance
+llm_usage_service = LLMUsageService()
@@ -0,0 +1,88 @@
+"""
+G3 CrossFit WODIFY Automation - Order Number Service
+
+Unique, human-readable order numbers (G3-20261019-0000042). Numbers come
+from a counter row in the database that is advanced a whole block at a
+time in its own short transaction; each process then hands out numbers
+from its block without touching the database. Numbers are unique across
+workers and increase monotonically within a process. Unused numbers of a
+block are skipped after a restart.
+"""
+
+import threading
+import weakref
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.models.database import OrderNumberCounter
+
+
+# Numbers allocated per database round trip
+ORDER_NUMBER_BLOCK_SIZE = 100
+
+ORDER_NUMBER_COUNTER = "orders"
+
+
+class OrderNumberService:
+    """Service for allocating order numbers in blocks"""
+
+    def __init__(self, block_size: int = ORDER_NUMBER_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # Current block [next, limit) per engine
+        self._blocks: Dict[Engine, List[int]] = weakref.WeakKeyDictionary()
+
+    def _allocate_block(self, engine: Engine) -> int:
+        """
+        Reserve the next block on the counter row and return its first value
+
+        Runs on its own connection and commits immediately, so the counter row
+        is never locked for the duration of a checkout.
+        """
+        advance = (
+            update(OrderNumberCounter)
+            .where(OrderNumberCounter.name == ORDER_NUMBER_COUNTER)
+            .values(next_value=OrderNumberCounter.next_value + self.block_size)
+            .returning(OrderNumberCounter.next_value)
+        )
+        for _ in range(2):
+            try:
+                with engine.begin() as conn:
+                    next_value = conn.execute(advance).scalar()
+                    if next_value is None:
+                        # First allocation on this database
+                        conn.execute(OrderNumberCounter.__table__.insert().values(
+                            name=ORDER_NUMBER_COUNTER, next_value=1 + self.block_size
+                        ))
+                        return 1
+                return next_value - self.block_size
+            except IntegrityError:
+                # Another worker created the counter row first
+                continue
+        raise RuntimeError("Bestellnummern-Zähler konnte nicht angelegt werden")
+
+    def next_value(self, db: Session) -> int:
+        """Get the next sequence value for the session's database"""
+        engine = db.get_bind()
+        with self._lock:
+            block = self._blocks.get(engine)
+            if block is None or block[0] >= block[1]:
+                start = self._allocate_block(engine)
+                block = [start, start + self.block_size]
+                self._blocks[engine] = block
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def next_order_number(self, db: Session) -> str:
+        """Generate a unique human-readable order number"""
+        return f"G3-{datetime.now().strftime('%Y%m%d')}-{self.next_value(db):07d}"
+
+
+# Global order number service instance
+order_number_service = OrderNumberService()
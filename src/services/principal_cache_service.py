@@ -0,0 +1,188 @@
+"""
+G3 CrossFit WODIFY Automation - Principal Cache Service
+
+Resolves the principal of an authenticated request without a user query
+per request. Access tokens carry is_active/is_admin as claims (see
+`principal_claims`), so they are trusted as long as the user's account
+hasn't changed since the token was issued. Tokens without these claims are
+resolved once from the database and cached per token (jti) for a few
+seconds.
+
+Changing a user's status (deactivation, admin flag) must call
+`invalidate_user`: it records a marker (in Redis if REDIS_HOST is
+configured, so every worker sees it) and all tokens issued or principals
+cached before it are checked against the database again.
+
+Without Redis the marker only reaches the worker that made the change.
+Other workers then trust claims and cached principals for at most
+AUTH_PRINCIPAL_LOCAL_TTL_SECONDS, which bounds how long they keep serving
+a deactivated or demoted user.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.settings import settings
+from src.models.auth import AuthenticatedUser
+
+
+# Upper bound of cached principals per process
+PRINCIPAL_CACHE_MAX_ENTRIES = 10_000
+
+
+class InMemoryInvalidationBackend:
+    """Process-local invalidation markers"""
+
+    shared = False
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._markers: Dict[str, float] = {}
+
+    async def get(self, user_id: str) -> Optional[float]:
+        invalidated_at = self._markers.get(user_id)
+        if invalidated_at is not None and invalidated_at + self.ttl_seconds < time.time():
+            del self._markers[user_id]
+            return None
+        return invalidated_at
+
+    async def set(self, user_id: str, invalidated_at: float):
+        self._markers[user_id] = invalidated_at
+
+
+class RedisInvalidationBackend:
+    """Invalidation markers shared by all workers"""
+
+    shared = True
+
+    def __init__(self, ttl_seconds: int):
+        import redis.asyncio as redis
+
+        self.ttl_seconds = ttl_seconds
+        self._redis = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            password=settings.redis_password
+        )
+
+    def _key(self, user_id: str) -> str:
+        return f"g3:auth:invalidated:{user_id}"
+
+    async def get(self, user_id: str) -> Optional[float]:
+        raw = await self._redis.get(self._key(user_id))
+        return float(raw) if raw else None
+
+    async def set(self, user_id: str, invalidated_at: float):
+        await self._redis.set(self._key(user_id), invalidated_at, ex=self.ttl_seconds)
+
+
+class PrincipalCacheService:
+    """Service for resolving request principals from token claims or a short-lived cache"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None, backend=None):
+        if backend is None:
+            # Markers must outlive every access token issued before them
+            marker_ttl = settings.jwt_access_token_expire_minutes * 60
+            backend_class = RedisInvalidationBackend if settings.redis_host else InMemoryInvalidationBackend
+            backend = backend_class(marker_ttl)
+        self.backend = backend
+        # Max. age of trusted claims; other workers don't see process-local markers
+        self.claims_max_age = None if backend.shared else settings.auth_principal_local_ttl_seconds
+        if ttl_seconds is None:
+            ttl_seconds = settings.auth_principal_cache_ttl_seconds
+            if not backend.shared:
+                ttl_seconds = min(ttl_seconds, settings.auth_principal_local_ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        # token key -> (expires_at monotonic, cached_at wall clock, principal)
+        self._principals: "OrderedDict[str, Tuple[float, float, AuthenticatedUser]]" = OrderedDict()
+
+    @staticmethod
+    def token_key(payload: Dict[str, Any]) -> str:
+        """Cache key of a token: its jti, or subject and issue/expiry time for older tokens"""
+        jti = payload.get("jti")
+        if jti:
+            return jti
+        return f"{payload.get('sub')}:{payload.get('iat', payload.get('exp'))}"
+
+    def _cached(self, key: str) -> Optional[Tuple[float, AuthenticatedUser]]:
+        cached = self._principals.get(key)
+        if cached is None:
+            return None
+        expires_at, cached_at, principal = cached
+        if expires_at < time.monotonic():
+            del self._principals[key]
+            return None
+        return cached_at, principal
+
+    def _store(self, key: str, principal: AuthenticatedUser):
+        if self.ttl_seconds <= 0:
+            return
+        self._principals[key] = (time.monotonic() + self.ttl_seconds, time.time(), principal)
+        self._principals.move_to_end(key)
+        while len(self._principals) > PRINCIPAL_CACHE_MAX_ENTRIES:
+            self._principals.popitem(last=False)
+
+    async def resolve(
+        self,
+        payload: Dict[str, Any],
+        load_principal: Callable[[str], Optional[AuthenticatedUser]]
+    ) -> Optional[AuthenticatedUser]:
+        """
+        Get the principal of a verified access token
+
+        Args:
+            payload: Decoded access token payload
+            load_principal: Loads the principal of a user ID from the database
+                (returns None if the user doesn't exist)
+
+        Returns:
+            The principal (may be inactive) or None if the user doesn't exist
+        """
+        user_id = payload["sub"]
+        invalidated_at = await self.backend.get(user_id)
+
+        # Stateless path: claims embedded in a token issued after the last change
+        if "is_active" in payload and "is_admin" in payload:
+            issued_at = payload.get("iat")
+            fresh = self.claims_max_age is None or (
+                issued_at is not None and time.time() - issued_at <= self.claims_max_age
+            )
+            if fresh and (invalidated_at is None or (issued_at is not None and issued_at > invalidated_at)):
+                return AuthenticatedUser(
+                    id=user_id,
+                    email=payload.get("email", ""),
+                    is_active=payload["is_active"],
+                    is_admin=payload["is_admin"]
+                )
+
+        key = self.token_key(payload)
+        cached = self._cached(key)
+        if cached is not None:
+            cached_at, principal = cached
+            if invalidated_at is None or cached_at > invalidated_at:
+                return principal
+
+        principal = load_principal(user_id)
+        if principal is not None:
+            self._store(key, principal)
+        return principal
+
+    async def invalidate_user(self, user_id: str):
+        """
+        Force a database check for all current tokens of a user
+
+        Call after deactivating a user or changing their admin flag.
+        """
+        await self.backend.set(user_id, time.time())
+        for key in [key for key, (_, _, principal) in self._principals.items() if principal.id == user_id]:
+            del self._principals[key]
+
+    def clear(self):
+        """Drop all cached principals"""
+        self._principals.clear()
+
+
+# Global principal cache service instance
+principal_cache_service = PrincipalCacheService()
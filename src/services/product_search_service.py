@@ -0,0 +1,262 @@
+"""
+G3 CrossFit WODIFY Automation - Product Search Service
+
+Full-text search over product name, description and SKU.
+Uses Postgres tsvector/GIN in production and SQLite FTS5 locally.
+The index structures themselves are created with the products table
+(see PRODUCT_SEARCH_DDL_* in src/models/database.py). Other databases
+fall back to an unindexed ILIKE search.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, case, func, literal, or_, text
+from sqlalchemy.orm import Session
+
+from src.models.database import (
+    Product,
+    ProductCategoryDB,
+    PRODUCT_SEARCH_DDL_SQLITE,
+    PRODUCT_SEARCH_DDL_POSTGRESQL,
+)
+
+
+# Databases with a full-text index; others use the ILIKE fallback
+FULL_TEXT_DIALECTS = ("sqlite", "postgresql")
+
+# Upper bound on query terms so a pasted paragraph can't produce a huge query
+MAX_SEARCH_TERMS = 8
+
+# bm25 column weights for (product_id, category, name, description, sku)
+SQLITE_BM25_WEIGHTS = "0.0, 0.0, 10.0, 2.0, 5.0"
+
+# Used by rebuild_index() to repopulate the SQLite FTS table
+SQLITE_INDEX_COLUMNS = "product_id, category, name, description, sku"
+SQLITE_SOURCE_COLUMNS = "id, category, name, description, sku"
+
+# Score per term of the ILIKE fallback, by the first column it occurs in
+LIKE_WEIGHTS = ((Product.name, 10.0), (Product.sku, 5.0), (Product.description, 2.0))
+
+
+class ProductSearchService:
+    """Service for full-text product search with relevance ranking and category facets"""
+
+    def tokenize(self, query: str) -> List[str]:
+        """
+        Split a user query into search terms
+
+        Only word characters survive, which also makes the terms safe to
+        embed in FTS5 / tsquery syntax.
+        """
+        return re.findall(r"\w+", query.lower(), re.UNICODE)[:MAX_SEARCH_TERMS]
+
+    def build_match_expression(self, terms: List[str], dialect: str) -> str:
+        """
+        Build a prefix-matching query expression for the given dialect
+
+        Every term is matched as a prefix and all terms must match.
+        """
+        if dialect == "postgresql":
+            return " & ".join(f"{term}:*" for term in terms)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def _build_sql(self, dialect: str, with_category: bool) -> str:
+        """
+        Build a single statement returning the ranked hits page plus one
+        facet row per category (counted over all text matches)
+        """
+        category_filter = "WHERE category = :category" if with_category else ""
+
+        if dialect == "postgresql":
+            matches = """
+                SELECT id, category, ts_rank_cd(search_vector, query) AS score
+                FROM products, to_tsquery('simple', :match) AS query
+                WHERE search_vector @@ query
+            """
+        else:
+            # Ranking and facets run on the FTS table alone; products is only
+            # joined for the rows of the requested page
+            matches = f"""
+                SELECT product_id AS id, category, -bm25(products_fts, {SQLITE_BM25_WEIGHTS}) AS score
+                FROM products_fts
+                WHERE products_fts MATCH :match
+            """
+
+        return f"""
+            WITH matches AS MATERIALIZED ({matches})
+            SELECT 'hit' AS kind, p.id, p.name, p.price, p.category, p.images, p.in_stock,
+                   p.featured, p.sku, page.score, NULL AS facet_count
+            FROM (
+                SELECT id, score FROM matches {category_filter}
+                ORDER BY score DESC, id
+                LIMIT :limit OFFSET :offset
+            ) AS page
+            JOIN products p ON p.id = page.id
+            UNION ALL
+            SELECT 'facet' AS kind, NULL, NULL, NULL, category, NULL, NULL, NULL, NULL,
+                   NULL, COUNT(*) AS facet_count
+            FROM matches
+            GROUP BY category
+        """
+
+    def _like_search(
+        self,
+        db: Session,
+        terms: List[str],
+        category: Optional[str],
+        limit: int,
+        offset: int
+    ) -> Tuple[List[Any], Dict[str, int]]:
+        """
+        Hits page and facet counts via ILIKE, for databases without a full-text index
+
+        Every term has to occur in name, SKU or description; scores follow
+        the bm25 weights of the SQLite index.
+        """
+        matches, score = [], literal(0.0)
+        for term in terms:
+            # Terms are word characters only, "_" is the one LIKE wildcard among them
+            pattern = "%" + term.replace("_", "\\_") + "%"
+            found = [(column.ilike(pattern, escape="\\"), weight) for column, weight in LIKE_WEIGHTS]
+            matches.append(or_(*(hit for hit, _ in found)))
+            score = score + case(*found, else_=0.0)
+        condition = and_(*matches)
+
+        facets = {
+            row.category.value: row.count
+            for row in db.query(Product.category, func.count().label("count"))
+            .filter(condition)
+            .group_by(Product.category)
+        }
+        query = db.query(
+            Product.id, Product.name, Product.price, Product.category, Product.images,
+            Product.in_stock, Product.featured, Product.sku, score.label("score")
+        ).filter(condition)
+        if category:
+            query = query.filter(Product.category == ProductCategoryDB(category))
+        rows = query.order_by(score.desc(), Product.id).limit(limit).offset(offset).all()
+        return rows, facets
+
+    def _hit(self, row: Any, category_value: Optional[str]) -> Dict[str, Any]:
+        images = json.loads(row.images) if isinstance(row.images, str) else row.images
+        return {
+            "id": row.id,
+            "name": row.name,
+            "price": row.price,
+            "category": category_value,
+            "images": images or [],
+            "inStock": bool(row.in_stock),
+            "featured": bool(row.featured),
+            "sku": row.sku,
+            "score": round(float(row.score), 6),
+        }
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Search products by name, description and SKU
+
+        Args:
+            db: Database session
+            query: User search query (prefix matching per term)
+            category: Optional category filter (facets ignore it)
+            limit: Page size
+            offset: Offset into the ranked results
+
+        Returns:
+            Dict with ranked products, total hits, facet counts per category and the query
+
+        Raises:
+            ValueError: If the query has no searchable terms or the category is unknown
+        """
+        terms = self.tokenize(query)
+        if not terms:
+            raise ValueError("Suchbegriff ist leer")
+
+        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        if category:
+            # Enum columns store the member name
+            params["category"] = ProductCategoryDB(category).name
+
+        hits = []
+        facets: Dict[str, int] = {c.value: 0 for c in ProductCategoryDB}
+        dialect = db.get_bind().dialect.name
+        if dialect in FULL_TEXT_DIALECTS:
+            params["match"] = self.build_match_expression(terms, dialect)
+            rows = db.execute(text(self._build_sql(dialect, bool(category))), params).fetchall()
+            for row in rows:
+                category_value = ProductCategoryDB[row.category].value if row.category else None
+                if row.kind == "facet":
+                    facets[category_value] = row.facet_count
+                else:
+                    hits.append(self._hit(row, category_value))
+            # UNION ALL doesn't guarantee branch order, so re-sort the (small) page
+            hits.sort(key=lambda h: (-h["score"], h["id"]))
+        else:
+            rows, like_facets = self._like_search(db, terms, category, limit, offset)
+            facets.update(like_facets)
+            hits = [self._hit(row, row.category.value) for row in rows]
+        total = facets.get(category, 0) if category else sum(facets.values())
+
+        return {
+            "products": hits,
+            "total": total,
+            "facets": facets,
+            "query": query,
+        }
+
+    def rebuild_index(self, db: Session):
+        """
+        Rebuild the search index from the products table
+
+        Only needed for SQLite (e.g. after restoring a database without the
+        FTS table); Postgres keeps its generated column up to date itself.
+        """
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            for statement in PRODUCT_SEARCH_DDL_SQLITE:
+                db.execute(text(statement))
+            db.execute(text("DELETE FROM products_fts"))
+            db.execute(text(
+                f"INSERT INTO products_fts ({SQLITE_INDEX_COLUMNS}) "
+                f"SELECT {SQLITE_SOURCE_COLUMNS} FROM products"
+            ))
+            db.commit()
+            self.optimize_index(db)
+        elif dialect == "postgresql":
+            for statement in PRODUCT_SEARCH_DDL_POSTGRESQL:
+                db.execute(text(statement))
+            db.commit()
+        logger.info("Product search index rebuilt")
+
+    def clear_index(self, db: Session):
+        """
+        Empty the SQLite FTS table before bulk-deleting products
+
+        The delete trigger then has nothing to scan, which keeps bulk deletes linear.
+        """
+        if db.get_bind().dialect.name == "sqlite":
+            db.execute(text("DELETE FROM products_fts"))
+
+    def optimize_index(self, db: Session):
+        """Merge index segments after bulk loads (SQLite) or refresh planner statistics (Postgres)"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            db.execute(text("INSERT INTO products_fts (products_fts) VALUES ('optimize')"))
+            db.commit()
+        elif dialect == "postgresql":
+            db.execute(text("ANALYZE products"))
+            db.commit()
+
+
+# Global product search service instance
+product_search_service = ProductSearchService()
@@ -0,0 +1,210 @@
+"""
+G3 CrossFit WODIFY Automation - Prompt Service
+
+Assembles the prompts of the phone assistant and chatbot.
+
+The gym facts and conversation rules are one constant system prefix
+(ASSISTANT_CONTEXT), built once and sent first and unchanged with every
+request, so providers can reuse it from their prompt cache. Everything
+that comes from the caller is bounded by a token budget:
+
+- the extra context is cut to LLM_CONTEXT_MAX_TOKENS
+- the conversation history keeps the most recent messages that fit into
+  LLM_HISTORY_MAX_TOKENS; older messages are replaced by a short
+  extractive summary in the system context
+
+Tokens are counted locally with tiktoken if it is installed, otherwise
+estimated from word lengths (about 4 characters per token).
+"""
+
+import functools
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+
+ASSISTANT_CONTEXT = """Du bist ein freundlicher und professioneller AI-Assistent für G3 CrossFit in Berlin.
+
+WICHTIGE INFORMATIONEN:
+- Standort: Musterstraße 123, 10115 Berlin
+- Telefon: +49 30 12345678
+- Öffnungszeiten: Mo-Fr 6:00-21:00, Sa 8:00-18:00, So 9:00-16:00
+- Preise: Starter 89€, Unlimited 139€, Premium 189€
+- Kostenloses Probetraining verfügbar
+- Alle Level willkommen
+
+GESPRÄCHSFÜHRUNG:
+- Sei freundlich, professionell und hilfsbereit
+- Antworte kurz und präzise (max. 2-3 Sätze)
+- Biete bei Fragen zu Probetraining die Online-Buchung an
+- Erwähne wichtige Informationen wie kostenloses Probetraining
+- Antworte immer auf Deutsch"""
+
+# Per-message overhead of the chat formats (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Tokens of each dropped message kept in the history summary
+SUMMARY_TOKENS_PER_MESSAGE = 25
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken encoding, or None if tiktoken (or its encoding file) isn't available"""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Number of tokens of a text (exact with tiktoken, otherwise estimated)"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(1 + (len(piece) - 1) // 4 for piece in _TOKEN_PIECES.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Number of tokens of chat messages including the per-message overhead"""
+    return sum(count_tokens(message.get("content")) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def truncate_tokens(text: Optional[str], max_tokens: int) -> str:
+    """Cut a text to at most max_tokens at a word boundary"""
+    if not text or count_tokens(text) <= max_tokens:
+        return text or ""
+    used = 0
+    end = 0
+    for match in re.finditer(r"\S+\s*", text):
+        used += count_tokens(match.group())
+        if used > max_tokens - 1:
+            break
+        end = match.end()
+    return text[:end].rstrip() + " …"
+
+
+class AssembledPrompt:
+    """Prompt parts for LLMService"""
+
+    __slots__ = ("prompt", "static_context", "context", "history", "input_tokens", "dropped_messages")
+
+    def __init__(
+        self,
+        prompt: str,
+        static_context: str,
+        context: str,
+        history: List[Dict[str, str]],
+        input_tokens: int,
+        dropped_messages: int
+    ):
+        self.prompt = prompt
+        self.static_context = static_context
+        self.context = context
+        self.history = history
+        # Local count of all input tokens (system, history, prompt)
+        self.input_tokens = input_tokens
+        self.dropped_messages = dropped_messages
+
+
+class PromptService:
+    """Service for assembling prompts within token budgets"""
+
+    def __init__(self, context_max_tokens: Optional[int] = None, history_max_tokens: Optional[int] = None):
+        self.context_max_tokens = (
+            context_max_tokens if context_max_tokens is not None else settings.llm_context_max_tokens
+        )
+        self.history_max_tokens = (
+            history_max_tokens if history_max_tokens is not None else settings.llm_history_max_tokens
+        )
+
+    def trim_history(
+        self,
+        history: Optional[List[Dict[str, str]]]
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """
+        Split the history into the most recent messages within the budget and the dropped rest
+
+        The kept part always starts with a user message (required by Anthropic).
+
+        Returns:
+            (kept messages, dropped messages)
+        """
+        history = [
+            {"role": message["role"], "content": message["content"]}
+            for message in history or []
+            if message.get("role") in ("user", "assistant") and message.get("content")
+        ]
+        budget = self.history_max_tokens
+        start = len(history)
+        while start > 0:
+            cost = count_tokens(history[start - 1]["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+        while start < len(history) and history[start]["role"] != "user":
+            start += 1
+        return history[start:], history[:start]
+
+    @staticmethod
+    def summarize(dropped: List[Dict[str, str]]) -> str:
+        """Short extractive summary of dropped messages (no extra completion)"""
+        if not dropped:
+            return ""
+        lines = [
+            f"- {'Interessent' if message['role'] == 'user' else 'Assistent'}: "
+            f"{truncate_tokens(' '.join(message['content'].split()), SUMMARY_TOKENS_PER_MESSAGE)}"
+            for message in dropped[-6:]
+        ]
+        return "Bisheriger Gesprächsverlauf (gekürzt):\n" + "\n".join(lines)
+
+    def assemble(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        static_context: str = ASSISTANT_CONTEXT
+    ) -> AssembledPrompt:
+        """
+        Build the prompt parts for one request
+
+        Args:
+            prompt: The user's prompt/question
+            context: Caller-supplied extra context (cut to the context budget)
+            history: Previous conversation messages (cut to the history budget)
+            static_context: Constant system prefix
+
+        Returns:
+            AssembledPrompt
+        """
+        kept, dropped = self.trim_history(history)
+        extra = [truncate_tokens(context.strip(), self.context_max_tokens)] if context and context.strip() else []
+        summary = self.summarize(dropped)
+        if summary:
+            extra.append(summary)
+        dynamic_context = "\n\n".join(extra)
+
+        input_tokens = (
+            count_tokens(static_context) + count_tokens(dynamic_context) + MESSAGE_OVERHEAD_TOKENS
+            + count_message_tokens(kept)
+            + count_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS
+        )
+        return AssembledPrompt(
+            prompt=prompt,
+            static_context=static_context,
+            context=dynamic_context,
+            history=kept,
+            input_tokens=input_tokens,
+            dropped_messages=len(dropped)
+        )
+
+
+# Global prompt service instance
+prompt_service = PromptService()
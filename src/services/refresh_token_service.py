@@ -0,0 +1,257 @@
+"""
+G3 CrossFit WODIFY Automation - Refresh Token Service
+
+Server-side store for refresh tokens. Only a SHA-256 hash of every issued
+token is kept, together with its family (all tokens descending from one
+login), expiry and revocation state.
+
+Each refresh rotates the token: the presented token is revoked and a new
+one of the same family is issued. Presenting an already rotated or
+revoked token again means it was copied, so the whole family is revoked
+and the legitimate holder has to log in again. Rotated and rejected token
+hashes are remembered in a small in-process negative cache, so replays
+are recognized without looking the token up in the database.
+"""
+
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from src.models.auth import AuthenticatedUser
+from src.models.database import RefreshToken, User
+from src.utils.auth import create_refresh_token
+
+
+# Upper bound of remembered rejected tokens per process
+NEGATIVE_CACHE_MAX_ENTRIES = 10_000
+
+
+class RefreshTokenError(Exception):
+    """Raised when a refresh token can't be used"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Refresh token rejected: {reason}")
+
+
+class RefreshTokenService:
+    """Service for issuing, rotating and revoking refresh tokens"""
+
+    def __init__(self, negative_cache_size: int = NEGATIVE_CACHE_MAX_ENTRIES):
+        self.negative_cache_size = negative_cache_size
+        # token hash -> (monotonic time until which the token stays rejected,
+        # family to revoke if a rotated token is presented again)
+        self._rejected: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """SHA-256 hex digest of a token (the only form that is stored)"""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _check_rejected(self, db: Session, token_hash: str):
+        """Raise if the token is in the negative cache, revoking its family on a replay"""
+        cached = self._rejected.get(token_hash)
+        if cached is None:
+            return
+        until, family_id = cached
+        if until < time.monotonic():
+            del self._rejected[token_hash]
+            return
+        if family_id is None:
+            raise RefreshTokenError("revoked")
+
+        self._rejected[token_hash] = (until, None)
+        revoked = self._revoke_family(db, family_id, datetime.utcnow())
+        db.commit()
+        logger.warning(f"Refresh token reuse, revoked family {family_id} ({revoked} tokens)")
+        raise RefreshTokenError("reused")
+
+    def _reject(self, token_hash: str, expires_at: Optional[datetime] = None, family_id: Optional[str] = None):
+        """
+        Remember a rejected token until it would have expired anyway
+
+        family_id marks a rotated token: presenting it again revokes its family.
+        """
+        if expires_at is not None:
+            ttl = max(0.0, (expires_at - datetime.utcnow()).total_seconds())
+        else:
+            ttl = settings.jwt_refresh_token_expire_days * 86400
+        self._rejected[token_hash] = (time.monotonic() + ttl, family_id)
+        self._rejected.move_to_end(token_hash)
+        while len(self._rejected) > self.negative_cache_size:
+            self._rejected.popitem(last=False)
+
+    def issue(
+        self,
+        db: Session,
+        user_id: str,
+        family_id: Optional[str] = None,
+        token_id: Optional[str] = None
+    ) -> str:
+        """
+        Create a refresh token and store its hash (does not commit)
+
+        Args:
+            db: Database session
+            user_id: Token owner
+            family_id: Family of the token (None starts a new family, i.e. a login)
+            token_id: ID of the stored row (generated if not given)
+
+        Returns:
+            The refresh token
+        """
+        token = create_refresh_token(data={"sub": user_id})
+        db.add(RefreshToken(
+            id=token_id or str(uuid.uuid4()),
+            user_id=user_id,
+            token_hash=self.hash_token(token),
+            family_id=family_id or str(uuid.uuid4()),
+            expires_at=datetime.utcnow() + timedelta(days=settings.jwt_refresh_token_expire_days)
+        ))
+        return token
+
+    def _revoke_family(self, db: Session, family_id: str, now: datetime) -> int:
+        return db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    def rotate(self, db: Session, token: str) -> Tuple[str, AuthenticatedUser]:
+        """
+        Exchange a refresh token for a new one of the same family
+
+        The token row and its owner are read with one indexed query; the
+        old token is revoked with a conditional UPDATE, so two concurrent
+        refreshes with the same token can't both succeed.
+
+        Args:
+            db: Database session
+            token: Presented refresh token (signature already verified)
+
+        Returns:
+            New refresh token and the token owner
+
+        Raises:
+            RefreshTokenError: If the token is unknown, expired, revoked,
+                reused or its user is inactive
+        """
+        token_hash = self.hash_token(token)
+        self._check_rejected(db, token_hash)
+
+        row = db.query(
+            RefreshToken.id,
+            RefreshToken.family_id,
+            RefreshToken.expires_at,
+            RefreshToken.revoked_at,
+            User.id.label("user_id"),
+            User.email,
+            User.is_active,
+            User.is_admin
+        ).join(User, User.id == RefreshToken.user_id).filter(RefreshToken.token_hash == token_hash).first()
+
+        if row is None:
+            self._reject(token_hash)
+            raise RefreshTokenError("unknown")
+
+        now = datetime.utcnow()
+        if row.expires_at < now:
+            self._reject(token_hash, row.expires_at)
+            raise RefreshTokenError("expired")
+        if not row.is_active:
+            raise RefreshTokenError("inactive user")
+
+        new_id = str(uuid.uuid4())
+        claimed = 0
+        if row.revoked_at is None:
+            claimed = db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+                .values(revoked_at=now, replaced_by_id=new_id)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+        if not claimed:
+            # Already rotated or revoked: the token was replayed
+            revoked = self._revoke_family(db, row.family_id, now)
+            db.commit()
+            self._reject(token_hash, row.expires_at)
+            logger.warning(
+                f"Refresh token reuse for user {row.user_id}, revoked family {row.family_id} ({revoked} tokens)"
+            )
+            raise RefreshTokenError("reused")
+
+        new_token = self.issue(db, row.user_id, family_id=row.family_id, token_id=new_id)
+        db.commit()
+        self._reject(token_hash, row.expires_at, family_id=row.family_id)
+        user = AuthenticatedUser(
+            id=row.user_id, email=row.email, is_active=bool(row.is_active), is_admin=bool(row.is_admin)
+        )
+        return new_token, user
+
+    def revoke(self, db: Session, token: str) -> int:
+        """
+        Revoke the family of a refresh token (logout)
+
+        Returns:
+            Number of revoked tokens
+        """
+        token_hash = self.hash_token(token)
+        row = db.query(RefreshToken.family_id, RefreshToken.expires_at).filter(
+            RefreshToken.token_hash == token_hash
+        ).first()
+        self._reject(token_hash, row.expires_at if row else None)
+        if row is None:
+            return 0
+        revoked = self._revoke_family(db, row.family_id, datetime.utcnow())
+        db.commit()
+        return revoked
+
+    def revoke_user(self, db: Session, user_id: str) -> int:
+        """
+        Revoke all refresh tokens of a user (logout everywhere, deactivation)
+
+        Returns:
+            Number of revoked tokens
+        """
+        revoked = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return revoked
+
+    def purge_expired(self, db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Delete expired tokens
+
+        Revoked tokens are kept until they expire, so reuse of a rotated
+        token is still detected.
+
+        Returns:
+            Number of deleted tokens
+        """
+        deleted = db.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.expires_at < (now or datetime.utcnow()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired refresh tokens")
+        return deleted
+
+
+# Global refresh token service instance
+refresh_token_service = RefreshTokenService()
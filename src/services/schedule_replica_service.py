@@ -0,0 +1,348 @@
+"""
+G3 CrossFit WODIFY Automation - Schedule Replica Service
+
+Local copy of the Wodify class schedule, class types and trainers.
+
+The replica covers the next SCHEDULE_REPLICA_DAYS_AHEAD days and is
+refreshed every SCHEDULE_REPLICA_REFRESH_MINUTES by the scheduler. A
+failed refresh keeps the previous copy. Between refreshes, booking
+webhooks keep the `booked` counters current: every booking's last status
+is stored in `class_bookings`, so a repeated webhook doesn't count twice
+and a cancellation only counts down a booking that was counted. Bookings
+cancelled through the API are counted down right away. A cancellation
+also closes the user's confirmed reservation, so the class can be booked
+again. A booking for a
+class the replica doesn't know yet triggers an early refresh.
+
+/api/schedule reads the replica with indexed queries (date range, day of
+week, class type, trainer) as long as it covers the requested dates, and
+asks Wodify live otherwise.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from src.database import SessionLocal
+from src.models.database import (
+    ClassBooking,
+    ClassReservation,
+    ClassReservationStatusDB,
+    ClassType,
+    ScheduleClass,
+    ScheduleSyncState,
+    Trainer,
+)
+from src.models.wodify import WodifyClassBooked
+from src.services.wodify_api_service import wodify_api_service
+
+SYNC_STATE_NAME = "classes"
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# A booking for an unknown class refreshes the replica at most this often
+MIN_REFRESH_INTERVAL = timedelta(minutes=1)
+# Class IDs per IN (...) list when replacing classes
+ID_CHUNK_SIZE = 500
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def class_date(cls: Dict[str, Any], window_start: date, window_end: date) -> Optional[date]:
+    """
+    Date of a Wodify class: from its date fields, its ISO start time or
+    (for weekly schedules that only name the day) the first such weekday
+    within the window
+    """
+    for key in ("date", "class_date", "start_date", "start_time"):
+        parsed = _parse_date(cls.get(key))
+        if parsed:
+            return parsed
+    day = cls.get("day")
+    if day in WEEKDAYS:
+        offset = (WEEKDAYS.index(day) - window_start.weekday()) % 7
+        found = window_start + timedelta(days=offset)
+        if found <= window_end:
+            return found
+    return None
+
+
+def class_row(cls: Dict[str, Any], window_start: date, window_end: date, synced_at: datetime) -> Optional[Dict[str, Any]]:
+    """Columns of a ScheduleClass for a Wodify class (None without ID or date)"""
+    class_id = cls.get("id")
+    when = class_date(cls, window_start, window_end)
+    if not class_id or not when:
+        return None
+    trainer = cls.get("trainer") or {}
+    return {
+        "id": str(class_id),
+        "name": cls.get("name") or "",
+        "class_type": (cls.get("type") or "").lower() or None,
+        "trainer_name": trainer.get("name") if isinstance(trainer, dict) else str(trainer),
+        "level": cls.get("level"),
+        "description": cls.get("description"),
+        "price": cls.get("price"),
+        "location": cls.get("location"),
+        "class_date": when,
+        "day_of_week": cls.get("day") or WEEKDAYS[when.weekday()],
+        "start_time": cls.get("start_time"),
+        "end_time": cls.get("end_time"),
+        "capacity": 12 if cls.get("capacity") is None else cls["capacity"],
+        "booked": cls.get("booked") or 0,
+        "synced_at": synced_at,
+    }
+
+
+def class_payload(row: ScheduleClass) -> Dict[str, Any]:
+    """Replica class in the format of /api/schedule/classes"""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "type": row.class_type or "",
+        "trainer": row.trainer_name or "TBD",
+        "day": row.day_of_week,
+        "startTime": row.start_time,
+        "endTime": row.end_time,
+        "level": row.level or "Alle Level",
+        "spotsTotal": row.capacity,
+        "spotsBooked": row.booked,
+        "description": row.description or "",
+        "price": row.price or "Mitgliedschaft",
+        "location": row.location or "G3 CrossFit Berlin"
+    }
+
+
+def _catalog_id(item: Dict[str, Any]) -> Optional[str]:
+    value = item.get("id") or item.get("name")
+    return str(value) if value else None
+
+
+class ScheduleReplicaService:
+    """Service for the local class schedule"""
+
+    def _replace_catalog(self, db: Session, model, items: List[Dict[str, Any]], synced_at: datetime) -> int:
+        """Replace all class types or trainers (kept as they are if Wodify returned none)"""
+        rows = {}
+        for item in items:
+            item_id = _catalog_id(item)
+            if item_id:
+                rows[item_id] = {"id": item_id, "name": item.get("name") or item_id, "data": item, "synced_at": synced_at}
+        if not rows:
+            return 0
+        db.query(model).delete(synchronize_session=False)
+        db.bulk_insert_mappings(model, list(rows.values()))
+        return len(rows)
+
+    async def refresh(self, db: Session, start: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Replace the replica with the current schedule from Wodify
+
+        Args:
+            db: Database session
+            start: First day of the window (default: today)
+
+        Returns:
+            Number of classes, class types and trainers stored
+
+        Raises:
+            Exception: If the schedule couldn't be fetched (the replica is unchanged)
+        """
+        start = start or date.today()
+        end = start + timedelta(days=settings.schedule_replica_days_ahead)
+        classes = await wodify_api_service.fetch_classes(start, end)
+        class_types = await wodify_api_service.get_class_types()
+        trainers = await wodify_api_service.get_trainers()
+
+        synced_at = datetime.utcnow()
+        rows = {}
+        for cls in classes:
+            row = class_row(cls, start, end, synced_at)
+            if row:
+                rows[row["id"]] = row
+
+        # Classes of the window (and anything that was moved into it) are replaced,
+        # past classes and the bookings of classes that are gone are dropped
+        db.query(ScheduleClass).filter(
+            (ScheduleClass.class_date < start) | ScheduleClass.class_date.between(start, end)
+        ).delete(synchronize_session=False)
+        ids = list(rows)
+        for i in range(0, len(ids), ID_CHUNK_SIZE):
+            db.query(ScheduleClass).filter(
+                ScheduleClass.id.in_(ids[i:i + ID_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ScheduleClass, list(rows.values()))
+        # Spots held by bookings Wodify hasn't confirmed yet (see booking_service)
+        held = (
+            db.query(ClassReservation.class_id, func.count())
+            .filter(
+                ClassReservation.status == ClassReservationStatusDB.PENDING,
+                ClassReservation.holds_spot.is_(True)
+            )
+            .group_by(ClassReservation.class_id)
+        )
+        for class_id, count in held:
+            db.execute(
+                update(ScheduleClass)
+                .where(ScheduleClass.id == class_id)
+                .values(booked=ScheduleClass.booked + count)
+                .execution_options(synchronize_session=False)
+            )
+        db.query(ClassBooking).filter(
+            ~ClassBooking.class_id.in_(db.query(ScheduleClass.id))
+        ).delete(synchronize_session=False)
+
+        stored_types = self._replace_catalog(db, ClassType, class_types, synced_at)
+        stored_trainers = self._replace_catalog(db, Trainer, trainers, synced_at)
+
+        db.merge(ScheduleSyncState(
+            name=SYNC_STATE_NAME, window_start=start, window_end=end, refreshed_at=synced_at
+        ))
+        db.commit()
+        logger.info(
+            f"Schedule replica refreshed: {len(rows)} classes {start.isoformat()} - {end.isoformat()}, "
+            f"{stored_types} class types, {stored_trainers} trainers"
+        )
+        return {
+            "classes": len(rows),
+            "class_types": stored_types,
+            "trainers": stored_trainers,
+            "window_start": start.isoformat(),
+            "window_end": end.isoformat(),
+        }
+
+    def sync_state(self, db: Session) -> Optional[ScheduleSyncState]:
+        return db.get(ScheduleSyncState, SYNC_STATE_NAME)
+
+    def covering_state(self, db: Session, start: date, end: date) -> Optional[ScheduleSyncState]:
+        """Sync state if the replica holds all classes from start to end, else None"""
+        state = self.sync_state(db)
+        if state and state.window_start <= start and end <= state.window_end:
+            return state
+        return None
+
+    def is_stale(self, state: ScheduleSyncState) -> bool:
+        """True if the last refresh is older than two refresh intervals"""
+        max_age = timedelta(minutes=2 * settings.schedule_replica_refresh_minutes)
+        return datetime.utcnow() - state.refreshed_at > max_age
+
+    def query(
+        self,
+        db: Session,
+        start: date,
+        end: date,
+        class_type: Optional[str] = None,
+        day: Optional[str] = None,
+        trainer: Optional[str] = None
+    ) -> List[ScheduleClass]:
+        """Classes from start to end (inclusive), optionally by type, day of week and trainer"""
+        query = db.query(ScheduleClass).filter(ScheduleClass.class_date.between(start, end))
+        if class_type:
+            query = query.filter(ScheduleClass.class_type == class_type.lower())
+        if day:
+            query = query.filter(ScheduleClass.day_of_week == day)
+        if trainer:
+            query = query.filter(ScheduleClass.trainer_name == trainer)
+        return query.order_by(ScheduleClass.class_date, ScheduleClass.start_time).all()
+
+    def catalog(self, db: Session, model) -> List[Dict[str, Any]]:
+        """Stored class types or trainers as sent by Wodify"""
+        return [row.data for row in db.query(model).order_by(model.name).all()]
+
+    def apply_booking(self, db: Session, class_id: str, booking_id: str, status: str) -> bool:
+        """
+        Record a booking status and adjust the class's `booked` counter
+
+        Args:
+            db: Database session
+            class_id: Wodify class ID
+            booking_id: Wodify booking ID
+            status: Booked, Waitlist or Cancelled
+
+        Returns:
+            True if the class is in the replica
+        """
+        for attempt in range(2):
+            try:
+                entry = db.get(ClassBooking, booking_id)
+                was_booked = entry is not None and entry.status == "Booked"
+                if entry is None:
+                    db.add(ClassBooking(booking_id=booking_id, class_id=class_id, status=status))
+                else:
+                    entry.status = status
+                if status == "Cancelled":
+                    db.execute(
+                        update(ClassReservation)
+                        .where(
+                            ClassReservation.wodify_booking_id == booking_id,
+                            ClassReservation.status == ClassReservationStatusDB.CONFIRMED
+                        )
+                        .values(status=ClassReservationStatusDB.CANCELLED)
+                        .execution_options(synchronize_session=False)
+                    )
+                delta = int(status == "Booked") - int(was_booked)
+                known = True
+                if delta:
+                    booked = ScheduleClass.booked + delta
+                    result = db.execute(
+                        update(ScheduleClass)
+                        .where(ScheduleClass.id == class_id)
+                        .values(booked=case((booked < 0, 0), else_=booked))
+                    )
+                    known = result.rowcount > 0
+                else:
+                    known = db.query(ScheduleClass.id).filter(ScheduleClass.id == class_id).first() is not None
+                db.commit()
+                return known
+            except IntegrityError:
+                # The same booking arrived twice at the same time, the other one inserted it first
+                db.rollback()
+                if attempt:
+                    raise
+        return False
+
+    def cancel_booking(self, db: Session, booking_id: str) -> bool:
+        """
+        Give the spot of a booking cancelled through the API back
+
+        Only bookings recorded in `class_bookings` are counted down; the
+        cancellation webhook then finds the booking already cancelled.
+
+        Returns:
+            True if the booking was known and counted down
+        """
+        entry = db.get(ClassBooking, booking_id)
+        if entry is None or entry.status != "Booked":
+            return False
+        return self.apply_booking(db, entry.class_id, booking_id, "Cancelled")
+
+    async def process_booking(self, booking: WodifyClassBooked):
+        """Background task for booking webhooks"""
+        db = SessionLocal()
+        try:
+            known = self.apply_booking(db, booking.class_id, booking.booking_id, booking.booking_status)
+            if known:
+                return
+            state = self.sync_state(db)
+            if state is None or datetime.utcnow() - state.refreshed_at >= MIN_REFRESH_INTERVAL:
+                logger.info(f"Booking for unknown class {booking.class_id}, refreshing schedule replica")
+                # Wodify's counter already includes the booking, which stays in class_bookings
+                await self.refresh(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to apply booking {booking.booking_id} to schedule replica: {str(e)}")
+        finally:
+            db.close()
+
+
+# Global schedule replica service instance
+schedule_replica_service = ScheduleReplicaService()
@@ -5,17 +5,40 @@ This service handles scheduled tasks using APScheduler.
 Replaces asyncio.sleep() for production-ready delayed task execution.
 """
 
+import apscheduler
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.job import Job
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from sqlalchemy import select
 from loguru import logger
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import pickle
 import uuid
 
 from config.settings import settings
 from src.services.email_service import email_service
 from src.services.database_service import database_service
 from src.services.sync_service import sync_service
+from src.services.refresh_token_service import refresh_token_service
+from src.services.schedule_replica_service import schedule_replica_service
+from src.services.booking_service import booking_service
+from src.database import SessionLocal
+
+# Days after lead creation of the nurturing emails
+NURTURING_DAYS = (2, 5, 7)
+
+
+def parse_nurturing_job_id(job_id: str) -> Optional[Tuple[int, str]]:
+    """(day, lead_id) of a nurturing job ID (nurturing_<day>_<lead_id>_<suffix>)"""
+    prefix, _, rest = job_id.partition("_")
+    day, _, rest = rest.partition("_")
+    lead_id = rest.rpartition("_")[0]
+    if prefix != "nurturing" or not day.isdigit() or not lead_id:
+        return None
+    return int(day), lead_id
 
 
 class SchedulerService:
@@ -40,12 +63,19 @@ class SchedulerService:
             }
             logger.info(f"Scheduler using SQLAlchemy job store (development): {settings.database_url}")
         
+        self.jobstore = jobstores['default']
         self.scheduler = AsyncIOScheduler(jobstores=jobstores)
+        if not settings.scheduler_run_jobs:
+            # Jobs are only written to the job store and run by the backend's scheduler
+            self.scheduler.start(paused=True)
+            logger.info("Scheduler service initialized without running jobs")
+            return
         self.scheduler.start()
         logger.info("Scheduler service initialized with persistent job store")
         
         # Schedule automatic sync jobs
         self._schedule_sync_jobs()
+        self._schedule_shop_jobs()
     
     def schedule_welcome_email(
         self,
@@ -565,57 +595,144 @@ class SchedulerService:
             interested_in: What the lead is interested in (optional)
         
         Returns:
-            List of Job IDs
+            List of Job IDs (steps that were already scheduled are skipped)
+        """
+        lead = {
+            "lead_id": lead_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "created_at": created_at,
+            "interested_in": interested_in,
+        }
+        return self.schedule_nurturing_sequences([lead], spread_minutes=0).get(lead_id, [])
+    
+    def _bulk_insert_supported(self) -> bool:
+        """
+        True if nurturing jobs can be written to the job store as rows directly
+
+        The rows follow the table layout and job state of APScheduler 3.x's
+        SQLAlchemyJobStore; with any other store or version the jobs are
+        added one by one through the public API instead.
+        """
+        return apscheduler.version_info[0] == 3 and isinstance(self.jobstore, SQLAlchemyJobStore)
+    
+    def _scheduled_nurturing_steps(self, connection=None) -> set:
+        """(day, lead_id) of all nurturing jobs in the job store"""
+        if connection is None:
+            job_ids = [job.id for job in self.scheduler.get_jobs()]
+        else:
+            jobs_t = self.jobstore.jobs_t
+            job_ids = connection.execute(
+                select(jobs_t.c.id).where(jobs_t.c.id.like("nurturing\\_%", escape="\\"))
+            ).scalars()
+        steps = set()
+        for job_id in job_ids:
+            step = parse_nurturing_job_id(job_id)
+            if step:
+                steps.add(step)
+        return steps
+    
+    def _nurturing_steps(
+        self,
+        leads: List[Dict[str, Any]],
+        spread_minutes: int,
+        existing: set
+    ) -> List[Dict[str, Any]]:
+        """add_job arguments of all steps that aren't scheduled yet"""
+        step_seconds = spread_minutes * 60 / len(leads)
+        steps = []
+        for i, lead in enumerate(leads):
+            lead_id = lead["lead_id"]
+            start = (lead.get("created_at") or datetime.now()) + timedelta(seconds=int(i * step_seconds))
+            for day in NURTURING_DAYS:
+                if (day, lead_id) in existing:
+                    continue
+                steps.append({
+                    "id": f"nurturing_{day}_{lead_id}_{uuid.uuid4().hex[:8]}",
+                    "func": send_nurturing_email_job,
+                    "trigger": DateTrigger(run_date=start + timedelta(days=day), timezone=self.scheduler.timezone),
+                    "args": (
+                        day, lead_id, lead["first_name"], lead["last_name"], lead["email"], lead.get("interested_in")
+                    ),
+                    "name": f"nurturing_{day}",
+                    "misfire_grace_time": 600,  # 10 minutes grace period
+                    "coalesce": True,
+                    "max_instances": 1,
+                })
+        return steps
+    
+    def _insert_nurturing_jobs(self, connection, steps: List[Dict[str, Any]]):
+        """Write the steps as job rows with one INSERT (APScheduler 3.x layout)"""
+        now = datetime.now(self.scheduler.timezone)
+        rows = []
+        for step in steps:
+            job = Job(
+                self.scheduler,
+                executor="default",
+                kwargs={},
+                next_run_time=step["trigger"].get_next_fire_time(None, now),
+                **step
+            )
+            rows.append({
+                "id": job.id,
+                "next_run_time": datetime_to_utc_timestamp(job.next_run_time),
+                "job_state": pickle.dumps(job.__getstate__(), self.jobstore.pickle_protocol),
+            })
+        connection.execute(self.jobstore.jobs_t.insert(), rows)
+    
+    def schedule_nurturing_sequences(
+        self,
+        leads: List[Dict[str, Any]],
+        spread_minutes: Optional[int] = None
+    ) -> Dict[str, List[str]]:
         """
-        job_ids = []
+        Schedule the nurturing sequence (Day 2, 5, 7) of many leads at once
         
-        # Day 2 (48 hours after creation)
-        run_date_2 = created_at + timedelta(days=2)
-        job_id_2 = f"nurturing_2_{lead_id}_{uuid.uuid4().hex[:8]}"
-        self.scheduler.add_job(
-            self._send_nurturing_2_job,
-            'date',
-            run_date=run_date_2,
-            args=[lead_id, first_name, last_name, email, interested_in],
-            id=job_id_2,
-            replace_existing=True,
-            max_instances=1,
-            misfire_grace_time=600  # 10 minutes grace period
-        )
-        job_ids.append(job_id_2)
+        All steps are written to the job store with one INSERT in one
+        transaction, instead of one add_job (and commit) per step (see
+        _bulk_insert_supported). Steps that are already scheduled for a lead
+        are skipped, so the method can be called again for the same leads
+        (e.g. after every sync).
         
-        # Day 5 (120 hours after creation)
-        run_date_5 = created_at + timedelta(days=5)
-        job_id_5 = f"nurturing_5_{lead_id}_{uuid.uuid4().hex[:8]}"
-        self.scheduler.add_job(
-            self._send_nurturing_5_job,
-            'date',
-            run_date=run_date_5,
-            args=[lead_id, first_name, last_name, email, interested_in],
-            id=job_id_5,
-            replace_existing=True,
-            max_instances=1,
-            misfire_grace_time=600  # 10 minutes grace period
-        )
-        job_ids.append(job_id_5)
+        Leads are spread evenly over `spread_minutes` (all three steps of a
+        lead move together), so a large import doesn't send all its emails
+        in the same minute.
         
-        # Day 7 (168 hours after creation)
-        run_date_7 = created_at + timedelta(days=7)
-        job_id_7 = f"nurturing_7_{lead_id}_{uuid.uuid4().hex[:8]}"
-        self.scheduler.add_job(
-            self._send_nurturing_7_job,
-            'date',
-            run_date=run_date_7,
-            args=[lead_id, first_name, last_name, email, interested_in],
-            id=job_id_7,
-            replace_existing=True,
-            max_instances=1,
-            misfire_grace_time=600  # 10 minutes grace period
-        )
-        job_ids.append(job_id_7)
+        Args:
+            leads: Dicts with lead_id, first_name, last_name, email and
+                optionally created_at (default: now) and interested_in
+            spread_minutes: Window to spread the leads over (defaults to settings)
+        
+        Returns:
+            Job IDs of the newly scheduled steps per lead ID
+        """
+        if spread_minutes is None:
+            spread_minutes = settings.nurturing_spread_minutes
+        unique = list({lead["lead_id"]: lead for lead in leads}.values())
+        if not unique:
+            return {}
         
-        logger.info(f"Scheduled nurturing sequence for {email}: Day 2 ({run_date_2}), Day 5 ({run_date_5}), Day 7 ({run_date_7}), Interested in: {interested_in}")
-        return job_ids
+        if self._bulk_insert_supported():
+            with self.jobstore.engine.begin() as connection:
+                steps = self._nurturing_steps(unique, spread_minutes, self._scheduled_nurturing_steps(connection))
+                if steps:
+                    self._insert_nurturing_jobs(connection, steps)
+            # Let the scheduler pick up the new next run time
+            self.scheduler.wakeup()
+        else:
+            steps = self._nurturing_steps(unique, spread_minutes, self._scheduled_nurturing_steps())
+            for step in steps:
+                self.scheduler.add_job(replace_existing=True, **step)
+        
+        scheduled: Dict[str, List[str]] = {}
+        for step in steps:
+            scheduled.setdefault(step["args"][1], []).append(step["id"])
+        logger.info(
+            f"Scheduled {len(steps)} nurturing emails for "
+            f"{len(scheduled)} of {len(unique)} leads (spread over {spread_minutes} minutes)"
+        )
+        return scheduled
     
     async def _send_lead_response_job(
         self,
@@ -1041,8 +1158,43 @@ class SchedulerService:
             max_instances=1
         )
         
+        # Refresh the local class schedule (first run right away)
+        if settings.schedule_replica_enabled:
+            self.scheduler.add_job(
+                refresh_schedule_replica_job,
+                'interval',
+                minutes=settings.schedule_replica_refresh_minutes,
+                next_run_time=datetime.now(),
+                id='refresh_schedule_replica',
+                replace_existing=True,
+                max_instances=1
+            )
+        
+        # Confirm pending class bookings with Wodify
+        if settings.optimistic_booking_enabled:
+            self.scheduler.add_job(
+                confirm_class_reservations_job,
+                'interval',
+                seconds=settings.booking_confirm_interval_seconds,
+                id='confirm_class_reservations',
+                replace_existing=True,
+                max_instances=1
+            )
+        
         logger.info("Automatic sync jobs scheduled (every 6 hours)")
     
+    def _schedule_shop_jobs(self):
+        """Schedule shop and auth maintenance jobs"""
+        # Delete expired refresh tokens
+        self.scheduler.add_job(
+            purge_expired_refresh_tokens_job,
+            'interval',
+            hours=1,
+            id='purge_expired_refresh_tokens',
+            replace_existing=True,
+            max_instances=1
+        )
+    
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """
         Get status of a scheduled job
@@ -1171,6 +1323,55 @@ async def sync_leads_job():
         logger.error(f"Error in leads sync job: {str(e)}")
 
 
+async def send_nurturing_email_job(
+    day: int,
+    lead_id: str,
+    first_name: str,
+    last_name: str,
+    email: str,
+    interested_in: Optional[str] = None
+):
+    """Job to send the nurturing email of one day (see schedule_nurturing_sequences)"""
+    send = getattr(scheduler_service, f"_send_nurturing_{day}_job")
+    await send(lead_id, first_name, last_name, email, interested_in)
+
+
+async def refresh_schedule_replica_job():
+    """Job to refresh the local class schedule from WODIFY"""
+    db = SessionLocal()
+    try:
+        await schedule_replica_service.refresh(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in schedule replica refresh job: {str(e)}")
+    finally:
+        db.close()
+
+
+async def confirm_class_reservations_job():
+    """Job to confirm pending class bookings with WODIFY"""
+    db = SessionLocal()
+    try:
+        await booking_service.process_due(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in class reservation confirmation job: {str(e)}")
+    finally:
+        db.close()
+
+
+async def purge_expired_refresh_tokens_job():
+    """Job to delete expired refresh tokens"""
+    db = SessionLocal()
+    try:
+        refresh_token_service.purge_expired(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in refresh token purge job: {str(e)}")
+    finally:
+        db.close()
+
+
 # Global scheduler service instance
 scheduler_service = SchedulerService()
 
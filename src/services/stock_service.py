@@ -0,0 +1,100 @@
+"""
+G3 CrossFit WODIFY Automation - Stock Service
+
+Stock reservations for shop orders. Checkout decrements the stock of all
+order lines with a single conditional UPDATE (no row locks held across the
+request) and records a reservation per product. Orders are binding as soon
+as they are placed (there is no separate payment step), so reservations
+never expire. `Product.in_stock` follows the stock level automatically.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.models.database import StockReservation
+
+
+class InsufficientStockError(Exception):
+    """Raised when at least one order line can't be reserved"""
+
+    def __init__(self, product_ids: List[str]):
+        self.product_ids = product_ids
+        super().__init__(f"Nicht genügend Lagerbestand für: {', '.join(product_ids)}")
+
+
+class StockService:
+    """Service for reserving product stock"""
+
+    def _lines_subquery(self, quantities: Dict[str, int]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build a `lines(product_id, qty)` derived table from a product → quantity mapping
+
+        A subquery rather than a CTE: pysqlite only opens its implicit
+        transaction for statements starting with UPDATE/INSERT/DELETE, so a
+        `WITH ... UPDATE` would run in autocommit mode and survive a rollback.
+        """
+        selects = []
+        params: Dict[str, Any] = {}
+        for i, (product_id, quantity) in enumerate(quantities.items()):
+            selects.append(f"SELECT :p{i} AS product_id, :q{i} AS qty")
+            params[f"p{i}"] = product_id
+            params[f"q{i}"] = quantity
+        return f"({' UNION ALL '.join(selects)}) AS lines", params
+
+    def reserve(
+        self,
+        db: Session,
+        order_id: str,
+        quantities: Dict[str, int]
+    ) -> List[StockReservation]:
+        """
+        Reserve stock for all lines of an order
+
+        All lines are decremented in one statement, each row only if enough
+        stock is left (`stock_quantity >= qty`), so concurrent checkouts can
+        never oversell. Does not commit.
+
+        Args:
+            db: Database session (inside the checkout transaction)
+            order_id: Order the reservations belong to
+            quantities: Quantity per product ID
+
+        Returns:
+            The created reservations
+
+        Raises:
+            InsufficientStockError: If any line couldn't be reserved. Other
+                lines may already be decremented, so the caller must roll back.
+        """
+        if not quantities:
+            return []
+
+        lines, params = self._lines_subquery(quantities)
+        reserved = db.execute(text(f"""
+            UPDATE products
+            SET stock_quantity = stock_quantity - lines.qty,
+                in_stock = stock_quantity - lines.qty > 0,
+                updated_at = CURRENT_TIMESTAMP
+            FROM {lines}
+            WHERE products.id = lines.product_id
+              AND products.in_stock
+              AND products.stock_quantity >= lines.qty
+            RETURNING products.id
+        """), params).scalars().all()
+
+        missing = sorted(set(quantities) - set(reserved))
+        if missing:
+            raise InsufficientStockError(missing)
+
+        reservations = [
+            StockReservation(order_id=order_id, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+        ]
+        db.add_all(reservations)
+        return reservations
+
+
+# Global stock service instance
+stock_service = StockService()
@@ -0,0 +1,448 @@
+"""
+G3 CrossFit WODIFY Automation - Training Plan Service
+
+Generates training plans in two steps:
+
+1. Skeleton: the full weekly plan for (experience level, goals, days,
+   equipment). It doesn't depend on the member, so it is cached (see
+   TRAINING_PLAN_CACHE_TTL_SECONDS) and equivalent requests reuse it;
+   concurrent requests for the same skeleton share one completion.
+2. Personalization: a short completion (TRAINING_PLAN_PERSONALIZATION_MAX_TOKENS)
+   that adapts the skeleton to the member's own wishes. Only this step
+   runs for every request.
+
+Plans can be generated as background jobs. Job state is kept in Redis if
+REDIS_HOST is configured (so any worker can answer status requests),
+otherwise in process; the generation itself runs in the worker that
+accepted the job.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+from loguru import logger
+
+from config.settings import settings
+from src.models.training_plan import TrainingPlanRequest
+from src.services.llm_cache_service import LLMResponseCache
+from src.services.llm_service import llm_service
+
+
+SKELETON_CONTEXT = """
+Du bist ein erfahrener CrossFit-Coach bei G3 CrossFit in Berlin.
+Erstelle einen allgemeingültigen Wochenplan in Markdown: pro Trainingstag
+Warm-up, Skill/Strength Part, Metcon und Cool-down mit Zeiten, dazu die
+Ruhetage und kurze Tipps. Keine persönliche Anrede, keine Namen.
+Antworte immer auf Deutsch.
+"""
+
+PERSONALIZATION_CONTEXT = """
+Du bist ein erfahrener CrossFit-Coach bei G3 CrossFit in Berlin.
+Du bekommst einen fertigen Wochenplan und die Wünsche eines Mitglieds.
+Schreibe eine kurze persönliche Einleitung (höchstens 5 Sätze) mit den
+konkreten Anpassungen des Plans an diese Wünsche. Wiederhole den Plan nicht.
+Antworte immer auf Deutsch.
+"""
+
+PERSONALIZATION_HEADING = "## Für dich angepasst\n\n"
+PLAN_SEPARATOR = "\n\n---\n\n"
+
+# How often a job status stream re-reads the job without a local update
+JOB_POLL_SECONDS = 1.0
+
+# How often a running job refreshes its updated_at (see TrainingPlanService.is_stale)
+JOB_HEARTBEAT_SECONDS = 10.0
+
+
+def example_plan(experience_level: Optional[str]) -> str:
+    """Structured example plan (used when no LLM provider is available)"""
+    return f"""# Dein personalisierter CrossFit Trainingsplan
+
+## Woche: {experience_level} Level
+
+### Tag 1: Kraft & Technik
+
+#### Warm-up (10 Minuten)
+- 5 Minuten leichtes Laufen oder Rudern
+- Dynamisches Dehnen: Armkreise, Beinschwünge, Rumpfrotationen
+- 2 Runden: 10 Air Squats, 10 Push-ups, 10 Sit-ups
+
+#### Skill/Strength Part (20 Minuten)
+**Back Squat**
+- 5x5 @ 75% 1RM
+- Fokus auf Tiefe und Kontrolle
+- 2-3 Minuten Pause zwischen den Sätzen
+
+#### Metcon (20 Minuten)
+**"Strength Builder"**
+- 5 Runden für Zeit:
+  - 10 Back Squats (60% 1RM)
+  - 15 Kettlebell Swings (24kg)
+  - 20 Double Unders
+  - 400m Lauf
+
+#### Cool-down (5 Minuten)
+- Statisches Dehnen: Quadrizeps, Hamstrings, Waden
+- Foam Rolling: Beine und Rücken
+
+---
+
+### Tag 2: Kondition & Ausdauer
+
+#### Warm-up (10 Minuten)
+- 5 Minuten Rudern
+- Beweglichkeitsübungen: Cat-Cow, Hip Circles
+- 2 Runden: 10 Burpees, 10 Mountain Climbers
+
+#### Skill/Strength Part (20 Minuten)
+**Strict Pull-ups**
+- 5x3-5 Wiederholungen
+- Falls nicht möglich: Negatives oder Band-Unterstützung
+- Fokus auf vollständige Bewegungsamplitude
+
+#### Metcon (25 Minuten)
+**"Endurance Challenge"**
+- AMRAP in 20 Minuten:
+  - 400m Lauf
+  - 15 Box Jumps (24")
+  - 10 Pull-ups
+  - 15 Wall Balls (9kg)
+
+#### Cool-down (5 Minuten)
+- Dehnen: Schultern, Rücken, Hüfte
+- Leichtes Gehen
+
+---
+
+### Tag 3: Gymnastics & Beweglichkeit
+
+#### Warm-up (10 Minuten)
+- 5 Minuten Seilspringen
+- Gymnastics Warm-up: Handstand Practice, Ring Dips
+- Beweglichkeitsübungen für Schultern und Hüfte
+
+#### Skill/Strength Part (20 Minuten)
+**Handstand Push-ups Progression**
+- 5x3-5 Wiederholungen
+- Oder Pike Push-ups falls noch nicht möglich
+- Fokus auf Stabilität und Kontrolle
+
+#### Metcon (15 Minuten)
+**"Gymnastics Flow"**
+- 3 Runden für Zeit:
+  - 15 Handstand Push-ups (oder Pike Push-ups)
+  - 20 Toes-to-Bar
+  - 25 Sit-ups
+  - 30 Double Unders
+
+#### Cool-down (5 Minuten)
+- Ausgiebiges Dehnen: Schultern, Rücken, Bauch
+- Yoga-Positionen: Downward Dog, Child's Pose
+
+---
+
+### Ruhetage
+
+**Tag 4 & Tag 7: Aktive Erholung**
+- Leichtes Cardio: 30 Minuten Spazieren, Radfahren oder Schwimmen
+- Beweglichkeitstraining: 20 Minuten Yoga oder Mobility Work
+- Foam Rolling: Ganzkörper
+
+---
+
+## Tipps für dein Training
+
+- **Konsistenz ist wichtiger als Intensität**: Regelmäßiges Training bringt mehr als sporadische Höchstleistungen
+- **Höre auf deinen Körper**: Bei Schmerzen oder extremer Müdigkeit lieber einen Tag Pause machen
+- **Ernährung**: Achte auf ausreichend Protein (ca. 1.6-2g pro kg Körpergewicht) und Hydration
+- **Schlaf**: 7-9 Stunden Schlaf sind essentiell für Regeneration und Performance
+
+Viel Erfolg bei deinem Training! 💪
+"""
+
+
+def skeleton_prompt(request: TrainingPlanRequest) -> str:
+    """Prompt of the skeleton; its normalized form is the skeleton cache key"""
+    return (
+        f"Erfahrungslevel: {request.experience_level}\n"
+        f"Ziele: {request.goals}\n"
+        f"Trainingstage pro Woche: {request.days}\n"
+        f"Ausstattung: {request.equipment}"
+    )
+
+
+class InMemoryJobStore:
+    """Process-local job state"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, tuple] = {}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        stored = self._jobs.get(job_id)
+        if stored is None:
+            return None
+        expires_at, job = stored
+        if expires_at < time.monotonic():
+            del self._jobs[job_id]
+            return None
+        return dict(job)
+
+    async def set(self, job: Dict[str, Any]):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, (expires_at, _) in self._jobs.items() if expires_at < now]:
+            del self._jobs[job_id]
+        self._jobs[job["job_id"]] = (now + self.ttl_seconds, dict(job))
+
+
+class RedisJobStore:
+    """Job state shared by all workers"""
+
+    def __init__(self, ttl_seconds: int):
+        import redis.asyncio as redis
+
+        self.ttl_seconds = ttl_seconds
+        self._redis = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            password=settings.redis_password
+        )
+
+    def _key(self, job_id: str) -> str:
+        return f"g3:training-plan:job:{job_id}"
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._key(job_id))
+        return json.loads(raw) if raw else None
+
+    async def set(self, job: Dict[str, Any]):
+        await self._redis.set(self._key(job["job_id"]), json.dumps(job), ex=self.ttl_seconds)
+
+
+class TooManyJobsError(Exception):
+    """Raised when a user already has the maximum number of running plan jobs"""
+
+
+class TrainingPlanService:
+    """Service for generating training plans"""
+
+    def __init__(self, llm=None, job_store=None):
+        self.llm = llm or llm_service
+        self.skeletons = LLMResponseCache(
+            ttl_seconds=settings.training_plan_cache_ttl_seconds,
+            max_entries=settings.training_plan_cache_max_entries,
+            semantic=False
+        )
+        if job_store is None:
+            store_class = RedisJobStore if settings.redis_host else InMemoryJobStore
+            job_store = store_class(settings.training_plan_job_ttl_seconds)
+        self.jobs = job_store
+        # Skeleton generations in flight, by cache key
+        self._pending: Dict[str, asyncio.Task] = {}
+        # Jobs running in this worker: job_id -> (user_id, task)
+        self._tasks: Dict[str, tuple] = {}
+        self._updates: Dict[str, asyncio.Event] = {}
+
+    async def skeleton(self, request: TrainingPlanRequest) -> Optional[str]:
+        """
+        Cached or newly generated skeleton
+
+        Returns:
+            The skeleton, or None if no LLM provider is available
+        """
+        prompt = skeleton_prompt(request)
+        cached = self.skeletons.get(prompt, SKELETON_CONTEXT, self.llm.model)
+        if cached is not None:
+            return cached
+
+        key = self.skeletons.scope(self.llm.model, prompt)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_skeleton(prompt))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # A cancelled request must not cancel the completion others wait for
+        return await asyncio.shield(task)
+
+    async def _generate_skeleton(self, prompt: str) -> Optional[str]:
+        skeleton = await self.llm.complete(
+            prompt,
+            context=SKELETON_CONTEXT,
+            max_tokens=settings.training_plan_skeleton_max_tokens
+        )
+        if skeleton is not None:
+            self.skeletons.put(prompt, SKELETON_CONTEXT, self.llm.model, skeleton)
+        return skeleton
+
+    @staticmethod
+    def personalization_prompt(request: TrainingPlanRequest, skeleton: str) -> str:
+        return f"Wünsche des Mitglieds:\n{request.prompt}\n\nWochenplan:\n{skeleton}"
+
+    async def generate(self, request: TrainingPlanRequest) -> str:
+        """
+        Generate a personalized plan
+
+        Args:
+            request: Plan parameters and the member's wishes
+
+        Returns:
+            Markdown plan (the example plan if no LLM provider is available)
+        """
+        skeleton = await self.skeleton(request)
+        if skeleton is None:
+            return example_plan(request.experience_level)
+        if not request.prompt.strip():
+            return skeleton
+
+        personalization = await self.llm.complete(
+            self.personalization_prompt(request, skeleton),
+            context=PERSONALIZATION_CONTEXT,
+            max_tokens=settings.training_plan_personalization_max_tokens
+        )
+        if not personalization:
+            return skeleton
+        return f"{PERSONALIZATION_HEADING}{personalization}{PLAN_SEPARATOR}{skeleton}"
+
+    async def stream(self, request: TrainingPlanRequest) -> AsyncIterator[str]:
+        """
+        Generate a personalized plan as text deltas
+
+        The personalization is streamed as it is generated, followed by the
+        skeleton in one piece.
+        """
+        skeleton = await self.skeleton(request)
+        if skeleton is None:
+            yield example_plan(request.experience_level)
+            return
+
+        if request.prompt.strip():
+            deltas = self.llm.stream_response(
+                self.personalization_prompt(request, skeleton),
+                context=PERSONALIZATION_CONTEXT,
+                fallback="",
+                max_tokens=settings.training_plan_personalization_max_tokens,
+                cache=False
+            )
+            personalized = False
+            try:
+                async for delta in deltas:
+                    if not delta:
+                        continue
+                    if not personalized:
+                        personalized = True
+                        yield PERSONALIZATION_HEADING
+                    yield delta
+            finally:
+                await deltas.aclose()
+            if personalized:
+                yield PLAN_SEPARATOR
+        yield skeleton
+
+    def _notify(self, job_id: str):
+        event = self._updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _save(self, job: Dict[str, Any]):
+        job["updated_at"] = datetime.utcnow().isoformat()
+        await self.jobs.set(job)
+        self._notify(job["job_id"])
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        # Lets other workers tell a running job from one whose worker died
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            job["updated_at"] = datetime.utcnow().isoformat()
+            await self.jobs.set(job)
+
+    async def submit(self, user_id: str, request: TrainingPlanRequest) -> Dict[str, Any]:
+        """
+        Start generating a plan in the background
+
+        Returns:
+            The queued job
+
+        Raises:
+            TooManyJobsError: If the user already has too many running jobs
+        """
+        running = sum(1 for owner, _ in self._tasks.values() if owner == user_id)
+        if running >= settings.training_plan_max_jobs_per_user:
+            raise TooManyJobsError()
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "status": "queued",
+            "plan": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        }
+        await self._save(job)
+        task = asyncio.ensure_future(self._run(job, request))
+        self._tasks[job["job_id"]] = (user_id, task)
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+        return job
+
+    async def _run(self, job: Dict[str, Any], request: TrainingPlanRequest):
+        job = {**job, "status": "running"}
+        await self._save(job)
+        heartbeat = asyncio.ensure_future(self._heartbeat(job))
+        try:
+            job["plan"] = await self.generate(request)
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            job["status"] = "failed"
+            job["error"] = "Abgebrochen"
+            raise
+        except Exception as e:
+            logger.error(f"Training plan job {job['job_id']} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = "Fehler beim Generieren des Trainingsplans"
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            job["finished_at"] = datetime.utcnow().isoformat()
+            await self._save(job)
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Job state, or None if unknown, expired or owned by another user"""
+        job = await self.jobs.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return job
+
+    @staticmethod
+    def is_stale(job: Dict[str, Any]) -> bool:
+        """True if an unfinished job's worker stopped updating it (e.g. the worker died)"""
+        if job["status"] in ("completed", "failed"):
+            return False
+        updated_at = datetime.fromisoformat(job.get("updated_at") or job["created_at"])
+        return (datetime.utcnow() - updated_at).total_seconds() > settings.training_plan_job_stale_seconds
+
+    async def wait_for_update(self, job_id: str, timeout: float = JOB_POLL_SECONDS):
+        """Wait until a job of this worker changes, at most timeout seconds"""
+        if job_id not in self._tasks:
+            await asyncio.sleep(timeout)
+            return
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def aclose(self):
+        """Cancel running jobs (application shutdown)"""
+        tasks = [task for _, task in self._tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global training plan service instance
+training_plan_service = TrainingPlanService()
@@ -1,16 +1,107 @@
 """
 Wodify API Service - Handles all communication with Wodify API
+
+Every request goes through the circuit breaker of its endpoint group
+(schedule, bookings, members, leads, ...) and one adaptive concurrency
+limit for all outbound calls (see src/utils/resilience.py). While Wodify
+is down, calls of the affected group fail right away instead of waiting
+for timeouts and retries.
+
+Only idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE) are retried,
+and only on timeouts/connection errors and retryable statuses (408, 429,
+5xx gateway errors), honoring Retry-After. Requests that never reached
+Wodify (connection refused) are retried for every method.
+
+Requests respect the deadline of the incoming request (see
+resilience.deadline()): every attempt is cut off when it runs out, and a
+retry that would wait past it isn't made. Schedule reads can be hedged
+(WODIFY_HEDGING): if Wodify hasn't answered within the p95 latency of
+the endpoint group, a second request is sent and the first answer wins.
+get_schedule() falls back to the last schedule fetched for the same
+range if Wodify fails or the deadline passes.
+
+get_member(), get_lead() and get_class_details() go through batch loaders
+(see src/utils/batching.py): lookups made in the same event loop tick are
+sent as one `?ids=a,b,c` request if WODIFY_BATCH_LOOKUPS is enabled (the
+API accepts ID lists), else as a fan-out of at most
+WODIFY_LOOKUP_CONCURRENCY single requests.
 """
 
+import asyncio
+import email.utils
+import random
+import time
 import httpx
 import logging
-from typing import List, Dict, Optional, Any
-from datetime import datetime, date, timedelta
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from collections import OrderedDict, deque
+from functools import partial
+from typing import Deque, List, Dict, Optional, Any, Tuple
+from datetime import datetime, date, timedelta, timezone
 from config.settings import settings
+from src.utils.batching import BatchLoader
+from src.utils.resilience import (
+    AIMDLimiter, CircuitBreaker, CircuitOpenError, DeadlineExceededError, remaining_time
+)
 
 logger = logging.getLogger(__name__)
 
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Statuses that signal Wodify is overloaded (lower the concurrency limit)
+OVERLOAD_STATUS_CODES = {429, 503, 504}
+
+# First path segment -> circuit breaker group
+ENDPOINT_GROUPS = {
+    "classes": "schedule",
+    "class-types": "schedule",
+    "trainers": "schedule",
+    "bookings": "bookings",
+    "waitlist": "bookings",
+    "members": "members",
+    "memberships": "members",
+    "membership-packages": "members",
+    "leads": "leads",
+    "health": "health",
+}
+
+
+# Latencies kept per endpoint group for the hedging delay
+LATENCY_SAMPLES = 200
+
+# Schedules kept for the fallback (one per date range and class type)
+SCHEDULE_CACHE_MAX_ENTRIES = 64
+
+# Batched lookups: loader -> (endpoint, key of one entity, key of a list, ID field, ID query parameter)
+LOOKUP_ENTITIES = {
+    "members": ("members", "member", "members", "client_id", "client_id"),
+    "leads": ("leads", "lead", "leads", "lead_id", "lead_id"),
+    "classes": ("classes", "class", "classes", "id", None),
+}
+
+
+def endpoint_group(endpoint: str) -> str:
+    """Circuit breaker group of an API endpoint"""
+    segment = endpoint.strip("/").split("/", 1)[0]
+    return ENDPOINT_GROUPS.get(segment, segment)
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Seconds of a Retry-After header (delay or HTTP date), None if absent or invalid"""
+    value = response.headers.get("Retry-After")
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
 
 class WodifyAPIService:
     """Service for interacting with Wodify API"""
@@ -24,58 +115,295 @@ class WodifyAPIService:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.limiter = AIMDLimiter(
+            "wodify",
+            initial_limit=settings.wodify_concurrency_initial,
+            min_limit=settings.wodify_concurrency_min,
+            max_limit=settings.wodify_concurrency_max,
+            queue_timeout=settings.wodify_concurrency_queue_timeout_seconds
+        )
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self._schedule_cache: "OrderedDict[Tuple, Tuple[datetime, List[Dict[str, Any]]]]" = OrderedDict()
+        self.loaders = {
+            name: BatchLoader(name, partial(self._load_entities, name), settings.wodify_batch_max_size)
+            for name in LOOKUP_ENTITIES
+        }
+    
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=30.0)
+    
+    def _breaker(self, group: str) -> CircuitBreaker:
+        breaker = self.breakers.get(group)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                group,
+                failure_threshold=settings.wodify_breaker_failure_threshold,
+                recovery_seconds=settings.wodify_breaker_recovery_seconds
+            )
+            self.breakers[group] = breaker
+        return breaker
+    
+    def resilience_status(self) -> Dict[str, Any]:
+        """Circuit breaker states per endpoint group, concurrency limit and hedging (this worker)"""
+        return {
+            "circuit_breakers": {group: breaker.snapshot() for group, breaker in sorted(self.breakers.items())},
+            "concurrency": self.limiter.snapshot(),
+            "hedging": {
+                "enabled": settings.wodify_hedging,
+                "hedged_requests": self.hedged_requests,
+                "hedge_wins": self.hedge_wins,
+                "p95_seconds": {
+                    group: round(delay, 3)
+                    for group in sorted(self._latencies)
+                    if (delay := self._hedge_delay(group)) is not None
+                },
+            },
+            "batching": {name: loader.snapshot() for name, loader in self.loaders.items()},
+        }
+    
+    async def _fetch_entity(self, name: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        """One entity by ID (None if Wodify doesn't know it, raises on other failures)"""
+        endpoint, single_key, _, _, id_param = LOOKUP_ENTITIES[name]
+        params = None
+        if id_param:
+            params = {id_param: entity_id, "location_id": self.location_id}
+        try:
+            response = await self._make_request(
+                "GET", f"{endpoint}/{entity_id}", params=params, hedge=name == "classes"
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        return response.get(single_key, None)
+    
+    async def _load_entities(self, name: str, ids: List[str]) -> Dict[str, Any]:
+        """
+        Batch function of a loader: one list request, or a bounded fan-out of single requests
+
+        A failed single request is returned as the exception of its ID, so
+        only the lookups of that ID fail.
+        """
+        endpoint, _, list_key, id_field, _ = LOOKUP_ENTITIES[name]
+        if settings.wodify_batch_lookups and len(ids) > 1:
+            params = {"ids": ",".join(ids), "location_id": self.location_id}
+            response = await self._make_request("GET", endpoint, params=params, hedge=name == "classes")
+            found = {str(item.get(id_field) or item.get("id")): item for item in response.get(list_key, [])}
+            return {entity_id: found.get(entity_id) for entity_id in ids}
+        
+        semaphore = asyncio.Semaphore(max(settings.wodify_lookup_concurrency, 1))
+        
+        async def fetch(entity_id: str) -> Any:
+            async with semaphore:
+                try:
+                    return await self._fetch_entity(name, entity_id)
+                except Exception as e:
+                    return e
+        
+        return dict(zip(ids, await asyncio.gather(*(fetch(entity_id) for entity_id in ids))))
+    
+    async def _lookup(self, name: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.loaders[name].load(entity_id)
+        except Exception as e:
+            logger.error(f"Failed to fetch {name} {entity_id}: {str(e)}")
+            return None
+    
+    def _hedge_delay(self, group: str) -> Optional[float]:
+        """p95 latency of an endpoint group, None until enough requests were measured"""
+        samples = self._latencies.get(group)
+        if not samples or len(samples) < max(settings.wodify_hedge_min_samples, 1):
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict],
+        data: Optional[Dict],
+        group: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """One HTTP request within the concurrency limit"""
+        async with self.limiter.slot() as slot:
+            started = time.monotonic()
+            try:
+                async with self._client() as client:
+                    response = await client.request(
+                        method=method,
+                        url=url,
+                        headers=headers or self.headers,
+                        params=params,
+                        json=data
+                    )
+                    response.raise_for_status()
+                    result = response.json()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in OVERLOAD_STATUS_CODES:
+                    slot.overload()
+                else:
+                    slot.success()
+                raise
+            except httpx.TimeoutException:
+                slot.overload()
+                raise
+            slot.success()
+            self._latencies.setdefault(group, deque(maxlen=LATENCY_SAMPLES)).append(time.monotonic() - started)
+            return result
+    
+    async def _attempt(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict],
+        data: Optional[Dict],
+        group: str,
+        hedge: bool,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """One attempt; hedged reads send a second request once the first is slower than the p95"""
+        delay = None
+        if hedge and settings.wodify_hedging and method in IDEMPOTENT_METHODS:
+            delay = self._hedge_delay(group)
+        if delay is None:
+            return await self._send(method, url, params, data, group, headers)
+        
+        first = asyncio.ensure_future(self._send(method, url, params, data, group, headers))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Hedge only with spare capacity, never to push an overloaded Wodify further
+            if not done and self.limiter.in_flight < self.limiter.capacity:
+                self.hedged_requests += 1
+                tasks.append(asyncio.ensure_future(self._send(method, url, params, data, group, headers)))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _retry_delay(method: str, attempt: int, error: Exception) -> Optional[float]:
+        """Seconds to wait before retrying a failed attempt, None if it must not be retried"""
+        if attempt >= settings.wodify_retry_attempts:
+            return None
+        retry_after = None
+        if isinstance(error, httpx.HTTPStatusError):
+            if method not in IDEMPOTENT_METHODS or error.response.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+            retry_after = retry_after_seconds(error.response)
+        elif isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            pass  # The request never reached Wodify
+        elif not (isinstance(error, httpx.RequestError) and method in IDEMPOTENT_METHODS):
+            return None
+        if retry_after is not None:
+            # Don't hold the caller longer than allowed; fail now instead
+            return retry_after if retry_after <= settings.wodify_retry_max_wait_seconds else None
+        backoff = settings.wodify_retry_backoff_seconds * 2 ** (attempt - 1)
+        return min(backoff * random.uniform(0.5, 1.0), settings.wodify_retry_max_wait_seconds)
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.RequestError)),
-        reraise=True
-    )
     async def _make_request(
         self, 
         method: str, 
         endpoint: str, 
         params: Optional[Dict] = None,
-        data: Optional[Dict] = None
+        data: Optional[Dict] = None,
+        hedge: bool = False,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Make HTTP request to Wodify API with automatic retry logic
+        Make HTTP request to Wodify API with circuit breaker and retries
         
         Args:
             method: HTTP method (GET, POST, DELETE, etc.)
             endpoint: API endpoint path
             params: Query parameters
             data: Request body data
+            hedge: Hedge slow attempts (idempotent methods, if WODIFY_HEDGING is on)
+            idempotency_key: Sent as Idempotency-Key header, so Wodify can
+                recognise a repeated write
             
         Returns:
             Response JSON data
             
         Raises:
+            CircuitOpenError: If the circuit of the endpoint group is open
+            ConcurrencyLimitError: If no concurrency slot became free in time
+            DeadlineExceededError: If the deadline of the request ran out
             httpx.HTTPStatusError: For HTTP errors (after retries)
             httpx.RequestError: For request errors (after retries)
         """
         url = f"{self.api_url}/{endpoint}"
-        
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.request(
-                    method=method,
-                    url=url,
-                    headers=self.headers,
-                    params=params,
-                    json=data
-                )
-                response.raise_for_status()
-                return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"Wodify API HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except httpx.RequestError as e:
-            logger.error(f"Wodify API request error: {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"Wodify API unexpected error: {str(e)}")
-            raise
+        method = method.upper()
+        group = endpoint_group(endpoint)
+        breaker = self._breaker(group)
+        headers = {**self.headers, "Idempotency-Key": idempotency_key} if idempotency_key else None
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            left = remaining_time()
+            if left is not None and left <= 0:
+                raise DeadlineExceededError(f"Deadline exceeded before Wodify {method} {endpoint}")
+            breaker.allow()
+            try:
+                request = self._attempt(method, url, params, data, group, hedge, headers)
+                result = await (request if left is None else asyncio.wait_for(request, timeout=left))
+            except asyncio.TimeoutError:
+                breaker.release()
+                raise DeadlineExceededError(f"Deadline exceeded during Wodify {method} {endpoint}")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in RETRYABLE_STATUS_CODES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                logger.error(f"Wodify API HTTP error: {e.response.status_code} - {e.response.text}")
+                delay = self._retry_delay(method, attempt, e)
+                if delay is None:
+                    raise
+                error = e
+            except httpx.RequestError as e:
+                breaker.record_failure()
+                logger.error(f"Wodify API request error: {str(e)}")
+                delay = self._retry_delay(method, attempt, e)
+                if delay is None:
+                    raise
+                error = e
+            except Exception as e:
+                breaker.release()
+                logger.error(f"Wodify API unexpected error: {str(e)}")
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+                return result
+            
+            left = remaining_time()
+            if left is not None and delay >= left:
+                logger.warning(f"Not retrying Wodify {method} {endpoint}, the deadline ends in {max(left, 0):.1f}s")
+                raise error
+            logger.warning(
+                f"Retrying Wodify {method} {endpoint} in {delay:.1f}s "
+                f"(attempt {attempt + 1}/{settings.wodify_retry_attempts})"
+            )
+            await asyncio.sleep(delay)
     
     async def get_schedule(
         self, 
@@ -94,11 +422,68 @@ class WodifyAPIService:
         Returns:
             List of class objects
         """
+        return (await self.get_schedule_snapshot(start_date, end_date, class_type))["classes"]
+    
+    async def get_schedule_snapshot(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        class_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get class schedule from Wodify, or the last one fetched if Wodify can't answer in time
+        
+        Args:
+            start_date: Start date for schedule (default: today)
+            end_date: End date for schedule (default: 7 days from start)
+            class_type: Filter by class type (optional)
+        
+        Returns:
+            {"classes": [...], "stale": bool, "fetched_at": ISO timestamp or None};
+            stale is True for a cached schedule, no schedule at all gives []
+        """
         if not start_date:
             start_date = date.today()
         if not end_date:
             end_date = start_date + timedelta(days=7)
         
+        key = (start_date.isoformat(), end_date.isoformat(), class_type)
+        try:
+            classes = await self.fetch_classes(start_date, end_date, class_type)
+        except Exception as e:
+            cached = self._schedule_cache.get(key)
+            if cached is not None:
+                fetched_at, classes = cached
+                logger.warning(f"Serving schedule fetched at {fetched_at.isoformat()}: {str(e)}")
+                return {"classes": classes, "stale": True, "fetched_at": fetched_at.isoformat()}
+            logger.error(f"Failed to fetch schedule: {str(e)}")
+            # Return empty list on error to prevent frontend crashes
+            return {"classes": [], "stale": False, "fetched_at": None}
+        
+        fetched_at = datetime.utcnow()
+        self._schedule_cache[key] = (fetched_at, classes)
+        self._schedule_cache.move_to_end(key)
+        while len(self._schedule_cache) > SCHEDULE_CACHE_MAX_ENTRIES:
+            self._schedule_cache.popitem(last=False)
+        return {"classes": classes, "stale": False, "fetched_at": fetched_at.isoformat()}
+    
+    async def fetch_classes(
+        self,
+        start_date: date,
+        end_date: date,
+        class_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get class schedule from Wodify, raising on failure
+        
+        Args:
+            start_date: Start date for schedule
+            end_date: End date for schedule
+            class_type: Filter by class type (optional)
+        
+        Returns:
+            List of class objects
+        """
         params = {
             "location_id": self.location_id,
             "start_date": start_date.isoformat(),
@@ -108,13 +493,8 @@ class WodifyAPIService:
         if class_type:
             params["class_type"] = class_type
         
-        try:
-            response = await self._make_request("GET", "classes", params=params)
-            return response.get("classes", [])
-        except Exception as e:
-            logger.error(f"Failed to fetch schedule: {str(e)}")
-            # Return empty list on error to prevent frontend crashes
-            return []
+        response = await self._make_request("GET", "classes", params=params, hedge=True)
+        return response.get("classes", [])
     
     async def get_class_details(self, class_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -126,19 +506,15 @@ class WodifyAPIService:
         Returns:
             Class details or None if not found
         """
-        try:
-            response = await self._make_request("GET", f"classes/{class_id}")
-            return response.get("class", None)
-        except Exception as e:
-            logger.error(f"Failed to fetch class details for {class_id}: {str(e)}")
-            return None
+        return await self._lookup("classes", class_id)
     
     async def book_class(
         self, 
         class_id: str, 
         user_id: str,
         user_email: str,
-        user_name: str
+        user_name: str,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Book a class for a user
@@ -148,6 +524,7 @@ class WodifyAPIService:
             user_id: User ID
             user_email: User email
             user_name: User full name
+            idempotency_key: Key that makes a resent request a no-op at Wodify
         
         Returns:
             Booking confirmation
@@ -161,7 +538,9 @@ class WodifyAPIService:
         }
         
         try:
-            response = await self._make_request("POST", "bookings", data=data)
+            response = await self._make_request(
+                "POST", "bookings", data=data, idempotency_key=idempotency_key
+            )
             logger.info(f"Class booked successfully: {class_id} for user {user_email}")
             return response
         except Exception as e:
@@ -201,7 +580,8 @@ class WodifyAPIService:
         class_id: str,
         user_id: str,
         user_email: str,
-        user_name: str
+        user_name: str,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Add user to class waitlist
@@ -211,6 +591,7 @@ class WodifyAPIService:
             user_id: User ID
             user_email: User email
             user_name: User full name
+            idempotency_key: Key that makes a resent request a no-op at Wodify
         
         Returns:
             Waitlist confirmation
@@ -224,7 +605,9 @@ class WodifyAPIService:
         }
         
         try:
-            response = await self._make_request("POST", "waitlist", data=data)
+            response = await self._make_request(
+                "POST", "waitlist", data=data, idempotency_key=idempotency_key
+            )
             logger.info(f"User added to waitlist: {class_id} for {user_email}")
             return response
         except Exception as e:
@@ -253,6 +636,30 @@ class WodifyAPIService:
             logger.error(f"Failed to fetch bookings for user {user_id}: {str(e)}")
             return []
     
+    async def find_booking(self, user_id: str, class_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Find an active booking of a user for a class
+        
+        Unlike get_user_bookings, errors are raised: "no booking" must not
+        be assumed when Wodify couldn't be asked.
+        
+        Args:
+            user_id: User ID
+            class_id: Wodify class ID
+        
+        Returns:
+            The booking, or None if the user hasn't booked the class
+        """
+        params = {
+            "user_id": user_id,
+            "location_id": self.location_id
+        }
+        response = await self._make_request("GET", "bookings", params=params)
+        for booking in response.get("bookings", []):
+            if str(booking.get("class_id")) == class_id and str(booking.get("status", "")).lower() != "cancelled":
+                return booking
+        return None
+    
     async def get_class_types(self) -> List[Dict[str, Any]]:
         """
         Get all available class types
@@ -265,7 +672,7 @@ class WodifyAPIService:
         }
         
         try:
-            response = await self._make_request("GET", "class-types", params=params)
+            response = await self._make_request("GET", "class-types", params=params, hedge=True)
             return response.get("class_types", [])
         except Exception as e:
             logger.error(f"Failed to fetch class types: {str(e)}")
@@ -283,7 +690,7 @@ class WodifyAPIService:
         }
         
         try:
-            response = await self._make_request("GET", "trainers", params=params)
+            response = await self._make_request("GET", "trainers", params=params, hedge=True)
             return response.get("trainers", [])
         except Exception as e:
             logger.error(f"Failed to fetch trainers: {str(e)}")
@@ -402,17 +809,7 @@ class WodifyAPIService:
         Returns:
             Member details or None if not found
         """
-        params = {
-            "client_id": client_id,
-            "location_id": self.location_id
-        }
-        
-        try:
-            response = await self._make_request("GET", f"members/{client_id}", params=params)
-            return response.get("member", None)
-        except Exception as e:
-            logger.error(f"Failed to fetch member {client_id}: {str(e)}")
-            return None
+        return await self._lookup("members", client_id)
     
     async def update_membership(
         self,
@@ -494,17 +891,7 @@ class WodifyAPIService:
         Returns:
             Lead details or None if not found
         """
-        params = {
-            "lead_id": lead_id,
-            "location_id": self.location_id
-        }
-        
-        try:
-            response = await self._make_request("GET", f"leads/{lead_id}", params=params)
-            return response.get("lead", None)
-        except Exception as e:
-            logger.error(f"Failed to fetch lead {lead_id}: {str(e)}")
-            return None
+        return await self._lookup("leads", lead_id)
     
     async def update_lead(
         self,
@@ -667,6 +1054,9 @@ class WodifyAPIService:
             response = await self._make_request("GET", "health", params={"location_id": self.location_id})
             health_status["status"] = "healthy"
             health_status["response"] = response
+        except CircuitOpenError as e:
+            health_status["status"] = "circuit_open"
+            health_status["error"] = str(e)
         except httpx.HTTPStatusError as e:
             health_status["status"] = "error"
             health_status["error"] = f"HTTP {e.response.status_code}: {e.response.text}"
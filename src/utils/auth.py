@@ -4,23 +4,36 @@ G3 CrossFit WODIFY Automation - Authentication Utilities
 JWT token creation and verification utilities.
 """
 
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+import bcrypt
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from loguru import logger
 
 from config.settings import settings
 
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# Worker threads for password hashing (bcrypt releases the GIL), created on first use
+_password_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against a hash
     
+    Blocks for the duration of one bcrypt round; use verify_password_async
+    in request handlers.
+    
     Args:
         plain_password: Plain text password
         hashed_password: Hashed password
@@ -28,12 +41,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if password matches, False otherwise
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
+    except ValueError:
+        # Not a bcrypt hash
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """
-    Hash a password
+    Hash a password with the configured bcrypt cost (BCRYPT_ROUNDS)
+    
+    Blocks like verify_password; use get_password_hash_async in request handlers.
     
     Args:
         password: Plain text password
@@ -41,7 +60,60 @@ def get_password_hash(password: str) -> str:
     Returns:
         Hashed password
     """
-    return pwd_context.hash(password)
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
+    return bcrypt.hashpw(_password_bytes(password), salt).decode("utf-8")
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Check whether a hash was created with a different cost than configured
+    
+    Args:
+        hashed_password: Stored bcrypt hash ($2b$12$...)
+        
+    Returns:
+        True if the password should be hashed again on the next login
+    """
+    try:
+        _, ident, rounds, _ = hashed_password.split("$", 3)
+        return ident != "2b" or int(rounds) != settings.bcrypt_rounds
+    except ValueError:
+        return True
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            thread_name_prefix="password-hash"
+        )
+    return _password_executor
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password in the password hashing pool without blocking the event loop
+    
+    At most PASSWORD_HASH_WORKERS hashes run at once; further calls wait
+    for a free worker, so a login storm can't starve other requests of CPU.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the password hashing pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), get_password_hash, password)
+
+
+def shutdown_password_executor():
+    """Stop the password hashing workers (application shutdown)"""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -56,13 +128,15 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         Encoded JWT token
     """
     to_encode = data.copy()
+    now = datetime.utcnow()
     
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.jwt_access_token_expire_minutes)
+        expire = now + timedelta(minutes=settings.jwt_access_token_expire_minutes)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    # iat/jti identify the token in the principal cache
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex, "type": "access"})
     
     encoded_jwt = jwt.encode(
         to_encode,
@@ -73,6 +147,26 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     return encoded_jwt
 
 
+def principal_claims(user) -> Dict[str, Any]:
+    """
+    Build the access token claims for a user
+    
+    With JWT_EMBED_PRINCIPAL_CLAIMS the account status is embedded, so
+    authenticated requests don't need to load the user (see
+    src/services/principal_cache_service.py).
+    
+    Args:
+        user: User database object
+        
+    Returns:
+        Claims for create_access_token
+    """
+    claims = {"sub": user.id, "email": user.email}
+    if settings.jwt_embed_principal_claims:
+        claims.update({"is_active": bool(user.is_active), "is_admin": bool(user.is_admin)})
+    return claims
+
+
 def create_refresh_token(data: Dict[str, Any]) -> str:
     """
     Create a JWT refresh token
@@ -86,7 +180,8 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.jwt_refresh_token_expire_days)
     
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti makes every token unique (the token store is keyed by its hash)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": "refresh"})
     
     encoded_jwt = jwt.encode(
         to_encode,
@@ -0,0 +1,82 @@
+"""
+G3 CrossFit WODIFY Automation - Batching
+
+BatchLoader coalesces lookups by key (DataLoader pattern): all load()
+calls made within the same event loop tick are collected and passed to
+one call of the batch function, split into batches of at most
+`max_batch_size` keys. Keys requested several times in a tick are loaded
+once. Nothing is kept after the batch, so data is never older than the
+lookup.
+
+If the batch function raises, every load() of the batch raises; it can
+also return an exception as the result of a single key, then only the
+loads of that key raise.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+BatchFunction = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """Coalesces load(key) calls of one loop tick into batch function calls"""
+
+    def __init__(self, name: str, batch_fn: BatchFunction, max_batch_size: int = 100):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.loads = 0
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            chunk = keys[i:i + self.max_batch_size]
+            task = asyncio.ensure_future(self._run(chunk, [pending[key] for key in chunk]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: List[Hashable], futures: List[asyncio.Future]):
+        self.batches += 1
+        try:
+            results = await self.batch_fn(keys)
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in zip(keys, futures):
+            if future.done():
+                continue
+            result = results.get(key)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Result of the batch function for `key` (None if it returned none)
+
+        Raises:
+            Exception: Whatever the batch function raised for the batch of
+                `key` or returned for `key`
+        """
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = loop.create_future()
+            self._pending[key] = future
+        return await asyncio.shield(future)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"loads": self.loads, "batches": self.batches}
@@ -0,0 +1,52 @@
+"""
+G3 CrossFit WODIFY Automation - Rate Limiting
+
+The one slowapi limiter shared by the app and all routers. With REDIS_HOST
+configured, counters live in Redis, so a limit like 5/minute holds across
+all workers and restarts; otherwise they are kept in process. If Redis
+becomes unreachable, limits are enforced per process until it is back.
+
+The default sliding-window-counter strategy costs one Redis round trip
+(a single Lua script) per checked limit and doesn't allow the bursts of
+up to twice the limit that fixed windows allow at window boundaries.
+"""
+
+from urllib.parse import quote
+
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from config.settings import settings
+
+
+def rate_limit_storage_uri() -> str:
+    """Storage URI for the limits library (Redis if configured, otherwise in-memory)"""
+    if settings.rate_limit_storage_uri:
+        return settings.rate_limit_storage_uri
+    if not settings.redis_host:
+        return "memory://"
+    credentials = f":{quote(settings.redis_password, safe='')}@" if settings.redis_password else ""
+    return f"redis://{credentials}{settings.redis_host}:{settings.redis_port}/{settings.redis_db}"
+
+
+def create_limiter(storage_uri: str = None) -> Limiter:
+    """
+    Create a limiter with the configured strategy
+
+    Args:
+        storage_uri: Storage URI (defaults to rate_limit_storage_uri())
+
+    Returns:
+        slowapi Limiter
+    """
+    return Limiter(
+        key_func=get_remote_address,
+        strategy=settings.rate_limit_strategy,
+        storage_uri=storage_uri or rate_limit_storage_uri(),
+        in_memory_fallback_enabled=True,
+        key_prefix="g3"
+    )
+
+
+# Global rate limiter instance
+limiter = create_limiter()
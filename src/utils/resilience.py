@@ -0,0 +1,266 @@
+"""
+G3 CrossFit WODIFY Automation - Resilience
+
+Building blocks for calls to external APIs:
+
+- CircuitBreaker: after `failure_threshold` consecutive failures the
+  circuit opens and calls fail right away with CircuitOpenError instead of
+  waiting for timeouts. After `recovery_seconds` one probe call is let
+  through (half-open); its success closes the circuit, its failure opens
+  it again.
+- AIMDLimiter: adaptive concurrency limit. Every successful call raises
+  the limit by 1/limit (about +1 per round of calls), an overload signal
+  (429/503, timeouts) halves it - at most once per round, since calls
+  started before the last decrease don't decrease it again.
+- deadline(): end-to-end time budget of the current request. Nested
+  scopes can only shorten it; calls made within the scope read what is
+  left with remaining_time().
+
+State is kept per process.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class ConcurrencyLimitError(Exception):
+    """Raised if no slot of the concurrency limit became free in time"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised if the deadline of the current request has passed (or would pass)"""
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block with a deadline `seconds` from now (None: keep the current one)"""
+    current = _deadline.get()
+    if seconds is not None:
+        ends_at = time.monotonic() + seconds
+        if current is None or ends_at < current:
+            current = ends_at
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current deadline (None without deadline, may be negative)"""
+    ends_at = _deadline.get()
+    if ends_at is None:
+        return None
+    return ends_at - time.monotonic()
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _retry_in(self) -> float:
+        return max(self.opened_at + self.recovery_seconds - self.clock(), 0.0)
+
+    def allow(self):
+        """
+        Admit one call
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with the
+                probe call still running
+        """
+        if self.state == self.OPEN:
+            if self._retry_in() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self._retry_in())
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._probing = True
+
+    def record_success(self):
+        """The service answered (closes a half-open circuit)"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        """The service failed or didn't answer"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def release(self):
+        """An admitted call ended without a result (e.g. cancelled)"""
+        self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.state == self.OPEN and self._retry_in() == 0:
+            state = self.HALF_OPEN
+        else:
+            state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(self._retry_in(), 1) if state == self.OPEN else 0.0,
+        }
+
+
+class LimiterSlot:
+    """Outcome of one call within the limiter"""
+
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome: Optional[str] = None
+
+    def success(self):
+        self.outcome = "success"
+
+    def overload(self):
+        self.outcome = "overload"
+
+
+class AIMDLimiter:
+    """Adaptive (additive increase / multiplicative decrease) concurrency limit"""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        backoff: float = 0.5,
+        queue_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = float("-inf")
+        self.decreases = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.capacity:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def _acquire(self):
+        if self.in_flight < self.capacity and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ConcurrencyLimitError(f"No free slot of '{self.name}' within {self.queue_timeout}s")
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted, but the caller is gone
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self, slot: LimiterSlot, started: float):
+        self.in_flight -= 1
+        if slot.outcome == "success":
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif slot.outcome == "overload" and started >= self._last_decrease:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = self.clock()
+            self.decreases += 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[LimiterSlot]:
+        """
+        Hold one slot of the limit for a call; report the outcome on the slot
+
+        Raises:
+            ConcurrencyLimitError: If no slot became free within queue_timeout
+        """
+        await self._acquire()
+        slot = LimiterSlot()
+        started = self.clock()
+        try:
+            yield slot
+        finally:
+            self._release(slot, started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "decreases": self.decreases,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,52 @@
+"""
+G3 CrossFit WODIFY Automation - Streaming Responses
+
+Server-Sent Events for streamed AI answers. Events are produced by an
+async generator that is only advanced when the previous event has been
+handed to the server, and uvicorn waits for the socket to drain before
+accepting more data, so a slow client slows down the producer instead of
+piling up buffered text.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+import anyio
+from starlette.responses import StreamingResponse
+from starlette.types import Send
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep nginx from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    text/event-stream response that closes its generator right away
+
+    Starlette stops iterating when the client disconnects but leaves the
+    generator suspended until it is garbage collected; closing it here
+    releases the upstream stream (and its LLM slot) immediately.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: AsyncIterator[str], **kwargs):
+        headers = {**SSE_HEADERS, **(kwargs.pop("headers", None) or {})}
+        super().__init__(content, headers=headers, **kwargs)
+
+    async def stream_response(self, send: Send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
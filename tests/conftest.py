@@ -4,8 +4,10 @@ Test configuration and fixtures
 
 import pytest
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 # Set test environment
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
@@ -19,17 +21,62 @@ from src.models.database import Base
 
 
 @pytest.fixture(scope="function")
-def test_db():
-    """Create a test database"""
-    engine = create_engine("sqlite:///:memory:")
+def test_engine():
+    """Create a test database engine"""
+    # One shared connection, so the in-memory database is visible from the
+    # threads TestClient runs endpoints in
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
     Base.metadata.create_all(bind=engine)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    yield engine
+    
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def test_db(test_engine):
+    """Create a test database"""
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
     session = SessionLocal()
     
     yield session
     
     session.close()
-    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def query_budget(test_engine):
+    """
+    Assert that a block executes at most a fixed number of SQL statements
+
+    Usage:
+        with query_budget(1) as statements:
+            client.get("/api/shop/cart")
+    """
+    @contextmanager
+    def _budget(max_queries: int):
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine, "before_cursor_execute", _record)
+
+        assert len(statements) <= max_queries, (
+            f"Expected at most {max_queries} queries, got {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+    return _budget
 
 
 @pytest.fixture
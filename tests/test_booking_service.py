@@ -0,0 +1,326 @@
+"""
+Tests for optimistic class bookings and their confirmation with Wodify
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.api.schedule as schedule_api
+import src.services.booking_service as booking_module
+import src.services.schedule_replica_service as replica_module
+from config.settings import settings
+from src.api.auth import get_current_user
+from src.database import get_db
+from src.models.auth import AuthenticatedUser
+from src.models.database import (
+    Base,
+    ClassBooking,
+    ClassReservation,
+    ClassReservationKindDB,
+    ClassReservationStatusDB,
+    ScheduleClass,
+    User,
+)
+from src.services.booking_service import BookingService, ClassFullError
+from src.services.schedule_replica_service import ScheduleReplicaService
+from src.services.wodify_api_service import WodifyAPIService
+
+BOOKING = ClassReservationKindDB.BOOKING
+
+
+def add_class(db, class_id: str = "c1", capacity: int = 12, booked: int = 11):
+    db.add(ScheduleClass(
+        id=class_id, name="CrossFit", class_type="crossfit", class_date=date.today(),
+        day_of_week="Monday", start_time="18:00", capacity=capacity, booked=booked,
+    ))
+    db.commit()
+
+
+def reserve(service: BookingService, db, user: str = "u1", class_id: str = "c1", kind=BOOKING) -> ClassReservation:
+    return service.reserve(db, kind, class_id, user, f"{user}@example.com", user)
+
+
+class WodifyStub:
+    """
+    Answers booking requests with the queued responses or errors (then a new
+    booking ID); lookups of a user's bookings return `existing`
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.bookings = 0
+        self.idempotency_keys = []
+        self.existing = []
+        self.lookups = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            self.lookups += 1
+            return httpx.Response(200, json={"bookings": self.existing})
+        self.bookings += 1
+        self.idempotency_keys.append(request.headers.get("Idempotency-Key"))
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json={"booking_id": f"wb{self.bookings}", "status": "confirmed"})
+
+
+@pytest.fixture
+def wodify(monkeypatch):
+    monkeypatch.setattr(settings, "wodify_retry_attempts", 1)
+    monkeypatch.setattr(settings, "booking_confirm_max_attempts", 2)
+
+    def use(stub: WodifyStub) -> WodifyStub:
+        service = WodifyAPIService()
+        service._client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(stub), timeout=30.0)
+        monkeypatch.setattr(booking_module, "wodify_api_service", service)
+        return stub
+
+    return use
+
+
+@pytest.fixture
+def service():
+    return BookingService()
+
+
+class TestReserve:
+    """Spots are taken from the local capacity"""
+
+    def test_last_spot_goes_to_exactly_one_client(self, tmp_path, service):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'bookings.db'}", connect_args={"check_same_thread": False, "timeout": 30}
+        )
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            add_class(db)
+
+        clients = 20
+        barrier = threading.Barrier(clients)
+        results = []
+
+        def book(user: str):
+            with Session() as db:
+                barrier.wait()
+                try:
+                    reserve(service, db, user)
+                    results.append("booked")
+                except ClassFullError:
+                    results.append("full")
+
+        threads = [threading.Thread(target=book, args=(f"u{i}",)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(results) == ["booked"] + ["full"] * (clients - 1)
+        with Session() as db:
+            assert db.get(ScheduleClass, "c1").booked == 12
+            assert db.query(ClassReservation).count() == 1
+        engine.dispose()
+
+    def test_concurrent_requests_of_one_user_hold_one_spot(self, tmp_path, service):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'bookings.db'}", connect_args={"check_same_thread": False, "timeout": 30}
+        )
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            add_class(db, booked=0)
+
+        requests = 8
+        barrier = threading.Barrier(requests)
+        reservation_ids = []
+
+        def book():
+            with Session() as db:
+                barrier.wait()
+                reservation_ids.append(reserve(service, db, "u1").id)
+
+        threads = [threading.Thread(target=book) for _ in range(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(reservation_ids) == requests and len(set(reservation_ids)) == 1
+        with Session() as db:
+            assert db.get(ScheduleClass, "c1").booked == 1
+            assert db.query(ClassReservation).count() == 1
+        engine.dispose()
+
+    def test_repeated_request_returns_the_open_reservation(self, test_db, service):
+        add_class(test_db, booked=0)
+
+        first = reserve(service, test_db)
+        second = reserve(service, test_db)
+
+        assert first.id == second.id
+        assert test_db.get(ScheduleClass, "c1").booked == 1
+
+    def test_cancelled_booking_can_be_booked_again(self, test_db, service):
+        add_class(test_db, booked=0)
+        first = reserve(service, test_db)
+        first.status = ClassReservationStatusDB.CONFIRMED
+        first.wodify_booking_id = "wb1"
+        test_db.add(ClassBooking(booking_id="wb1", class_id="c1", status="Booked"))
+        test_db.commit()
+
+        ScheduleReplicaService().cancel_booking(test_db, "wb1")
+        second = reserve(service, test_db)
+
+        test_db.expire_all()
+        assert test_db.get(ClassReservation, first.id).status == ClassReservationStatusDB.CANCELLED
+        assert second.id != first.id and second.holds_spot
+        assert test_db.get(ScheduleClass, "c1").booked == 1
+
+    def test_unknown_class_is_queued_without_holding_a_spot(self, test_db, service):
+        reservation = reserve(service, test_db, class_id="unknown")
+
+        assert reservation.status == ClassReservationStatusDB.PENDING
+        assert reservation.holds_spot is False
+
+
+class TestConfirmation:
+    """Wodify confirms or rejects queued reservations"""
+
+    async def test_confirmed_booking_is_counted_once(self, test_db, service, wodify):
+        stub = wodify(WodifyStub())
+        add_class(test_db)
+        reservation = reserve(service, test_db)
+
+        await service.confirm(test_db, reservation.id)
+
+        assert reservation.status == ClassReservationStatusDB.CONFIRMED
+        assert reservation.wodify_booking_id == "wb1"
+        # Wodify's webhook for the same booking doesn't count it again
+        ScheduleReplicaService().apply_booking(test_db, "c1", "wb1", "Booked")
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 12
+        # Confirmed reservations aren't sent again
+        assert await service.confirm(test_db, reservation.id) is None
+        assert stub.bookings == 1
+
+    async def test_rejected_booking_gives_the_spot_back(self, test_db, service, wodify):
+        wodify(WodifyStub(httpx.Response(422, json={"error": "class full"})))
+        add_class(test_db)
+        reservation = reserve(service, test_db)
+
+        await service.confirm(test_db, reservation.id)
+
+        assert reservation.status == ClassReservationStatusDB.REJECTED
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 11
+
+    async def test_unreachable_wodify_is_retried_then_fails(self, test_db, service, wodify):
+        stub = wodify(WodifyStub(httpx.Response(503), httpx.Response(503)))
+        add_class(test_db)
+        reservation = reserve(service, test_db)
+
+        assert await service.process_due(test_db) == {"pending": 1}
+        assert reservation.next_attempt_at > datetime.utcnow()
+        assert await service.process_due(test_db) == {}
+
+        reservation.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        test_db.commit()
+        assert await service.process_due(test_db) == {"failed": 1}
+        assert stub.bookings == 2
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 11
+
+    async def test_booking_that_reached_wodify_is_not_sent_again(self, test_db, service, wodify):
+        stub = wodify(WodifyStub(httpx.ReadTimeout("read timeout")))
+        add_class(test_db)
+        reservation = reserve(service, test_db)
+
+        await service.confirm(test_db, reservation.id)
+        assert reservation.status == ClassReservationStatusDB.PENDING
+
+        # Wodify booked the class even though the response never arrived
+        stub.existing = [{"booking_id": "wb-late", "class_id": "c1", "status": "Booked"}]
+        reservation.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        test_db.commit()
+        await service.confirm(test_db, reservation.id)
+
+        assert reservation.status == ClassReservationStatusDB.CONFIRMED
+        assert reservation.wodify_booking_id == "wb-late"
+        assert (stub.bookings, stub.lookups) == (1, 1)
+        assert stub.idempotency_keys == [reservation.id]
+
+    async def test_retry_is_resent_with_the_same_idempotency_key(self, test_db, service, wodify):
+        stub = wodify(WodifyStub(httpx.Response(502)))
+        add_class(test_db)
+        reservation = reserve(service, test_db)
+
+        await service.confirm(test_db, reservation.id)
+        stub.existing = [{"booking_id": "other", "class_id": "c2", "status": "Booked"}]
+        reservation.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        test_db.commit()
+        await service.confirm(test_db, reservation.id)
+
+        assert reservation.status == ClassReservationStatusDB.CONFIRMED
+        assert reservation.wodify_booking_id == "wb2"
+        assert stub.idempotency_keys == [reservation.id, reservation.id]
+
+    async def test_refresh_keeps_spots_of_pending_bookings(self, test_db, service, monkeypatch):
+        add_class(test_db, booked=0)
+        reserve(service, test_db)
+
+        class Schedule:
+            async def fetch_classes(self, start, end):
+                return [{"id": "c1", "name": "CrossFit", "day": "Monday", "date": date.today().isoformat(), "booked": 5}]
+
+            async def get_class_types(self):
+                return []
+
+            async def get_trainers(self):
+                return []
+
+        monkeypatch.setattr(replica_module, "wodify_api_service", Schedule())
+        await ScheduleReplicaService().refresh(test_db)
+
+        assert test_db.get(ScheduleClass, "c1").booked == 6
+
+
+class TestBookingEndpoints:
+    """/api/schedule/book answers before Wodify confirms"""
+
+    async def test_book_returns_pending_then_confirms_in_background(self, test_db, test_engine, wodify, monkeypatch):
+        wodify(WodifyStub())
+        monkeypatch.setattr(booking_module, "SessionLocal", sessionmaker(bind=test_engine))
+        add_class(test_db)
+        test_db.add(User(id="u1", email="u1@example.com", hashed_password="x", first_name="Max", last_name="Muster"))
+        test_db.commit()
+        app = FastAPI()
+        app.include_router(schedule_api.router)
+        app.dependency_overrides[get_db] = lambda: test_db
+        current = {"user": AuthenticatedUser(id="u1", email="u1@example.com")}
+        app.dependency_overrides[get_current_user] = lambda: current["user"]
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            # Identity fields in the body are ignored
+            response = await client.post("/api/schedule/book", json={"class_id": "c1", "user_id": "u9"})
+            reservation_url = f"/api/schedule/reservations/{response.json()['booking']['id']}"
+            status = await client.get(reservation_url)
+            current["user"] = AuthenticatedUser(id="u2", email="u2@example.com")
+            full = await client.post("/api/schedule/book", json={"class_id": "c1"})
+            foreign = await client.get(reservation_url)
+
+        assert response.status_code == 202
+        assert response.json()["booking"]["status"] == "pending"
+        assert full.status_code == 409
+        assert status.json()["reservation"]["status"] == "confirmed"
+        assert foreign.status_code == 404
+        reservation = test_db.query(ClassReservation).one()
+        assert (reservation.user_id, reservation.user_email, reservation.user_name) == ("u1", "u1@example.com", "Max Muster")
+        assert test_db.get(ClassBooking, "wb1") is not None
@@ -0,0 +1,136 @@
+"""
+Tests for streaming exports of members, leads and logs
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+import src.services.export_service as export_module
+from src.api.admin import router
+from src.api.auth import get_current_user
+from src.models.auth import AuthenticatedUser
+from src.models.database import EmailLog, Lead, LeadStatusDB
+from src.services.export_service import ExportService
+
+
+def add_logs(db, count: int = 5):
+    for i in range(count):
+        db.add(EmailLog(
+            id=f"log_{i}",
+            email_type="welcome" if i % 2 == 0 else "nurturing_day_1",
+            recipient_email=f"lead{i}@example.com",
+            recipient_name=f"Lead {i}",
+            sent=True,
+            created_at=datetime(2024, 1, 1 + i, 12, 0),
+        ))
+    db.commit()
+
+
+@pytest.fixture
+def service(test_engine, monkeypatch):
+    monkeypatch.setattr(export_module, "SessionLocal", sessionmaker(bind=test_engine))
+    return ExportService()
+
+
+class TestStream:
+    """Rows are read in batches and encoded per batch"""
+
+    def test_ndjson_in_batches(self, test_db, service, monkeypatch):
+        monkeypatch.setattr(export_module, "EXPORT_BATCH_SIZE", 2)
+        add_logs(test_db)
+
+        chunks = list(service.stream("email_logs"))
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+        assert len(chunks) == 3
+        assert [row["id"] for row in rows] == [f"log_{i}" for i in range(5)]
+        assert rows[0]["created_at"] == "2024-01-01T12:00:00"
+        assert rows[0]["sent"] is True
+
+    def test_csv_has_a_header_row(self, test_db, service):
+        add_logs(test_db, 2)
+
+        rows = list(csv.DictReader(io.StringIO("".join(service.stream("email_logs", "csv")))))
+
+        assert [row["recipient_email"] for row in rows] == ["lead0@example.com", "lead1@example.com"]
+
+    def test_csv_neutralises_formulas(self, test_db, service):
+        names = ["=HYPERLINK(\"http://evil\")", "+49 170 1234", "-2+3", "@SUM(A1)", "Max -1", "-1.5", "+cmd|' /C calc'!A0"]
+        for i, name in enumerate(names):
+            test_db.add(EmailLog(id=f"log_{i}", email_type="welcome", recipient_email=f"l{i}@example.com",
+                                 recipient_name=name, sent=True, created_at=datetime(2024, 1, 1 + i)))
+        test_db.commit()
+
+        rows = list(csv.DictReader(io.StringIO("".join(service.stream("email_logs", "csv")))))
+
+        assert [row["recipient_name"] for row in rows] == [
+            "'=HYPERLINK(\"http://evil\")", "+49 170 1234", "'-2+3", "'@SUM(A1)", "Max -1", "-1.5", "'+cmd|' /C calc'!A0"
+        ]
+        # NDJSON keeps the values as they are
+        assert json.loads(next(service.stream("email_logs")).splitlines()[0])["recipient_name"].startswith("=")
+
+    def test_date_range_and_type_are_filtered_in_sql(self, test_db, service):
+        add_logs(test_db)
+
+        query = service.build_query("email_logs", date(2024, 1, 2), date(2024, 1, 4), "welcome")
+        rows = "".join(service.stream("email_logs", start=date(2024, 1, 2), end=date(2024, 1, 4), type_filter="welcome"))
+
+        sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+        assert "email_logs.created_at >=" in sql and "email_logs.email_type =" in sql
+        assert [json.loads(line)["id"] for line in rows.splitlines()] == ["log_2"]
+
+    def test_enum_type_filter(self, test_db, service):
+        test_db.add_all([
+            Lead(lead_id="l1", first_name="A", last_name="B", email="a@example.com", lead_status=LeadStatusDB.NEW),
+            Lead(lead_id="l2", first_name="C", last_name="D", email="c@example.com", lead_status=LeadStatusDB.CONVERTED),
+        ])
+        test_db.commit()
+
+        converted = "".join(service.stream("leads", type_filter="converted"))
+        unknown = "".join(service.stream("leads", type_filter="nonsense"))
+
+        assert [json.loads(line)["lead_id"] for line in converted.splitlines()] == ["l2"]
+        assert json.loads(converted)["lead_status"] == "Converted"
+        assert unknown == ""
+
+
+class TestExportEndpoint:
+    """/admin/export/{entity} is limited to admins"""
+
+    @pytest.fixture
+    def make_client(self, service):
+        def make(is_admin: bool) -> httpx.AsyncClient:
+            app = FastAPI()
+            app.include_router(router)
+            app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+                id="user_1", email="admin@example.com", is_active=True, is_admin=is_admin
+            )
+            return httpx.AsyncClient(app=app, base_url="http://test")
+        return make
+
+    async def test_streams_an_attachment(self, test_db, make_client):
+        add_logs(test_db, 3)
+
+        async with make_client(is_admin=True) as client:
+            response = await client.get("/admin/export/email_logs", params={"format": "csv", "type": "welcome"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        assert len(response.text.splitlines()) == 3
+
+    async def test_requires_admin_and_known_entity(self, make_client):
+        async with make_client(is_admin=False) as client:
+            forbidden = await client.get("/admin/export/members")
+        async with make_client(is_admin=True) as client:
+            unknown = await client.get("/admin/export/users")
+
+        assert forbidden.status_code == 403
+        assert unknown.status_code == 404
@@ -0,0 +1,192 @@
+"""
+Tests for bulk imports of members and leads
+"""
+
+import io
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+import src.services.import_service as import_module
+from src.api.admin import router
+from src.api.auth import get_current_user
+from src.models.auth import AuthenticatedUser
+from src.models.database import Lead, LeadNurturingStateDB, LeadStatusDB, Member, MembershipStatusDB
+from src.services.import_service import ImportService, write_report
+
+MEMBER_HEADER = "client_id,first_name,last_name,email,membership_id,membership_type,membership_status,monthly_price,start_date\n"
+
+
+def member_line(i: int, email: str = None) -> str:
+    return f"c{i},Max,Muster,{email or f'max{i}@example.com'},m{i},Unlimited,active,\"89,90\",01.03.2024\n"
+
+
+class Automation:
+    """Records the automation calls of the import"""
+
+    def __init__(self):
+        self.members = []
+        self.leads = []
+        self.converted = []
+
+    def process_imported_members(self, members, converted_lead_ids):
+        self.members += members
+        self.converted += converted_lead_ids
+
+    def process_imported_leads(self, leads):
+        self.leads += leads
+
+
+@pytest.fixture
+def automation(monkeypatch):
+    automation = Automation()
+    monkeypatch.setattr(ImportService, "_automation", lambda self: automation)
+    return automation
+
+
+@pytest.fixture
+def service(test_engine, monkeypatch):
+    monkeypatch.setattr(import_module, "SessionLocal", sessionmaker(bind=test_engine))
+    return ImportService()
+
+
+class TestValidation:
+    """Invalid rows are reported, the rest is imported"""
+
+    def test_csv_members(self, test_db, service, automation):
+        data = MEMBER_HEADER + member_line(1) + "c2,Erika,Muster,keine-mail,m2,Basic,Active,49,2024-03-01\n" \
+            + "c3,Tom,Muster,tom@example.com,m3,Basic,gekündigt,49,2024-03-01\n" + member_line(4).replace("89,90", "abc")
+
+        result = service.import_file("members", io.StringIO(data))
+
+        member = test_db.get(Member, "c1")
+        assert member.membership_status == MembershipStatusDB.ACTIVE
+        assert member.monthly_price == 89.9
+        assert member.start_date.day == 1 and member.start_date.month == 3
+        assert (result.created, result.rows) == (1, 4)
+        assert [(r.line, r.key) for r in result.rejections] == [(3, "c2"), (4, "c3"), (5, "c4")]
+        assert "email" in result.rejections[0].reason and "membership_status" in result.rejections[1].reason
+        assert [m["client_id"] for m in automation.members] == ["c1"]
+
+    def test_ndjson_leads_and_report(self, test_db, service, automation):
+        data = "\n".join([
+            json.dumps({"lead_id": "l1", "first_name": "A", "last_name": "B", "email": "A@Example.com", "lead_status": "Interested"}),
+            "{kein json",
+            json.dumps({"lead_id": "l2", "first_name": "C", "email": "c@example.com"}),
+        ])
+
+        result = service.import_file("leads", io.StringIO(data), "ndjson")
+        report = io.StringIO()
+        write_report(result, report)
+
+        lead = test_db.get(Lead, "l1")
+        assert lead.email == "a@example.com"
+        assert lead.lead_status == LeadStatusDB.INTERESTED
+        assert lead.nurturing_state == LeadNurturingStateDB.NEW
+        assert report.getvalue().splitlines() == [
+            "line,key,reason",
+            "2,,Ungültiges JSON",
+            "3,l2,last_name fehlt",
+        ]
+
+    def test_csv_export_apostrophes_are_removed(self, test_db, service, automation):
+        data = "lead_id,first_name,last_name,email,phone,message\n" \
+            + "l1,Max,Muster,max@example.com,'+49 170 1234,'=1+1\n" \
+            + "l2,Erika,Muster,erika@example.com,+49 171 5678,'s Training\n"
+
+        service.import_file("leads", io.StringIO(data))
+
+        assert (test_db.get(Lead, "l1").phone, test_db.get(Lead, "l1").message) == ("+49 170 1234", "=1+1")
+        assert (test_db.get(Lead, "l2").phone, test_db.get(Lead, "l2").message) == ("+49 171 5678", "'s Training")
+
+
+class TestDeduplication:
+    """Rows are matched on their ID and e-mail"""
+
+    def test_duplicates_in_file_and_database(self, test_db, service, automation):
+        service.import_file("members", io.StringIO(MEMBER_HEADER + member_line(1) + member_line(2)))
+        automation.members.clear()
+
+        data = MEMBER_HEADER + member_line(1).replace("Max", "Moritz", 1) + member_line(3) + member_line(3) \
+            + member_line(4, email="max3@example.com") + member_line(5, email="max2@example.com")
+        result = service.import_file("members", io.StringIO(data))
+
+        test_db.expire_all()
+        assert test_db.get(Member, "c1").first_name == "Moritz"
+        assert (result.created, result.updated) == (1, 1)
+        assert [(r.line, r.key) for r in result.rejections] == [(4, "c3"), (5, "c4"), (6, "c5")]
+        assert "Zeile 3" in result.rejections[0].reason
+        assert "c2" in result.rejections[2].reason
+        # Only new members get a welcome email
+        assert [m["client_id"] for m in automation.members] == ["c3"]
+
+    def test_imported_members_convert_their_leads(self, test_db, service, automation):
+        test_db.add(Lead(lead_id="l1", first_name="Max", last_name="Muster", email="max1@example.com"))
+        test_db.commit()
+
+        result = service.import_file("members", io.StringIO(MEMBER_HEADER + member_line(1)))
+
+        test_db.expire_all()
+        lead = test_db.get(Lead, "l1")
+        assert lead.converted_to_member and lead.nurturing_state == LeadNurturingStateDB.CONVERTED
+        assert result.converted_leads == 1 and automation.converted == ["l1"]
+
+    def test_skip_automation(self, service, automation):
+        result = service.import_file("members", io.StringIO(MEMBER_HEADER + member_line(1)), skip_automation=True)
+
+        assert result.created == 1 and automation.members == []
+
+
+class TestThroughput:
+    """10k rows are written in batches, not row by row"""
+
+    def test_ten_thousand_leads(self, test_db, service, automation, query_budget):
+        data = "lead_id,first_name,last_name,email\n" + "".join(
+            f"l{i},Lead,{i},lead{i}@example.com\n" for i in range(10_000)
+        )
+
+        with query_budget(80):
+            result = service.import_file("leads", io.StringIO(data), skip_automation=True)
+
+        assert (result.created, result.rejections) == (10_000, [])
+        assert test_db.query(Lead).count() == 10_000
+        assert result.seconds < 10
+
+
+class TestImportEndpoint:
+    """/admin/import/{entity} is limited to admins"""
+
+    @pytest.fixture
+    def make_client(self, service):
+        def make(is_admin: bool) -> httpx.AsyncClient:
+            app = FastAPI()
+            app.include_router(router)
+            app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+                id="user_1", email="admin@example.com", is_active=True, is_admin=is_admin
+            )
+            return httpx.AsyncClient(app=app, base_url="http://test")
+        return make
+
+    async def test_imports_the_request_body(self, test_db, make_client, automation):
+        body = ("\ufeff" + MEMBER_HEADER + member_line(1) + member_line(1)).encode("utf-8")
+
+        async with make_client(is_admin=True) as client:
+            response = await client.post("/admin/import/members", params={"skip_automation": "true"}, content=body)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["created"], data["rejected"], data["automation"]) == (1, 1, False)
+        assert data["rejections"][0]["line"] == 3
+        assert test_db.get(Member, "c1") is not None
+
+    async def test_requires_admin_and_known_entity(self, make_client):
+        async with make_client(is_admin=False) as client:
+            forbidden = await client.post("/admin/import/members", content=b"")
+        async with make_client(is_admin=True) as client:
+            unknown = await client.post("/admin/import/users", content=b"")
+
+        assert forbidden.status_code == 403
+        assert unknown.status_code == 404
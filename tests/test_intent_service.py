@@ -0,0 +1,56 @@
+"""
+Tests for the fallback intent matcher
+"""
+
+import re
+
+from src.services.intent_service import (
+    IntentMatcher, INTENTS, DEFAULT_RESPONSE, intent_matcher, normalize_utterance, trie_regex
+)
+
+
+class TestIntentMatcher:
+    """Tests for keyword matching and scoring"""
+
+    def test_keywords_only_match_whole_words(self):
+        # "wo" used to match inside "Woche", "Workout" and "wohne"
+        assert intent_matcher.classify("Ich wohne in Potsdam") is None
+        assert intent_matcher.classify("Was ist das Workout diese Woche?") == "classes"
+        assert intent_matcher.classify("Wo seid ihr?") == "location"
+
+    def test_prefix_keywords_and_folding(self):
+        assert normalize_utterance("Öffnungs-Zeiten, Straße!") == "offnungs zeiten strasse"
+        assert intent_matcher.classify("Wie sind eure ÖFFNUNGSZEITEN?") == "opening_hours"
+        assert intent_matcher.classify("Gibt es Parkplätze?") == "location"
+
+    def test_weights_decide_between_intents(self):
+        assert intent_matcher.scores("Wann kann ich ein Probetraining machen?") == {
+            "trial_class": 3.0, "opening_hours": 1.0
+        }
+        assert intent_matcher.classify("Wann kann ich ein Probetraining machen?") == "trial_class"
+        assert intent_matcher.classify("Hallo, was kostet die Mitgliedschaft?") == "pricing"
+        # Multi-word phrases win over the words they contain
+        assert intent_matcher.classify("Ab wie viel Uhr kann man trainieren?") == "opening_hours"
+
+    def test_default_answer_below_minimum_score(self):
+        assert intent_matcher.classify("heute") is None
+        assert intent_matcher.respond("Können Sie mich zurückrufen?") == DEFAULT_RESPONSE
+        assert intent_matcher.respond("Anruf beginnt") == INTENTS[0]["response"]
+
+    def test_intent_table_drives_matching(self):
+        matcher = IntentMatcher([
+            {"name": "a", "keywords": {"ring*": 1, "ring dips": 2}, "response": "A"},
+            {"name": "b", "keywords": {"rings": 1}, "response": "B"},
+        ])
+
+        # Ties keep the earlier intent
+        assert matcher.scores("Ringe und rings") == {"a": 1.0, "b": 1.0}
+        assert matcher.classify("Ringe und rings") == "a"
+        assert matcher.scores("ring dips") == {"a": 2.0}
+
+    def test_trie_regex_matches_exactly_the_words(self):
+        words = ["wo", "wohin", "wann", "was"]
+        pattern = re.compile(rf"(?:{trie_regex(words)})")
+
+        assert all(pattern.fullmatch(word) for word in words)
+        assert not any(pattern.fullmatch(word) for word in ("w", "woh", "wan", "wash"))
@@ -0,0 +1,123 @@
+"""
+Tests for the exact and semantic LLM response cache
+"""
+
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from src.api.admin import router
+from src.api.auth import get_current_user
+from src.models.auth import AuthenticatedUser
+from src.services.llm_cache_service import LLMResponseCache, normalize_prompt
+
+CONTEXT = "Du bist der Assistent von G3 CrossFit."
+MODEL = "gpt-4o-mini"
+
+
+class TestExactCache:
+    """Tests for the exact tier, TTL and eviction"""
+
+    def test_normalized_prompts_share_an_entry(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=10, semantic=False)
+        cache.put("Wann habt ihr geöffnet?", CONTEXT, MODEL, "Mo-Fr 6-21 Uhr")
+
+        assert normalize_prompt("  Wann habt ihr GEÖFFNET ") == "wann habt ihr geöffnet"
+        assert cache.get("wann  habt ihr geöffnet", CONTEXT, MODEL) == "Mo-Fr 6-21 Uhr"
+        # Other model or system context: no shared answers
+        assert cache.get("Wann habt ihr geöffnet?", CONTEXT, "gpt-4o") is None
+        assert cache.get("Wann habt ihr geöffnet?", "Anderer Kontext", MODEL) is None
+
+    def test_entries_expire(self):
+        cache = LLMResponseCache(ttl_seconds=0, max_entries=10, semantic=False)
+        cache.put("Preise?", CONTEXT, MODEL, "Ab 89€")
+
+        assert cache.get("Preise?", CONTEXT, MODEL) is None
+        assert cache.report()["expirations"] == 1
+        assert cache.report()["entries"] == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=2, semantic=False)
+        cache.put("frage a", CONTEXT, MODEL, "a")
+        cache.put("frage b", CONTEXT, MODEL, "b")
+        cache.get("frage a", CONTEXT, MODEL)
+        cache.put("frage c", CONTEXT, MODEL, "c")
+
+        assert cache.get("frage b", CONTEXT, MODEL) is None
+        assert [cache.get(p, CONTEXT, MODEL) for p in ("frage a", "frage c")] == ["a", "c"]
+        assert cache.report()["evictions"] == 1
+
+    def test_report_counts_hits_per_entry(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=10, semantic=False)
+        cache.put("Probetraining?", CONTEXT, MODEL, "Gerne!")
+        for _ in range(3):
+            cache.get("probetraining", CONTEXT, MODEL)
+        cache.get("Parkplätze?", CONTEXT, MODEL)
+
+        report = cache.report()
+        assert (report["lookups"], report["exact_hits"], report["misses"]) == (4, 3, 1)
+        assert report["hit_rate"] == 0.75
+        assert report["top_entries"][0]["prompt"] == "Probetraining?"
+        assert report["top_entries"][0]["hits"] == 3
+
+
+class TestSemanticCache:
+    """Tests for the NumPy nearest-neighbour tier"""
+
+    @pytest.fixture(autouse=True)
+    def numpy(self):
+        return pytest.importorskip("numpy")
+
+    def test_rephrased_prompt_hits(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=10, semantic=True, semantic_threshold=0.9)
+        cache.put("Wie sind eure Öffnungszeiten?", CONTEXT, MODEL, "Mo-Fr 6-21 Uhr")
+        cache.put("Wie sind eure Preise?", CONTEXT, MODEL, "Ab 89€")
+
+        assert cache.get("Wie sind denn eure Öffnungszeiten", CONTEXT, MODEL) == "Mo-Fr 6-21 Uhr"
+        assert cache.get("Wo kann ich parken?", CONTEXT, MODEL) is None
+        assert cache.get("Wie sind denn eure Öffnungszeiten", "Anderer Kontext", MODEL) is None
+        assert cache.report()["semantic_hits"] == 1
+
+    def test_evicted_and_expired_entries_are_not_matched(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=1, semantic=True, semantic_threshold=0.9)
+        cache.put("Wie sind eure Öffnungszeiten?", CONTEXT, MODEL, "Mo-Fr 6-21 Uhr")
+        cache.put("Wie sind eure Preise?", CONTEXT, MODEL, "Ab 89€")
+        assert cache.get("Wie sind denn eure Öffnungszeiten", CONTEXT, MODEL) is None
+
+        cache = LLMResponseCache(ttl_seconds=0, max_entries=10, semantic=True, semantic_threshold=0.9)
+        cache.put("Wie sind eure Öffnungszeiten?", CONTEXT, MODEL, "Mo-Fr 6-21 Uhr")
+        assert cache.get("Wie sind denn eure Öffnungszeiten", CONTEXT, MODEL) is None
+
+    def test_lookup_is_sub_millisecond_when_full(self):
+        cache = LLMResponseCache(ttl_seconds=60, max_entries=1000, semantic=True, semantic_threshold=0.9)
+        for i in range(1000):
+            cache.put(f"Frage Nummer {i} zum Training am Tag {i % 7}", CONTEXT, MODEL, f"Antwort {i}")
+
+        start = time.perf_counter()
+        for _ in range(200):
+            cache.get("Frage Nummer 512 zum Training am Tag 1", CONTEXT, MODEL)
+            cache.get("Frage Nummer 512 zum Training am Tag", CONTEXT, MODEL)
+        per_lookup = (time.perf_counter() - start) / 400
+
+        assert per_lookup < 0.001
+        assert cache.report()["exact_hits"] == 200
+
+
+class TestCacheReportEndpoint:
+    """/admin/llm-cache shows prompt text, so it is limited to admins"""
+
+    async def test_requires_admin(self):
+        responses = {}
+        for is_admin in (False, True):
+            app = FastAPI()
+            app.include_router(router)
+            app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(
+                id="user_1", email="user@example.com", is_active=True, is_admin=is_admin
+            )
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                responses[is_admin] = await client.get("/admin/llm-cache")
+
+        assert responses[False].status_code == 403
+        assert responses[True].status_code == 200
+        assert "top_entries" in responses[True].json()
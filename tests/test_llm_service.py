@@ -0,0 +1,381 @@
+"""
+Tests for the LLM service against a local stub of the OpenAI and Anthropic APIs
+"""
+
+import asyncio
+import json
+import threading
+import time
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+import src.api.ai as ai_api
+from config.settings import settings
+from src.services.llm_service import LLMService, ClientDisconnectedError
+from src.services.llm_usage_service import llm_usage_service
+from src.services.prompt_service import PromptService
+
+
+def sdk_uses_httpx(module_name: str) -> bool:
+    """Whether the installed provider SDK is built on httpx (some vendored builds ship a fork)"""
+    try:
+        sdk = __import__(module_name)
+    except ImportError:
+        return False
+    return isinstance(getattr(sdk, "DEFAULT_CONNECTION_LIMITS", httpx.Limits()), httpx.Limits)
+
+
+PROVIDERS = [
+    pytest.param(name, marks=pytest.mark.skipif(not sdk_uses_httpx(name), reason=f"{name} SDK not built on httpx"))
+    for name in ("openai", "anthropic")
+]
+
+
+class ProviderStub:
+    """
+    Minimal OpenAI (/v1/chat/completions) and Anthropic (/v1/messages) server
+
+    A prompt of the form "sleep:<seconds>" delays the answer; the stub
+    records peak concurrency, client ports (connection reuse) and requests
+    whose client went away before the answer was sent. Streamed answers
+    are sent word by word, chunk_delay seconds apart. OpenAI answers report
+    42 prompt tokens (32 of them cached) and 3 completion tokens.
+    """
+
+    def __init__(self):
+        self.app = FastAPI()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.client_ports = []
+        self.disconnects = 0
+        self.chunk_delay = 0.0
+        self.last_body = None
+        usage = {"prompt_tokens": 42, "completion_tokens": 3, "total_tokens": 45, "prompt_tokens_details": {"cached_tokens": 32}}
+
+        @self.app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = self.last_body = await request.json()
+            text = await self._answer(request, body["messages"][-1]["content"])
+            if body.get("stream"):
+                chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"]}
+                events = [
+                    f"data: {json.dumps({**chunk, 'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]})}\n\n"
+                    for word in self._words(f"openai: {text}")
+                ]
+                if body.get("stream_options", {}).get("include_usage"):
+                    events.append(f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n")
+                return self._stream(events + ["data: [DONE]\n\n"])
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f" openai: {text} "}
+                }],
+                "usage": usage,
+            }
+
+        @self.app.post("/v1/messages")
+        async def messages(request: Request):
+            body = self.last_body = await request.json()
+            text = await self._answer(request, body["messages"][-1]["content"])
+            if body.get("stream"):
+                message = {
+                    "id": "msg_stub", "type": "message", "role": "assistant", "model": body["model"], "content": [],
+                    "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 1, "output_tokens": 1},
+                }
+                events = [
+                    ("message_start", {"message": message}),
+                    ("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}}),
+                ] + [
+                    ("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": word}})
+                    for word in self._words(f"anthropic: {text}")
+                ] + [
+                    ("content_block_stop", {"index": 0}),
+                    ("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": 1}}),
+                    ("message_stop", {}),
+                ]
+                return self._stream([
+                    f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n" for name, data in events
+                ])
+            return {
+                "id": "msg_stub", "type": "message", "role": "assistant", "model": body["model"],
+                "content": [{"type": "text", "text": f"anthropic: {text}"}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 1, "output_tokens": 1},
+            }
+
+    @staticmethod
+    def _words(text: str):
+        words = text.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def _stream(self, events):
+        async def body():
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            finished = False
+            try:
+                for event in events:
+                    yield event
+                    await asyncio.sleep(self.chunk_delay)
+                finished = True
+            finally:
+                self.in_flight -= 1
+                if not finished:
+                    self.disconnects += 1
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    async def _answer(self, request: Request, prompt: str) -> str:
+        self.client_ports.append(request.client.port)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if prompt.startswith("sleep:"):
+                deadline = time.monotonic() + float(prompt.split(":", 1)[1])
+                while time.monotonic() < deadline:
+                    if await request.is_disconnected():
+                        self.disconnects += 1
+                        break
+                    await asyncio.sleep(0.02)
+            return prompt
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(scope="module")
+def provider_stub():
+    stub = ProviderStub()
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    stub.base_url = f"http://127.0.0.1:{port}"
+    yield stub
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def llm_settings(provider_stub, monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "anthropic_api_key", "sk-ant-test")
+    monkeypatch.setattr(settings, "openai_base_url", f"{provider_stub.base_url}/v1")
+    monkeypatch.setattr(settings, "anthropic_base_url", provider_stub.base_url)
+    monkeypatch.setattr(settings, "llm_timeout_seconds", 5.0)
+    monkeypatch.setattr(settings, "llm_max_concurrency", 8)
+    provider_stub.max_in_flight = 0
+    provider_stub.client_ports.clear()
+    provider_stub.disconnects = 0
+    provider_stub.chunk_delay = 0.0
+    return provider_stub
+
+
+@pytest.fixture
+async def make_service(llm_settings, monkeypatch):
+    services = []
+
+    def make(provider: str) -> LLMService:
+        monkeypatch.setattr(settings, "llm_provider", provider)
+        service = LLMService()
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        await service.aclose()
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+class TestProviders:
+    """Tests for both providers through pooled async clients"""
+
+    async def test_reuses_one_client_and_connection(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+
+        answers = [await service.generate_response(f"frage {i}") for i in range(3)]
+
+        assert answers == [f"{provider}: frage {i}" for i in range(3)]
+        assert list(service._clients) == [provider]
+        # Sequential calls travel over one keep-alive connection
+        assert len(set(llm_settings.client_ports)) == 1
+
+    async def test_concurrency_is_limited_per_provider(self, make_service, llm_settings, monkeypatch, provider):
+        monkeypatch.setattr(settings, "llm_max_concurrency", 2)
+        service = make_service(provider)
+
+        # The event loop stays free while completions are pending
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.ensure_future(ticker())
+        answers = await asyncio.gather(*(service.generate_response("sleep:0.2") for _ in range(6)))
+        ticking.cancel()
+
+        assert answers == [f"{provider}: sleep:0.2"] * 6
+        assert llm_settings.max_in_flight == 2
+        assert ticks >= 30
+
+    async def test_timeout_returns_fallback(self, make_service, monkeypatch, provider):
+        monkeypatch.setattr(settings, "llm_timeout_seconds", 0.3)
+        service = make_service(provider)
+
+        start = time.perf_counter()
+        answer = await service.generate_response("sleep:3 probetraining")
+
+        assert time.perf_counter() - start < 1.5
+        assert answer == service._generate_fallback("probetraining")
+        # Fallbacks are never cached
+        assert service.cache.report()["entries"] == 0
+
+    async def test_repeated_prompt_is_served_from_cache(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+
+        first = await service.generate_response("Wann habt ihr geöffnet?", context="G3")
+        again = await service.generate_response("wann habt ihr geöffnet", context="G3")
+        streamed = [delta async for delta in service.stream_response("Wann habt ihr geöffnet?", context="G3")]
+
+        assert first == again == f"{provider}: Wann habt ihr geöffnet?"
+        assert streamed == [first]
+        assert len(llm_settings.client_ports) == 1
+        assert service.cache.report()["exact_hits"] == 2
+
+    async def test_disconnect_cancels_request(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+        started = time.monotonic()
+
+        async def is_disconnected() -> bool:
+            return time.monotonic() - started > 0.3
+
+        with pytest.raises(ClientDisconnectedError):
+            await service.generate_response("sleep:3", is_disconnected=is_disconnected)
+        assert time.monotonic() - started < 1.5
+
+        # The stub notices the closed connection
+        for _ in range(100):
+            if llm_settings.disconnects:
+                break
+            await asyncio.sleep(0.02)
+        assert llm_settings.disconnects == 1
+
+    async def test_static_context_leads_the_system_prompt(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+
+        await service.generate_response("Hallo", context="Anrufer heißt Max", static_context="G3 Fakten")
+
+        if provider == "openai":
+            assert llm_settings.last_body["messages"][0] == {"role": "system", "content": "G3 Fakten\n\nAnrufer heißt Max"}
+        else:
+            assert llm_settings.last_body["system"] == [
+                {"type": "text", "text": "G3 Fakten", "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": "Anrufer heißt Max"},
+            ]
+
+    async def test_usage_is_recorded_per_request(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+
+        with llm_usage_service.track() as usage:
+            await service.generate_response("Was kostet das?", static_context="G3 Fakten")
+            [delta async for delta in service.stream_response("Was kostet das?", cache=False)]
+
+        assert usage.calls == 2
+        assert not usage.estimated
+        if provider == "openai":
+            assert (usage.input_tokens, usage.cached_input_tokens, usage.output_tokens) == (84, 64, 6)
+        assert usage.cost > 0
+
+    async def test_stream_yields_deltas(self, make_service, llm_settings, provider):
+        service = make_service(provider)
+
+        deltas = [delta async for delta in service.stream_response("drei kurze worte")]
+
+        assert deltas == [f"{provider}:", " drei", " kurze", " worte"]
+        assert llm_settings.max_in_flight == 1
+
+    async def test_closing_stream_releases_provider(self, make_service, llm_settings, monkeypatch, provider):
+        monkeypatch.setattr(settings, "llm_max_concurrency", 1)
+        llm_settings.chunk_delay = 0.2
+        service = make_service(provider)
+
+        stream = service.stream_response("ein sehr langer text mit vielen worten")
+        assert await anext(stream) == f"{provider}:"
+        await stream.aclose()
+
+        # The slot is free again and the stub sees the closed connection
+        assert not service._semaphore(provider).locked()
+        for _ in range(100):
+            if llm_settings.disconnects:
+                break
+            await asyncio.sleep(0.02)
+        assert llm_settings.disconnects == 1
+
+
+async def test_stream_falls_back_before_first_chunk(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "openai_base_url", "http://127.0.0.1:1/v1")
+    service = LLMService()
+
+    deltas = [delta async for delta in service.stream_response("probetraining", fallback="Plan")]
+    await service.aclose()
+
+    assert deltas == ["Plan"]
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines.get("event", "message"), json.loads(lines["data"])))
+    return events
+
+
+async def test_response_endpoint_streams_events(make_service, monkeypatch):
+    service = make_service("openai")
+    monkeypatch.setattr(ai_api, "llm_service", service)
+    app = FastAPI()
+    app.include_router(ai_api.router)
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/ai/generate-response/stream", json={"prompt": "wann habt ihr offen"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = parse_sse(response.text)
+    assert events[-1] == ("done", {"success": True})
+    assert "".join(data["delta"] for _, data in events[:-1]) == "openai: wann habt ihr offen"
+
+
+async def test_response_endpoint_trims_history_and_context(make_service, llm_settings, monkeypatch):
+    service = make_service("openai")
+    monkeypatch.setattr(ai_api, "llm_service", service)
+    monkeypatch.setattr(ai_api, "prompt_service", PromptService(context_max_tokens=5, history_max_tokens=40))
+    app = FastAPI()
+    app.include_router(ai_api.router)
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Nachricht {i} " + "bla " * 10}
+        for i in range(10)
+    ]
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/api/ai/generate-response", json={
+            "prompt": "Und samstags?", "context": "eins zwei drei vier fünf sechs sieben", "conversation_history": history
+        })
+
+    assert response.json()["response"] == "openai: Und samstags?"
+    messages = llm_settings.last_body["messages"]
+    assert [message["content"].split(" ", 2)[1] for message in messages[1:-1]] == ["8", "9"]
+    system = messages[0]["content"]
+    assert system.startswith(ai_api.prompt_service.assemble("x").static_context)
+    assert "eins zwei drei vier …" in system and "sechs" not in system
+    assert "- Interessent: Nachricht 6" in system
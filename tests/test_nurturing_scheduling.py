@@ -0,0 +1,183 @@
+"""
+Tests for bulk scheduling of nurturing sequences
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_PAUSED
+from sqlalchemy import event
+
+import src.services.automation_service as automation_module
+import src.services.scheduler_service as scheduler_module
+from config.settings import settings
+from src.services.automation_service import AutomationService
+from src.services.scheduler_service import SchedulerService, parse_nurturing_job_id, send_nurturing_email_job
+
+CREATED_AT = datetime(2030, 1, 1, 9, 0)
+
+
+def lead(i: int, **extra) -> dict:
+    return {"lead_id": f"lead_{i}", "first_name": "Max", "last_name": str(i), "email": f"lead{i}@example.com",
+            "created_at": CREATED_AT, **extra}
+
+
+@pytest.fixture
+def service(tmp_path):
+    """SchedulerService on its own (paused) scheduler and job store"""
+    store = SQLAlchemyJobStore(url=f"sqlite:///{tmp_path / 'jobs.db'}")
+    scheduler = BackgroundScheduler(jobstores={"default": store}, timezone="UTC")
+    scheduler.start(paused=True)
+    service = SchedulerService.__new__(SchedulerService)
+    service.jobstore = store
+    service.scheduler = scheduler
+    yield service
+    scheduler.shutdown(wait=False)
+
+
+def run_dates(service: SchedulerService) -> dict:
+    return {
+        parse_nurturing_job_id(job.id): job.next_run_time.replace(tzinfo=None)
+        for job in service.scheduler.get_jobs()
+    }
+
+
+class TestBulkScheduling:
+    """All steps of all leads are written at once"""
+
+    def test_one_insert_for_all_steps(self, service):
+        inserts = []
+        event.listen(service.jobstore.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: inserts.append(statement)
+                     if statement.startswith("INSERT") else None)
+
+        scheduled = service.schedule_nurturing_sequences([lead(i) for i in range(200)], spread_minutes=0)
+
+        assert len(inserts) == 1
+        assert sum(len(ids) for ids in scheduled.values()) == 600
+        jobs = service.scheduler.get_jobs()
+        assert len(jobs) == 600
+        assert jobs[0].func is send_nurturing_email_job
+        assert jobs[0].args[:2] == (2, "lead_0")
+
+    def test_already_scheduled_steps_are_skipped(self, service):
+        single = service.schedule_nurturing_sequence(
+            "lead_1", "Max", "1", "lead1@example.com", CREATED_AT
+        )
+        # A step scheduled some other way (e.g. before the bulk API existed)
+        service.scheduler.add_job(send_nurturing_email_job, "date", run_date=CREATED_AT,
+                                  id="nurturing_5_lead_2_abcd1234", args=[5, "lead_2", "Max", "2", "lead2@example.com"])
+
+        scheduled = service.schedule_nurturing_sequences([lead(1), lead(2), lead(2)])
+
+        assert len(single) == 3
+        assert scheduled == {"lead_2": [scheduled["lead_2"][0], scheduled["lead_2"][1]]}
+        assert [parse_nurturing_job_id(job_id)[0] for job_id in scheduled["lead_2"]] == [2, 7]
+        assert service.schedule_nurturing_sequences([lead(1), lead(2)]) == {}
+        assert len(service.scheduler.get_jobs()) == 6
+
+    def test_send_times_are_spread_over_the_window(self, service):
+        service.schedule_nurturing_sequences([lead(i) for i in range(4)], spread_minutes=60)
+
+        dates = run_dates(service)
+        assert [dates[(2, f"lead_{i}")] - CREATED_AT for i in range(4)] == [
+            timedelta(days=2, minutes=minutes) for minutes in (0, 15, 30, 45)
+        ]
+        # The steps of a lead keep their distance
+        assert dates[(7, "lead_3")] - dates[(2, "lead_3")] == timedelta(days=5)
+
+    def test_inserted_rows_match_add_job(self, service):
+        """The hand-written rows load back like a job added through add_job"""
+        scheduled = service.schedule_nurturing_sequences([lead(1, interested_in="CrossFit")], spread_minutes=0)
+        job_id = scheduled["lead_1"][0]
+        service.scheduler.add_job(
+            send_nurturing_email_job, "date", run_date=CREATED_AT + timedelta(days=2), id="reference",
+            args=(2, "lead_1", "Max", "1", "lead1@example.com", "CrossFit"), name="nurturing_2",
+            misfire_grace_time=600, coalesce=True, max_instances=1
+        )
+
+        inserted = service.jobstore.lookup_job(job_id)
+        reference = service.jobstore.lookup_job("reference")
+        state, reference_state = inserted.__getstate__(), reference.__getstate__()
+        assert state.pop("trigger").__getstate__() == reference_state.pop("trigger").__getstate__()
+        assert {**state, "id": "reference"} == reference_state
+        assert inserted.next_run_time == reference.next_run_time
+        assert service.scheduler.get_job(job_id).func is send_nurturing_email_job
+
+    def test_falls_back_to_add_job(self, service, monkeypatch):
+        """Without the 3.x SQLAlchemy job store the steps go through add_job"""
+        monkeypatch.setattr(service, "_bulk_insert_supported", lambda: False)
+        service.scheduler.add_job(send_nurturing_email_job, "date", run_date=CREATED_AT,
+                                  id="nurturing_5_lead_2_abcd1234", args=[5, "lead_2", "Max", "2", "lead2@example.com"])
+
+        scheduled = service.schedule_nurturing_sequences([lead(1), lead(2)], spread_minutes=60)
+
+        assert [len(scheduled[lead_id]) for lead_id in ("lead_1", "lead_2")] == [3, 2]
+        dates = run_dates(service)
+        assert dates[(2, "lead_2")] - CREATED_AT == timedelta(days=2, minutes=30)
+        assert service.schedule_nurturing_sequences([lead(1), lead(2)]) == {}
+        assert len(service.scheduler.get_jobs()) == 6
+
+
+class TestJobs:
+    """Nurturing jobs are module-level functions, so the job store can persist them"""
+
+    async def test_job_sends_the_email_of_its_day(self, monkeypatch):
+        calls = []
+
+        class Scheduler:
+            async def _send_nurturing_5_job(self, *args):
+                calls.append(args)
+
+        monkeypatch.setattr(scheduler_module, "scheduler_service", Scheduler())
+        await send_nurturing_email_job(5, "lead_1", "Max", "1", "lead1@example.com", "CrossFit")
+
+        assert calls == [("lead_1", "Max", "1", "lead1@example.com", "CrossFit")]
+
+    def test_parse_job_id(self):
+        assert parse_nurturing_job_id("nurturing_7_lead_with_underscores_1a2b3c4d") == (7, "lead_with_underscores")
+        assert parse_nurturing_job_id("welcome_email_c1_1a2b3c4d") is None
+        assert parse_nurturing_job_id("nurturing_x_lead_1a2b3c4d") is None
+
+    def test_imported_leads_are_scheduled_in_bulk(self, service, monkeypatch):
+        monkeypatch.setattr(settings, "enable_lead_nurturing", True)
+        monkeypatch.setattr(service, "schedule_lead_response_email", lambda **kwargs: "lead_response")
+        monkeypatch.setattr(automation_module, "scheduler_service", service)
+
+        AutomationService().process_imported_leads([lead(i) for i in range(3)])
+
+        assert len([job for job in service.scheduler.get_jobs() if parse_nurturing_job_id(job.id)]) == 9
+
+    async def test_leads_sync_schedules_no_nurturing(self, service, monkeypatch):
+        """Synced Wodify leads (any status, any age) never start a sequence"""
+        class SyncService:
+            async def sync_leads(self, force=False):
+                return {"success": True, "synced": 2, "created": 2}
+
+        monkeypatch.setattr(settings, "enable_lead_nurturing", True)
+        monkeypatch.setattr(scheduler_module, "sync_service", SyncService())
+        monkeypatch.setattr(scheduler_module, "scheduler_service", service)
+
+        await scheduler_module.sync_leads_job()
+
+        assert service.scheduler.get_jobs() == []
+
+
+class TestWithoutRunningJobs:
+    """CLI scripts (e.g. the data import) only write jobs for the backend's scheduler"""
+
+    def test_jobs_are_stored_but_not_run(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "scheduler_run_jobs", False)
+        monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'jobs.db'}")
+        service = SchedulerService()
+        try:
+            scheduled = service.schedule_nurturing_sequences([lead(1)], spread_minutes=0)
+
+            # No recurring sync or shop jobs, and nothing is executed
+            assert [job.id for job in service.scheduler.get_jobs()] == scheduled["lead_1"]
+            assert service.scheduler.state == STATE_PAUSED
+            assert len(SQLAlchemyJobStore(url=settings.database_url).get_all_jobs()) == 3
+        finally:
+            service.scheduler.shutdown(wait=False)
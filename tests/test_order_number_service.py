@@ -0,0 +1,54 @@
+"""
+Tests for block-allocated order numbers
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.database import Base, OrderNumberCounter
+from src.services.order_number_service import OrderNumberService
+
+
+def test_numbers_are_sequential_and_formatted(test_db):
+    service = OrderNumberService(block_size=3)
+
+    numbers = [service.next_order_number(test_db) for _ in range(7)]
+
+    assert all(re.fullmatch(r"G3-\d{8}-\d{7}", n) for n in numbers)
+    assert [int(n.rsplit("-", 1)[1]) for n in numbers] == list(range(1, 8))
+    # Three blocks of three were allocated
+    assert test_db.query(OrderNumberCounter).one().next_value == 10
+
+
+def test_workers_get_disjoint_blocks(test_db):
+    first, second = OrderNumberService(block_size=5), OrderNumberService(block_size=5)
+
+    a = [first.next_value(test_db) for _ in range(3)]
+    b = [second.next_value(test_db) for _ in range(3)]
+    a += [first.next_value(test_db) for _ in range(3)]
+
+    assert a == [1, 2, 3, 4, 5, 11]
+    assert b == [6, 7, 8]
+
+
+def test_concurrent_allocation_is_unique(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/numbers.db",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    # Two "workers" sharing the database, eight threads each
+    services = [OrderNumberService(block_size=10), OrderNumberService(block_size=10)]
+
+    def allocate(i: int):
+        with Session() as db:
+            return [services[i % 2].next_value(db) for _ in range(25)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        values = [v for chunk in pool.map(allocate, range(16)) for v in chunk]
+
+    assert len(values) == len(set(values)) == 400
+    engine.dispose()
@@ -0,0 +1,126 @@
+"""
+Tests for password hashing in the worker pool
+"""
+
+import asyncio
+import statistics
+import time
+import uuid
+import pytest
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+import src.api.auth as auth_api
+from config.settings import settings
+from src.api.webhooks import router as webhooks_router
+from src.models.database import User
+from src.services.database_service import database_service
+from src.utils.auth import (
+    get_password_hash,
+    password_needs_rehash,
+    shutdown_password_executor,
+    verify_password,
+)
+
+PASSWORD = "kettlebell-42"
+
+app = FastAPI()
+app.include_router(auth_api.router)
+app.include_router(webhooks_router)
+
+
+@pytest.fixture
+def auth_db(test_engine, monkeypatch):
+    """Point the auth endpoints at the test database and lift the login rate limit"""
+    monkeypatch.setattr(database_service, "SessionLocal", sessionmaker(bind=test_engine, autoflush=False))
+    monkeypatch.setattr(auth_api.limiter, "enabled", False)
+    yield database_service.SessionLocal
+    shutdown_password_executor()
+
+
+def hash_with_cost(rounds: int) -> str:
+    previous, settings.bcrypt_rounds = settings.bcrypt_rounds, rounds
+    try:
+        return get_password_hash(PASSWORD)
+    finally:
+        settings.bcrypt_rounds = previous
+
+
+def add_user(session_factory, hashed_password: str) -> str:
+    with session_factory() as db:
+        user_id = str(uuid.uuid4())
+        db.add(User(id=user_id, email=f"{user_id}@example.com", hashed_password=hashed_password, is_active=True))
+        db.commit()
+        return user_id
+
+
+class TestPasswordHashing:
+    """Tests for hashing, verification and cost upgrades"""
+
+    def test_hash_uses_configured_cost(self, monkeypatch):
+        monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+        hashed = get_password_hash(PASSWORD)
+
+        assert hashed.startswith("$2b$05$")
+        assert verify_password(PASSWORD, hashed)
+        assert not verify_password("wrong-password", hashed)
+        assert not password_needs_rehash(hashed)
+
+        monkeypatch.setattr(settings, "bcrypt_rounds", 6)
+        assert password_needs_rehash(hashed)
+
+    def test_invalid_hash_never_verifies(self):
+        assert not verify_password(PASSWORD, "not-a-bcrypt-hash")
+        assert password_needs_rehash("not-a-bcrypt-hash")
+
+    async def test_login_rehashes_when_cost_changed(self, auth_db, monkeypatch):
+        user_id = add_user(auth_db, hash_with_cost(4))
+        monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/auth/login", json={"email": f"{user_id}@example.com", "password": PASSWORD}
+            )
+
+        assert response.status_code == 200
+        with auth_db() as db:
+            hashed = db.query(User).filter(User.id == user_id).one().hashed_password
+        assert hashed.startswith("$2b$05$")
+        assert verify_password(PASSWORD, hashed)
+
+
+async def test_webhook_latency_stays_flat_during_login_storm(auth_db, monkeypatch):
+    """16 concurrent logins at cost 12 must not stall webhook requests"""
+    monkeypatch.setattr(settings, "bcrypt_rounds", 12)
+    hashed = hash_with_cost(12)
+    emails = [f"{add_user(auth_db, hashed)}@example.com" for _ in range(16)]
+
+    start = time.perf_counter()
+    verify_password(PASSWORD, hashed)
+    single_verify = time.perf_counter() - start
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        async def probe_webhooks(until: asyncio.Future):
+            latencies = []
+            while not until.done():
+                start = time.perf_counter()
+                response = await client.get("/webhooks/health")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+            return latencies
+
+        async def login(email: str):
+            return await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+
+        storm = asyncio.gather(*(login(email) for email in emails))
+        latencies = await probe_webhooks(storm)
+        responses = await storm
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(latencies) >= 5
+    print(f"\nbcrypt verify: {single_verify * 1000:.0f} ms, webhook latency during storm: "
+          f"median {statistics.median(latencies) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+    # A verify on the event loop would delay a probe by at least one full bcrypt round
+    assert max(latencies) < single_verify / 2
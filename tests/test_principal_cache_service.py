@@ -0,0 +1,243 @@
+"""
+Tests for the principal cache and embedded token claims
+"""
+
+import time
+import httpx
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import sessionmaker
+
+import src.api.admin as admin_api
+import src.api.auth as auth_api
+import src.services.principal_cache_service as principal_cache_module
+from config.settings import settings
+from src.models.auth import AuthenticatedUser
+from src.models.database import RefreshToken, User
+from src.services.database_service import database_service
+from src.services.principal_cache_service import PrincipalCacheService
+from src.services.refresh_token_service import refresh_token_service
+from src.utils.auth import (
+    create_access_token,
+    get_password_hash,
+    principal_claims,
+    shutdown_password_executor,
+    verify_password,
+    verify_token,
+)
+
+
+def make_user(is_active: bool = True, is_admin: bool = False):
+    return SimpleNamespace(id="user_1", email="max@example.com", is_active=is_active, is_admin=is_admin)
+
+
+class CountingLoader:
+    """Stands in for the user query and counts how often it runs"""
+
+    def __init__(self, user):
+        self.user = user
+        self.calls = 0
+
+    def __call__(self, user_id: str):
+        self.calls += 1
+        if self.user is None:
+            return None
+        return AuthenticatedUser(
+            id=user_id, email=self.user.email, is_active=self.user.is_active, is_admin=self.user.is_admin
+        )
+
+
+@pytest.fixture
+def principal_cache(monkeypatch):
+    cache = PrincipalCacheService(ttl_seconds=60)
+    monkeypatch.setattr(auth_api, "principal_cache_service", cache)
+    monkeypatch.setattr(admin_api, "principal_cache_service", cache)
+    return cache
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+class TestPrincipalResolution:
+    """Tests for resolving principals without per-request user queries"""
+
+    async def test_embedded_claims_need_no_user_query(self, principal_cache):
+        loader = CountingLoader(make_user(is_admin=True))
+        payload = verify_token(create_access_token(principal_claims(make_user(is_admin=True))))
+
+        for _ in range(3):
+            principal = await principal_cache.resolve(payload, loader)
+
+        assert loader.calls == 0
+        assert principal == AuthenticatedUser(id="user_1", email="max@example.com", is_active=True, is_admin=True)
+
+    async def test_token_without_claims_is_loaded_once_per_jti(self, principal_cache):
+        loader = CountingLoader(make_user())
+        first = verify_token(create_access_token({"sub": "user_1", "email": "max@example.com"}))
+        second = verify_token(create_access_token({"sub": "user_1", "email": "max@example.com"}))
+
+        for _ in range(3):
+            await principal_cache.resolve(first, loader)
+        await principal_cache.resolve(second, loader)
+
+        assert first["jti"] != second["jti"]
+        assert loader.calls == 2
+
+    async def test_expired_cache_entry_is_reloaded(self):
+        cache = PrincipalCacheService(ttl_seconds=0)
+        loader = CountingLoader(make_user())
+        payload = verify_token(create_access_token({"sub": "user_1"}))
+
+        await cache.resolve(payload, loader)
+        await cache.resolve(payload, loader)
+
+        assert loader.calls == 2
+
+    async def test_invalidation_overrides_claims_and_cache(self, principal_cache):
+        user = make_user()
+        loader = CountingLoader(user)
+        with_claims = verify_token(create_access_token(principal_claims(user)))
+        without_claims = verify_token(create_access_token({"sub": "user_1"}))
+        await principal_cache.resolve(without_claims, loader)
+
+        user.is_active = False
+        await principal_cache.invalidate_user("user_1")
+
+        assert (await principal_cache.resolve(with_claims, loader)).is_active is False
+        assert (await principal_cache.resolve(without_claims, loader)).is_active is False
+        assert loader.calls == 3
+
+    async def test_other_workers_recheck_after_the_local_ttl(self, monkeypatch):
+        """Without Redis another worker serves a changed user for at most the local TTL"""
+        monkeypatch.setattr(settings, "redis_host", None)
+        monkeypatch.setattr(settings, "auth_principal_local_ttl_seconds", 5)
+        other_worker = PrincipalCacheService()
+        user = make_user()
+        loader = CountingLoader(user)
+        with_claims = verify_token(create_access_token(principal_claims(user)))
+        without_claims = verify_token(create_access_token({"sub": "user_1"}))
+        await other_worker.resolve(without_claims, loader)
+
+        # Deactivated through a different worker: no marker in this one
+        user.is_active = False
+        assert (await other_worker.resolve(with_claims, loader)).is_active is True
+        now, monotonic = time.time(), time.monotonic()
+        monkeypatch.setattr(principal_cache_module, "time", SimpleNamespace(
+            time=lambda: now + 6, monotonic=lambda: monotonic + 6
+        ))
+
+        assert other_worker.ttl_seconds == 5
+        assert (await other_worker.resolve(with_claims, loader)).is_active is False
+        assert (await other_worker.resolve(without_claims, loader)).is_active is False
+
+
+class TestGetCurrentUser:
+    """Tests for the get_current_user dependency"""
+
+    async def test_deactivated_user_is_rejected_after_invalidation(self, principal_cache, monkeypatch):
+        user = make_user()
+        loader = CountingLoader(user)
+        monkeypatch.setattr(auth_api, "load_principal", loader)
+        token = create_access_token(principal_claims(user))
+
+        assert (await auth_api.get_current_user(bearer(token))).id == "user_1"
+        assert loader.calls == 0
+
+        user.is_active = False
+        await principal_cache.invalidate_user("user_1")
+        with pytest.raises(HTTPException) as exc:
+            await auth_api.get_current_user(bearer(token))
+        assert exc.value.status_code == 403
+
+    async def test_unknown_user_is_unauthorized(self, principal_cache, monkeypatch):
+        monkeypatch.setattr(auth_api, "load_principal", CountingLoader(None))
+        token = create_access_token({"sub": "ghost"})
+
+        with pytest.raises(HTTPException) as exc:
+            await auth_api.get_current_user(bearer(token))
+        assert exc.value.status_code == 401
+
+
+@pytest.fixture
+def account(test_engine, principal_cache, monkeypatch):
+    """A user with a password and a refresh token in the test database"""
+    monkeypatch.setattr(database_service, "SessionLocal", sessionmaker(bind=test_engine, autoflush=False))
+    monkeypatch.setattr(auth_api.limiter, "enabled", False)
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    with database_service.SessionLocal() as db:
+        db.add(User(id="user_1", email="max@example.com", hashed_password=get_password_hash("alt-passwort-1")))
+        db.commit()
+        refresh_token_service.issue(db, "user_1")
+        db.commit()
+    yield make_user()
+    shutdown_password_executor()
+
+
+def client_for(user) -> httpx.AsyncClient:
+    app = FastAPI()
+    app.include_router(auth_api.router)
+    app.include_router(admin_api.router)
+    token = create_access_token(principal_claims(user))
+    return httpx.AsyncClient(app=app, base_url="http://test", headers={"Authorization": f"Bearer {token}"})
+
+
+def open_refresh_tokens() -> int:
+    with database_service.SessionLocal() as db:
+        return db.query(RefreshToken).filter(RefreshToken.revoked_at.is_(None)).count()
+
+
+class TestUserChangesInvalidate:
+    """Changing or deactivating a user rechecks the user's current tokens"""
+
+    async def test_deactivated_user_is_locked_out_at_once(self, account):
+        async with client_for(account) as user_client, client_for(make_user(is_admin=True)) as admin:
+            assert (await user_client.get("/api/auth/me")).status_code == 200
+
+            response = await admin.patch("/admin/users/user_1", json={"is_active": False})
+            me = await user_client.get("/api/auth/me")
+
+        assert response.status_code == 200 and response.json()["is_active"] is False
+        # The token still claims is_active=True
+        assert me.status_code == 403
+        assert open_refresh_tokens() == 0
+
+    async def test_admin_flag_change_applies_to_current_tokens(self, account):
+        async with client_for(make_user(is_admin=True)) as admin:
+            await admin.patch("/admin/users/user_1", json={"is_admin": True})
+        async with client_for(account) as user_client:
+            response = await user_client.get("/admin/llm-cache")
+
+        assert response.status_code == 200
+
+    async def test_null_flags_are_ignored(self, account):
+        async with client_for(make_user(is_admin=True)) as admin:
+            response = await admin.patch("/admin/users/user_1", json={"is_active": None, "is_admin": None})
+
+        assert response.status_code == 200
+        assert (response.json()["is_active"], response.json()["is_admin"]) == (True, False)
+
+    async def test_only_admins_update_users(self, account):
+        async with client_for(account) as user_client:
+            response = await user_client.patch("/admin/users/user_1", json={"is_admin": True})
+
+        assert response.status_code == 403
+
+    async def test_password_change_invalidates_and_logs_out_everywhere(self, account, principal_cache):
+        async with client_for(account) as user_client:
+            wrong = await user_client.post("/api/auth/change-password", json={
+                "current_password": "falsch-falsch", "new_password": "neu-passwort-2"
+            })
+            assert await principal_cache.backend.get("user_1") is None
+            changed = await user_client.post("/api/auth/change-password", json={
+                "current_password": "alt-passwort-1", "new_password": "neu-passwort-2"
+            })
+
+        assert wrong.status_code == 400
+        assert changed.status_code == 204
+        assert await principal_cache.backend.get("user_1") is not None
+        assert open_refresh_tokens() == 0
+        with database_service.SessionLocal() as db:
+            assert verify_password("neu-passwort-2", db.get(User, "user_1").hashed_password)
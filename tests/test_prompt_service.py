@@ -0,0 +1,99 @@
+"""
+Tests for prompt assembly, token budgets and usage accounting
+"""
+
+import pytest
+
+import src.services.prompt_service as prompt_module
+from config.settings import settings
+from src.services.llm_usage_service import LLMUsageService, usage_cost
+from src.services.prompt_service import (
+    ASSISTANT_CONTEXT, PromptService, count_tokens, truncate_tokens
+)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Expected counts are those of the estimate, also where tiktoken is installed"""
+    monkeypatch.setattr(prompt_module, "_encoding", lambda: None)
+
+
+def message(role: str, words: int, label: str = "") -> dict:
+    return {"role": role, "content": f"{label} " + "wort " * words}
+
+
+class TestPromptService:
+    """Tests for the static prefix and the budgets"""
+
+    def test_token_estimate_and_truncation(self):
+        assert count_tokens("") == 0
+        assert count_tokens("Hallo, wie geht's?") == 8
+        assert count_tokens("Öffnungszeiten") == 4
+
+        assert truncate_tokens("eins zwei drei", 10) == "eins zwei drei"
+        cut = truncate_tokens("eins zwei drei vier fünf sechs", 4)
+        assert cut == "eins zwei drei …"
+        assert count_tokens(cut) <= 4
+
+    def test_static_prefix_is_unchanged_by_request_data(self):
+        service = PromptService(context_max_tokens=50, history_max_tokens=100)
+
+        first = service.assemble("Was kostet das?", context="Anrufer: Max")
+        second = service.assemble("Wann habt ihr offen?", history=[message("user", 3)])
+
+        assert first.static_context is second.static_context is ASSISTANT_CONTEXT
+        assert first.context == "Anrufer: Max"
+        assert second.context == ""
+        assert first.input_tokens == count_tokens(ASSISTANT_CONTEXT) + count_tokens("Anrufer: Max") + 4 + count_tokens("Was kostet das?") + 4
+
+    def test_history_keeps_most_recent_messages_within_budget(self):
+        service = PromptService(context_max_tokens=50, history_max_tokens=32)
+        history = [
+            message("user", 10, "alt"),
+            message("assistant", 10, "antwort"),
+            message("user", 10, "neu"),
+            message("assistant", 10, "letzte"),
+        ]
+
+        assembled = service.assemble("Und dann?", history=history)
+
+        assert [m["content"].split()[0] for m in assembled.history] == ["neu", "letzte"]
+        assert assembled.dropped_messages == 2
+        assert assembled.context.startswith("Bisheriger Gesprächsverlauf (gekürzt):\n- Interessent: alt wort")
+        assert "- Assistent: antwort" in assembled.context
+
+    def test_kept_history_starts_with_a_user_message(self):
+        service = PromptService(context_max_tokens=50, history_max_tokens=20)
+        history = [message("user", 10, "frage"), message("assistant", 10, "antwort"), {"role": "system", "content": "x"}]
+
+        kept, dropped = service.trim_history(history)
+
+        assert kept == []
+        assert [m["role"] for m in dropped] == ["user", "assistant"]
+
+
+class TestUsage:
+    """Tests for token and cost accounting"""
+
+    def test_cost_uses_cached_input_price(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_input_cost_per_million", 1.0)
+        monkeypatch.setattr(settings, "llm_cached_input_cost_per_million", 0.5)
+        monkeypatch.setattr(settings, "llm_output_cost_per_million", 4.0)
+
+        assert usage_cost(1_000_000, 0) == 1.0
+        assert usage_cost(1_000_000, 250_000, cached_input_tokens=500_000) == 0.5 + 0.25 + 1.0
+
+    def test_calls_are_added_to_the_tracked_request(self):
+        service = LLMUsageService()
+
+        with service.track() as usage:
+            service.record("openai", "gpt-4o-mini", 100, 20)
+            service.record("openai", "gpt-4o-mini", 50, 10, estimated=True)
+        service.record("anthropic", "claude-3-haiku", 10, 5)
+
+        assert (usage.calls, usage.input_tokens, usage.output_tokens, usage.estimated) == (2, 150, 30, True)
+        report = service.report()
+        assert report["requests"] == 1
+        assert report["models"]["openai:gpt-4o-mini"]["input_tokens"] == 150
+        assert report["models"]["anthropic:claude-3-haiku"]["calls"] == 1
+        assert report["avg_cost_per_request_usd"] == round(usage.cost, 6)
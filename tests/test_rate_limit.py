@@ -0,0 +1,71 @@
+"""
+Tests for the shared rate limiter
+"""
+
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from config.settings import settings
+from src.utils.rate_limit import create_limiter, rate_limit_storage_uri
+
+
+def make_app(limiter) -> FastAPI:
+    """App with one endpoint limited to 3 requests per minute"""
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get("/limited")
+    @limiter.limit("3/minute")
+    async def limited(request: Request):
+        return {"status": "ok"}
+
+    return app
+
+
+def status_codes(app: FastAPI, count: int):
+    with TestClient(app) as client:
+        return [client.get("/limited").status_code for _ in range(count)]
+
+
+class TestRateLimitStorage:
+    """Tests for storage selection and the sliding window limit"""
+
+    def test_storage_uri_follows_redis_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "rate_limit_storage_uri", None)
+        monkeypatch.setattr(settings, "redis_host", None)
+        assert rate_limit_storage_uri() == "memory://"
+
+        monkeypatch.setattr(settings, "redis_host", "cache.internal")
+        monkeypatch.setattr(settings, "redis_port", 6380)
+        monkeypatch.setattr(settings, "redis_db", 2)
+        monkeypatch.setattr(settings, "redis_password", "p@ss/word")
+        assert rate_limit_storage_uri() == "redis://:p%40ss%2Fword@cache.internal:6380/2"
+
+        monkeypatch.setattr(settings, "rate_limit_storage_uri", "memory://")
+        assert rate_limit_storage_uri() == "memory://"
+
+    def test_limit_is_enforced_with_sliding_window(self):
+        limiter = create_limiter("memory://")
+
+        assert type(limiter.limiter).__name__ == "SlidingWindowCounterRateLimiter"
+        assert status_codes(make_app(limiter), 5) == [200, 200, 200, 429, 429]
+
+    def test_unreachable_redis_falls_back_to_in_process_limits(self):
+        limiter = create_limiter("redis://127.0.0.1:1/0")
+
+        assert status_codes(make_app(limiter), 5) == [200, 200, 200, 429, 429]
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_REDIS_URL"), reason="TEST_REDIS_URL not set")
+def test_workers_share_one_limit():
+    """Two limiters (two workers) on the same Redis share the 3/minute budget"""
+    first, second = create_limiter(os.environ["TEST_REDIS_URL"]), create_limiter(os.environ["TEST_REDIS_URL"])
+    first.reset()
+
+    assert status_codes(make_app(first), 2) + status_codes(make_app(second), 2) == [200, 200, 200, 429]
+    first.reset()
@@ -0,0 +1,148 @@
+"""
+Tests for the refresh token store
+"""
+
+import pytest
+import httpx
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import src.api.auth as auth_api
+from src.models.database import RefreshToken, User
+from src.services.database_service import database_service
+from src.services.refresh_token_service import RefreshTokenService, RefreshTokenError
+from src.utils.auth import get_password_hash
+
+app = FastAPI()
+app.include_router(auth_api.router)
+
+
+@pytest.fixture
+def token_db(test_db):
+    test_db.add(User(id="user_1", email="max@example.com", hashed_password="x", is_active=True))
+    test_db.commit()
+    return test_db
+
+
+@pytest.fixture
+def tokens():
+    return RefreshTokenService()
+
+
+def issue(tokens: RefreshTokenService, db) -> str:
+    token = tokens.issue(db, "user_1")
+    db.commit()
+    return token
+
+
+class TestRefreshTokenRotation:
+    """Tests for rotation, reuse detection and revocation"""
+
+    def test_only_the_hash_is_stored(self, token_db, tokens):
+        token = issue(tokens, token_db)
+
+        row = token_db.query(RefreshToken).one()
+        assert row.token_hash == RefreshTokenService.hash_token(token)
+        assert token not in (row.token_hash, row.id, row.family_id)
+
+    def test_rotation_keeps_family_and_revokes_old_token(self, token_db, tokens):
+        token = issue(tokens, token_db)
+
+        new_token, user = tokens.rotate(token_db, token)
+
+        assert new_token != token
+        assert (user.id, user.email, user.is_active) == ("user_1", "max@example.com", True)
+        old, new = sorted(token_db.query(RefreshToken).all(), key=lambda row: row.revoked_at is None)
+        assert old.revoked_at is not None and old.replaced_by_id == new.id
+        assert new.revoked_at is None and new.family_id == old.family_id
+
+    def test_reuse_revokes_whole_family(self, token_db, tokens):
+        token = issue(tokens, token_db)
+        other_login = issue(tokens, token_db)
+        new_token, _ = tokens.rotate(token_db, token)
+
+        # A fresh service instance (another worker) without the negative cache
+        with pytest.raises(RefreshTokenError) as exc:
+            RefreshTokenService().rotate(token_db, token)
+        assert exc.value.reason == "reused"
+
+        with pytest.raises(RefreshTokenError):
+            tokens.rotate(token_db, new_token)
+        # Other logins of the user are unaffected
+        tokens.rotate(token_db, other_login)
+
+    def test_expired_and_inactive_are_rejected(self, token_db, tokens):
+        token = issue(tokens, token_db)
+        token_db.query(RefreshToken).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+        token_db.commit()
+        with pytest.raises(RefreshTokenError) as exc:
+            tokens.rotate(token_db, token)
+        assert exc.value.reason == "expired"
+
+        token = issue(tokens, token_db)
+        token_db.query(User).update({"is_active": False})
+        token_db.commit()
+        with pytest.raises(RefreshTokenError) as exc:
+            tokens.rotate(token_db, token)
+        assert exc.value.reason == "inactive user"
+
+    def test_rejected_tokens_skip_the_database(self, token_db, tokens, test_engine):
+        token = issue(tokens, token_db)
+        tokens.revoke(token_db, token)
+        unknown = "not-a-stored-token"
+        with pytest.raises(RefreshTokenError):
+            tokens.rotate(token_db, unknown)
+
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", listener)
+        try:
+            for replayed in (token, unknown):
+                with pytest.raises(RefreshTokenError) as exc:
+                    tokens.rotate(token_db, replayed)
+                assert exc.value.reason == "revoked"
+        finally:
+            event.remove(test_engine, "before_cursor_execute", listener)
+        assert statements == []
+
+    def test_purge_deletes_only_expired_tokens(self, token_db, tokens):
+        issue(tokens, token_db)
+        revoked = issue(tokens, token_db)
+        tokens.revoke(token_db, revoked)
+
+        assert tokens.purge_expired(token_db) == 0
+        assert tokens.purge_expired(token_db, now=datetime.utcnow() + timedelta(days=30)) == 2
+        assert token_db.query(RefreshToken).count() == 0
+
+
+async def test_login_refresh_logout_flow(test_engine, monkeypatch):
+    monkeypatch.setattr(database_service, "SessionLocal", sessionmaker(bind=test_engine, autoflush=False))
+    monkeypatch.setattr(auth_api.limiter, "enabled", False)
+    monkeypatch.setattr(auth_api, "refresh_token_service", RefreshTokenService())
+    with database_service.SessionLocal() as db:
+        db.add(User(id="user_1", email="max@example.com", hashed_password=get_password_hash("kettlebell-42")))
+        db.commit()
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        login = await client.post("/api/auth/login", json={"email": "max@example.com", "password": "kettlebell-42"})
+        first = login.json()["refresh_token"]
+
+        refreshed = await client.post("/api/auth/refresh", json={"refresh_token": first})
+        assert refreshed.status_code == 200
+        second = refreshed.json()["refresh_token"]
+
+        replayed = await client.post("/api/auth/refresh", json={"refresh_token": first})
+        assert replayed.status_code == 401
+
+        # The replay revoked the family, so the rotated token is dead too
+        assert (await client.post("/api/auth/refresh", json={"refresh_token": second})).status_code == 401
+
+        login = await client.post("/api/auth/login", json={"email": "max@example.com", "password": "kettlebell-42"})
+        third = login.json()["refresh_token"]
+        assert (await client.post("/api/auth/logout", json={"refresh_token": third})).status_code == 204
+        assert (await client.post("/api/auth/refresh", json={"refresh_token": third})).status_code == 401
@@ -0,0 +1,170 @@
+"""
+Tests for deadlines, hedged reads and the cached schedule fallback against a local Wodify stub
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import src.api.schedule as schedule_api
+from config.settings import settings
+from src.database import get_db
+from src.services.wodify_api_service import WodifyAPIService
+from src.utils.resilience import deadline, remaining_time, DeadlineExceededError
+
+
+class WodifyLatencyStub:
+    """
+    Minimal Wodify API whose answers are delayed
+
+    Each request takes the next delay from `delays` (then `default_delay`)
+    and the next (status, headers) from `statuses` (then 200).
+    """
+
+    def __init__(self):
+        self.app = FastAPI()
+        self.delays = deque()
+        self.statuses = deque()
+        self.default_delay = 0.0
+        self.requests = 0
+
+        @self.app.get("/v1/classes")
+        async def classes(request: Request):
+            self.requests += 1
+            number = self.requests
+            await asyncio.sleep(self.delays.popleft() if self.delays else self.default_delay)
+            status, headers = self.statuses.popleft() if self.statuses else (200, {})
+            if status != 200:
+                return JSONResponse({"error": "unavailable"}, status_code=status, headers=headers)
+            return {"classes": [{"id": f"class_{number}", "name": "CrossFit", "day": "Monday"}]}
+
+    def reset(self):
+        self.delays.clear()
+        self.statuses.clear()
+        self.default_delay = 0.0
+        self.requests = 0
+
+
+@pytest.fixture(scope="module")
+def wodify_stub():
+    stub = WodifyLatencyStub()
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    stub.base_url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+    yield stub
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def service(wodify_stub, monkeypatch):
+    wodify_stub.reset()
+    monkeypatch.setattr(settings, "wodify_api_url", f"{wodify_stub.base_url}/v1")
+    monkeypatch.setattr(settings, "wodify_retry_backoff_seconds", 0.01)
+    monkeypatch.setattr(settings, "wodify_hedging", False)
+    service = WodifyAPIService()
+    monkeypatch.setattr(schedule_api, "wodify_api_service", service)
+    return service
+
+
+@pytest.fixture
+async def client(test_db):
+    app = FastAPI()
+    app.include_router(schedule_api.router)
+    # Empty schedule replica, all reads go to Wodify
+    app.dependency_overrides[get_db] = lambda: test_db
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+class TestDeadlines:
+    """The deadline of the incoming request bounds all Wodify calls"""
+
+    async def test_slow_wodify_falls_back_to_cached_schedule(self, service, wodify_stub, client):
+        fresh = (await client.get("/api/schedule/classes")).json()
+        assert fresh["stale"] is False
+        assert fresh["classes"][0]["id"] == "class_1"
+
+        wodify_stub.default_delay = 2.0
+        started = time.monotonic()
+        response = await client.get("/api/schedule/classes", headers={"X-Request-Timeout-Ms": "300"})
+
+        assert time.monotonic() - started < 0.8
+        body = response.json()
+        assert body["stale"] is True
+        assert body["classes"] == fresh["classes"]
+        assert body["fetchedAt"] == fresh["fetchedAt"]
+        # Running out of time isn't retried
+        assert wodify_stub.requests == 2
+
+    async def test_without_cached_schedule_the_answer_is_empty(self, service, wodify_stub, client, monkeypatch):
+        monkeypatch.setattr(settings, "schedule_deadline_seconds", 0.2)
+        wodify_stub.default_delay = 2.0
+        next_week = (date.today() + timedelta(days=7)).isoformat()
+
+        started = time.monotonic()
+        body = (await client.get(f"/api/schedule/classes?start_date={next_week}")).json()
+
+        assert time.monotonic() - started < 0.7
+        assert (body["classes"], body["stale"], body["fetchedAt"]) == ([], False, None)
+
+    async def test_retry_is_skipped_if_it_would_pass_the_deadline(self, service, wodify_stub):
+        wodify_stub.statuses.append((503, {"Retry-After": "1"}))
+
+        started = time.monotonic()
+        with deadline(0.5):
+            with pytest.raises(httpx.HTTPStatusError):
+                await service._make_request("GET", "classes")
+            # Nested deadlines can only shorten the outer one
+            with deadline(5.0):
+                assert remaining_time() < 0.5
+        assert time.monotonic() - started < 0.3
+        assert wodify_stub.requests == 1
+
+    async def test_expired_deadline_sends_nothing(self, service, wodify_stub):
+        with deadline(0):
+            with pytest.raises(DeadlineExceededError):
+                await service._make_request("GET", "classes")
+        assert wodify_stub.requests == 0
+
+
+class TestHedging:
+    """Slow reads get a second request once the p95 latency has passed"""
+
+    async def test_hedged_request_wins_over_slow_one(self, service, wodify_stub, monkeypatch):
+        monkeypatch.setattr(settings, "wodify_hedging", True)
+        monkeypatch.setattr(settings, "wodify_hedge_min_samples", 5)
+        wodify_stub.default_delay = 0.01
+        for _ in range(5):
+            await service.get_schedule()
+        assert service.resilience_status()["hedging"]["p95_seconds"]["schedule"] < 0.5
+
+        wodify_stub.delays.append(2.0)
+        started = time.monotonic()
+        classes = await service.get_schedule()
+
+        assert time.monotonic() - started < 0.5
+        assert classes[0]["id"] == "class_7"
+        assert wodify_stub.requests == 7
+        assert (service.hedged_requests, service.hedge_wins) == (1, 1)
+
+    async def test_no_hedging_without_latency_samples(self, service, wodify_stub, monkeypatch):
+        monkeypatch.setattr(settings, "wodify_hedging", True)
+        monkeypatch.setattr(settings, "wodify_hedge_min_samples", 5)
+        wodify_stub.delays.append(0.3)
+
+        await service.get_schedule()
+
+        assert wodify_stub.requests == 1
+        assert service.hedged_requests == 0
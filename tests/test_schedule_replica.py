@@ -0,0 +1,221 @@
+"""
+Tests for the local class schedule replica
+"""
+
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import src.api.schedule as schedule_api
+import src.services.schedule_replica_service as replica_module
+from config.settings import settings
+from src.api.auth import get_current_user
+from src.database import get_db
+from src.models.auth import AuthenticatedUser
+from src.models.database import ClassBooking, ScheduleClass
+from src.models.wodify import WodifyClassBooked
+from src.services.schedule_replica_service import ScheduleReplicaService, class_date
+from src.services.wodify_api_service import WodifyAPIService
+
+MONDAY = date(2026, 10, 19)
+
+
+def wodify_class(class_id: str, day: str, class_type: str = "CrossFit", trainer: str = "Anna", **fields) -> dict:
+    return {
+        "id": class_id, "name": class_type, "type": class_type, "trainer": {"name": trainer},
+        "day": day, "start_time": "18:00", "end_time": "19:00", "capacity": 12, "booked": 3, **fields,
+    }
+
+
+class WodifyStub:
+    """Answers with `classes` (or `status` if set) and counts the schedule requests"""
+
+    def __init__(self):
+        self.classes = [
+            wodify_class("c1", "Monday"),
+            wodify_class("c2", "Tuesday", class_type="Open Gym", trainer="Ben"),
+            wodify_class("c3", "Monday", class_type="Hyrox", date="2026-10-26"),
+        ]
+        self.status = 200
+        self.schedule_requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.status != 200:
+            return httpx.Response(self.status)
+        if request.url.path.endswith("/classes"):
+            self.schedule_requests += 1
+            return httpx.Response(200, json={"classes": self.classes})
+        if request.url.path.endswith("/class-types"):
+            return httpx.Response(200, json={"class_types": [{"id": "t1", "name": "CrossFit"}]})
+        return httpx.Response(200, json={"trainers": [{"id": "anna", "name": "Anna"}, {"id": "ben", "name": "Ben"}]})
+
+
+@pytest.fixture
+def wodify(monkeypatch):
+    monkeypatch.setattr(settings, "wodify_retry_attempts", 1)
+    stub = WodifyStub()
+    service = WodifyAPIService()
+    service._client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(stub), timeout=30.0)
+    monkeypatch.setattr(replica_module, "wodify_api_service", service)
+    monkeypatch.setattr(schedule_api, "wodify_api_service", service)
+    return stub
+
+
+@pytest.fixture
+def replica():
+    return ScheduleReplicaService()
+
+
+@pytest.fixture
+async def client(test_db, monkeypatch):
+    monkeypatch.setattr(schedule_api, "schedule_replica_service", ScheduleReplicaService())
+    app = FastAPI()
+    app.include_router(schedule_api.router)
+    app.dependency_overrides[get_db] = lambda: test_db
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+class TestRefresh:
+    """Tests for loading the replica from Wodify"""
+
+    def test_class_date(self):
+        assert class_date({"day": "Wednesday"}, MONDAY, MONDAY + timedelta(days=7)) == date(2026, 10, 21)
+        assert class_date({"start_time": "2026-11-02T18:00:00"}, MONDAY, MONDAY) == date(2026, 11, 2)
+        assert class_date({"day": "Sunday"}, MONDAY, MONDAY + timedelta(days=3)) is None
+
+    async def test_refresh_and_indexed_filters(self, test_db, wodify, replica):
+        result = await replica.refresh(test_db, start=MONDAY)
+
+        assert (result["classes"], result["class_types"], result["trainers"]) == (3, 1, 2)
+        end = MONDAY + timedelta(days=settings.schedule_replica_days_ahead)
+        assert [c.id for c in replica.query(test_db, MONDAY, end)] == ["c1", "c2", "c3"]
+        assert [c.id for c in replica.query(test_db, MONDAY, end, day="Monday")] == ["c1", "c3"]
+        assert [c.id for c in replica.query(test_db, MONDAY, end, class_type="Hyrox")] == ["c3"]
+        assert [c.id for c in replica.query(test_db, MONDAY, end, trainer="Ben")] == ["c2"]
+        assert [t["name"] for t in replica.catalog(test_db, schedule_api.Trainer)] == ["Anna", "Ben"]
+
+        plan = test_db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM classes "
+            "WHERE day_of_week = 'Monday' AND class_date BETWEEN '2026-10-19' AND '2026-10-26'"
+        )).fetchall()
+        assert "ix_classes_day_date" in str(plan)
+
+    async def test_failed_refresh_keeps_the_replica(self, test_db, wodify, replica):
+        await replica.refresh(test_db, start=MONDAY)
+        wodify.status = 500
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await replica.refresh(test_db, start=MONDAY)
+
+        assert test_db.query(ScheduleClass).count() == 3
+        assert replica.sync_state(test_db).window_start == MONDAY
+
+
+class TestBookings:
+    """Booking webhooks update the counters incrementally"""
+
+    async def test_each_booking_counts_once(self, test_db, wodify, replica):
+        await replica.refresh(test_db, start=MONDAY)
+
+        assert replica.apply_booking(test_db, "c1", "b1", "Booked")
+        assert replica.apply_booking(test_db, "c1", "b1", "Booked")
+        assert replica.apply_booking(test_db, "c1", "b2", "Waitlist")
+        assert test_db.get(ScheduleClass, "c1").booked == 4
+
+        replica.apply_booking(test_db, "c1", "b1", "Cancelled")
+        replica.apply_booking(test_db, "c1", "b1", "Cancelled")
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 3
+
+    async def test_counter_never_goes_below_zero(self, test_db, wodify, replica):
+        wodify.classes = [wodify_class("c1", "Monday", booked=0)]
+        await replica.refresh(test_db, start=MONDAY)
+        test_db.add(ClassBooking(booking_id="b1", class_id="c1", status="Booked"))
+        test_db.commit()
+
+        replica.apply_booking(test_db, "c1", "b1", "Cancelled")
+
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 0
+
+    async def test_cancel_through_the_api_frees_the_spot(self, test_db, wodify, replica, monkeypatch):
+        await replica.refresh(test_db, start=MONDAY)
+        replica.apply_booking(test_db, "c1", "b1", "Booked")
+        monkeypatch.setattr(schedule_api, "schedule_replica_service", replica)
+        app = FastAPI()
+        app.include_router(schedule_api.router)
+        app.dependency_overrides[get_db] = lambda: test_db
+        app.dependency_overrides[get_current_user] = lambda: AuthenticatedUser(id="u1", email="u1@example.com")
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.delete("/api/schedule/bookings/b1")
+            unknown = await client.delete("/api/schedule/bookings/b2")
+
+        assert response.status_code == 200 and unknown.status_code == 200
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 3
+        # The cancellation webhook doesn't count it down again
+        replica.apply_booking(test_db, "c1", "b1", "Cancelled")
+        test_db.expire_all()
+        assert test_db.get(ScheduleClass, "c1").booked == 3
+
+    async def test_booking_for_unknown_class_refreshes(self, test_db, test_engine, wodify, replica, monkeypatch):
+        monkeypatch.setattr(replica_module, "SessionLocal", sessionmaker(bind=test_engine))
+        booking = WodifyClassBooked(
+            client_id="m1", first_name="Max", last_name="Muster", email="max@example.com",
+            class_id="c1", class_name="CrossFit", class_date=datetime(2026, 10, 19, 18),
+            booking_id="b1", booking_status="Booked",
+        )
+
+        await replica.process_booking(booking)
+
+        assert wodify.schedule_requests == 1
+        assert test_db.get(ClassBooking, "b1").status == "Booked"
+        # Wodify's counter already includes the booking
+        assert test_db.get(ScheduleClass, "c1").booked == 3
+
+
+class TestScheduleEndpoint:
+    """/api/schedule reads the replica"""
+
+    async def test_classes_are_served_during_wodify_outage(self, test_db, wodify, client):
+        await ScheduleReplicaService().refresh(test_db)
+        wodify.status = 503
+        start = date.today()
+
+        response = await client.get(f"/api/schedule/classes?start_date={start.isoformat()}&trainer=Ben")
+
+        body = response.json()
+        assert response.status_code == 200
+        assert [c["id"] for c in body["classes"]] == ["c2"]
+        assert body["classes"][0]["type"] == "open gym"
+        assert body["stale"] is False
+        assert body["fetchedAt"] == ScheduleReplicaService().sync_state(test_db).refreshed_at.isoformat()
+        assert wodify.schedule_requests == 1
+
+        types = (await client.get("/api/schedule/class-types")).json()
+        assert types["class_types"] == [{"id": "t1", "name": "CrossFit"}]
+
+    async def test_dates_outside_the_replica_are_fetched_live(self, test_db, wodify, client):
+        await ScheduleReplicaService().refresh(test_db)
+        later = date.today() + timedelta(days=settings.schedule_replica_days_ahead + 1)
+
+        body = (await client.get(f"/api/schedule/classes?start_date={later.isoformat()}&day=Monday")).json()
+
+        assert wodify.schedule_requests == 2
+        assert [c["id"] for c in body["classes"]] == ["c1", "c3"]
+
+    async def test_old_replica_is_marked_stale(self, test_db, wodify, client):
+        await ScheduleReplicaService().refresh(test_db)
+        state = ScheduleReplicaService().sync_state(test_db)
+        state.refreshed_at -= timedelta(minutes=2 * settings.schedule_replica_refresh_minutes + 1)
+        test_db.commit()
+
+        body = (await client.get("/api/schedule/classes")).json()
+
+        assert body["stale"] is True
@@ -0,0 +1,539 @@
+"""
+Tests for shop endpoints and helpers
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from src.models.database import (
+    Product, ProductCategoryDB, User, CartItem, ProductReview, WishlistItem,
+    Order, OrderItem, OrderStatusDB, StockReservation
+)
+from src.database import get_db
+from src.api.auth import get_current_user
+from src.api.shop import (
+    router,
+    review_display_name,
+    fetch_product_page,
+    fetch_order_page,
+    parse_product_fields,
+    encode_cursor,
+    decode_cursor,
+)
+import src.services.product_search_service as product_search_module
+from src.services.product_search_service import product_search_service
+from src.services.cart_cache_service import CartCacheService, InMemoryCartCacheBackend
+
+
+ORDER_REQUEST = {
+    "shipping_name": "Max Mustermann",
+    "shipping_email": "max@example.com",
+    "shipping_phone": None,
+    "shipping_address_line1": "Hauptstraße 1",
+    "shipping_city": "Berlin",
+    "shipping_postal_code": "10115",
+}
+
+
+@pytest.fixture
+def seeded_products(test_db):
+    """Seed 25 products with distinct and partly identical created_at values"""
+    base = datetime(2025, 1, 1, 12, 0, 0)
+    for i in range(25):
+        test_db.add(Product(
+            id=f"prod_{i:03d}",
+            name=f"Produkt {i}",
+            description="Beschreibung",
+            price=10.0 + i,
+            category=ProductCategoryDB.CLOTHING if i % 2 else ProductCategoryDB.EQUIPMENT,
+            images=[f"https://example.com/{i}.jpg"],
+            sizes=["M"],
+            in_stock=True,
+            stock_quantity=10,
+            featured=i % 5 == 0,
+            sku=f"SKU-{i:03d}",
+            # Groups of three share a timestamp to exercise the id tie-breaker
+            created_at=base + timedelta(minutes=i // 3),
+        ))
+    test_db.commit()
+    return test_db
+
+
+@pytest.fixture
+def shop_user(test_db):
+    user = User(
+        id="user_shop", email="max@example.com", username="maxm",
+        hashed_password="not-a-real-hash", first_name="Max", last_name="Mustermann"
+    )
+    test_db.add(user)
+    test_db.commit()
+    # get_current_user loads the user in its own session; detach it the same way
+    test_db.refresh(user)
+    test_db.expunge(user)
+    return user
+
+
+@pytest.fixture
+def cart_cache(test_engine, monkeypatch):
+    """Fresh cart cache writing to the test database"""
+    cache = CartCacheService(backend=InMemoryCartCacheBackend(ttl_seconds=60))
+    monkeypatch.setattr("src.api.shop.cart_cache_service", cache)
+    return cache
+
+
+@pytest.fixture
+def shop_client(seeded_products, shop_user, cart_cache):
+    """TestClient for the shop router on the test database, logged in as shop_user"""
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: seeded_products
+    app.dependency_overrides[get_current_user] = lambda: shop_user
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def filled_shop(seeded_products, shop_user):
+    """Cart, wishlist, reviews and an order of 10 items each"""
+    db = seeded_products
+    for i in range(10):
+        product_id = f"prod_{i:03d}"
+        db.add(CartItem(user_id=shop_user.id, product_id=product_id, quantity=1, price_at_added=10.0 + i))
+        db.add(WishlistItem(user_id=shop_user.id, product_id=product_id))
+        reviewer = User(id=f"reviewer_{i}", email=f"r{i}@example.com", hashed_password="x", first_name=f"Rev{i}")
+        db.add(reviewer)
+        db.add(ProductReview(product_id="prod_000", user_id=reviewer.id, rating=5, title="Top"))
+
+    order = Order(
+        id="order_1", user_id=shop_user.id, order_number="G3-TEST-1", status=OrderStatusDB.DELIVERED,
+        subtotal=100.0, shipping_cost=0.0, total=100.0, shipping_name="Max", shipping_email="max@example.com",
+        shipping_address_line1="Hauptstraße 1", shipping_city="Berlin", shipping_postal_code="10115"
+    )
+    db.add(order)
+    for i in range(10):
+        db.add(OrderItem(order_id=order.id, product_id=f"prod_{i:03d}", product_name=f"Produkt {i}", quantity=1, price=10.0))
+    db.commit()
+    return db
+
+
+class TestProductListing:
+    """Tests for keyset pagination and sparse fieldsets"""
+
+    def test_pages_cover_catalog_without_duplicates(self, seeded_products):
+        """Walking all pages returns every product exactly once in stable order"""
+        seen = []
+        cursor = None
+        while True:
+            page = fetch_product_page(seeded_products, limit=7, cursor=cursor)
+            seen.extend(p["id"] for p in page["products"])
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+
+        assert seen == [f"prod_{i:03d}" for i in range(25)]
+
+    def test_filters_apply_across_pages(self, seeded_products):
+        """Filters are combined with the cursor condition"""
+        first = fetch_product_page(seeded_products, category="clothing", limit=5)
+        second = fetch_product_page(seeded_products, category="clothing", limit=5, cursor=first["next_cursor"])
+
+        ids = [p["id"] for p in first["products"] + second["products"]]
+        assert len(ids) == 10
+        assert all(int(i.split("_")[1]) % 2 == 1 for i in ids)
+        assert all(p["category"] == "clothing" for p in first["products"])
+
+    def test_sparse_fieldset_only_returns_requested_fields(self, seeded_products):
+        """Sparse fieldsets always include the id and nothing else"""
+        fields = parse_product_fields("name,price")
+        page = fetch_product_page(seeded_products, limit=3, fields=fields)
+
+        assert set(page["products"][0].keys()) == {"id", "name", "price"}
+
+    def test_unknown_field_is_rejected(self):
+        with pytest.raises(ValueError):
+            parse_product_fields("name,hashed_password")
+
+    def test_products_sharing_a_second_are_paged_once(self, seeded_products):
+        # Server default timestamps ("YYYY-MM-DD HH:MM:SS"): a second shared by
+        # many products, plus two products without a timestamp
+        seeded_products.execute(text("UPDATE products SET created_at = CURRENT_TIMESTAMP"))
+        seeded_products.execute(text("UPDATE products SET created_at = NULL WHERE id IN ('prod_007', 'prod_020')"))
+        seeded_products.commit()
+
+        seen, cursor = [], None
+        for _ in range(10):
+            page = fetch_product_page(seeded_products, limit=4, cursor=cursor)
+            seen.extend(p["id"] for p in page["products"])
+            cursor = page["next_cursor"]
+            if not page["has_more"]:
+                break
+
+        # NULL sorts first on SQLite
+        assert seen == ["prod_007", "prod_020"] + [f"prod_{i:03d}" for i in range(25) if i not in (7, 20)]
+
+    def test_cursor_roundtrip_and_invalid_cursor(self):
+        created_at = datetime(2025, 1, 1, 12, 30)
+        assert decode_cursor(encode_cursor(created_at, "prod_1")) == (created_at, "prod_1")
+
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestProductSearch:
+    """Tests for the full-text product search (SQLite FTS5 backend)"""
+
+    def test_prefix_match_ranking_and_facets(self, seeded_products):
+        seeded_products.add(Product(
+            id="prod_hoodie", name="G3 Hoodie Premium", description="Warmes Hoodie",
+            price=69.99, category=ProductCategoryDB.CLOTHING, sku="G3-HD-001",
+        ))
+        seeded_products.add(Product(
+            id="prod_bottle", name="Wasserflasche", description="Passt zum Hoodie",
+            price=19.99, category=ProductCategoryDB.ACCESSORIES, sku="G3-WF-001",
+        ))
+        seeded_products.commit()
+
+        result = product_search_service.search(seeded_products, "hood")
+
+        # Name matches outrank description-only matches
+        assert [p["id"] for p in result["products"]] == ["prod_hoodie", "prod_bottle"]
+        assert result["total"] == 2
+        assert result["facets"]["clothing"] == 1
+        assert result["facets"]["accessories"] == 1
+
+        filtered = product_search_service.search(seeded_products, "hood", category="accessories")
+        assert [p["id"] for p in filtered["products"]] == ["prod_bottle"]
+        assert filtered["total"] == 1
+        assert filtered["facets"]["clothing"] == 1
+
+    def test_index_follows_product_writes(self, seeded_products):
+        product = seeded_products.query(Product).filter(Product.id == "prod_003").first()
+        product.name = "Kettlebell 24kg"
+        seeded_products.commit()
+        assert [p["id"] for p in product_search_service.search(seeded_products, "kettle")["products"]] == ["prod_003"]
+
+        seeded_products.delete(product)
+        seeded_products.commit()
+        assert product_search_service.search(seeded_products, "kettle")["total"] == 0
+
+    def test_sku_and_empty_query(self, seeded_products):
+        assert product_search_service.search(seeded_products, "SKU-012")["products"][0]["id"] == "prod_012"
+        with pytest.raises(ValueError):
+            product_search_service.search(seeded_products, "  -- ")
+
+    def test_ilike_fallback_without_full_text_index(self, seeded_products, monkeypatch):
+        seeded_products.add(Product(
+            id="prod_hoodie", name="G3 Hoodie Premium", description="Warmes Hoodie",
+            price=69.99, category=ProductCategoryDB.CLOTHING, sku="G3-HD-001",
+        ))
+        seeded_products.add(Product(
+            id="prod_bottle", name="Wasserflasche", description="Passt zum Hoodie",
+            price=19.99, category=ProductCategoryDB.ACCESSORIES, sku="G3-WF-001",
+        ))
+        seeded_products.commit()
+        monkeypatch.setattr(product_search_module, "FULL_TEXT_DIALECTS", ())
+
+        result = product_search_service.search(seeded_products, "HOOD")
+        filtered = product_search_service.search(seeded_products, "hood", category="accessories")
+
+        assert [p["id"] for p in result["products"]] == ["prod_hoodie", "prod_bottle"]
+        assert (result["total"], result["facets"]["clothing"], result["facets"]["accessories"]) == (2, 1, 1)
+        assert [p["id"] for p in filtered["products"]] == ["prod_bottle"] and filtered["total"] == 1
+        # "_" is matched literally, not as a wildcard
+        assert product_search_service.search(seeded_products, "g3_hd")["total"] == 0
+
+
+class TestShopQueryBudgets:
+    """Every shop endpoint runs a fixed number of queries, independent of row counts"""
+
+    def test_get_cart(self, shop_client, filled_shop, query_budget):
+        with query_budget(1):
+            response = shop_client.get("/api/shop/cart")
+
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == 10
+        assert response.json()["items"][0]["product_image"].startswith("https://example.com/")
+
+        # Later reads are served from the cart cache
+        with query_budget(0):
+            assert shop_client.get("/api/shop/cart").json() == response.json()
+
+    def test_get_product_reviews(self, shop_client, filled_shop, query_budget):
+        with query_budget(1) as statements:
+            response = shop_client.get("/api/shop/products/prod_000/reviews")
+
+        assert response.status_code == 200
+        assert len(response.json()) == 10
+        assert {r["user_name"] for r in response.json()} == {f"Rev{i}" for i in range(10)}
+        # Neither the password hash nor the email address is selected
+        assert "hashed_password" not in statements[0]
+        assert "email" not in statements[0]
+
+    def test_get_wishlist(self, shop_client, filled_shop, query_budget):
+        with query_budget(1) as statements:
+            response = shop_client.get("/api/shop/wishlist")
+
+        assert response.status_code == 200
+        assert response.json()["total"] == 10
+        assert "users" not in statements[0]
+
+    def test_get_orders(self, shop_client, filled_shop, query_budget):
+        with query_budget(2):
+            response = shop_client.get("/api/shop/orders")
+        assert response.status_code == 200
+        assert len(response.json()["orders"][0]["items"]) == 10
+
+        with query_budget(2):
+            assert shop_client.get("/api/shop/orders/order_1").status_code == 200
+
+    def test_get_product(self, shop_client, seeded_products, query_budget):
+        with query_budget(1):
+            assert shop_client.get("/api/shop/products/prod_001").status_code == 200
+
+    def test_cart_writes(self, shop_client, seeded_products, query_budget):
+        with query_budget(3):
+            response = shop_client.post("/api/shop/cart", json={"product_id": "prod_001", "quantity": 2})
+        assert response.status_code == 200
+
+        with query_budget(1):
+            assert shop_client.delete("/api/shop/cart").status_code == 200
+
+    def test_create_order(self, shop_client, filled_shop, query_budget):
+        # cart, order insert, stock decrement, reservations, order items, cart delete,
+        # plus creating the order number counter (once per 100 orders afterwards)
+        with query_budget(8) as statements:
+            response = shop_client.post("/api/shop/orders", json=ORDER_REQUEST)
+
+        assert response.status_code == 201
+        order = filled_shop.query(Order).filter(Order.id == response.json()["order_id"]).one()
+        assert len(order.items) == 10
+        assert filled_shop.query(CartItem).count() == 0
+        assert filled_shop.query(Product).filter(Product.id == "prod_000").one().stock_quantity == 9
+        # All ten order items are written by a single multi-row INSERT
+        assert len([st for st in statements if st.startswith("INSERT INTO order_items")]) == 1
+        assert response.json()["order_number"].endswith("-0000001")
+
+    def test_create_order_without_stock_is_rejected(self, shop_client, filled_shop):
+        filled_shop.query(Product).filter(Product.id == "prod_004").update({"stock_quantity": 0})
+        filled_shop.commit()
+
+        response = shop_client.post("/api/shop/orders", json=ORDER_REQUEST)
+
+        assert response.status_code == 409
+        assert "Produkt 4" in response.json()["detail"]
+        # Nothing was reserved, ordered or removed from the cart
+        filled_shop.expire_all()
+        assert filled_shop.query(Product).filter(Product.id == "prod_000").one().stock_quantity == 10
+        assert filled_shop.query(Order).count() == 1
+        assert filled_shop.query(CartItem).count() == 10
+
+    def test_placed_order_records_its_stock(self, shop_client, filled_shop):
+        response = shop_client.post("/api/shop/orders", json=ORDER_REQUEST)
+
+        filled_shop.expire_all()
+        order = filled_shop.query(Order).filter(Order.id == response.json()["order_id"]).one()
+        assert order.status == OrderStatusDB.PENDING
+        reservations = filled_shop.query(StockReservation).filter(StockReservation.order_id == order.id).all()
+        assert len(reservations) == 10 and {r.quantity for r in reservations} == {1}
+        assert filled_shop.query(Product).filter(Product.id == "prod_000").one().stock_quantity == 9
+
+    def test_create_review_marks_verified_purchase(self, shop_client, filled_shop, query_budget):
+        with query_budget(5):
+            response = shop_client.post("/api/shop/reviews", json={"product_id": "prod_003", "rating": 4})
+
+        assert response.status_code == 201
+        review = filled_shop.query(ProductReview).filter(ProductReview.id == response.json()["review_id"]).one()
+        assert review.verified_purchase is True
+
+    def test_relationships_are_not_loaded_implicitly(self, filled_shop):
+        """Accessing an unloaded relationship raises instead of issuing a hidden query"""
+        item = filled_shop.query(CartItem).first()
+        with pytest.raises(Exception, match="raise"):
+            item.user
+
+    def test_review_display_name(self):
+        assert review_display_name("Max", "Mustermann", "maxm") == "Max M."
+        assert review_display_name("Max", None, None) == "Max"
+        assert review_display_name(None, None, "maxm") == "maxm"
+
+
+class TestCartCache:
+    """Tests for cached cart reads, quantity writes and item versions"""
+
+    def first_item(self, client):
+        return client.get("/api/shop/cart").json()["items"][0]
+
+    def db_item(self, db, item_id):
+        db.expire_all()
+        return db.query(CartItem).filter(CartItem.id == item_id).one()
+
+    def test_quantity_change_is_written_before_it_is_acknowledged(self, shop_client, filled_shop, query_budget):
+        item = self.first_item(shop_client)
+
+        with query_budget(1) as statements:
+            response = shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=6&version={item['version']}")
+
+        assert response.json()["version"] == item["version"] + 1
+        assert statements[0].startswith("UPDATE cart_items")
+        row = self.db_item(filled_shop, item["id"])
+        assert (row.quantity, row.version) == (6, item["version"] + 1)
+        # The cached cart was dropped, the next read sees the change
+        assert self.first_item(shop_client)["quantity"] == 6
+
+    def test_stale_version_is_rejected(self, shop_client, filled_shop):
+        item = self.first_item(shop_client)
+        url = f"/api/shop/cart/{item['id']}"
+
+        first_tab = shop_client.patch(f"{url}?quantity=2&version={item['version']}")
+        second_tab = shop_client.patch(f"{url}?quantity=5&version={item['version']}")
+
+        assert first_tab.status_code == 200
+        assert second_tab.status_code == 409
+        assert self.first_item(shop_client)["quantity"] == 2
+
+    def test_create_order_uses_the_changed_cart(self, shop_client, filled_shop):
+        item = self.first_item(shop_client)
+        shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=3")
+
+        response = shop_client.post("/api/shop/orders", json=ORDER_REQUEST)
+
+        assert response.status_code == 201
+        order_item = filled_shop.query(OrderItem).filter(
+            OrderItem.order_id == response.json()["order_id"],
+            OrderItem.product_id == item["product_id"]
+        ).one()
+        assert order_item.quantity == 3
+        assert shop_client.get("/api/shop/cart").json()["items"] == []
+
+    def test_change_from_another_worker_wins_over_a_stale_cache(self, shop_client, filled_shop):
+        item = self.first_item(shop_client)
+
+        # Another worker writes the row; this worker's cache still has the old version
+        row = self.db_item(filled_shop, item["id"])
+        row.quantity = 9
+        filled_shop.commit()
+        stale = shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=4&version={item['version']}")
+
+        assert stale.status_code == 409
+        assert self.db_item(filled_shop, item["id"]).quantity == 9
+
+    def test_unreachable_cache_falls_back_to_the_database(self, shop_client, filled_shop, cart_cache):
+        class DownBackend:
+            async def get(self, user_id):
+                raise ConnectionError("Redis down")
+
+            set = delete = get
+
+        cart_cache.backend = DownBackend()
+        item = self.first_item(shop_client)
+        response = shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=3&version={item['version']}")
+
+        assert len(shop_client.get("/api/shop/cart").json()["items"]) == 10
+        assert response.status_code == 200
+        assert self.first_item(shop_client)["quantity"] == 3
+
+    def test_without_shared_cache_every_worker_sees_the_database(self, shop_client, filled_shop, monkeypatch):
+        monkeypatch.setattr("config.settings.settings.redis_host", None)
+        cache = CartCacheService()
+        monkeypatch.setattr("src.api.shop.cart_cache_service", cache)
+        assert cache.backend is None
+
+        item = self.first_item(shop_client)
+        response = shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=4&version={item['version']}")
+        stale = shop_client.patch(f"/api/shop/cart/{item['id']}?quantity=5&version={item['version']}")
+
+        assert response.json()["version"] == item["version"] + 1
+        assert stale.status_code == 409
+        assert self.db_item(filled_shop, item["id"]).quantity == 4
+
+        order = shop_client.post("/api/shop/orders", json=ORDER_REQUEST)
+        order_item = filled_shop.query(OrderItem).filter(
+            OrderItem.order_id == order.json()["order_id"], OrderItem.product_id == item["product_id"]
+        ).one()
+        assert order_item.quantity == 4
+
+
+@pytest.fixture
+def order_history(seeded_products, shop_user):
+    """25 orders of three items each, one minute apart"""
+    base = datetime(2025, 3, 1, 9, 0, 0)
+    for i in range(25):
+        seeded_products.add(Order(
+            id=f"order_{i:03d}", user_id=shop_user.id, order_number=f"G3-TEST-{i:03d}",
+            status=OrderStatusDB.DELIVERED, subtotal=30.0, shipping_cost=0.0, total=30.0,
+            shipping_name="Max", shipping_email="max@example.com", shipping_address_line1="Hauptstraße 1",
+            shipping_city="Berlin", shipping_postal_code="10115", created_at=base + timedelta(minutes=i)
+        ))
+        for j in range(3):
+            seeded_products.add(OrderItem(
+                order_id=f"order_{i:03d}", product_id=f"prod_{j:03d}", product_name=f"Produkt {j}",
+                product_sku=f"SKU-{j:03d}", quantity=1, price=10.0
+            ))
+    seeded_products.commit()
+    return seeded_products
+
+
+class TestOrderHistory:
+    """Tests for the paginated order history"""
+
+    def test_pages_are_newest_first_without_duplicates(self, order_history, shop_user, query_budget):
+        seen = []
+        cursor = None
+        while True:
+            # One query for the orders, one selectin query for their items
+            with query_budget(2):
+                page = fetch_order_page(order_history, shop_user.id, limit=10, cursor=cursor)
+            assert all(len(order["items"]) == 3 for order in page["orders"])
+            seen.extend(order["id"] for order in page["orders"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+
+        assert seen == [f"order_{i:03d}" for i in reversed(range(25))]
+
+    def test_items_use_denormalized_product_data(self, order_history, shop_user, query_budget):
+        with query_budget(2) as statements:
+            page = fetch_order_page(order_history, shop_user.id, limit=5)
+
+        assert page["orders"][0]["items"][0]["product_sku"] == "SKU-000"
+        assert not any("FROM products" in statement for statement in statements)
+
+    def test_summary_mode_has_item_count_and_no_items(self, shop_client, order_history, query_budget):
+        with query_budget(1):
+            response = shop_client.get("/api/shop/orders?summary=true&limit=3")
+
+        body = response.json()
+        assert response.status_code == 200
+        assert [o["order_number"] for o in body["orders"]] == ["G3-TEST-024", "G3-TEST-023", "G3-TEST-022"]
+        assert all(o["item_count"] == 3 and "items" not in o for o in body["orders"])
+        assert body["has_more"] is True
+
+    def test_invalid_cursor_is_rejected(self, shop_client, order_history):
+        assert shop_client.get("/api/shop/orders?cursor=kaputt").status_code == 400
+
+    @pytest.mark.parametrize("summary", [False, True])
+    def test_orders_sharing_a_second_are_paged_once(self, seeded_products, shop_user, summary):
+        for i in range(7):
+            seeded_products.add(Order(
+                id=f"o{i}", user_id=shop_user.id, order_number=f"G3-SEC-{i}", status=OrderStatusDB.PENDING,
+                subtotal=30.0, shipping_cost=0.0, total=30.0, shipping_name="Max", shipping_email="max@example.com",
+                shipping_address_line1="Hauptstraße 1", shipping_city="Berlin", shipping_postal_code="10115"
+            ))
+        seeded_products.commit()
+        # Server default timestamps ("YYYY-MM-DD HH:MM:SS"), all in the same second
+        seeded_products.execute(text("UPDATE orders SET created_at = CURRENT_TIMESTAMP"))
+        seeded_products.commit()
+
+        seen, cursor = [], None
+        for _ in range(10):
+            page = fetch_order_page(seeded_products, shop_user.id, limit=2, cursor=cursor, summary=summary)
+            seen.extend(order["id"] for order in page["orders"])
+            cursor = page["next_cursor"]
+            if not page["has_more"]:
+                break
+
+        assert seen == [f"o{i}" for i in reversed(range(7))]
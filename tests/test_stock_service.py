@@ -0,0 +1,129 @@
+"""
+Tests for stock reservations
+"""
+
+import os
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.database import (
+    Base, Product, ProductCategoryDB, Order, OrderStatusDB, StockReservation
+)
+from src.services.stock_service import stock_service, InsufficientStockError
+
+
+def make_product(product_id: str, stock: int) -> Product:
+    return Product(
+        id=product_id, name=f"Produkt {product_id}", price=20.0, category=ProductCategoryDB.EQUIPMENT,
+        sku=f"SKU-{product_id}", in_stock=stock > 0, stock_quantity=stock
+    )
+
+
+def make_order(order_id: str) -> Order:
+    return Order(
+        id=order_id, user_id="user_1", order_number=f"G3-{order_id}", status=OrderStatusDB.PENDING,
+        subtotal=20.0, shipping_cost=0.0, total=20.0, shipping_name="Max", shipping_email="max@example.com",
+        shipping_address_line1="Hauptstraße 1", shipping_city="Berlin", shipping_postal_code="10115"
+    )
+
+
+@pytest.fixture
+def stocked_db(test_db):
+    test_db.add_all([make_product("kb", 5), make_product("rope", 1), make_order("o1"), make_order("o2")])
+    test_db.commit()
+    return test_db
+
+
+def stock_of(db, product_id: str):
+    db.expire_all()
+    product = db.query(Product).filter(Product.id == product_id).one()
+    return product.stock_quantity, product.in_stock
+
+
+class TestStockReservation:
+    """Tests for reserve"""
+
+    def test_reserve_decrements_all_lines_and_flips_in_stock(self, stocked_db):
+        stock_service.reserve(stocked_db, "o1", {"kb": 2, "rope": 1})
+        stocked_db.commit()
+
+        assert stock_of(stocked_db, "kb") == (3, True)
+        assert stock_of(stocked_db, "rope") == (0, False)
+        assert stocked_db.query(StockReservation).filter(StockReservation.order_id == "o1").count() == 2
+
+    def test_insufficient_line_reports_product_and_rolls_back(self, stocked_db):
+        with pytest.raises(InsufficientStockError) as exc:
+            stock_service.reserve(stocked_db, "o1", {"kb": 2, "rope": 2})
+        stocked_db.rollback()
+
+        assert exc.value.product_ids == ["rope"]
+        assert stock_of(stocked_db, "kb") == (5, True)
+        assert stocked_db.query(StockReservation).count() == 0
+
+
+def concurrency_database_urls():
+    urls = ["sqlite"]
+    if os.environ.get("TEST_POSTGRES_URL"):
+        urls.append(os.environ["TEST_POSTGRES_URL"])
+    return urls
+
+
+@pytest.mark.parametrize("database_url", concurrency_database_urls())
+def test_parallel_checkouts_never_oversell(database_url, tmp_path):
+    """
+    300 checkouts of one kettlebell and one rope race for 50 units of stock
+
+    Set TEST_POSTGRES_URL to run the same test against Postgres.
+    """
+    if database_url == "sqlite":
+        engine = create_engine(
+            f"sqlite:///{tmp_path}/stock.db",
+            connect_args={"check_same_thread": False, "timeout": 30},
+            pool_size=16
+        )
+    else:
+        engine = create_engine(database_url, pool_size=16)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        db.add_all([make_product("kb", 50), make_product("rope", 80)])
+        db.commit()
+
+    def checkout(i: int) -> bool:
+        with Session() as db:
+            db.add(make_order(f"order_{i}"))
+            db.flush()
+            try:
+                stock_service.reserve(db, f"order_{i}", {"kb": 1, "rope": 1})
+            except InsufficientStockError:
+                db.rollback()
+                return False
+            db.commit()
+            return True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(checkout, range(300)))
+    elapsed = time.perf_counter() - started
+
+    with Session() as db:
+        kb = db.query(Product).filter(Product.id == "kb").one()
+        rope = db.query(Product).filter(Product.id == "rope").one()
+        reserved_kb = sum(
+            r.quantity for r in db.query(StockReservation).filter(StockReservation.product_id == "kb")
+        )
+
+        assert sum(results) == 50
+        assert (kb.stock_quantity, kb.in_stock) == (0, False)
+        assert rope.stock_quantity == 30 and rope.in_stock
+        assert reserved_kb == 50
+        assert db.query(Order).count() == 50
+
+    print(f"\n{engine.dialect.name}: 300 checkouts in {elapsed:.2f}s ({300 / elapsed:.0f}/s)")
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
@@ -0,0 +1,186 @@
+"""
+Tests for the training plan pipeline and background jobs
+"""
+
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from types import SimpleNamespace
+
+import src.api.ai as ai_api
+import src.services.training_plan_service as training_plan_module
+from config.settings import settings
+from src.models.training_plan import TrainingPlanRequest
+from src.services.training_plan_service import (
+    TrainingPlanService, InMemoryJobStore, TooManyJobsError, SKELETON_CONTEXT, example_plan
+)
+from src.utils.auth import create_access_token, principal_claims
+
+app = FastAPI()
+app.include_router(ai_api.router)
+
+
+class RecordingLLM:
+    """LLMService stand-in that records completions"""
+
+    model = "gpt-4o-mini"
+
+    def __init__(self, available: bool = True, delay: float = 0.0):
+        self.available = available
+        self.delay = delay
+        self.calls = []
+
+    async def complete(self, prompt, context=None, conversation_history=None, max_tokens=None, is_disconnected=None):
+        self.calls.append((context, max_tokens))
+        await asyncio.sleep(self.delay)
+        if not self.available:
+            return None
+        if context == SKELETON_CONTEXT:
+            return f"# Plan\n{prompt}"
+        return f"Angepasst: {prompt.splitlines()[1]}"
+
+    async def stream_response(self, prompt, context=None, conversation_history=None, fallback=None,
+                              max_tokens=None, cache=True):
+        self.calls.append((context, max_tokens))
+        for word in ("Angepasst", " für", " dich"):
+            yield word
+
+    def skeleton_calls(self):
+        return [call for call in self.calls if call[0] == SKELETON_CONTEXT]
+
+
+def plan_request(**fields) -> TrainingPlanRequest:
+    return TrainingPlanRequest(**{"prompt": "Knie schonen", **fields})
+
+
+class TestTrainingPlanPipeline:
+    """Tests for skeleton caching and personalization"""
+
+    async def test_equivalent_requests_reuse_the_skeleton(self):
+        llm = RecordingLLM()
+        service = TrainingPlanService(llm=llm, job_store=InMemoryJobStore(60))
+
+        first = await service.generate(plan_request(prompt="Knie schonen"))
+        second = await service.generate(plan_request(prompt="Mehr Ausdauer", experience_level=" fortgeschritten "))
+        other = await service.generate(plan_request(days=4))
+
+        assert first.startswith("## Für dich angepasst\n\nAngepasst: Knie schonen")
+        assert "Angepasst: Mehr Ausdauer" in second
+        assert first.endswith(second.split("---\n\n", 1)[1])
+        assert "Trainingstage pro Woche: 4" in other
+        assert len(llm.skeleton_calls()) == 2
+        personalizations = [call for call in llm.calls if call[0] != SKELETON_CONTEXT]
+        assert len(personalizations) == 3
+        assert all(max_tokens < settings.training_plan_skeleton_max_tokens for _, max_tokens in personalizations)
+
+    async def test_concurrent_requests_share_one_skeleton_completion(self):
+        llm = RecordingLLM(delay=0.05)
+        service = TrainingPlanService(llm=llm, job_store=InMemoryJobStore(60))
+
+        plans = await asyncio.gather(*(service.generate(plan_request(prompt=f"Wunsch {i}")) for i in range(5)))
+
+        assert len(set(plans)) == 5
+        assert len(llm.skeleton_calls()) == 1
+
+    async def test_without_provider_the_example_plan_is_returned(self):
+        llm = RecordingLLM(available=False)
+        service = TrainingPlanService(llm=llm, job_store=InMemoryJobStore(60))
+
+        assert await service.generate(plan_request(experience_level="Anfänger")) == example_plan("Anfänger")
+        await service.generate(plan_request(experience_level="Anfänger"))
+        # Nothing was cached, the provider is asked again
+        assert len(llm.skeleton_calls()) == 2
+
+    async def test_stream_sends_personalization_then_skeleton(self):
+        service = TrainingPlanService(llm=RecordingLLM(), job_store=InMemoryJobStore(60))
+
+        deltas = [delta async for delta in service.stream(plan_request())]
+
+        assert deltas[:4] == ["## Für dich angepasst\n\n", "Angepasst", " für", " dich"]
+        assert deltas[-1].startswith("# Plan\nErfahrungslevel: Fortgeschritten")
+
+
+class TestTrainingPlanJobs:
+    """Tests for background generation"""
+
+    async def test_job_runs_in_background(self):
+        service = TrainingPlanService(llm=RecordingLLM(delay=0.05), job_store=InMemoryJobStore(60))
+
+        job = await service.submit("user_1", plan_request())
+        assert job["status"] == "queued"
+        assert await service.get_job(job["job_id"], "user_2") is None
+
+        while (await service.get_job(job["job_id"], "user_1"))["status"] != "completed":
+            await service.wait_for_update(job["job_id"], timeout=1)
+        finished = await service.get_job(job["job_id"], "user_1")
+        assert finished["plan"].startswith("## Für dich angepasst")
+        assert finished["finished_at"] is not None
+
+    async def test_running_jobs_per_user_are_limited(self, monkeypatch):
+        monkeypatch.setattr(settings, "training_plan_max_jobs_per_user", 1)
+        service = TrainingPlanService(llm=RecordingLLM(delay=0.2), job_store=InMemoryJobStore(60))
+
+        await service.submit("user_1", plan_request())
+        with pytest.raises(TooManyJobsError):
+            await service.submit("user_1", plan_request())
+        await service.submit("user_2", plan_request())
+        await service.aclose()
+
+    async def test_running_job_sends_heartbeats(self, monkeypatch):
+        monkeypatch.setattr(training_plan_module, "JOB_HEARTBEAT_SECONDS", 0.02)
+        store = InMemoryJobStore(60)
+        service = TrainingPlanService(llm=RecordingLLM(delay=0.2), job_store=store)
+
+        job = await service.submit("user_1", plan_request())
+        await asyncio.sleep(0.05)
+        first = (await store.get(job["job_id"]))["updated_at"]
+        await asyncio.sleep(0.05)
+        running = await store.get(job["job_id"])
+
+        assert running["status"] == "running" and running["updated_at"] > first
+        assert not service.is_stale(running)
+        await service.aclose()
+
+
+async def test_job_endpoints_poll_and_stream(monkeypatch):
+    service = TrainingPlanService(llm=RecordingLLM(delay=0.1), job_store=InMemoryJobStore(60))
+    monkeypatch.setattr(ai_api, "training_plan_service", service)
+    user = SimpleNamespace(id="user_1", email="max@example.com", is_active=True, is_admin=False)
+    headers = {"Authorization": f"Bearer {create_access_token(principal_claims(user))}"}
+
+    async with httpx.AsyncClient(app=app, base_url="http://test", headers=headers) as client:
+        created = await client.post("/api/ai/training-plan-jobs", json={"prompt": "Knie schonen", "days": 4})
+        assert created.status_code == 202
+        job_id = created.json()["job_id"]
+
+        polled = await client.get(f"/api/ai/training-plan-jobs/{job_id}")
+        assert polled.json()["status"] in ("queued", "running")
+
+        events = await client.get(f"/api/ai/training-plan-jobs/{job_id}/events")
+        blocks = [block.split("\n") for block in events.text.strip().split("\n\n")]
+        assert blocks[-1][0] == "event: done"
+        done = json.loads(blocks[-1][1][len("data: "):])
+        assert done["status"] == "completed"
+        assert "Trainingstage pro Woche: 4" in done["plan"]
+
+        assert (await client.get("/api/ai/training-plan-jobs/unknown")).status_code == 404
+
+
+async def test_job_stream_ends_when_the_worker_is_gone(monkeypatch):
+    store = InMemoryJobStore(60)
+    service = TrainingPlanService(llm=RecordingLLM(), job_store=store)
+    monkeypatch.setattr(ai_api, "training_plan_service", service)
+    # Left "running" by a worker that died
+    await store.set({
+        "job_id": "job_1", "user_id": "user_1", "status": "running", "plan": None, "error": None,
+        "created_at": "2026-01-01T09:00:00", "finished_at": None, "updated_at": "2026-01-01T09:00:00",
+    })
+    user = SimpleNamespace(id="user_1", email="max@example.com", is_active=True, is_admin=False)
+    headers = {"Authorization": f"Bearer {create_access_token(principal_claims(user))}"}
+
+    async with httpx.AsyncClient(app=app, base_url="http://test", headers=headers) as client:
+        events = await asyncio.wait_for(client.get("/api/ai/training-plan-jobs/job_1/events"), 5)
+
+    assert events.text.strip().split("\n")[0] == "event: error"
@@ -0,0 +1,159 @@
+"""
+Tests for batched member, lead and class lookups of WodifyAPIService
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from config.settings import settings
+from src.services.wodify_api_service import WodifyAPIService
+from src.utils.batching import BatchLoader
+
+
+class WodifyStub:
+    """Answers single and ?ids= lookups and records the outbound requests"""
+
+    def __init__(self, known=("m1", "m2", "m3", "m4", "m5"), delay: float = 0.01, fail: int = 0):
+        self.known = set(known)
+        self.delay = delay
+        self.fail = fail
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.fail:
+            self.fail -= 1
+            return httpx.Response(500)
+
+        segments = request.url.path.strip("/").split("/")
+        kind = segments[1]
+        single = {"members": "member", "leads": "lead", "classes": "class"}[kind]
+        id_field = {"members": "client_id", "leads": "lead_id", "classes": "id"}[kind]
+        if len(segments) > 2:
+            if segments[2] not in self.known:
+                return httpx.Response(404)
+            return httpx.Response(200, json={single: {id_field: segments[2]}})
+        ids = request.url.params["ids"].split(",")
+        return httpx.Response(200, json={kind: [{id_field: i} for i in ids if i in self.known]})
+
+
+@pytest.fixture
+def make_service(monkeypatch):
+    monkeypatch.setattr(settings, "wodify_api_url", "http://wodify.test/v1")
+    monkeypatch.setattr(settings, "wodify_retry_attempts", 1)
+    monkeypatch.setattr(settings, "wodify_lookup_concurrency", 2)
+
+    def make(stub: WodifyStub) -> WodifyAPIService:
+        service = WodifyAPIService()
+        service._client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(stub), timeout=30.0)
+        return service
+
+    return make
+
+
+class TestFanOut:
+    """Without ID list support lookups become a bounded fan-out"""
+
+    async def test_same_tick_lookups_are_deduplicated_and_bounded(self, make_service):
+        stub = WodifyStub()
+        service = make_service(stub)
+
+        members = await asyncio.gather(*(service.get_member(f"m{i % 4 + 1}") for i in range(12)))
+
+        assert [m["client_id"] for m in members[:4]] == ["m1", "m2", "m3", "m4"]
+        assert len(stub.requests) == 4
+        assert stub.max_in_flight == 2
+        assert service.resilience_status()["batching"]["members"] == {"loads": 12, "batches": 1}
+
+    async def test_unknown_entity_is_none(self, make_service):
+        stub = WodifyStub()
+        service = make_service(stub)
+
+        assert await asyncio.gather(service.get_member("m1"), service.get_member("x")) == [{"client_id": "m1"}, None]
+
+    async def test_failed_request_fails_only_its_lookup(self, make_service):
+        stub = WodifyStub(delay=0, fail=1)
+        service = make_service(stub)
+
+        first = await asyncio.gather(service.get_lead("m1"), service.get_lead("m2"))
+
+        assert first == [None, {"lead_id": "m2"}]
+        # The failure isn't kept, the next lookup asks Wodify again
+        assert await asyncio.gather(service.get_lead("m1"), service.get_lead("m2")) == [
+            {"lead_id": "m1"}, {"lead_id": "m2"}
+        ]
+        assert len(stub.requests) == 4
+
+
+class TestBatchedRequests:
+    """With WODIFY_BATCH_LOOKUPS lookups of a tick become one ?ids= request"""
+
+    async def test_one_request_per_batch(self, make_service, monkeypatch):
+        monkeypatch.setattr(settings, "wodify_batch_lookups", True)
+        monkeypatch.setattr(settings, "wodify_batch_max_size", 3)
+        stub = WodifyStub()
+        service = make_service(stub)
+
+        *leads, member = await asyncio.gather(
+            *(service.get_lead(lead_id) for lead_id in ["m1", "m2", "m3", "m4", "x"]),
+            service.get_member("m5"),
+        )
+
+        assert leads[3] == {"lead_id": "m4"} and leads[4] is None
+        assert member == {"client_id": "m5"}
+        paths = sorted((r.url.path, r.url.params.get("ids")) for r in stub.requests)
+        assert paths == [
+            ("/v1/leads", "m1,m2,m3"),
+            ("/v1/leads", "m4,x"),
+            # A single ID is fetched directly
+            ("/v1/members/m5", None),
+        ]
+
+    async def test_failed_batch_is_not_kept(self, make_service, monkeypatch):
+        monkeypatch.setattr(settings, "wodify_batch_lookups", True)
+        stub = WodifyStub(fail=1)
+        service = make_service(stub)
+
+        assert await asyncio.gather(service.get_class_details("m1"), service.get_class_details("m2")) == [None, None]
+        assert await asyncio.gather(service.get_class_details("m1"), service.get_class_details("m2")) == [
+            {"id": "m1"}, {"id": "m2"}
+        ]
+        assert len(stub.requests) == 2
+
+
+class TestBatchLoader:
+    """Keys of a tick are loaded together, nothing is kept afterwards"""
+
+    async def test_loader_batches_per_tick(self):
+        calls = []
+
+        async def batch(keys):
+            calls.append(list(keys))
+            return {key: key.upper() for key in keys}
+
+        loader = BatchLoader("test", batch, max_batch_size=10)
+        first = await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"))
+        second = await loader.load("a")
+
+        assert (first, second) == (["A", "B", "A"], "A")
+        assert calls == [["a", "b"], ["a"]]
+
+    async def test_exception_result_fails_only_its_key(self):
+        async def batch(keys):
+            return {key: ValueError(key) if key == "b" else key.upper() for key in keys}
+
+        loader = BatchLoader("test", batch, max_batch_size=10)
+        results = await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+
+        assert results[0] == "A"
+        assert isinstance(results[1], ValueError)
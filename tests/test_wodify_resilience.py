@@ -0,0 +1,195 @@
+"""
+Tests for retries, circuit breakers and the adaptive concurrency limit of WodifyAPIService
+"""
+
+import asyncio
+import time
+import httpx
+import pytest
+
+from config.settings import settings
+from src.services.wodify_api_service import WodifyAPIService, endpoint_group, retry_after_seconds
+from src.utils.resilience import AIMDLimiter, CircuitBreaker, CircuitOpenError, ConcurrencyLimitError
+
+
+class WodifyStub:
+    """Answers with the queued responses (then 200) and records the requests"""
+
+    def __init__(self, *responses, delay: float = 0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.method, request.url.path))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        response = self.responses.pop(0) if self.responses else httpx.Response(200, json={"classes": []})
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def make_service(monkeypatch):
+    monkeypatch.setattr(settings, "wodify_retry_attempts", 3)
+    monkeypatch.setattr(settings, "wodify_retry_backoff_seconds", 0.01)
+    monkeypatch.setattr(settings, "wodify_retry_max_wait_seconds", 1.0)
+    monkeypatch.setattr(settings, "wodify_breaker_failure_threshold", 3)
+    monkeypatch.setattr(settings, "wodify_breaker_recovery_seconds", 0.2)
+
+    def make(stub: WodifyStub) -> WodifyAPIService:
+        service = WodifyAPIService()
+        service._client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(stub), timeout=30.0)
+        return service
+
+    return make
+
+
+class TestRetries:
+    """Only idempotent requests with retryable outcomes are retried"""
+
+    async def test_get_is_retried_on_server_errors(self, make_service):
+        stub = WodifyStub(httpx.Response(503), httpx.ConnectError("refused"))
+        service = make_service(stub)
+
+        assert await service._make_request("GET", "classes") == {"classes": []}
+        assert len(stub.requests) == 3
+
+    async def test_post_and_client_errors_are_not_retried(self, make_service):
+        stub = WodifyStub(httpx.Response(503), httpx.Response(404))
+        service = make_service(stub)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await service._make_request("POST", "bookings", data={})
+        with pytest.raises(httpx.HTTPStatusError):
+            await service._make_request("GET", "classes/unknown")
+        assert len(stub.requests) == 2
+
+    async def test_post_is_retried_if_it_never_reached_wodify(self, make_service):
+        stub = WodifyStub(httpx.ConnectError("refused"), httpx.Response(200, json={"booking_id": "b1"}))
+        service = make_service(stub)
+
+        assert await service._make_request("POST", "bookings", data={}) == {"booking_id": "b1"}
+
+    async def test_retry_after_is_honored(self, make_service):
+        stub = WodifyStub(
+            httpx.Response(429, headers={"Retry-After": "0.3"}),
+            httpx.Response(429, headers={"Retry-After": "120"}),
+        )
+        service = make_service(stub)
+
+        started = time.monotonic()
+        with pytest.raises(httpx.HTTPStatusError):
+            await service._make_request("GET", "classes")
+
+        # Waited for the first Retry-After, gave up on the one above the maximum wait
+        assert 0.3 <= time.monotonic() - started < 1.0
+        assert len(stub.requests) == 2
+
+    def test_retry_after_formats(self):
+        assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "7"})) == 7.0
+        assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+        assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "bald"})) is None
+        assert retry_after_seconds(httpx.Response(429)) is None
+
+
+class TestCircuitBreaker:
+    """Open circuits fail fast per endpoint group"""
+
+    async def test_open_circuit_fails_fast_until_probe_succeeds(self, make_service):
+        stub = WodifyStub(*[httpx.Response(500)] * 3)
+        service = make_service(stub)
+
+        assert await service.get_schedule() == []
+        assert len(stub.requests) == 3
+        assert service.resilience_status()["circuit_breakers"]["schedule"]["state"] == "open"
+
+        # Fails without a request, other groups are unaffected
+        started = time.monotonic()
+        assert await service.get_trainers() == []
+        assert time.monotonic() - started < 0.05
+        assert await service.get_lead("lead_1") is None
+        assert len(stub.requests) == 4
+        health = await service.check_api_health()
+        assert health["status"] in ("circuit_open", "not_configured")
+
+        await asyncio.sleep(0.25)
+        assert await service._make_request("GET", "classes") == {"classes": []}
+        assert service.breakers["schedule"].snapshot()["state"] == "closed"
+
+    def test_half_open_admits_one_probe(self):
+        now = [0.0]
+        breaker = CircuitBreaker("schedule", failure_threshold=2, recovery_seconds=10, clock=lambda: now[0])
+
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+        now[0] = 10.0
+        assert breaker.snapshot()["state"] == "half_open"
+        breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_failure()
+        assert breaker.snapshot() == {
+            "state": "open", "consecutive_failures": 3, "failures": 3, "rejected": 2,
+            "times_opened": 2, "retry_in_seconds": 10.0,
+        }
+
+    def test_endpoint_groups(self):
+        assert endpoint_group("classes/123") == "schedule"
+        assert endpoint_group("waitlist") == "bookings"
+        assert endpoint_group("leads/1/convert") == "leads"
+        assert endpoint_group("reports") == "reports"
+
+
+class TestAIMDLimiter:
+    """Adaptive concurrency limit of outbound calls"""
+
+    async def test_limit_grows_on_success_and_halves_on_overload(self):
+        limiter = AIMDLimiter("test", initial_limit=4, min_limit=1, max_limit=5)
+
+        for _ in range(4):
+            async with limiter.slot() as slot:
+                slot.success()
+        assert limiter.limit == pytest.approx(5.0, abs=0.1)
+
+        # Calls started before a decrease don't decrease again
+        async def overloaded():
+            async with limiter.slot() as slot:
+                await asyncio.sleep(0.01)
+                slot.overload()
+
+        await asyncio.gather(*(overloaded() for _ in range(3)))
+        assert limiter.limit == pytest.approx(2.5, abs=0.1)
+        assert limiter.snapshot()["decreases"] == 1
+
+    async def test_outbound_calls_stay_within_the_limit(self, make_service, monkeypatch):
+        monkeypatch.setattr(settings, "wodify_concurrency_initial", 2)
+        monkeypatch.setattr(settings, "wodify_concurrency_max", 2)
+        stub = WodifyStub(delay=0.02)
+        service = make_service(stub)
+
+        await asyncio.gather(*(service._make_request("GET", "classes") for _ in range(10)))
+
+        assert stub.max_in_flight == 2
+        assert service.limiter.snapshot()["in_flight"] == 0
+
+    async def test_queue_timeout(self):
+        limiter = AIMDLimiter("test", initial_limit=1, min_limit=1, max_limit=1, queue_timeout=0.05)
+
+        async with limiter.slot():
+            with pytest.raises(ConcurrencyLimitError):
+                async with limiter.slot():
+                    pass
+        async with limiter.slot():
+            assert limiter.in_flight == 1
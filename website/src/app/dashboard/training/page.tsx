@@ -37,7 +37,8 @@ Verwende fette Überschriften für jeden Abschnitt (Warm-up, Skill/Strength, Met
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
       const token = localStorage.getItem('access_token');
       
-      const response = await fetch(`${apiUrl}/api/ai/generate-training-plan`, {
+      // The plan is streamed as Server-Sent Events and rendered while it is generated
+      const response = await fetch(`${apiUrl}/api/ai/generate-training-plan/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -46,12 +47,40 @@ Verwende fette Überschriften für jeden Abschnitt (Warm-up, Skill/Strength, Met
         body: JSON.stringify({ prompt }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to generate training plan');
       }
 
-      const data = await response.json();
-      setTrainingPlan(data.plan || data.response || 'Plan wurde erfolgreich erstellt.');
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let plan = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop() || '';
+        for (const event of events) {
+          const lines = event.split('\n');
+          const type = lines.find((line) => line.startsWith('event: '))?.slice(7) || 'message';
+          const data = lines.find((line) => line.startsWith('data: '))?.slice(6);
+          if (!data) continue;
+          if (type === 'error') {
+            throw new Error(JSON.parse(data).detail);
+          }
+          if (type === 'message') {
+            plan += JSON.parse(data).delta;
+            setTrainingPlan(plan);
+          }
+        }
+      }
+
+      if (!plan) {
+        setTrainingPlan('Plan wurde erfolgreich erstellt.');
+      }
 
     } catch (error) {
       console.error("Error generating training plan:", error);
@@ -103,7 +132,7 @@ Verwende fette Überschriften für jeden Abschnitt (Warm-up, Skill/Strength, Met
           </CardContent>
         </Card>
 
-        {isLoading && (
+        {isLoading && !trainingPlan && (
           <Card>
             <CardContent className="py-10">
               <div className="text-center">
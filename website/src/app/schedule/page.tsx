@@ -415,11 +415,13 @@ const SuccessModal = ({ isOpen, onClose, type, courseName }: SuccessModalProps)
             <CardContent className="p-8 text-center">
               <CheckCircle className="w-16 h-16 mx-auto mb-6 text-secondary-500" />
               <h2 className="text-2xl font-bold mb-4 text-secondary-500 font-heading">
-                {type === 'booking' ? 'Erfolgreich gebucht!' : 'Auf Warteliste gesetzt!'}
+                {type === 'booking' ? 'Erfolgreich gebucht!' : type === 'pending' ? 'Anfrage erhalten!' : 'Auf Warteliste gesetzt!'}
               </h2>
               <p className="text-lg mb-6 text-foreground font-body">
                 {type === 'booking'
                   ? `Du bist für "${courseName}" angemeldet. Wir freuen uns auf dich!`
+                  : type === 'pending'
+                  ? `Deine Anfrage für "${courseName}" wird gerade bestätigt. Du findest sie in Kürze unter deinen Buchungen.`
                   : `Du stehst jetzt auf der Warteliste für "${courseName}". Wir benachrichtigen dich, sobald ein Platz frei wird.`
                 }
               </p>
@@ -434,6 +436,34 @@ const SuccessModal = ({ isOpen, onClose, type, courseName }: SuccessModalProps)
   );
 };
 
+// Bookings and waitlist requests are answered with a pending reservation (202)
+// that Wodify confirms in the background; poll it until Wodify has answered
+const RESERVATION_POLL_INTERVAL_MS = 2000;
+const RESERVATION_POLL_TIMEOUT_MS = 60000;
+
+const waitForReservation = async (apiUrl: string, token: string, reservation: { id: string; status: string }) => {
+  const deadline = Date.now() + RESERVATION_POLL_TIMEOUT_MS;
+  let status = reservation.status;
+  while (status === 'pending' && Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, RESERVATION_POLL_INTERVAL_MS));
+    try {
+      const response = await fetch(`${apiUrl}/api/schedule/reservations/${reservation.id}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        status = data.reservation?.status || status;
+      }
+    } catch (error) {
+      console.warn('Reservierungsstatus nicht abrufbar:', error);
+    }
+  }
+  if (status === 'rejected' || status === 'failed') {
+    throw new Error(`Reservation ${status}`);
+  }
+  return status;
+};
+
 export default function SchedulePage() {
   const { user, token } = useAuth();
   const router = useRouter();
@@ -553,12 +583,7 @@ export default function SchedulePage() {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`,
         },
-        body: JSON.stringify({
-          class_id: course.id,
-          user_id: user.id,
-          user_email: user.email,
-          user_name: `${user.first_name || ''} ${user.last_name || ''}`.trim() || user.email,
-        }),
+        body: JSON.stringify({ class_id: course.id }),
       });
 
       const data = await response.json();
@@ -567,8 +592,11 @@ export default function SchedulePage() {
         throw new Error(data.detail || 'Booking failed');
       }
 
+      // Without optimistic booking the response already is Wodify's confirmation
+      const status = response.status === 202 ? await waitForReservation(apiUrl, token, data.booking) : 'confirmed';
+
       console.log('Booking successful:', data);
-      setShowSuccess({ isOpen: true, type: 'booking', courseName: course.name });
+      setShowSuccess({ isOpen: true, type: status === 'pending' ? 'pending' : 'booking', courseName: course.name });
       setSelectedCourse(null);
 
       // Refresh courses to update availability
@@ -601,12 +629,7 @@ export default function SchedulePage() {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`,
         },
-        body: JSON.stringify({
-          class_id: course.id,
-          user_id: user.id,
-          user_email: user.email,
-          user_name: `${user.first_name || ''} ${user.last_name || ''}`.trim() || user.email,
-        }),
+        body: JSON.stringify({ class_id: course.id }),
       });
 
       const data = await response.json();
@@ -615,8 +638,10 @@ export default function SchedulePage() {
         throw new Error(data.detail || 'Waitlist join failed');
       }
 
+      const status = response.status === 202 ? await waitForReservation(apiUrl, token, data.waitlist) : 'confirmed';
+
       console.log('Waitlist join successful:', data);
-      setShowSuccess({ isOpen: true, type: 'waitlist', courseName: course.name });
+      setShowSuccess({ isOpen: true, type: status === 'pending' ? 'pending' : 'waitlist', courseName: course.name });
       setSelectedCourse(null);
     } catch (error) {
       console.error("Wartelisten-Fehler:", error);
@@ -121,6 +121,17 @@ export function AuthProvider({ children }: { children: ReactNode }) {
   };
 
   const logout = () => {
+    // Revoke the refresh token server-side; local logout doesn't wait for it
+    const storedRefreshToken = localStorage.getItem('refresh_token');
+    if (storedRefreshToken) {
+      fetch(`${apiUrl}/api/auth/logout`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ refresh_token: storedRefreshToken }),
+      }).catch((error) => console.error('Logout error:', error));
+    }
     setUser(null);
     setToken(null);
     localStorage.removeItem('access_token');
@@ -4,7 +4,9 @@
  */
 
 export interface OrderItem {
+    product_id?: string;
     product_name: string;
+    product_sku?: string;
     quantity: number;
     price: number;
     size?: string;
@@ -88,8 +90,9 @@ export async function getOrders(token?: string): Promise<Order[]> {
             return [];
         }
         
+        // Paginated response: { orders, next_cursor, has_more }
         const data = await response.json();
-        return data || [];
+        return data.orders || [];
     } catch (error) {
         console.error('Error fetching orders:', error);
         return [];
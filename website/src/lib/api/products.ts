@@ -17,8 +17,14 @@ export interface Product {
 
 const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+// Largest page the API serves (MAX_PAGE_SIZE in src/api/shop.py)
+const PRODUCT_PAGE_SIZE = 200;
+
 /**
  * Fetch all products
+ *
+ * The API returns the catalog in pages (keyset pagination), so next_cursor
+ * is followed until the last page.
  */
 export async function listProducts(): Promise<Product[]> {
     try {
@@ -26,18 +32,29 @@ export async function listProducts(): Promise<Product[]> {
         const controller = new AbortController();
         const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 second timeout
         
-        const response = await fetch(`${apiUrl}/api/shop/products`, {
-            signal: controller.signal,
-        });
+        const products: Product[] = [];
+        let cursor: string | null = null;
+        do {
+            const params = new URLSearchParams({ limit: String(PRODUCT_PAGE_SIZE) });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            const response = await fetch(`${apiUrl}/api/shop/products?${params}`, {
+                signal: controller.signal,
+            });
+            
+            if (!response.ok) {
+                clearTimeout(timeoutId);
+                throw new Error(`Failed to fetch products: ${response.status}`);
+            }
+            
+            const data = await response.json();
+            products.push(...(data.products || []));
+            cursor = data.has_more ? data.next_cursor : null;
+        } while (cursor);
         
         clearTimeout(timeoutId);
-        
-        if (!response.ok) {
-            throw new Error(`Failed to fetch products: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        return data.products || [];
+        return products;
     } catch (error) {
         // Silently fall back to mock data if API is unavailable
         if (error instanceof Error) {